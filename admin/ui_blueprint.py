@@ -9,6 +9,7 @@ from sqlalchemy import text
 from werkzeug.security import generate_password_hash
 from core.models import Tenant, User
 from core.impersonation import start_impersonation
+from core.site_cache import invalidate_sites
 
 admin_ui_bp = Blueprint("admin_ui", __name__)
 @admin_ui_bp.route("/ui/systemadmin/dashboard", methods=["GET", "POST"])  # accept accidental POST
@@ -1278,6 +1279,7 @@ def systemadmin_customer_sites_create(tenant_id: int):
         )
         db.add(user)
         db.commit()
+        invalidate_sites()  # site row and possibly the sites.tenant_id column are new
         try:
             open_admin_url = url_for("admin_ui.systemadmin_switch_site", site_id=site_id)
         except Exception:
@@ -15,6 +15,7 @@ from .api_types import (
 from .app_authz import require_roles as require_roles_strict
 from .auth import require_roles as require_roles_simple
 from .db import get_session
+from .feature_flag_cache import bump_version as bump_flag_version
 from .feature_service import FeatureService
 from .http_limits import limit as http_limit
 from .limit_registry import (
@@ -48,6 +49,8 @@ except Exception:  # pragma: no cover
 
 bp = Blueprint("admin", __name__, url_prefix="/admin")
 
+MENU_IMPORT_MAX_BYTES = 5 * 1024 * 1024  # decoded upload size, same guard as /import
+
 
 def _admin_problem(status: int, title: str, *, detail: str | None = None, invalid_params: list | None = None, extra: dict | None = None):
     """Build RFC7807 problem+json response for admin endpoints.
@@ -795,32 +798,82 @@ def update_diet_defaults(department_id: str):
 @bp.post("/menu-import")
 @require_roles_strict("admin")
 def start_menu_import():
-    """Start menu import job (admin only).
-    
-    Phase A: Returns 501 Not Implemented.
+    """Queue a menu import job (admin only).
+
+    Body: { data_format: csv|json|docx|xlsx, data, site_id?, filename? } where data is text for
+    csv/json and base64 for docx/xlsx; site_id defaults to the session site. Returns 202 with the
+    job; a re-upload of the same file (or the same Idempotency-Key header) returns the existing
+    job with 200. Poll GET /admin/menu-import/<job_id> for progress.
     """
     maybe = _require_admin_module_enabled()
     if maybe is not None:
         return maybe
-    # Basic validation to satisfy tests: require minimal body fields
+    import base64
+    import binascii
+
+    from . import menu_import_jobs
+
+    tid = _admin_tenant_id()
+    if not tid:
+        return forbidden("tenant_required", "Tenant context required")
     data = request.get_json(silent=True) or {}
     if not data.get("data_format") or not data.get("data"):
         return bad_request("missing required fields: data_format, data")
-    return problem(501, "not_implemented_phase_a", "Not Implemented", "Menu import will be implemented in Phase B")
+    data_format = str(data["data_format"]).strip().lower()
+    if data_format not in menu_import_jobs.FORMATS:
+        return bad_request(f"data_format must be one of: {', '.join(menu_import_jobs.FORMATS)}")
+    raw = data["data"]
+    if not isinstance(raw, str):
+        return bad_request("data must be a string")
+    if data_format in menu_import_jobs.BINARY_FORMATS:
+        try:
+            payload = base64.b64decode(raw, validate=True)
+        except (binascii.Error, ValueError):
+            return bad_request("data must be base64 for docx/xlsx")
+    else:
+        payload = raw.encode("utf-8")
+    if len(payload) > MENU_IMPORT_MAX_BYTES:
+        return problem(413, "payload_too_large", "Payload Too Large", "menu import data exceeds 5MB")
+    site_id = str(data.get("site_id") or session.get("site_id") or "").strip()
+    if not site_id:
+        return bad_request("missing site_id")
+    key = (request.headers.get("Idempotency-Key") or "").strip() or None
+    if key is not None and len(key) > 128:
+        return bad_request("Idempotency-Key too long (max 128)")
+    filename = data.get("filename")
+    job, created = menu_import_jobs.submit(
+        int(tid),
+        site_id,
+        data_format,
+        payload,
+        filename=str(filename)[:255] if filename else None,
+        key=key,
+    )
+    resp = jsonify(job)
+    resp.status_code = 202 if created else 200
+    resp.headers["Location"] = f"/admin/menu-import/{job['job_id']}"
+    return resp
 
 
 @bp.get("/menu-import/<job_id>")
 @require_roles_strict("admin", "editor")
 def get_menu_import_status(job_id: str):
-    """Get menu import job status (admin/editor access).
-    
-    Phase A: Returns 501 Not Implemented.
-    """
+    """Menu import job status, progress, warnings and summary (admin/editor, own tenant)."""
     maybe = _require_admin_module_enabled()
     if maybe is not None:
         return maybe
-    
-    return problem(501, "not_implemented_phase_a", "Not Implemented", "Menu import status tracking will be implemented in Phase B")
+    from . import menu_import_jobs
+
+    tid = _admin_tenant_id()
+    if not tid:
+        return forbidden("tenant_required", "Tenant context required")
+    job = menu_import_jobs.get_job(int(tid), job_id)
+    if job is None:
+        return not_found("menu_import_job_not_found")
+    resp = jsonify(job)
+    if job["status"] in ("pending", "processing"):
+        resp.headers["Retry-After"] = "2"
+    return resp
 
 
 @bp.put("/alt2")
@@ -1834,6 +1887,8 @@ def admin_feature_flag_update_stub(key: str):  # type: ignore[return-value]
             if changed:
                 row2.updated_at = _dt.now(_UTC)
                 db2.add(row2)
+                if "enabled" in change_fields:
+                    bump_flag_version(db2)
                 db2.commit()
                 db2.refresh(row2)
                 # Emit audit for feature flag update (only when changed)
@@ -5,15 +5,34 @@ from datetime import datetime
 from flask import Blueprint, jsonify, request
 
 from .app_authz import require_roles
-from .audit_repo import AuditQueryFilters, AuditRepo
+from .audit_repo import AuditCursorError, AuditQueryFilters, AuditRepo
 from .pagination import make_page_response, parse_page_params
 
 bp = Blueprint("admin_audit", __name__, url_prefix="/admin")
 
 
+def _item(r) -> dict:
+    return {
+        "id": r.id,
+        "ts": r.ts.isoformat(),
+        "tenant_id": r.tenant_id,
+        "actor_user_id": r.actor_user_id,
+        "actor_role": r.actor_role,
+        "event": r.event,
+        "payload": r.payload,
+        "request_id": r.request_id,
+    }
+
+
 @bp.get("/audit")
 @require_roles("admin")
 def list_audit_events():  # type: ignore[return-value]
+    """List audit events newest first.
+
+    Page mode (page/size) is the default. Passing `cursor` (empty for the first page) switches to
+    keyset mode: meta carries `next_cursor` (null on the last page) and, only when asked via
+    `total=exact|approx`, `total` plus `total_exact`.
+    """
     args = request.args
     tenant_id = args.get("tenant_id")
     event = args.get("event")
@@ -27,29 +46,25 @@ def list_audit_events():  # type: ignore[return-value]
     except Exception:
         return jsonify({"ok": False, "error": "bad_request", "message": "invalid tenant_id"}), 400
     page_req = parse_page_params(dict(args))
-    repo = AuditRepo()
-    rows, total = repo.query(
-        AuditQueryFilters(
-            tenant_id=tenant_id_int,
-            event=event,
-            ts_from=ts_from,
-            ts_to=ts_to,
-            text=q,
-        ),
-        page=page_req["page"],
-        size=page_req["size"],
+    filters = AuditQueryFilters(
+        tenant_id=tenant_id_int,
+        event=event,
+        ts_from=ts_from,
+        ts_to=ts_to,
+        text=q,
     )
-    items = [
-        {
-            "id": r.id,
-            "ts": r.ts.isoformat(),
-            "tenant_id": r.tenant_id,
-            "actor_user_id": r.actor_user_id,
-            "actor_role": r.actor_role,
-            "event": r.event,
-            "payload": r.payload,
-            "request_id": r.request_id,
-        }
-        for r in rows
-    ]
-    return jsonify(make_page_response(items, page_req, total))
+    repo = AuditRepo()
+    if "cursor" in args:
+        try:
+            rows, next_cursor = repo.query_keyset(
+                filters, size=page_req["size"], cursor=args.get("cursor") or None
+            )
+        except AuditCursorError:
+            return jsonify({"ok": False, "error": "bad_request", "message": "invalid cursor"}), 400
+        meta: dict = {"size": page_req["size"], "next_cursor": next_cursor}
+        total_mode = (args.get("total") or "").lower()
+        if total_mode in ("exact", "approx"):
+            meta["total"], meta["total_exact"] = repo.count(filters, approx=total_mode == "approx")
+        return jsonify({"ok": True, "items": [_item(r) for r in rows], "meta": meta})
+    rows, total = repo.query(filters, page=page_req["page"], size=page_req["size"])
+    return jsonify(make_page_response([_item(r) for r in rows], page_req, total))
@@ -3,10 +3,11 @@ from __future__ import annotations
 import uuid
 from typing import Iterable
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
-from .db import get_session
+from .db import ensure_schema, get_session
 from .etag import ConcurrencyError
+from .site_cache import invalidate_sites
 
 
 def _is_sqlite(db) -> bool:
@@ -16,26 +17,89 @@ def _is_sqlite(db) -> bool:
         return True
 
 
+# SQLite test/dev fallbacks for tables normally created by migrations. Each runs once per engine
+# (see core.db.ensure_schema) on the caller's session.
+_SQLITE_TABLE_DDL = {
+    "sites": """
+        CREATE TABLE IF NOT EXISTS sites (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            notes TEXT NULL,
+            updated_at TEXT
+        )
+        """,
+    "departments": """
+        CREATE TABLE IF NOT EXISTS departments (
+            id TEXT PRIMARY KEY,
+            site_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            resident_count_mode TEXT NOT NULL,
+            resident_count_fixed INTEGER NOT NULL DEFAULT 0,
+            notes TEXT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+        """,
+    "department_diet_defaults": """
+        CREATE TABLE IF NOT EXISTS department_diet_defaults (
+            department_id TEXT NOT NULL,
+            diet_type_id TEXT NOT NULL,
+            default_count INTEGER NOT NULL DEFAULT 0,
+            -- Optional Phase 3 flag: count as done (debiterbar) always
+            always_mark INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (department_id, diet_type_id)
+        )
+        """,
+    "alt2_flags": """
+        CREATE TABLE IF NOT EXISTS alt2_flags (
+            site_id TEXT NOT NULL,
+            department_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            weekday INTEGER NOT NULL,
+            enabled BOOLEAN NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (site_id, department_id, week, weekday)
+        )
+        """,
+}
+
+
+def _ensure_sqlite_table(db, table: str) -> None:
+    if not _is_sqlite(db):
+        return
+
+    def _create() -> None:
+        db.execute(text(_SQLITE_TABLE_DDL[table]))
+
+    ensure_schema(table, _create)
+
+
+def _ensure_sites_table(db) -> None:
+    _ensure_sqlite_table(db, "sites")
+
+
+def _ensure_departments_table(db) -> None:
+    _ensure_sqlite_table(db, "departments")
+
+
+def _ensure_department_diet_defaults_table(db) -> None:
+    _ensure_sqlite_table(db, "department_diet_defaults")
+
+
+def _ensure_alt2_flags_table(db) -> None:
+    _ensure_sqlite_table(db, "alt2_flags")
+
+
 class SitesRepo:
     def create_site(self, name: str) -> tuple[dict, int]:
         db = get_session()
         try:
             sid = str(uuid.uuid4())
+            # Ensure minimal admin tables exist for sqlite test/dev environments
+            _ensure_sites_table(db)
             if _is_sqlite(db):
-                # Ensure minimal admin tables exist for sqlite test/dev environments
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS sites (
-                            id TEXT PRIMARY KEY,
-                            name TEXT NOT NULL,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            notes TEXT NULL,
-                            updated_at TEXT
-                        )
-                        """
-                    )
-                )
                 db.execute(
                     text(
                         """
@@ -56,6 +120,7 @@ class SitesRepo:
                     {"id": sid, "name": name},
                 )
             db.commit()
+            invalidate_sites(sid)
             return {"id": sid, "name": name}, 0
         except Exception as exc:
             db.rollback()
@@ -77,20 +142,7 @@ class SitesRepo:
         """List all sites (id, name, version)."""
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS sites (
-                            id TEXT PRIMARY KEY,
-                            name TEXT NOT NULL,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            notes TEXT NULL,
-                            updated_at TEXT
-                        )
-                        """
-                    )
-                )
+            _ensure_sites_table(db)
             rows = db.execute(text("SELECT id, name, COALESCE(version,0) FROM sites ORDER BY name"))
             return [{"id": r[0], "name": r[1], "version": int(r[2] or 0)} for r in rows.fetchall()]
         finally:
@@ -105,32 +157,14 @@ class SitesRepo:
         db = get_session()
         try:
             # Ensure table exists on sqlite
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS sites (
-                            id TEXT PRIMARY KEY,
-                            name TEXT NOT NULL,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            notes TEXT NULL,
-                            updated_at TEXT
-                        )
-                        """
-                    )
-                )
+            _ensure_sites_table(db)
             # Detect presence of tenant_id column
-            has_col = False
-            try:
+            if _is_sqlite(db):
                 cols = db.execute(text("PRAGMA table_info('sites')")).fetchall()
                 has_col = any(str(c[1]) == "tenant_id" for c in cols)
-            except Exception:
-                # Postgres path
-                try:
-                    chk = db.execute(text("SELECT 1 FROM information_schema.columns WHERE table_name='sites' AND column_name='tenant_id'"))
-                    has_col = chk.fetchone() is not None
-                except Exception:
-                    has_col = False
+            else:
+                chk = db.execute(text("SELECT 1 FROM information_schema.columns WHERE table_name='sites' AND column_name='tenant_id'"))
+                has_col = chk.fetchone() is not None
             if not has_col:
                 return []
             rows = db.execute(
@@ -156,24 +190,9 @@ class DepartmentsRepo:
             did = str(uuid.uuid4())
             rc_fixed = int(resident_count_fixed or 0)
             notes_value = notes if notes is not None else None
+            # Ensure departments table exists (sqlite test/dev)
+            _ensure_departments_table(db)
             if _is_sqlite(db):
-                # Ensure departments table exists (sqlite test/dev)
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS departments (
-                            id TEXT PRIMARY KEY,
-                            site_id TEXT NOT NULL,
-                            name TEXT NOT NULL,
-                            resident_count_mode TEXT NOT NULL,
-                            resident_count_fixed INTEGER NOT NULL DEFAULT 0,
-                            notes TEXT NULL,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT
-                        )
-                        """
-                    )
-                )
                 db.execute(
                     text(
                         """
@@ -303,23 +322,7 @@ class DepartmentsRepo:
         """List departments for a given site."""
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS departments (
-                            id TEXT PRIMARY KEY,
-                            site_id TEXT NOT NULL,
-                            name TEXT NOT NULL,
-                            resident_count_mode TEXT NOT NULL,
-                            resident_count_fixed INTEGER NOT NULL DEFAULT 0,
-                            notes TEXT NULL,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT
-                        )
-                        """
-                    )
-                )
+            _ensure_departments_table(db)
             rows = db.execute(
                 text(
                     """
@@ -352,19 +355,7 @@ class DepartmentsRepo:
                 raise ConcurrencyError("missing version")
             # ensure department exists & optimistic concurrency check by bumping version at the end
             # SQLite test/dev fallback: ensure table exists (mirrors create_all bootstrap semantics)
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS department_diet_defaults (
-                            department_id TEXT NOT NULL,
-                            diet_type_id TEXT NOT NULL,
-                            default_count INTEGER NOT NULL DEFAULT 0,
-                            PRIMARY KEY (department_id, diet_type_id)
-                        )
-                        """
-                    )
-                )
+            _ensure_department_diet_defaults_table(db)
             for it in items:
                 diet_type_id = str(it["diet_type_id"]).strip()
                 default_count = int(it["default_count"])
@@ -477,21 +468,7 @@ class DietDefaultsRepo:
     def list_for_department(self, dept_id: str) -> list[dict]:
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS department_diet_defaults (
-                            department_id TEXT NOT NULL,
-                            diet_type_id TEXT NOT NULL,
-                            default_count INTEGER NOT NULL DEFAULT 0,
-                            -- Optional Phase 3 flag: count as done (debiterbar) always
-                            always_mark INTEGER NOT NULL DEFAULT 0,
-                            PRIMARY KEY (department_id, diet_type_id)
-                        )
-                        """
-                    )
-                )
+            _ensure_department_diet_defaults_table(db)
             # Detect optional column presence
             cols = {c[1] for c in db.execute(text("PRAGMA table_info('department_diet_defaults')")).fetchall()}
             if "always_mark" in cols:
@@ -530,38 +507,74 @@ class DietDefaultsRepo:
         finally:
             db.close()
 
+    def list_for_departments(self, dept_ids: Iterable[str]) -> dict[str, list[dict]]:
+        """Set-based variant of list_for_department: {department_id: [items]} for all ids."""
+        ids = [str(d) for d in dict.fromkeys(dept_ids) if d]
+        out: dict[str, list[dict]] = {d: [] for d in ids}
+        if not ids:
+            return out
+        db = get_session()
+        try:
+            _ensure_department_diet_defaults_table(db)
+            # always_mark is a SQLite-only optional column (no migration adds it)
+            cols: set = set()
+            if _is_sqlite(db):
+                cols = {c[1] for c in db.execute(text("PRAGMA table_info('department_diet_defaults')")).fetchall()}
+            always_col = "always_mark" if "always_mark" in cols else "0"
+            rows = db.execute(
+                text(
+                    f"""
+                    SELECT department_id, diet_type_id, default_count, {always_col}
+                    FROM department_diet_defaults
+                    WHERE department_id IN :ids
+                    ORDER BY department_id, diet_type_id
+                    """
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            ).fetchall()
+            for r in rows:
+                out.setdefault(str(r[0]), []).append(
+                    {"diet_type_id": r[1], "default_count": int(r[2]), "always_mark": bool(r[3] or 0)}
+                )
+            return out
+        finally:
+            db.close()
+
 
 class DietTypesRepo:
     """Repository for managing dietary types (specialkost), now scoped per site."""
 
     def _ensure_table(self, db) -> None:
         if _is_sqlite(db):
-            db.execute(
-                text(
-                    """
-                    CREATE TABLE IF NOT EXISTS dietary_types (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        -- tenant_id kept for backward-compat in some environments
-                        tenant_id INTEGER NULL,
-                        site_id TEXT NULL,
-                        name TEXT NOT NULL,
-                        default_select INTEGER NOT NULL DEFAULT 0
-                    )
-                    """
+            ensure_schema("dietary_types", lambda: self._bootstrap_table(db))
+
+    def _bootstrap_table(self, db) -> None:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS dietary_types (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    -- tenant_id kept for backward-compat in some environments
+                    tenant_id INTEGER NULL,
+                    site_id TEXT NULL,
+                    name TEXT NOT NULL,
+                    default_select INTEGER NOT NULL DEFAULT 0
                 )
+                """
             )
-            # Add missing site_id column for older dev DBs; keep it NULL-able to avoid breaking existing rows
-            try:
-                cols = {r[1] for r in db.execute(text("PRAGMA table_info('dietary_types')")).fetchall()}
-                if "site_id" not in cols:
-                    db.execute(text("ALTER TABLE dietary_types ADD COLUMN site_id TEXT"))
-            except Exception:
-                pass
-            # Helpful index for lookups
-            try:
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_dietary_types_site_name ON dietary_types(site_id, name)"))
-            except Exception:
-                pass
+        )
+        # Add missing site_id column for older dev DBs; keep it NULL-able to avoid breaking existing rows
+        try:
+            cols = {r[1] for r in db.execute(text("PRAGMA table_info('dietary_types')")).fetchall()}
+            if "site_id" not in cols:
+                db.execute(text("ALTER TABLE dietary_types ADD COLUMN site_id TEXT"))
+        except Exception:
+            pass
+        # Helpful index for lookups
+        try:
+            db.execute(text("CREATE INDEX IF NOT EXISTS idx_dietary_types_site_name ON dietary_types(site_id, name)"))
+        except Exception:
+            pass
 
     def list_all(self, site_id: str) -> list[dict]:
         """List all dietary types for a given site."""
@@ -790,6 +803,7 @@ class Alt2Repo:
         db = get_session()
         try:
             dialect = db.bind.dialect.name if db.bind is not None else ""
+            _ensure_alt2_flags_table(db)
             out: list[dict] = []
             for it in flags:
                 params = {
@@ -800,23 +814,6 @@ class Alt2Repo:
                     "enabled": bool(it["enabled"]),
                 }
                 if dialect == "sqlite":
-                    # Ensure table exists
-                    db.execute(
-                        text(
-                            """
-                            CREATE TABLE IF NOT EXISTS alt2_flags (
-                                site_id TEXT NOT NULL,
-                                department_id TEXT NOT NULL,
-                                week INTEGER NOT NULL,
-                                weekday INTEGER NOT NULL,
-                                enabled BOOLEAN NOT NULL DEFAULT 0,
-                                version INTEGER NOT NULL DEFAULT 0,
-                                updated_at TEXT,
-                                PRIMARY KEY (site_id, department_id, week, weekday)
-                            )
-                            """
-                        )
-                    )
                     # Do not update if no change (preserve version)
                     db.execute(
                         text(
@@ -871,23 +868,7 @@ class Alt2Repo:
     def collection_version(self, week: int, site_id: str) -> int:
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS alt2_flags (
-                            site_id TEXT NOT NULL,
-                            department_id TEXT NOT NULL,
-                            week INTEGER NOT NULL,
-                            weekday INTEGER NOT NULL,
-                            enabled BOOLEAN NOT NULL DEFAULT 0,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT,
-                            PRIMARY KEY (site_id, department_id, week, weekday)
-                        )
-                        """
-                    )
-                )
+            _ensure_alt2_flags_table(db)
             row = db.execute(
                 text(
                     "SELECT COALESCE(MAX(version),0) FROM alt2_flags WHERE site_id=:s AND week=:w"
@@ -906,23 +887,7 @@ class Alt2Repo:
         """List alt2 flags for a given week and site (strictly site-scoped)."""
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS alt2_flags (
-                            site_id TEXT NOT NULL,
-                            department_id TEXT NOT NULL,
-                            week INTEGER NOT NULL,
-                            weekday INTEGER NOT NULL,
-                            enabled BOOLEAN NOT NULL DEFAULT 0,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT,
-                            PRIMARY KEY (site_id, department_id, week, weekday)
-                        )
-                        """
-                    )
-                )
+            _ensure_alt2_flags_table(db)
             rows = db.execute(
                 text(
                     "SELECT site_id, department_id, week, weekday, enabled, COALESCE(version,0) FROM alt2_flags WHERE site_id=:s AND week=:w ORDER BY department_id, weekday"
@@ -946,23 +911,7 @@ class Alt2Repo:
         """Return max version for a department's week flags (0 if none)."""
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS alt2_flags (
-                            site_id TEXT NOT NULL,
-                            department_id TEXT NOT NULL,
-                            week INTEGER NOT NULL,
-                            weekday INTEGER NOT NULL,
-                            enabled BOOLEAN NOT NULL DEFAULT 0,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT,
-                            PRIMARY KEY (site_id, department_id, week, weekday)
-                        )
-                        """
-                    )
-                )
+            _ensure_alt2_flags_table(db)
             row = db.execute(
                 text(
                     "SELECT COALESCE(MAX(version),0) FROM alt2_flags WHERE department_id=:d AND week=:w"
@@ -973,27 +922,41 @@ class Alt2Repo:
         finally:
             db.close()
 
+    def list_for_departments_week(self, department_ids: Iterable[str], week: int) -> dict[str, list[dict]]:
+        """Set-based variant of list_for_department_week: {department_id: [flags]}."""
+        ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        out: dict[str, list[dict]] = {d: [] for d in ids}
+        if not ids:
+            return out
+        db = get_session()
+        try:
+            _ensure_alt2_flags_table(db)
+            rows = db.execute(
+                text(
+                    "SELECT site_id, department_id, week, weekday, enabled, COALESCE(version,0) FROM alt2_flags WHERE department_id IN :ids AND week=:w ORDER BY department_id, weekday"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids, "w": int(week)},
+            ).fetchall()
+            for r in rows:
+                out.setdefault(str(r[1]), []).append(
+                    {
+                        "site_id": r[0],
+                        "department_id": r[1],
+                        "week": int(r[2]),
+                        "weekday": int(r[3]),
+                        "enabled": bool(r[4]),
+                        "version": int(r[5] or 0),
+                    }
+                )
+            return out
+        finally:
+            db.close()
+
     def list_for_department_week(self, department_id: str, week: int) -> list[dict]:
         """List alt2 flags for a specific department and week."""
         db = get_session()
         try:
-            if _is_sqlite(db):
-                db.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS alt2_flags (
-                            site_id TEXT NOT NULL,
-                            department_id TEXT NOT NULL,
-                            week INTEGER NOT NULL,
-                            weekday INTEGER NOT NULL,
-                            enabled BOOLEAN NOT NULL DEFAULT 0,
-                            version INTEGER NOT NULL DEFAULT 0,
-                            updated_at TEXT,
-                            PRIMARY KEY (site_id, department_id, week, weekday)
-                        )
-                        """
-                    )
-                )
+            _ensure_alt2_flags_table(db)
             rows = db.execute(
                 text(
                     "SELECT site_id, department_id, week, weekday, enabled, COALESCE(version,0) FROM alt2_flags WHERE department_id=:d AND week=:w ORDER BY weekday"
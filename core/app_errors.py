@@ -95,6 +95,8 @@ def register_error_handlers(app: Flask) -> None:
         except Exception:
             pass
         r.headers["Retry-After"] = str(getattr(e, "retry_after", 1))
+        if getattr(e, "remaining", None) is not None:
+            r.headers["RateLimit-Remaining"] = str(e.remaining)
         return _attach_code(r, 429)
 
     # Pagination errors
@@ -34,23 +34,29 @@ from .app_authz import require_roles
 # Legacy JSON error handler removed in ADR-003 sweep
 from .auth import bp as auth_bp, ensure_bootstrap_superuser, ensure_dev_superuser_henrik
 from .config import Config
-from .db import get_session, init_engine
+from .db import begin_unit_of_work, end_unit_of_work, get_session, init_engine, pool_checkouts
+from .db_engine import EngineSettings
 from .diet_api import bp as diet_api_bp
 from .errors import APIError, register_error_handlers as register_domain_handlers
 from .export_api import bp as export_bp
 from .feature_flags import FeatureRegistry
+from .feature_flag_cache import bump_version as ff_bump_version, snapshots as ff_snapshots
+from . import http_metrics
 from .import_api import bp as import_api_bp
 from .inline_ui import inline_ui_bp
 from .logging_setup import install_support_log_handler
 from .menu_api import bp as menu_api_bp
 from .metrics import set_metrics
 from .metrics_logging import LoggingMetrics
+from .metrics_registry import RegistryMetrics
 from .models import TenantFeatureFlag
 from .notes_api import bp as notes_bp
+from .openapi_artifact import OpenAPIArtifactHolder
 from .openapi_ui import bp as openapi_ui_bp
 from .security import init_security
 from .service_metrics_api import bp as metrics_api_bp
 from .service_recommendation_api import bp as service_recommendation_bp
+from . import sql_profiler
 from .tasks_api import bp as tasks_bp
 from .turnus_api import bp as turnus_api_bp
 from .weekview_api import bp as weekview_api_bp
@@ -337,12 +343,79 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
 
     # --- DB setup ---
     _log_sqlite_fingerprint("before_init_engine")
+    engine_settings = EngineSettings.from_mapping(app.config, env=os.environ)
     if app.config.get("TESTING"):
-        engine = init_engine(cfg.database_url, force=True)
+        engine = init_engine(cfg.database_url, force=True, settings=engine_settings)
     else:
-        engine = init_engine(cfg.database_url)
+        engine = init_engine(cfg.database_url, settings=engine_settings)
     _log_sqlite_fingerprint("after_init_engine")
 
+    # Audit sink: batched background writer unless sync is requested. Tests read audit rows right
+    # after the request, so TESTING defaults to sync when neither config nor env picks a mode.
+    from .audit_sink import configure_audit_sink
+
+    audit_mode = app.config.get("AUDIT_SINK")
+    if not audit_mode and app.config.get("TESTING") and not os.getenv("AUDIT_SINK"):
+        audit_mode = "sync"
+    configure_audit_sink(audit_mode)
+
+    # Menu import jobs run on a worker pool; TESTING runs them inline so the POST response (and
+    # the in-memory DB) already carries the outcome, unless config or env picks a mode.
+    from .menu_import_jobs import configure_menu_import_jobs
+
+    import_mode = app.config.get("MENU_IMPORT_MODE")
+    if not import_mode and app.config.get("TESTING") and not os.getenv("MENU_IMPORT_MODE"):
+        import_mode = "inline"
+    configure_menu_import_jobs(import_mode)
+
+    # X-DB-Checkouts (pool checkouts per request) is a verification aid, not a public header:
+    # sent under debug/TESTING or EXPOSE_DB_CHECKOUTS=1; the request log always has db_checkouts
+    expose_checkouts = str(
+        app.config.get("EXPOSE_DB_CHECKOUTS", os.getenv("EXPOSE_DB_CHECKOUTS", "0"))
+    ).lower() in ("1", "true", "yes")
+
+    # One unit of work per request: repositories share the scoped session/connection and
+    # their close() calls are deferred to teardown. Registered first so every later hook shares it.
+    @app.before_request
+    def _db_begin_request() -> None:
+        g._db_checkouts0 = pool_checkouts()
+        begin_unit_of_work()
+
+    @app.teardown_request
+    def _db_end_request(_exc: BaseException | None) -> None:
+        end_unit_of_work()
+
+    # Request latency histogram + in-flight gauge (core.http_metrics, exposed on GET /metrics)
+    @app.before_request
+    def _metrics_begin_request() -> None:
+        http_metrics.start_request()
+
+    @app.after_request
+    def _metrics_after_request(resp: Response) -> Response:
+        try:
+            http_metrics.finish_request(resp.status_code)
+        except Exception:  # pragma: no cover - metrics must never break a response
+            pass
+        return resp
+
+    @app.teardown_request
+    def _metrics_end_request(_exc: BaseException | None) -> None:
+        http_metrics.end_request()
+
+    # Sampled SQL profile (SQL_PROFILE_*): finished in _after_req, which adds Server-Timing
+    sql_profiler.configure(
+        sample_rate=app.config.get("SQL_PROFILE_SAMPLE_RATE"),
+        n1_threshold=app.config.get("SQL_PROFILE_N1_THRESHOLD"),
+    )
+
+    @app.before_request
+    def _sql_profile_begin_request() -> None:
+        sql_profiler.start_request()
+
+    @app.teardown_request
+    def _sql_profile_end_request(_exc: BaseException | None) -> None:
+        sql_profiler.discard()
+
     is_dev = (app.config.get("ENV") == "development") or bool(app.config.get("DEBUG"))
     if is_dev:
         from sqlalchemy import event
@@ -503,7 +576,12 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
     init_security(app)
 
     # --- Metrics backend wiring ---
-    backend = app.config.get("METRICS_BACKEND") or getattr(cfg, "metrics_backend", None) or "noop"
+    backend = (
+        app.config.get("METRICS_BACKEND")
+        or getattr(cfg, "metrics_backend", None)
+        or os.getenv("METRICS_BACKEND")
+        or "noop"
+    )
     if backend == "log":  # minimal logging adapter
         try:
             set_metrics(LoggingMetrics())
@@ -512,6 +590,9 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
             app.logger.exception(
                 "Failed to initialize logging metrics backend; falling back to noop"
             )
+    elif backend == "prometheus":  # increment() events become registry counters on GET /metrics
+        set_metrics(RegistryMetrics())
+        app.logger.info("Metrics backend initialized: prometheus")
 
     # --- Feature flags ---
     feature_registry = FeatureRegistry()
@@ -549,26 +630,34 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
         if not tid and not sid:
             return
         db = get_session()
+
+        def _tenant_flags() -> dict[str, bool]:
+            rows = (
+                db.query(TenantFeatureFlag.name, TenantFeatureFlag.enabled)
+                .filter(TenantFeatureFlag.tenant_id == tid)
+                .all()
+            )
+            return {r[0]: bool(r[1]) for r in rows}
+
+        def _site_flags() -> dict[str, bool]:
+            # site_feature_flags may not exist: probe in a savepoint so a miss cannot abort the
+            # request's shared transaction
+            with db.begin_nested():
+                rows = db.execute(
+                    text("SELECT name, enabled FROM site_feature_flags WHERE site_id=:sid"), {"sid": sid}
+                ).fetchall()
+            return {str(r[0]): bool(int(r[1])) for r in rows}
+
+        # Versioned per-process snapshots; see core/feature_flag_cache.py
         try:
             if sid:
                 try:
-                    rows = db.execute(text("SELECT name, enabled FROM site_feature_flags WHERE site_id=:sid"), {"sid": sid}).fetchall()
-                    g.tenant_feature_flags = {str(r[0]): bool(int(r[1])) for r in rows}
+                    g.tenant_feature_flags = ff_snapshots.get(db, "site", sid, _site_flags)
                 except Exception:
                     # Fall back to tenant-level flags if site-level not available
-                    rows = (
-                        db.query(TenantFeatureFlag.name, TenantFeatureFlag.enabled)
-                        .filter(TenantFeatureFlag.tenant_id == tid)
-                        .all()
-                    )
-                    g.tenant_feature_flags = {r[0]: bool(r[1]) for r in rows}
+                    g.tenant_feature_flags = ff_snapshots.get(db, "tenant", tid, _tenant_flags)
             else:
-                rows = (
-                    db.query(TenantFeatureFlag.name, TenantFeatureFlag.enabled)
-                    .filter(TenantFeatureFlag.tenant_id == tid)
-                    .all()
-                )
-                g.tenant_feature_flags = {r[0]: bool(r[1]) for r in rows}
+                g.tenant_feature_flags = ff_snapshots.get(db, "tenant", tid, _tenant_flags)
         finally:
             db.close()
 
@@ -964,27 +1053,46 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
             rid = getattr(g, "request_id", str(uuid.uuid4()))
             resp.headers["X-Request-Id"] = rid
             resp.headers["X-Request-Duration-ms"] = str(dur_ms)
+            db_checkouts = pool_checkouts() - getattr(g, "_db_checkouts0", pool_checkouts())
+            if expose_checkouts or app.debug or app.config.get("TESTING"):
+                resp.headers["X-DB-Checkouts"] = str(db_checkouts)
             if "Cache-Control" not in resp.headers:
                 resp.headers["Cache-Control"] = "no-store"
-            # Structured log line (security headers already added by security middleware)
+            sql_summary = None
             try:
-                log.info(
+                sql_summary = sql_profiler.finish_request(
+                    resp,
                     {
                         "request_id": rid,
-                        # Context and session diagnostics
-                        "tenant_id": getattr(g, "tenant_id", None),
-                        "tenant_id_g": getattr(g, "tenant_id", None),
-                        "tenant_id_session": session.get("tenant_id"),
-                        "site_id_g": getattr(g, "site_id", None),
-                        "site_id_session": session.get("site_id"),
-                        "user_id": session.get("user_id"),
-                        "user_id_g": getattr(g, "user_id", None),
                         "method": request.method,
                         "path": request.path,
+                        "route": http_metrics.route_label(),
                         "status": resp.status_code,
-                        "duration_ms": dur_ms,
-                    }
+                    },
                 )
+            except Exception:  # pragma: no cover - profiling must never break a response
+                pass
+            # Structured log line (security headers already added by security middleware)
+            try:
+                line = {
+                    "request_id": rid,
+                    # Context and session diagnostics
+                    "tenant_id": getattr(g, "tenant_id", None),
+                    "tenant_id_g": getattr(g, "tenant_id", None),
+                    "tenant_id_session": session.get("tenant_id"),
+                    "site_id_g": getattr(g, "site_id", None),
+                    "site_id_session": session.get("site_id"),
+                    "user_id": session.get("user_id"),
+                    "user_id_g": getattr(g, "user_id", None),
+                    "method": request.method,
+                    "path": request.path,
+                    "status": resp.status_code,
+                    "duration_ms": dur_ms,
+                    "db_checkouts": db_checkouts,
+                }
+                if sql_summary is not None:
+                    line["sql"] = sql_summary
+                log.info(line)
             except Exception:
                 pass
         except Exception:
@@ -1068,6 +1176,7 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
     app.register_blueprint(report_api_bp)
     app.register_blueprint(weekview_report_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(http_metrics.bp)
     app.register_blueprint(home_bp)
     app.register_blueprint(dashboard_bp)
     if portal_department_bp:
@@ -1228,8 +1337,7 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
             "features": enabled_feature_names,
         }
 
-    @app.get("/openapi.json")
-    def openapi_spec() -> dict[str, Any]:  # pragma: no cover
+    def build_openapi_spec() -> dict[str, Any]:  # pragma: no cover
         note_schema = {
             "type": "object",
             "required": ["id", "content", "private_flag"],
@@ -1821,17 +1929,32 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
                                 "default": 20,
                             },
                         },
+                        {
+                            "name": "cursor",
+                            "in": "query",
+                            "description": "Switches to keyset paging (page is ignored). Send it empty for the first page, then meta.next_cursor.",
+                            "schema": {"type": "string"},
+                        },
+                        {
+                            "name": "total",
+                            "in": "query",
+                            "description": "Keyset mode only: also return meta.total. 'approx' may use a planner estimate (see meta.total_exact).",
+                            "schema": {"type": "string", "enum": ["exact", "approx"]},
+                        },
                     ],
                     "responses": {
                         "200": {
-                            "description": "Paged audit events (descending ts)",
+                            "description": "Paged audit events (descending ts); keyset shape when cursor is given",
                             "headers": {
                                 "X-Request-Id": {"$ref": "#/components/headers/X-Request-Id"}
                             },
                             "content": {
                                 "application/json": {
                                     "schema": {
-                                        "$ref": "#/components/schemas/PageResponse_AuditView"
+                                        "oneOf": [
+                                            {"$ref": "#/components/schemas/PageResponse_AuditView"},
+                                            {"$ref": "#/components/schemas/KeysetResponse_AuditView"},
+                                        ]
                                     },
                                     "examples": {
                                         "sample": {
@@ -1869,11 +1992,38 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
                                                     "pages": 1,
                                                 },
                                             }
-                                        }
+                                        },
+                                        "keyset": {
+                                            "value": {
+                                                "ok": True,
+                                                "items": [
+                                                    {
+                                                        "id": 2,
+                                                        "ts": "2025-10-05T12:02:00Z",
+                                                        "tenant_id": 5,
+                                                        "actor_user_id": 10,
+                                                        "actor_role": "admin",
+                                                        "event": "limits_upsert",
+                                                        "payload": {
+                                                            "limit_name": "exp",
+                                                            "quota": 9,
+                                                        },
+                                                        "request_id": "f3a2b1f8-2e0e-4b12-9f4c-5c28a6a0c3a1",
+                                                    }
+                                                ],
+                                                "meta": {
+                                                    "size": 1,
+                                                    "next_cursor": "MjAyNS0xMC0wNVQxMjowMjowMHwy",
+                                                    "total": 2,
+                                                    "total_exact": True,
+                                                },
+                                            }
+                                        },
                                     },
                                 }
                             },
                         },
+                        "400": {"$ref": "#/components/responses/Problem400"},
                         "401": {"$ref": "#/components/responses/Problem401"},
                         "403": {"$ref": "#/components/responses/Problem403"},
                     },
@@ -2661,6 +2811,38 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
                             "meta": {"$ref": "#/components/schemas/PageMeta"},
                         },
                     },
+                    "KeysetMeta": {
+                        "type": "object",
+                        "required": ["size", "next_cursor"],
+                        "properties": {
+                            "size": {"type": "integer"},
+                            "next_cursor": {
+                                "type": "string",
+                                "nullable": True,
+                                "description": "Opaque; null on the last page.",
+                            },
+                            "total": {
+                                "type": "integer",
+                                "description": "Only when requested via total=exact|approx.",
+                            },
+                            "total_exact": {
+                                "type": "boolean",
+                                "description": "False when total is a planner estimate.",
+                            },
+                        },
+                    },
+                    "KeysetResponse_AuditView": {
+                        "type": "object",
+                        "required": ["ok", "items", "meta"],
+                        "properties": {
+                            "ok": {"type": "boolean"},
+                            "items": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/AuditView"},
+                            },
+                            "meta": {"$ref": "#/components/schemas/KeysetMeta"},
+                        },
+                    },
                 },
                 "headers": {
                     "X-Request-Id": {
@@ -3257,6 +3439,24 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
 
         return spec
 
+    # Serve the spec as a precomputed artifact (strong ETag, 304, optional gzip); see core/openapi_artifact.py
+    openapi_artifact = OpenAPIArtifactHolder(
+        build_openapi_spec,
+        compress=str(app.config.get("OPENAPI_GZIP", os.getenv("OPENAPI_GZIP", "1"))).lower() in ("1", "true", "yes"),
+    )
+    app.extensions["openapi_artifact"] = openapi_artifact
+    _artifact_path = app.config.get("OPENAPI_ARTIFACT_PATH") or os.getenv("OPENAPI_ARTIFACT_PATH")
+    if _artifact_path:
+        openapi_artifact.adopt(
+            _artifact_path,
+            verify=str(app.config.get("OPENAPI_VERIFY_ARTIFACT", os.getenv("OPENAPI_VERIFY_ARTIFACT", "1"))).lower()
+            in ("1", "true", "yes"),
+        )
+
+    @app.get("/openapi.json")
+    def openapi_spec() -> Response:
+        return openapi_artifact.response(request)
+
     # --- Feature flag management endpoints (regression restore) ---
     from .rate_limit import RateLimitExceeded, allow, rate_limited_response
 
@@ -3348,6 +3548,7 @@ def create_app(config_override: dict[str, Any] | None = None) -> Flask:
                 db.add(rec)
             else:
                 rec.enabled = enabled
+            ff_bump_version(db)
             db.commit()
             if hasattr(g, "tenant_feature_flags"):
                 g.tenant_feature_flags[name] = enabled
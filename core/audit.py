@@ -1,17 +1,18 @@
 """Audit / logging helper utilities.
 
-Currently minimal; can be extended later to include batching, async dispatch,
-or structured event sinks. For now we centralize status transition logging so
-API layers stay slimmer and logic (like ignoring no-op transitions) is kept
-consistent.
+Events are handed to the configured sink (core/audit_sink.py: batched background writer,
+or synchronous for tests). We also centralize status transition logging so API layers
+stay slimmer and logic (like ignoring no-op transitions) is kept consistent.
 """
 
 from __future__ import annotations
 
+from datetime import UTC, datetime
+
 from flask import g, has_request_context, session as _session
 from sqlalchemy.orm import Session
 
-from .audit_repo import AuditRepo
+from .audit_sink import get_audit_sink
 from .models import Task, TaskStatusTransition
 
 
@@ -19,6 +20,7 @@ def log_event(name: str, **fields) -> None:
     """Persist generic audit event.
 
     Fields accepted are free-form; tenant_id / actor context inferred when present.
+    Context and timestamp are captured here; the write itself may be batched by the sink.
     Fails silently (non-critical path).
     """
     try:
@@ -35,13 +37,16 @@ def log_event(name: str, **fields) -> None:
         payload = {
             k: v for k, v in fields.items() if k not in {"tenant_id", "actor_user_id", "actor_role"}
         }
-        AuditRepo().insert(
-            event=name,
-            tenant_id=tenant_id,
-            actor_user_id=actor_user_id,
-            actor_role=str(actor_role) if actor_role else None,
-            payload=payload,
-            request_id=request_id,
+        get_audit_sink().emit(
+            {
+                "ts": datetime.now(UTC),
+                "event": name,
+                "tenant_id": tenant_id,
+                "actor_user_id": actor_user_id,
+                "actor_role": str(actor_role) if actor_role else None,
+                "payload": payload,
+                "request_id": request_id,
+            }
         )
     except Exception:  # pragma: no cover
         return None
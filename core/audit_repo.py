@@ -1,14 +1,55 @@
-"""Audit repository: persistence + query + retention (strict pocket)."""
+"""Audit repository: persistence + query + retention (strict pocket).
+
+Listing has two modes: the original page/offset query (COUNT + LIMIT/OFFSET) and a keyset query
+on (ts DESC, id DESC) whose cost does not grow with depth. The keyset cursor is an opaque
+urlsafe-base64 of "<ts isoformat>|<id>".
+
+Payload text search (q) goes through a search projection instead of scanning CAST(payload):
+ - SQLite: FTS5 side table audit_events_fts (trigram tokenizer, external content on
+   audit_events) kept in sync by insert/update/delete triggers, bootstrapped via ensure_schema.
+   Rebuilt whenever the triggers are (re)created, so rows written before bootstrap are indexed.
+ - Postgres: pg_trgm GIN index on CAST(payload AS VARCHAR) (migration 0015), which serves the
+   same ILIKE predicate.
+Both keep the existing case-insensitive substring semantics.
+"""
 
 from __future__ import annotations
 
+import base64
+import binascii
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import String, and_, cast, delete, func, select
+from sqlalchemy import Integer, String, and_, cast, column, delete, func, insert, or_, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
-from .db import get_session
+from .db import ensure_schema, get_session
 from .models import AuditEvent
 
+PURGE_BATCH_SIZE = 1000
+APPROX_TOTAL_CAP = 10000
+
+_FTS_TRIGGERS = ("audit_events_fts_ai", "audit_events_fts_ad", "audit_events_fts_au")
+_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS audit_events_fts USING fts5("
+    "payload, content='audit_events', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS audit_events_fts_ai AFTER INSERT ON audit_events BEGIN "
+    "INSERT INTO audit_events_fts(rowid, payload) VALUES (new.id, new.payload); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_events_fts_ad AFTER DELETE ON audit_events BEGIN "
+    "INSERT INTO audit_events_fts(audit_events_fts, rowid, payload) "
+    "VALUES ('delete', old.id, old.payload); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_events_fts_au AFTER UPDATE OF payload ON audit_events BEGIN "
+    "INSERT INTO audit_events_fts(audit_events_fts, rowid, payload) "
+    "VALUES ('delete', old.id, old.payload); "
+    "INSERT INTO audit_events_fts(rowid, payload) VALUES (new.id, new.payload); END",
+)
+# None until the first bootstrap; False when this SQLite build lacks FTS5/trigram (ILIKE fallback)
+_fts_supported: bool | None = None
+
+
+class AuditCursorError(ValueError):
+    """Raised when a keyset cursor cannot be decoded."""
+
 
 class AuditQueryFilters:
     def __init__(
@@ -25,6 +66,88 @@ class AuditQueryFilters:
         self.ts_to = ts_to
         self.text = text
 
+    def is_empty(self) -> bool:
+        return not (
+            self.tenant_id is not None or self.event or self.ts_from or self.ts_to or self.text
+        )
+
+
+def encode_cursor(ts: datetime, event_id: int) -> str:
+    raw = f"{ts.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts_s, id_s = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts_s), int(id_s)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise AuditCursorError("invalid cursor") from e
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.bind is not None and db.bind.dialect.name == "sqlite"
+
+
+def _bootstrap_search(db: Session) -> None:
+    global _fts_supported
+    if _fts_supported is False:
+        return
+    names = {
+        r[0]
+        for r in db.execute(
+            text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        )
+    }
+    if "audit_events" not in names:
+        return
+    if "audit_events_fts" in names and all(t in names for t in _FTS_TRIGGERS):
+        _fts_supported = True
+        return
+    try:
+        for ddl in _FTS_DDL:
+            db.execute(text(ddl))
+        # Triggers were missing (first run, or audit_events recreated): resync from the table
+        db.execute(text("INSERT INTO audit_events_fts(audit_events_fts) VALUES ('rebuild')"))
+        db.commit()
+        _fts_supported = True
+    except OperationalError:
+        db.rollback()
+        _fts_supported = False
+
+
+def _ensure_search(db: Session) -> None:
+    if _is_sqlite(db):
+        ensure_schema("audit_events_fts", lambda: _bootstrap_search(db))
+
+
+def _text_condition(db: Session, needle: str):
+    pattern = f"%{needle}%"
+    if _is_sqlite(db) and _fts_supported:
+        matches = text("SELECT rowid FROM audit_events_fts WHERE payload LIKE :audit_q")
+        return AuditEvent.id.in_(
+            matches.bindparams(audit_q=pattern).columns(column("rowid", Integer))
+        )
+    # Postgres: served by ix_audit_events_payload_trgm; elsewhere a plain scan
+    return cast(AuditEvent.payload, String).ilike(pattern)
+
+
+def _conditions(db: Session, filters: AuditQueryFilters) -> list:
+    conds = []
+    if filters.tenant_id is not None:
+        conds.append(AuditEvent.tenant_id == filters.tenant_id)
+    if filters.event:
+        conds.append(AuditEvent.event == filters.event)
+    if filters.ts_from:
+        conds.append(AuditEvent.ts >= filters.ts_from)
+    if filters.ts_to:
+        conds.append(AuditEvent.ts <= filters.ts_to)
+    if filters.text:
+        _ensure_search(db)
+        conds.append(_text_condition(db, filters.text))
+    return conds
+
 
 class AuditRepo:
     def insert(
@@ -36,11 +159,14 @@ class AuditRepo:
         actor_role: str | None,
         payload: dict | None,
         request_id: str | None,
+        ts: datetime | None = None,
     ) -> None:
         db = get_session()
         try:
+            _ensure_search(db)
             db.add(
                 AuditEvent(
+                    ts=ts or datetime.now(UTC),
                     event=event,
                     tenant_id=tenant_id,
                     actor_user_id=actor_user_id,
@@ -53,27 +179,29 @@ class AuditRepo:
         finally:
             db.close()
 
+    def insert_many(self, rows: list[dict]) -> int:
+        """Insert many events in one multi-row INSERT and a single commit (audit_sink batches)."""
+        if not rows:
+            return 0
+        db = get_session()
+        try:
+            _ensure_search(db)
+            db.execute(insert(AuditEvent), rows)
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
     def query(
         self, filters: AuditQueryFilters, page: int, size: int
     ) -> tuple[list[AuditEvent], int]:
         db = get_session()
         try:
             stmt = select(AuditEvent)
-            conds = []
-            if filters.tenant_id is not None:
-                conds.append(AuditEvent.tenant_id == filters.tenant_id)
-            if filters.event:
-                conds.append(AuditEvent.event == filters.event)
-            if filters.ts_from:
-                conds.append(AuditEvent.ts >= filters.ts_from)
-            if filters.ts_to:
-                conds.append(AuditEvent.ts <= filters.ts_to)
-            if filters.text:
-                # simple JSON string search fallback (cast JSON -> TEXT then ILIKE)
-                conds.append(cast(AuditEvent.payload, String).ilike(f"%{filters.text}%"))
+            conds = _conditions(db, filters)
             if conds:
                 stmt = stmt.where(and_(*conds))
-            stmt = stmt.order_by(AuditEvent.ts.desc())
+            stmt = stmt.order_by(AuditEvent.ts.desc(), AuditEvent.id.desc())
             total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
             offset = (page - 1) * size
             rows = list(db.execute(stmt.limit(size).offset(offset)).scalars().all())
@@ -81,16 +209,96 @@ class AuditRepo:
         finally:
             db.close()
 
-    def purge_older_than(self, days: int) -> int:
-        cutoff = datetime.now(UTC) - timedelta(days=days)
+    def query_keyset(
+        self, filters: AuditQueryFilters, size: int, cursor: str | None = None
+    ) -> tuple[list[AuditEvent], str | None]:
+        """Newest-first page after `cursor`; returns (rows, next_cursor or None at the end).
+
+        Raises AuditCursorError for a malformed cursor.
+        """
         db = get_session()
         try:
-            stmt = delete(AuditEvent).where(AuditEvent.ts < cutoff)
-            res = db.execute(stmt)
-            db.commit()
-            return res.rowcount or 0
+            conds = _conditions(db, filters)
+            if cursor:
+                c_ts, c_id = decode_cursor(cursor)
+                conds.append(
+                    or_(AuditEvent.ts < c_ts, and_(AuditEvent.ts == c_ts, AuditEvent.id < c_id))
+                )
+            stmt = select(AuditEvent)
+            if conds:
+                stmt = stmt.where(and_(*conds))
+            stmt = stmt.order_by(AuditEvent.ts.desc(), AuditEvent.id.desc()).limit(size + 1)
+            rows = list(db.execute(stmt).scalars().all())
+            if len(rows) <= size:
+                return rows, None
+            rows = rows[:size]
+            return rows, encode_cursor(rows[-1].ts, rows[-1].id)
         finally:
             db.close()
 
+    def count(self, filters: AuditQueryFilters, approx: bool = False) -> tuple[int, bool]:
+        """Matching row count as (total, exact).
+
+        approx=True avoids a full count: Postgres uses pg_class.reltuples for an unfiltered
+        listing, otherwise counting stops at APPROX_TOTAL_CAP (exact=False when capped).
+        """
+        db = get_session()
+        try:
+            if approx and filters.is_empty() and db.bind is not None:
+                if db.bind.dialect.name == "postgresql":
+                    est = db.execute(
+                        text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'audit_events'")
+                    ).scalar()
+                    if est is not None and est >= 0:
+                        return int(est), False
+            stmt = select(AuditEvent.id)
+            conds = _conditions(db, filters)
+            if conds:
+                stmt = stmt.where(and_(*conds))
+            if approx:
+                stmt = stmt.limit(APPROX_TOTAL_CAP + 1)
+            n = int(db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one())
+            if approx and n > APPROX_TOTAL_CAP:
+                return APPROX_TOTAL_CAP, False
+            return n, True
+        finally:
+            db.close()
+
+    def purge_before(self, cutoff: datetime, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        """Delete events older than cutoff, batch_size ids per transaction (short write locks)."""
+        batch_size = max(1, batch_size)
+        removed = 0
+        while True:
+            db = get_session()
+            try:
+                ids = list(
+                    db.execute(
+                        select(AuditEvent.id)
+                        .where(AuditEvent.ts < cutoff)
+                        .order_by(AuditEvent.ts)
+                        .limit(batch_size)
+                    ).scalars()
+                )
+                if not ids:
+                    return removed
+                db.execute(delete(AuditEvent).where(AuditEvent.id.in_(ids)))
+                db.commit()
+                removed += len(ids)
+            finally:
+                db.close()
+            if len(ids) < batch_size:
+                return removed
+
+    def purge_older_than(self, days: int, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        cutoff = datetime.now(UTC) - timedelta(days=days)
+        return self.purge_before(cutoff, batch_size=batch_size)
+
 
-__all__ = ["AuditRepo", "AuditQueryFilters"]
+__all__ = [
+    "APPROX_TOTAL_CAP",
+    "AuditCursorError",
+    "AuditQueryFilters",
+    "AuditRepo",
+    "decode_cursor",
+    "encode_cursor",
+]
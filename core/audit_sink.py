@@ -0,0 +1,358 @@
+"""Audit event sinks: synchronous (one commit per event) or batched on a background thread.
+
+log_event() builds the row on the request thread (tenant/actor/request_id and ts are captured
+there) and hands it to the configured sink:
+
+ - sync  : AuditRepo.insert per event, visible immediately (tests, scripts)
+ - async : bounded queue drained by a daemon flusher that writes one multi-row INSERT per batch
+           when AUDIT_BATCH_SIZE rows are queued or AUDIT_FLUSH_INTERVAL_MS has passed since the
+           first queued row. Flushed at atexit and from gunicorn's worker_exit hook. A batch that
+           fails is retried row by row, so only rows that fail on their own are lost; each of
+           those is logged in full at ERROR (the dead letter) and counted as audit.row_error.
+
+Env (read like core/rate_limiter.py; _test_reset() re-reads):
+ - AUDIT_SINK: async (default) | sync. create_app() selects sync under TESTING unless set.
+ - AUDIT_QUEUE_MAX (10000), AUDIT_BATCH_SIZE (200), AUDIT_FLUSH_INTERVAL_MS (250)
+ - AUDIT_QUEUE_FULL_POLICY when the queue is full:
+     sync (default) write the event inline on the caller's thread (back-pressure, no loss)
+     drop           discard and count it (audit.dropped)
+     block          wait up to AUDIT_ENQUEUE_TIMEOUT_MS (100) for space, then write inline
+
+Counters audit.enqueued / audit.batch / audit.dropped / audit.flush_error / audit.row_error go
+to core.metrics and to the registry as audit_sink_events_total{outcome}; audit_sink_queue_depth,
+audit_sink_batch_size and audit_sink_flush_seconds are exposed on GET /metrics. stats()
+(GET /admin/support/audit-sink) keeps the per-process view.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Protocol
+
+from . import metrics_registry
+from .metrics import increment as metrics_increment
+
+log = logging.getLogger(__name__)
+
+AuditRow = dict[str, Any]
+
+
+def _write_one(row: AuditRow) -> None:
+    from .audit_repo import AuditRepo
+
+    AuditRepo().insert(**row)
+
+
+def _write_many(rows: list[AuditRow]) -> None:
+    from .audit_repo import AuditRepo
+
+    AuditRepo().insert_many(rows)
+
+
+_EVENTS = metrics_registry.counter(
+    "audit_sink_events_total", "Audit sink events by outcome", ("outcome",)
+)
+_QUEUE_DEPTH = metrics_registry.gauge("audit_sink_queue_depth", "Audit rows waiting to be flushed")
+_BATCH_SIZE = metrics_registry.histogram(
+    "audit_sink_batch_size", "Rows per audit flush", buckets=(1, 5, 10, 25, 50, 100, 200, 500, 1000)
+)
+_FLUSH_SECONDS = metrics_registry.histogram("audit_sink_flush_seconds", "Audit batch insert latency")
+
+
+def _count(name: str) -> None:
+    try:
+        metrics_increment(name, None)
+        _EVENTS.labels(outcome=name.rsplit(".", 1)[-1]).inc()
+    except Exception:  # pragma: no cover - metrics must never break auditing
+        pass
+
+
+class AuditSink(Protocol):
+    def emit(self, row: AuditRow) -> None: ...  # pragma: no cover
+    def flush(self, timeout: float | None = None) -> bool: ...  # pragma: no cover
+    def close(self, timeout: float | None = None) -> None: ...  # pragma: no cover
+
+
+class SyncAuditSink:
+    def emit(self, row: AuditRow) -> None:
+        _write_one(row)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        return True
+
+    def close(self, timeout: float | None = None) -> None:
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {"mode": "sync"}
+
+
+class _FlushRequest:
+    __slots__ = ("done",)
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class AsyncAuditSink:
+    def __init__(
+        self,
+        *,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval_ms: int = 250,
+        full_policy: str = "sync",
+        enqueue_timeout_ms: int = 100,
+    ) -> None:
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.full_policy = full_policy if full_policy in ("sync", "drop", "block") else "sync"
+        self.enqueue_timeout = max(0, enqueue_timeout_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[AuditRow | _FlushRequest | None] = queue.Queue(self.max_queue)
+        self._thread: threading.Thread | None = None
+        self._pid = 0
+        self._closed = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.inline_writes = 0
+        self.flush_errors = 0
+        self.row_errors = 0
+        self.batches = 0
+        self.max_batch = 0
+        self._latencies_ms: deque[float] = deque(maxlen=256)
+
+    # --- lifecycle ---
+    def _ensure_thread(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Forked worker: the parent's queue and thread do not exist here
+                self._queue = queue.Queue(self.max_queue)
+            self._pid = pid
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+            self._thread.start()
+
+    def emit(self, row: AuditRow) -> None:
+        if self._closed:
+            _write_one(row)
+            return
+        self._ensure_thread()
+        try:
+            if self.full_policy == "block":
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            if self.full_policy == "drop":
+                self.dropped += 1
+                _count("audit.dropped")
+                return
+            self.inline_writes += 1
+            _write_one(row)
+            return
+        self.enqueued += 1
+        _count("audit.enqueued")
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Block until everything queued before this call is written; False on timeout."""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return self._queue.empty()
+        req = _FlushRequest()
+        try:
+            self._queue.put(req, timeout=timeout)
+        except queue.Full:
+            return False
+        return req.done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        thread = self._thread
+        self._closed = True
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:  # pragma: no cover - flusher wedged
+            log.warning("audit sink: queue full at shutdown; unflushed events may be lost")
+            return
+        thread.join(timeout)
+
+    # --- flusher thread ---
+    def _run(self) -> None:
+        batch: list[AuditRow] = []
+        deadline: float | None = None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = _FlushRequest()  # interval elapsed
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            deadline = None
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is None:
+                return
+
+    def _write_batch(self, batch: list[AuditRow]) -> None:
+        t0 = time.perf_counter()
+        try:
+            _write_many(batch)
+        except Exception:
+            self.flush_errors += 1
+            _count("audit.flush_error")
+            log.warning("audit sink: batch insert of %d events failed; retrying one by one", len(batch), exc_info=True)
+            self._write_rows(batch)
+            return
+        elapsed = time.perf_counter() - t0
+        self._latencies_ms.append(elapsed * 1000.0)
+        self.batches += 1
+        self.flushed += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        _count("audit.batch")
+        try:
+            _FLUSH_SECONDS.labels().observe(elapsed)
+            _BATCH_SIZE.labels().observe(len(batch))
+            _QUEUE_DEPTH.labels().set(self._queue.qsize())
+        except Exception:  # pragma: no cover - metrics must never break auditing
+            pass
+
+    def _write_rows(self, batch: list[AuditRow]) -> None:
+        # The failed batch was rolled back as a whole: write each row alone
+        for row in batch:
+            try:
+                _write_one(row)
+            except Exception:
+                self.row_errors += 1
+                _count("audit.row_error")
+                log.error("audit sink: dropping audit event that cannot be written: %r", row, exc_info=True)
+            else:
+                self.flushed += 1
+
+    def stats(self) -> dict[str, Any]:
+        lat = sorted(self._latencies_ms)
+        return {
+            "mode": "async",
+            "queue_depth": self._queue.qsize(),
+            "queue_max": self.max_queue,
+            "full_policy": self.full_policy,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "inline_writes": self.inline_writes,
+            "flush_errors": self.flush_errors,
+            "row_errors": self.row_errors,
+            "batches": self.batches,
+            "avg_batch": round(self.flushed / self.batches, 1) if self.batches else 0,
+            "max_batch": self.max_batch,
+            "flush_ms_p50": round(lat[len(lat) // 2], 2) if lat else None,
+            "flush_ms_max": round(lat[-1], 2) if lat else None,
+        }
+
+
+class _EnvConfig:
+    mode: str
+    max_queue: int
+    batch_size: int
+    flush_interval_ms: int
+    full_policy: str
+    enqueue_timeout_ms: int
+
+    def __init__(self) -> None:
+        self.reload()
+
+    @staticmethod
+    def _int(name: str, default: int) -> int:
+        try:
+            return int(os.getenv(name, str(default)))
+        except ValueError:
+            return default
+
+    def reload(self) -> None:
+        self.mode = os.getenv("AUDIT_SINK", "async").strip().lower() or "async"
+        self.max_queue = self._int("AUDIT_QUEUE_MAX", 10000)
+        self.batch_size = self._int("AUDIT_BATCH_SIZE", 200)
+        self.flush_interval_ms = self._int("AUDIT_FLUSH_INTERVAL_MS", 250)
+        self.full_policy = os.getenv("AUDIT_QUEUE_FULL_POLICY", "sync").strip().lower() or "sync"
+        self.enqueue_timeout_ms = self._int("AUDIT_ENQUEUE_TIMEOUT_MS", 100)
+
+
+_cfg = _EnvConfig()
+_instance: SyncAuditSink | AsyncAuditSink | None = None
+_mode_override: str | None = None
+
+
+def _build() -> SyncAuditSink | AsyncAuditSink:
+    mode = _mode_override or _cfg.mode
+    if mode == "sync":
+        return SyncAuditSink()
+    return AsyncAuditSink(
+        max_queue=_cfg.max_queue,
+        batch_size=_cfg.batch_size,
+        flush_interval_ms=_cfg.flush_interval_ms,
+        full_policy=_cfg.full_policy,
+        enqueue_timeout_ms=_cfg.enqueue_timeout_ms,
+    )
+
+
+def get_audit_sink() -> SyncAuditSink | AsyncAuditSink:
+    global _instance
+    if _instance is None:
+        _instance = _build()
+    return _instance
+
+
+def configure_audit_sink(mode: str | None) -> None:
+    """Force sync/async (None = follow AUDIT_SINK); the previous sink is drained first."""
+    global _instance, _mode_override
+    _mode_override = mode
+    if _instance is not None:
+        _instance.close()
+    _instance = None
+
+
+def shutdown(timeout: float | None = 5.0) -> None:
+    """Drain and stop the flusher (atexit, gunicorn worker_exit)."""
+    if _instance is not None:
+        _instance.close(timeout)
+
+
+def _test_reset() -> None:  # pragma: no cover - invoked by tests explicitly
+    global _instance
+    shutdown()
+    _cfg.reload()
+    _instance = None
+
+
+atexit.register(shutdown)
+
+__all__ = [
+    "AsyncAuditSink",
+    "AuditSink",
+    "SyncAuditSink",
+    "configure_audit_sink",
+    "get_audit_sink",
+    "shutdown",
+]
@@ -96,8 +96,10 @@ class CookDashboardService:
         dinner_done_count = 0
 
         site_vm = CookDashboardSiteVM(site_name=site_name, departments=[])
+        fetched = svc.fetch_weekview_many(tenant_id, year, week, [dep["id"] for dep in departments])
         for dep in departments:
-            payload, _etag = svc.fetch_weekview(tenant_id, year, week, dep_id:=dep["id"])  # type: ignore[name-defined]
+            dep_id = dep["id"]
+            payload = fetched[dep_id][0] if dep_id in fetched else {}
             summaries = payload.get("department_summaries") or []
             days = summaries[0].get("days") if summaries else []
             today_entry = next((d for d in days if d.get("date") == today.isoformat()), None)
@@ -0,0 +1,135 @@
+"""Chunked CSV streaming for export endpoints.
+
+csv_response() turns an iterable of rows into a streamed text/csv Response:
+
+ - rows are written through one csv.writer and sent in ~CHUNK_BYTES (64 KiB) pieces instead of
+   one tiny string per row
+ - gzip Content-Encoding when the client accepts it (or when forced with compress=True); a
+   gzip body carries its own ETag (csv_etag(): "-gzip" inside the quotes), since it differs byte
+   for byte from the identity body
+ - an export session (export_session()) handed to csv_response is closed via call_on_close,
+   i.e. after the last chunk was sent or the client went away, not when the view returns
+ - stream_query() reads ORM queries in batches on a server-side cursor where the driver has one
+   (Postgres); SQLite simply buffers per batch
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from typing import Any
+
+from flask import Response, has_request_context, request
+from sqlalchemy.orm import Query, Session
+
+from .db import get_new_session
+
+CHUNK_BYTES = 64 * 1024
+STREAM_BATCH = 500
+CSV_MIMETYPE = "text/csv; charset=utf-8"
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+def export_session() -> Session:
+    """Isolated session for one export; pass it to csv_response(session=...) to close it."""
+    return get_new_session()
+
+
+def stream_query(query: Query, batch: int = STREAM_BATCH) -> Iterator[Any]:
+    """Iterate query results batch by batch on a server-side cursor (stream_results)."""
+    return iter(query.execution_options(stream_results=True).yield_per(batch))
+
+
+def iter_csv_chunks(
+    rows: Iterable[Sequence[Any]],
+    delimiter: str = ",",
+    bom: bool = False,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """UTF-8 CSV for rows, coalesced into pieces of roughly chunk_bytes."""
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+    if bom:
+        buf.write("\ufeff")  # Excel needs the BOM to read UTF-8
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 16+15: gzip container
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def accepts_gzip() -> bool:
+    return has_request_context() and request.accept_encodings["gzip"] > 0
+
+
+def csv_etag(etag: str, compress: bool | None = None) -> str:
+    """The ETag csv_response() sends for etag: suffixed with -gzip when the body is gzipped.
+
+    compress=None negotiates like csv_response; compare If-None-Match against this value.
+    """
+    if compress is None:
+        compress = accepts_gzip()
+    if not compress or etag.endswith(f'{GZIP_ETAG_SUFFIX}"'):
+        return etag
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"' if etag.endswith('"') else etag + GZIP_ETAG_SUFFIX
+
+
+def csv_response(
+    rows: Iterable[Sequence[Any]],
+    filename: str | None = None,
+    delimiter: str = ",",
+    bom: bool = False,
+    compress: bool | None = None,
+    session: Session | None = None,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """Streamed CSV response for rows.
+
+    compress=None negotiates gzip from Accept-Encoding. filename adds an attachment
+    Content-Disposition; headers are added as given (ETag, Cache-Control, ...), except that an
+    ETag gets csv_etag()'s -gzip suffix when the body is gzipped. session, if given, is closed
+    when the response is closed.
+    """
+    body: Iterator[bytes] = iter_csv_chunks(rows, delimiter=delimiter, bom=bom)
+    if compress is None:
+        compress = accepts_gzip()
+    if compress:
+        body = gzip_chunks(body)
+    resp = Response(body, mimetype=CSV_MIMETYPE)
+    if filename:
+        resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if compress:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    for key, value in (headers or {}).items():
+        resp.headers[key] = csv_etag(value, compress) if key.lower() == "etag" else value
+    if session is not None:
+        resp.call_on_close(session.close)
+    return resp
+
+
+__all__ = [
+    "CHUNK_BYTES",
+    "export_session",
+    "stream_query",
+    "iter_csv_chunks",
+    "gzip_chunks",
+    "accepts_gzip",
+    "csv_etag",
+    "csv_response",
+]
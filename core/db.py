@@ -1,23 +1,45 @@
 """Database engine + session management.
-Later can be expanded with per-request session handling middleware.
+
+Inside a Flask request (and inside ``unit_of_work()`` for CLI/background code) all
+``get_session()`` callers share one session, connection and transaction; repository
+``db.close()`` calls are deferred until the unit of work ends. A deferred close() still rolls
+back what its caller left uncommitted, and a DB error on the shared connection (even one the
+caller caught and swallowed) rolls the transaction back before the next repository call.
 """
 
 from __future__ import annotations
 
-from contextlib import suppress
+from contextlib import contextmanager, suppress
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from flask import current_app, has_app_context
 import logging
 import os
-from typing import Mapping
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Session, scoped_session, sessionmaker
+import sys
+import threading
+from typing import Callable, Iterator, Mapping, TypeGuard
+from sqlalchemy.engine import Connection, Engine, ExceptionContext, make_url
+from sqlalchemy.orm import Session, SessionTransaction, scoped_session, sessionmaker
 
+from .db_engine import EngineSettings, engine_kwargs, install_sqlite_pragmas, pool_stats as _pool_stats
 from .models import Base
+from . import feature_flag_cache, portion_stats, response_cache, site_cache
 
 _engine: Engine | None = None
 _SessionFactory: scoped_session[Session] | None = None
+_IsolatedFactory: sessionmaker[Session] | None = None
+
+# Per-thread unit-of-work nesting depth and pool checkout counter.
+_uow_state = threading.local()
+
+# Process-wide schema registry: keys of DDL bootstraps already applied to the current engine.
+_schema_ready: set[str] = set()
+_schema_lock = threading.RLock()
+
+# Connection.info flags (cleared by commit/rollback): statement failed / uncommitted writes
+_TX_FAILED = "uow_tx_failed"
+_TX_WRITES = "uow_tx_writes"
+_WRITE_VERBS = ("insert", "update", "delete", "replace", "merge")
 
 
 def allow_destructive_db(app_config: Mapping[str, object] | None = None) -> bool:
@@ -48,33 +70,160 @@ def _normalize_url(url: str) -> str:
     return url
 
 
-def init_engine(database_url: str, force: bool = False) -> Engine:
-    """Initialize global engine (idempotent) or reinitialize when force=True."""
-    global _engine, _SessionFactory
+def ensure_schema(key: str, bootstrap: Callable[[], None]) -> None:
+    """Run an idempotent DDL bootstrap at most once per engine.
+
+    Repositories wrap their CREATE TABLE IF NOT EXISTS / PRAGMA / repair helpers with this so hot
+    read paths skip DDL after first use. Completion is only forgotten by init_engine(force=True)
+    or a metadata drop_all. In-memory SQLite is never cached: its pool hands each thread a
+    separate database.
+    """
+    if key in _schema_ready:
+        return
+    with _schema_lock:
+        if key in _schema_ready:
+            return
+        bootstrap()
+        if not _is_sqlite_memory(_engine):
+            _schema_ready.add(key)
+
+
+def reset_schema_registry() -> None:
+    """Forget completed schema bootstraps and cached lookups (engine replaced or schema dropped)."""
+    with _schema_lock:
+        _schema_ready.clear()
+    site_cache.invalidate_sites()
+    feature_flag_cache.snapshots.reset()
+    portion_stats.guidelines.invalidate()
+    response_cache.clear_local()
+
+
+@event.listens_for(Base.metadata, "after_drop")
+def _on_metadata_drop(*_args, **_kwargs) -> None:  # pragma: no cover - trivial
+    reset_schema_registry()
+
+
+class _UnitOfWorkSession(Session):
+    """Scoped session whose close() is deferred while a unit of work is active."""
+
+    def close(self) -> None:
+        if _uow_depth() > 0:
+            # Keep connection + transaction for the rest of the unit of work. Like a real close,
+            # discard what the caller left uncommitted (pending objects, flushed or raw writes),
+            # its partial work when an exception is in flight, and a failed transaction, so the
+            # next repository call never inherits either.
+            tx = self.get_transaction()
+            if tx is not None and (sys.exc_info()[0] is not None or not tx.is_active or self._needs_rollback()):
+                self.rollback()
+            return
+        super().close()
+
+    def _needs_rollback(self) -> bool:
+        if self.new or self.dirty or self.deleted:
+            return True
+        return self._tx_flag(_TX_FAILED) or self._tx_flag(_TX_WRITES)
+
+    def _tx_flag(self, key: str) -> bool:
+        conn = self.info.get("uow_connection")
+        return _usable(conn) and bool(conn.info.get(key))
+
+    def discard_failed(self) -> None:
+        """Roll back if a statement on this session's connection failed since the last commit."""
+        if self._tx_flag(_TX_FAILED):
+            self.rollback()
+
+
+def _usable(conn: Connection | None) -> TypeGuard[Connection]:
+    return conn is not None and not conn.closed and not conn.invalidated
+
+
+@event.listens_for(_UnitOfWorkSession, "after_begin")
+def _remember_connection(session: Session, _tx: object, connection: Connection) -> None:
+    session.info["uow_connection"] = connection
+
+
+@event.listens_for(_UnitOfWorkSession, "after_transaction_end")
+def _forget_connection(session: Session, tx: SessionTransaction) -> None:
+    if tx.parent is None:
+        session.info.pop("uow_connection", None)
+
+
+def _mark_failed(ctx: ExceptionContext) -> None:
+    # Errors inside a savepoint are undone by rolling back that savepoint (begin_nested)
+    conn = ctx.connection
+    if _usable(conn) and not conn.in_nested_transaction():
+        conn.info[_TX_FAILED] = True
+
+
+def _mark_writes(conn: Connection, _cursor: object, statement: str, *_args: object) -> None:
+    if statement.lstrip()[:7].lower().startswith(_WRITE_VERBS):
+        conn.info[_TX_WRITES] = True
+
+
+def _clear_tx_flags(conn: Connection) -> None:
+    if not _usable(conn):
+        return
+    conn.info.pop(_TX_FAILED, None)
+    conn.info.pop(_TX_WRITES, None)
+
+
+def _uow_depth() -> int:
+    return getattr(_uow_state, "depth", 0)
+
+
+def _count_checkout(*_args) -> None:
+    _uow_state.checkouts = getattr(_uow_state, "checkouts", 0) + 1
+
+
+def _build_engine(database_url: str, settings: EngineSettings | None) -> Engine:
+    global _SessionFactory, _IsolatedFactory
+    settings = settings or EngineSettings.from_mapping(env=os.environ)
+    url = make_url(_normalize_url(database_url))
+    engine = create_engine(url, **engine_kwargs(url, settings))
+    install_sqlite_pragmas(engine, settings)
+    site_cache.install_invalidation_listener(engine)
+    feature_flag_cache.install_invalidation_listener(engine)
+    portion_stats.install_invalidation_listener(engine)
+    event.listen(engine, "checkout", _count_checkout)
+    event.listen(engine, "handle_error", _mark_failed)
+    event.listen(engine, "after_cursor_execute", _mark_writes)
+    event.listen(engine, "commit", _clear_tx_flags)
+    event.listen(engine, "rollback", _clear_tx_flags)
+    _SessionFactory = scoped_session(
+        sessionmaker(bind=engine, class_=_UnitOfWorkSession, autoflush=False, autocommit=False)
+    )
+    _IsolatedFactory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    return engine
+
+
+def init_engine(database_url: str, force: bool = False, settings: EngineSettings | None = None) -> Engine:
+    """Initialize global engine (idempotent) or reinitialize when force=True.
+
+    settings tunes pool/driver/pragmas per dialect (see core.db_engine); defaults to env.
+    """
+    global _engine
     if _engine is None:
-        database_url = _normalize_url(database_url)
-        _engine = create_engine(database_url, future=True, echo=False)
-        _SessionFactory = scoped_session(
-            sessionmaker(bind=_engine, autoflush=False, autocommit=False)
-        )
+        reset_schema_registry()
+        _engine = _build_engine(database_url, settings)
         return _engine
     if force:
+        reset_schema_registry()
         _engine.dispose()
-        database_url = _normalize_url(database_url)
-        _engine = create_engine(database_url, future=True, echo=False)
         if _SessionFactory is not None:
             with suppress(Exception):  # pragma: no cover
                 _SessionFactory.remove()
-        _SessionFactory = scoped_session(
-            sessionmaker(bind=_engine, autoflush=False, autocommit=False)
-        )
+        _engine = _build_engine(database_url, settings)
     return _engine
 
 
-def get_session() -> Session:  # to be used inside request handlers (later integrate teardown)
+def get_session() -> Session:
+    """Return the thread-scoped session (shared for the whole request / unit of work)."""
     if _SessionFactory is None:
         raise RuntimeError("DB not initialized; call init_engine first")
-    return _SessionFactory()
+    sess = _SessionFactory()
+    if _uow_depth() > 0 and isinstance(sess, _UnitOfWorkSession):
+        sess.discard_failed()
+    return sess
 
 
 def get_new_session() -> Session:
@@ -83,10 +232,56 @@ def get_new_session() -> Session:
     Useful for internal services that want isolation and predictable lifetime
     without affecting callers that might be using the scoped session.
     """
-    if _engine is None:
+    if _IsolatedFactory is None:
         raise RuntimeError("DB not initialized; call init_engine first")
-    factory = sessionmaker(bind=_engine, autoflush=False, autocommit=False)
-    return factory()
+    return _IsolatedFactory()
+
+
+def begin_unit_of_work() -> Session:
+    """Enter a (possibly nested) unit of work on this thread and return its session."""
+    _uow_state.depth = _uow_depth() + 1
+    return get_session()
+
+
+def end_unit_of_work() -> None:
+    """Leave a unit of work; the outermost exit rolls back uncommitted work and releases the connection."""
+    depth = _uow_depth()
+    if depth <= 0:
+        return
+    _uow_state.depth = depth - 1
+    if depth == 1 and _SessionFactory is not None:
+        with suppress(Exception):
+            _SessionFactory.remove()
+
+
+@contextmanager
+def unit_of_work(commit: bool = False) -> Iterator[Session]:
+    """Share one session/connection across repository calls outside a request (CLI, jobs).
+
+    With commit=True the session is committed when the block exits cleanly; on error it is
+    rolled back. Repositories that commit themselves keep doing so.
+    """
+    db = begin_unit_of_work()
+    try:
+        yield db
+        if commit:
+            db.commit()
+    except Exception:
+        with suppress(Exception):
+            db.rollback()
+        raise
+    finally:
+        end_unit_of_work()
+
+
+def pool_stats() -> dict:
+    """Pool occupancy and checkout wait statistics for the current engine."""
+    return _pool_stats(_engine)
+
+
+def pool_checkouts() -> int:
+    """Connections checked out of the pool by this thread so far (diff it to measure a request)."""
+    return getattr(_uow_state, "checkouts", 0)
 
 
 def create_all() -> (
@@ -319,7 +514,24 @@ def get_site_tenant(site_id: str) -> int | None:
     """Return the tenant_id for a given site_id, or None if unavailable.
 
     SQLite dev schemas may lack sites.tenant_id; in that case we safely return None.
+    Results (including None) are cached per site, see core.site_cache.
     """
+    if _engine is None:
+        raise RuntimeError("Engine not initialized")
+    return site_cache.site_tenants.get_or_load(str(site_id), lambda: _load_site_tenant(str(site_id)))
+
+
+def _sites_has_tenant_column(conn) -> bool:
+    if conn.dialect.name != "sqlite":
+        return True
+    try:
+        rows = conn.execute(text("PRAGMA table_info('sites')")).fetchall()
+    except Exception:
+        return False
+    return "tenant_id" in {str(r[1]) for r in rows}
+
+
+def _load_site_tenant(site_id: str) -> int | None:
     if _engine is None:
         raise RuntimeError("Engine not initialized")
     # Prefer session helper to reuse connection pool
@@ -330,15 +542,9 @@ def get_site_tenant(site_id: str) -> int | None:
     try:
         conn = (sess.connection() if sess is not None else _engine.connect())
         try:
-            # Detect SQLite column presence via PRAGMA
-            if conn.dialect.name == "sqlite":
-                try:
-                    rows = conn.execute(text("PRAGMA table_info('sites')")).fetchall()
-                    cols = {str(r[1]) for r in rows}
-                    if "tenant_id" not in cols:
-                        return None
-                except Exception:
-                    return None
+            # Detect SQLite column presence via PRAGMA (cached with the site entries)
+            if not site_cache.capabilities.get_or_load("sites.tenant_id", lambda: _sites_has_tenant_column(conn)):
+                return None
             row = conn.execute(text("SELECT tenant_id FROM sites WHERE id = :sid"), {"sid": site_id}).fetchone()
             if not row:
                 return None
@@ -0,0 +1,203 @@
+"""Engine / connection pool tuning per dialect.
+
+Settings come from app config (``DB_*`` / ``SQLITE_*`` keys) with environment variables of the
+same name as fallback:
+
+ - DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+ - DB_STATEMENT_TIMEOUT_MS (Postgres; 0 = server default)
+ - DB_PREPARE_THRESHOLD (psycopg; "none" disables server-side prepared statements, e.g. behind
+   pgbouncer in transaction mode)
+ - SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS (applied per connection)
+
+Pool statistics (checked out, overflow, checkout wait) are exposed via pool_stats().
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _as_optional_int(value: Any) -> int | None:
+    if value is None or str(value).strip().lower() in ("", "none", "off", "null"):
+        return None
+    return int(value)
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int = 0
+    prepare_threshold: int | None = 5
+    sqlite_journal_mode: str = "WAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_synchronous: str = "NORMAL"
+
+    @classmethod
+    def from_mapping(cls, config: Mapping[str, Any] | None = None, env: Mapping[str, str] | None = None) -> EngineSettings:
+        """Build settings from app config, falling back to env, then to defaults."""
+        sources = [m for m in (config, env) if m]
+
+        def _get(key: str, default: Any) -> Any:
+            for src in sources:
+                if key in src and src[key] is not None and src[key] != "":
+                    return src[key]
+            return default
+
+        d = cls()
+        journal = str(_get("SQLITE_JOURNAL_MODE", d.sqlite_journal_mode)).upper()
+        sync = str(_get("SQLITE_SYNCHRONOUS", d.sqlite_synchronous)).upper()
+        if journal not in _JOURNAL_MODES:
+            raise ValueError(f"invalid SQLITE_JOURNAL_MODE: {journal}")
+        if sync not in _SYNCHRONOUS:
+            raise ValueError(f"invalid SQLITE_SYNCHRONOUS: {sync}")
+        return cls(
+            pool_size=int(_get("DB_POOL_SIZE", d.pool_size)),
+            max_overflow=int(_get("DB_MAX_OVERFLOW", d.max_overflow)),
+            pool_timeout=float(_get("DB_POOL_TIMEOUT", d.pool_timeout)),
+            pool_recycle=int(_get("DB_POOL_RECYCLE", d.pool_recycle)),
+            pool_pre_ping=_as_bool(_get("DB_POOL_PRE_PING", d.pool_pre_ping)),
+            statement_timeout_ms=int(_get("DB_STATEMENT_TIMEOUT_MS", d.statement_timeout_ms)),
+            prepare_threshold=_as_optional_int(_get("DB_PREPARE_THRESHOLD", d.prepare_threshold)),
+            sqlite_journal_mode=journal,
+            sqlite_busy_timeout_ms=int(_get("SQLITE_BUSY_TIMEOUT_MS", d.sqlite_busy_timeout_ms)),
+            sqlite_synchronous=sync,
+        )
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def _do_get(self):  # type: ignore[no-untyped-def]
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except sa_exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - t0
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_total_s += waited
+            if waited > self.wait_max_s:
+                self.wait_max_s = waited
+        return conn
+
+
+def _is_memory_sqlite(url) -> bool:
+    return (url.database or ":memory:") == ":memory:" or "mode=memory" in str(url)
+
+
+def engine_kwargs(url, settings: EngineSettings) -> dict[str, Any]:
+    """create_engine() keyword arguments for the URL's dialect."""
+    kwargs: dict[str, Any] = {"future": True, "echo": False}
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        # SQLAlchemy picks SingletonThreadPool for :memory: (one DB per thread) - keep it.
+        if not _is_memory_sqlite(url):
+            kwargs.update(
+                poolclass=_TimedQueuePool,
+                pool_size=settings.pool_size,
+                max_overflow=settings.max_overflow,
+                pool_timeout=settings.pool_timeout,
+            )
+        return kwargs
+    kwargs.update(
+        poolclass=_TimedQueuePool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+    if backend == "postgresql":
+        connect_args: dict[str, Any] = {}
+        if settings.statement_timeout_ms > 0:
+            connect_args["options"] = f"-c statement_timeout={int(settings.statement_timeout_ms)}"
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = settings.prepare_threshold
+        if connect_args:
+            kwargs["connect_args"] = connect_args
+    return kwargs
+
+
+def install_sqlite_pragmas(engine: Engine, settings: EngineSettings) -> None:
+    """Apply journal_mode / busy_timeout / synchronous on every new SQLite connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    journal = None if _is_memory_sqlite(engine.url) else settings.sqlite_journal_mode
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+            if journal:
+                cur.execute(f"PRAGMA journal_mode={journal}")
+            cur.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        finally:
+            cur.close()
+
+
+def pool_stats(engine: Engine | None) -> dict[str, Any]:
+    """Snapshot of pool occupancy and checkout wait times for diagnostics."""
+    if engine is None:
+        return {"initialized": False}
+    pool = engine.pool
+    out: dict[str, Any] = {
+        "initialized": True,
+        "dialect": engine.dialect.name,
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout_s=pool.timeout(),
+        )
+    if isinstance(pool, _TimedQueuePool):
+        with pool._stats_lock:
+            n = pool.checkouts
+            out.update(
+                checkouts=n,
+                timeouts=pool.timeouts,
+                wait_total_ms=round(pool.wait_total_s * 1000, 3),
+                wait_avg_ms=round(pool.wait_total_s * 1000 / n, 3) if n else 0.0,
+                wait_max_ms=round(pool.wait_max_s * 1000, 3),
+            )
+    return out
+
+
+__all__ = ["EngineSettings", "engine_kwargs", "install_sqlite_pragmas", "pool_stats"]
@@ -163,6 +163,9 @@ def register_error_handlers(app: Any) -> None:  # pragma: no cover - integration
         retry_after = getattr(ex, "retry_after", None)
         limit = getattr(ex, "limit", None)
         resp = too_many_requests(detail="rate_limited", retry_after=retry_after, limit=limit)
+        remaining = getattr(ex, "remaining", None)
+        if remaining is not None:
+            resp.headers["RateLimit-Remaining"] = str(remaining)
         payload = resp.get_json()
         try:
             record_audit_event(
@@ -1,19 +1,18 @@
 """Export endpoints (CSV) with unified role enforcement & rate limiting.
 
 Replaces legacy inline auth checks with `require_roles`; relies on central
-error handlers for 401/403. Streaming CSV responses for notes/tasks.
+error handlers for 401/403. Notes/tasks stream through core.csv_stream, which
+keeps the export session open until the response has been sent.
 """
 
 from __future__ import annotations
 
-import csv
 from datetime import UTC, datetime
-from io import StringIO
 
-from flask import Blueprint, Response, request, session, stream_with_context
+from flask import Blueprint, Response, request, session
 
 from .app_authz import require_roles
-from .db import get_session
+from .csv_stream import csv_response, export_session, stream_query
 from .http_limits import limit
 from .models import Note, Task
 
@@ -29,34 +28,17 @@ def _tenant_id() -> int:
     return int(tid)
 
 
-def _csv_response(name: str, rows_iterable):
+def _csv_response(name: str, rows_iterable, db=None) -> Response:
     sep = request.args.get("sep") or ","  # allow ?sep=; for regional Excel
     add_bom = request.args.get("bom", "0") == "1"
     ts = datetime.now(UTC).strftime("%Y%m%d_%H%M")
-
-    def generate():
-        buf = StringIO()
-        writer = csv.writer(buf, delimiter=sep, quoting=csv.QUOTE_MINIMAL)
-        first = True
-        for row in rows_iterable:
-            buf.seek(0)
-            buf.truncate(0)
-            writer.writerow(row)
-            data = buf.getvalue()
-            if first:
-                first = False
-                if add_bom:
-                    # Prepend UTF-8 BOM for Excel compatibility
-                    data = "\ufeff" + data
-            yield data
-
-    return Response(
-        stream_with_context(generate()),
-        mimetype="text/csv; charset=utf-8",
-        headers={
-            "Cache-Control": "no-store",
-            "Content-Disposition": f'attachment; filename="{name}_{ts}.csv"',
-        },
+    return csv_response(
+        rows_iterable,
+        filename=f"{name}_{ts}.csv",
+        delimiter=sep,
+        bom=add_bom,
+        session=db,
+        headers={"Cache-Control": "no-store"},
     )
 
 
@@ -69,13 +51,13 @@ def _csv_response(name: str, rows_iterable):
 )
 def export_notes():
     tid = _tenant_id()
-    db = get_session()
+    db = export_session()
     try:
         q = db.query(Note).filter(Note.tenant_id == tid).order_by(Note.created_at.asc())
 
         def rows():
             yield ["id", "created_at", "updated_at", "user_id", "private_flag", "content"]
-            for n in q.yield_per(200):
+            for n in stream_query(q):
                 yield [
                     str(n.id),
                     n.created_at.isoformat() if n.created_at else "",
@@ -85,9 +67,10 @@ def export_notes():
                     (n.content or "").replace("\n", " ").strip(),
                 ]
 
-        return _csv_response("notes", rows())
-    finally:
+        return _csv_response("notes", rows(), db)
+    except Exception:
         db.close()
+        raise
 
 
 @bp.get("/tasks.csv")
@@ -99,7 +82,7 @@ def export_notes():
 )
 def export_tasks():
     tid = _tenant_id()
-    db = get_session()
+    db = export_session()
     try:
         q = db.query(Task).filter(Task.tenant_id == tid).order_by(Task.id.asc())
 
@@ -116,7 +99,7 @@ def export_tasks():
                 "dish_id",
                 "content",
             ]
-            for t in q.yield_per(200):
+            for t in stream_query(q):
                 c_at = getattr(t, "created_at", None)
                 u_at = getattr(t, "updated_at", None)
                 yield [
@@ -132,6 +115,7 @@ def export_tasks():
                     (getattr(t, "content", "") or "").replace("\n", " ").strip(),
                 ]
 
-        return _csv_response("tasks", rows())
-    finally:
+        return _csv_response("tasks", rows(), db)
+    except Exception:
         db.close()
+        raise
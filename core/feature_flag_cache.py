@@ -0,0 +1,155 @@
+"""Versioned in-process snapshots of tenant/site feature-flag overrides.
+
+The request hook needs the override map for the current tenant (or site) on every request,
+while flags change a few times a month. Snapshots are cached per ("tenant", id) / ("site", id)
+and tagged with a version:
+
+ - a process-local generation, bumped by writers in this worker (and by an engine listener
+   for any raw write to a ``*feature_flags`` table)
+ - a shared counter in the single-row ``feature_flag_versions`` table, bumped by the flag
+   writers (FeatureService.enable/disable, PATCH /admin/feature-flags/<key>, POST /features/set)
+   so other gunicorn workers notice; it is read at most once per
+   FEATURE_FLAG_VERSION_CHECK_S seconds (default 2) per worker.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from .site_cache import TTLCache
+
+_VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS feature_flag_versions (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class FeatureFlagSnapshots:
+    def __init__(self, maxsize: int = 2048, check_interval: float = 2.0) -> None:
+        # TTL is only a backstop; versions do the real invalidation
+        self._snapshots = TTLCache(maxsize=maxsize, ttl=3600)
+        self.check_interval = float(check_interval)
+        self._lock = threading.Lock()
+        self._local_gen = 0
+        self._shared_version = 0
+        self._checked_at = float("-inf")
+
+    def invalidate_local(self) -> None:
+        with self._lock:
+            self._local_gen += 1
+            self._checked_at = float("-inf")
+
+    def reset(self) -> None:
+        self._snapshots.invalidate()
+        with self._lock:
+            self._local_gen += 1
+            self._shared_version = 0
+            self._checked_at = float("-inf")
+
+    def _shared(self, db) -> int:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._shared_version
+        version = read_shared_version(db)
+        with self._lock:
+            self._shared_version = version
+            self._checked_at = now
+        return version
+
+    def version(self, db) -> tuple[int, int]:
+        return (self._shared(db), self._local_gen)
+
+    def get(self, db, kind: str, key: Any, loader: Callable[[], dict[str, bool]]) -> dict[str, bool]:
+        """Return a private copy of the snapshot for (kind, key), reloading when stale."""
+        version = self.version(db)
+        entry = self._snapshots.get((kind, str(key)), None)
+        if entry is None or entry[0] != version:
+            entry = (version, dict(loader()))
+            self._snapshots.set((kind, str(key)), entry)
+        return dict(entry[1])
+
+
+snapshots = FeatureFlagSnapshots(check_interval=_env_float("FEATURE_FLAG_VERSION_CHECK_S", 2.0))
+
+
+def _is_sqlite(db) -> bool:
+    try:
+        return db.bind is not None and db.bind.dialect.name == "sqlite"
+    except Exception:
+        return False
+
+
+def _ensure_versions_table(db) -> None:
+    if not _is_sqlite(db):
+        return  # created by migration 0014 elsewhere
+    from .db import ensure_schema
+
+    ensure_schema("feature_flag_versions", lambda: db.execute(text(_VERSIONS_DDL)))
+
+
+def read_shared_version(db) -> int:
+    """Current cross-worker flag version (0 when the table is not available)."""
+    try:
+        _ensure_versions_table(db)
+        row = db.execute(text("SELECT version FROM feature_flag_versions WHERE id=1")).fetchone()
+        return int(row[0]) if row else 0
+    except Exception:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        return 0
+
+
+def bump_version(db) -> None:
+    """Bump the shared flag version on db (commit with the flag write) and drop local snapshots."""
+    try:
+        _ensure_versions_table(db)
+        res = db.execute(text("UPDATE feature_flag_versions SET version = version + 1 WHERE id=1"))
+        if not res.rowcount:
+            db.execute(text("INSERT INTO feature_flag_versions(id, version) VALUES(1, 1)"))
+    finally:
+        snapshots.invalidate_local()
+
+
+def _touches_flags(statement: str) -> bool:
+    head = statement.lstrip()[:7].lower()
+    return head.startswith(("insert", "update", "delete", "replace", "drop")) and "feature_flags" in statement.lower()
+
+
+def install_invalidation_listener(engine: Engine) -> None:
+    """Drop local snapshots whenever SQL on engine writes to a feature-flag table."""
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _on_execute(conn, _cursor, statement, _params, _context, _executemany) -> None:
+        if _touches_flags(statement or ""):
+            conn.info["feature_flags_dirty"] = True
+            snapshots.invalidate_local()
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn) -> None:
+        if conn.info.pop("feature_flags_dirty", False):
+            snapshots.invalidate_local()
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn) -> None:
+        if conn.info.pop("feature_flags_dirty", False):
+            snapshots.invalidate_local()
+
+
+__all__ = ["snapshots", "bump_version", "read_shared_version", "install_invalidation_listener"]
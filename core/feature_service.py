@@ -5,6 +5,7 @@ from collections.abc import Sequence
 from werkzeug.security import generate_password_hash
 
 from .db import get_session
+from .feature_flag_cache import bump_version
 from .models import Tenant, TenantFeatureFlag, User
 
 MODULE_FEATURE_MAP = {
@@ -40,6 +41,7 @@ class FeatureService:
             else:
                 row = TenantFeatureFlag(tenant_id=tenant_id, name=name, enabled=True)
                 db.add(row)
+            bump_version(db)
             db.commit()
         finally:
             db.close()
@@ -50,6 +52,7 @@ class FeatureService:
             row = db.query(TenantFeatureFlag).filter_by(tenant_id=tenant_id, name=name).first()
             if row:
                 row.enabled = False
+                bump_version(db)
                 db.commit()
         finally:
             db.close()
@@ -6,20 +6,33 @@ from contextlib import suppress
 from functools import wraps
 from typing import Any
 
-from flask import g, has_request_context, session
+from flask import g, has_request_context, make_response, session
 
+from . import metrics_registry
 from .limit_registry import get_limit
 from .metrics import increment as metrics_increment
-from .rate_limiter import RateLimitError, TokenBucketRateLimiter, get_rate_limiter
+from .rate_limiter import (
+    DecidingRateLimiter,
+    RateLimitDecision,
+    RateLimitError,
+    TokenBucketRateLimiter,
+    get_rate_limiter,
+)
 
 """HTTP rate limiting decorator.
 
 Add @limit to a view to enforce fixed-window quotas.
 Feature flag gating (opt-in) allows dark launch.
+Backends with decide() answer in one call; allowed responses then carry RateLimit-Remaining and
+429s carry Retry-After/RateLimit-Remaining from that same result.
 """
 
 LimiterKeyFunc = Callable[[], str]
 
+_DECISIONS = metrics_registry.counter(
+    "rate_limit_decisions_total", "Rate-limit decisions by limit", ("limit", "outcome", "strategy")
+)
+
 
 def _DEF_KEY() -> str:  # default key uses tenant if present else global bucket
     return getattr(g, "tenant_id", "global")
@@ -87,8 +100,18 @@ def limit(
             key_val = key_func()
             logical_key = f"{name}:{key_val}"
             rl = get_rate_limiter("token_bucket" if strategy == "token_bucket" else "fixed")
+            decision: RateLimitDecision | None = None
+            if isinstance(rl, DecidingRateLimiter):  # type: ignore[arg-type]
+                # One backend call yields allowed + remaining + retry_after
+                decision = rl.decide(  # type: ignore[attr-defined]
+                    logical_key,
+                    quota=q,
+                    per_seconds=p,
+                    burst=burst if strategy == "token_bucket" else None,
+                )
+                allowed = decision.allowed
             # If token bucket and backend supports extended interface, use it; else fallback to standard allow.
-            if strategy == "token_bucket" and isinstance(rl, TokenBucketRateLimiter):  # type: ignore[arg-type]
+            elif strategy == "token_bucket" and isinstance(rl, TokenBucketRateLimiter):  # type: ignore[arg-type]
                 try:
                     allowed = rl.allow_bucket(logical_key, quota=q, per_seconds=p, burst=burst)  # type: ignore[attr-defined]
                 except Exception:
@@ -101,7 +124,15 @@ def limit(
                     "rate_limit.hit",
                     {"name": name, "outcome": outcome, "window": str(p), "strategy": strategy},
                 )
+                _DECISIONS.labels(limit=name, outcome=outcome, strategy=strategy).inc()
             if not allowed:
+                if decision is not None:
+                    raise RateLimitError(
+                        f"Rate limit exceeded for {name}",
+                        retry_after=decision.retry_after,
+                        limit=name,
+                        remaining=decision.remaining,
+                    )
                 # Retry-after: attempt token bucket variant
                 retry_after = rl.retry_after(logical_key, per_seconds=p)
                 if strategy == "token_bucket" and isinstance(rl, TokenBucketRateLimiter):  # type: ignore[arg-type]
@@ -112,6 +143,10 @@ def limit(
                 raise RateLimitError(
                     f"Rate limit exceeded for {name}", retry_after=retry_after, limit=name
                 )
+            if decision is not None:
+                resp = make_response(fn(*args, **kwargs))
+                resp.headers["RateLimit-Remaining"] = str(decision.remaining)
+                return resp
             return fn(*args, **kwargs)
 
         return wrapper
@@ -0,0 +1,102 @@
+"""HTTP request metrics and the GET /metrics Prometheus exposition endpoint.
+
+Request hooks (registered in create_app) record, per route template / method / status class /
+tenant tier:
+ - http_request_duration_seconds (histogram)
+ - http_requests_in_flight (gauge)
+
+Tenant tier keeps label cardinality bounded (no raw tenant ids): METRICS_TENANT_TIERS maps
+tenant ids to tiers, e.g. "1=enterprise,7=pilot"; other tenants are "standard", requests without
+a tenant "none".
+
+GET /metrics exposes route names, tenant-tier traffic and DB pool internals, so it is never
+public: with METRICS_TOKEN set it requires `Authorization: Bearer <METRICS_TOKEN>` (scrapers);
+without it only a signed-in superuser may read it. Under METRICS_MULTIPROC_DIR it merges all
+workers.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+import time
+from functools import lru_cache
+
+from flask import Blueprint, Response, g, request, session
+
+from . import metrics_registry
+from .roles import to_canonical
+
+bp = Blueprint("metrics_exposition", __name__)
+
+REQUEST_DURATION = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("route", "method", "status_class", "tenant_tier"),
+)
+IN_FLIGHT = metrics_registry.gauge("http_requests_in_flight", "HTTP requests being served")
+
+
+@lru_cache(maxsize=8)
+def _tier_map(raw: str) -> dict[str, str]:
+    tiers: dict[str, str] = {}
+    for part in raw.split(","):
+        tid, sep, tier = part.partition("=")
+        if sep and tid.strip() and tier.strip():
+            tiers[tid.strip()] = tier.strip()
+    return tiers
+
+
+def tenant_tier(tenant_id: object) -> str:
+    if tenant_id in (None, ""):
+        return "none"
+    return _tier_map(os.getenv("METRICS_TENANT_TIERS", "")).get(str(tenant_id), "standard")
+
+
+def route_label() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def start_request() -> None:
+    g._metrics_t0 = time.perf_counter()
+    IN_FLIGHT.labels().inc()
+
+
+def finish_request(status_code: int) -> None:
+    t0 = getattr(g, "_metrics_t0", None)
+    if t0 is None:
+        return
+    REQUEST_DURATION.labels(
+        route=route_label(),
+        method=request.method,
+        status_class=f"{status_code // 100}xx",
+        tenant_tier=tenant_tier(getattr(g, "tenant_id", None)),
+    ).observe(time.perf_counter() - t0)
+
+
+def end_request() -> None:
+    if g.pop("_metrics_t0", None) is not None:
+        IN_FLIGHT.labels().dec()
+
+
+@bp.get("/metrics")
+def metrics_exposition() -> Response:
+    token = os.getenv("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+    else:
+        role = session.get("role")
+        if not session.get("user_id") or not role:
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        if to_canonical(role) != "superuser":
+            return Response("forbidden\n", status=403, mimetype="text/plain")
+    resp = Response(metrics_registry.render(), status=200)
+    resp.headers["Content-Type"] = metrics_registry.CONTENT_TYPE
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+__all__ = ["bp", "tenant_tier"]
@@ -4,11 +4,17 @@ import base64
 import hashlib
 import hmac
 import json
+import os
 import secrets
+import threading
 import time
+from collections import OrderedDict
 from collections.abc import Callable
+from functools import lru_cache
 from typing import Any, Literal, TypedDict
 
+from . import metrics_registry
+
 """JWT utilities (enhanced)
 
 Adds:
@@ -18,6 +24,10 @@ Adds:
  - Future iat guard (> leeway) rejected.
  - jti revocation hook: is_revoked(jti) -> bool (default no-op) pluggable via injector.
  - Rotation: multiple public keys/ shared secrets accepted; signing still handled externally.
+ - Prepared HMAC keys per secret set (kid-indexed, copied per verification) and a bounded
+   verification cache keyed by signature: header/signature/payload parsing is done once per
+   token until its exp; time, iss/aud and is_revoked checks still run on every decode.
+   JWT_VERIFY_CACHE_SIZE (default 4096, 0 disables).
 
 NOTE: For simplicity we still sign using HMAC (HS256) internally for issued tokens; validation path enforces alg expectations when header declares RS256.
 Future: swap to real RSA keypair management and JWKS fetcher.
@@ -42,8 +52,14 @@ except Exception:  # pragma: no cover
     _jwt_rejected_counter = None  # type: ignore
 
 
-def _inc_jwt_rejected(reason: str):  # pragma: no cover - simple helper
-    if _jwt_rejected_counter:
+_JWT_REJECTED = metrics_registry.counter(
+    "jwt_rejected_total", "Rejected JWTs by reason", ("reason",)
+)
+
+
+def _inc_jwt_rejected(reason: str):
+    _JWT_REJECTED.labels(reason=reason).inc()
+    if _jwt_rejected_counter:  # pragma: no cover - optional OTEL
         try:
             _jwt_rejected_counter.add(1, {"reason": reason})  # type: ignore
         except Exception:
@@ -72,6 +88,103 @@ def _sign(msg: bytes, secret: str) -> str:
     return _b64url(sig)
 
 
+def _kid_for_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()[:8]
+
+
+class _KeyRing:
+    """HMAC-SHA256 objects keyed once per secret; verification copies instead of re-keying."""
+
+    __slots__ = ("keys", "by_kid")
+
+    def __init__(self, candidates: tuple[str, ...]) -> None:
+        self.keys: list[hmac.HMAC] = [
+            hmac.new(s.encode(), digestmod=hashlib.sha256) for s in candidates
+        ]
+        self.by_kid: dict[str, hmac.HMAC] = {}
+        for s, h in zip(candidates, self.keys, strict=True):
+            self.by_kid.setdefault(_kid_for_secret(s), h)
+
+    def verify(self, msg: bytes, sig: str, kid: Any) -> bool:
+        first = self.by_kid.get(kid) if isinstance(kid, str) else None
+        order = self.keys if first is None else [first, *(h for h in self.keys if h is not first)]
+        for prepared in order:
+            h = prepared.copy()
+            h.update(msg)
+            if hmac.compare_digest(_b64url(h.digest()), sig):
+                return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def _keyring(candidates: tuple[str, ...]) -> _KeyRing:
+    return _KeyRing(candidates)
+
+
+_Scope = tuple[str | None, tuple[str, ...]]
+
+
+class _VerifyCache:
+    """LRU of signature-verified, parsed payloads per secret set; entries expire at the token's exp.
+
+    Only tokens that passed the signature check are stored, so forged tokens cannot fill it.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[_Scope, str], tuple[bytes, dict[str, Any], int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: _Scope, sig: str, msg: bytes, now: int) -> dict[str, Any] | None:
+        if self.max_entries <= 0:
+            return None
+        key = (scope, sig)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != msg or now > entry[2]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, scope: _Scope, sig: str, msg: bytes, raw: dict[str, Any], exp: int) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (scope, sig)
+        with self._lock:
+            self._entries[key] = (msg, raw, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _cache_size_from_env() -> int:
+    try:
+        return int(os.getenv("JWT_VERIFY_CACHE_SIZE", "4096"))
+    except ValueError:
+        return 4096
+
+
+_verify_cache = _VerifyCache(_cache_size_from_env())
+
+
+def configure_verify_cache(max_entries: int | None = None) -> None:
+    """Resize (None = re-read JWT_VERIFY_CACHE_SIZE) and clear the verification cache."""
+    _verify_cache.max_entries = _cache_size_from_env() if max_entries is None else max_entries
+    _verify_cache.clear()
+
+
 def generate_jti() -> str:
     return secrets.token_hex(16)
 
@@ -149,24 +262,9 @@ def _get_key_for_kid(kid: str, *, secrets: list[str] | None) -> str | None:
     return None
 
 
-def decode(
-    token: str,
-    *,
-    secret: str | None = None,
-    secrets_list: list[str] | None = None,
-    verify_exp: bool = True,
-    issuer: str | None = None,
-    audience: str | None = None,
-    leeway: int = SKEW_SECS,
-    max_age: int | None = None,
-    is_revoked: Callable[[str], bool] | None = None,
-) -> DecodedToken:
-    try:
-        header_b, payload_b, sig = token.split(".")
-    except ValueError as e:
-        _inc_jwt_rejected("malformed")
-        raise JWTError("malformed token") from e
-    msg = f"{header_b}.{payload_b}".encode()
+def _candidate_secrets(
+    header_b: str, secret: str | None, secrets_list: list[str] | None
+) -> tuple[tuple[str, ...], Any]:
     # Decode header early for alg/kid decisions
     try:
         header_raw = json.loads(_b64url_decode(header_b))
@@ -200,11 +298,12 @@ def decode(
     if not secrets_to_try:
         _inc_jwt_rejected("bad_signature")
         raise JWTError("bad signature")
-    for sec in secrets_to_try:
-        expected = _sign(msg, sec)
-        if hmac.compare_digest(expected, sig):
-            break
-    else:
+    return tuple(secrets_to_try), kid
+
+
+def _verify_and_parse(ring: _KeyRing, kid: Any, payload_b: str, msg: bytes, sig: str) -> dict[str, Any]:
+    """Signature check (kid-indexed key first) and payload parse; result is cacheable."""
+    if not ring.verify(msg, sig, kid):
         _inc_jwt_rejected("bad_signature")
         raise JWTError("bad signature")
     try:
@@ -217,6 +316,37 @@ def decode(
         raise JWTError("bad payload type")
     # Default issuer if absent
     raw.setdefault("iss", "yuplan")
+    return raw
+
+
+def decode(
+    token: str,
+    *,
+    secret: str | None = None,
+    secrets_list: list[str] | None = None,
+    verify_exp: bool = True,
+    issuer: str | None = None,
+    audience: str | None = None,
+    leeway: int = SKEW_SECS,
+    max_age: int | None = None,
+    is_revoked: Callable[[str], bool] | None = None,
+) -> DecodedToken:
+    try:
+        header_b, payload_b, sig = token.split(".")
+    except ValueError as e:
+        _inc_jwt_rejected("malformed")
+        raise JWTError("malformed token") from e
+    msg = f"{header_b}.{payload_b}".encode()
+    # Cache hit skips header parse, HMAC and payload parse; same secrets + same bytes required
+    scope = (secret, tuple(secrets_list) if secrets_list else ())
+    now = int(time.time())
+    raw = _verify_cache.get(scope, sig, msg, now)
+    if raw is None:
+        candidates, kid = _candidate_secrets(header_b, secret, secrets_list)
+        raw = _verify_and_parse(_keyring(candidates), kid, payload_b, msg, sig)
+        exp_hint = raw.get("exp")
+        if isinstance(exp_hint, int):
+            _verify_cache.put(scope, sig, msg, raw, exp_hint)
     token_type = raw.get("type")
     if token_type not in ("access", "refresh"):
         _inc_jwt_rejected("type")
@@ -245,7 +375,6 @@ def decode(
         _inc_jwt_rejected("nbf")
         raise JWTError("nbf")
     aud_val = raw.get("aud")
-    now = int(time.time())
     # Temporal validation
     if verify_exp:
         if now > exp + leeway:
@@ -16,7 +16,7 @@ from typing import Sequence
 
 from sqlalchemy import text
 
-from .db import get_session
+from .db import ensure_schema, get_session
 
 
 class MealRegistrationRepo:
@@ -129,8 +129,11 @@ class MealRegistrationRepo:
     def ensure_table_exists(self) -> None:
         """
         Ensure the meal_registrations table exists (for test/dev environments).
-        Production should use Alembic migrations.
+        Production should use Alembic migrations. Runs once per engine.
         """
+        ensure_schema("meal_registrations", self._create_table)
+
+    def _create_table(self) -> None:
         db = get_session()
         try:
             db.execute(
@@ -5,7 +5,7 @@ from typing import Iterable
 
 from sqlalchemy import text
 
-from .db import get_session
+from .db import ensure_schema, get_session
 from .week_key import build_week_key, normalize_week_key, parse_week_key, week_key_from_date
 
 
@@ -19,54 +19,66 @@ def _is_sqlite(db) -> bool:
 def _ensure_menus_schema(db) -> None:
     if not _is_sqlite(db):
         return
-    db.execute(
-        text(
-            """
-            CREATE TABLE IF NOT EXISTS menus (
-                id INTEGER PRIMARY KEY,
-                tenant_id INTEGER,
-                week INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                status TEXT,
-                updated_at TEXT
+
+    def _create() -> None:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS menus (
+                    id INTEGER PRIMARY KEY,
+                    tenant_id INTEGER,
+                    week INTEGER NOT NULL,
+                    year INTEGER NOT NULL,
+                    status TEXT,
+                    updated_at TEXT
+                )
+                """
             )
-            """
         )
-    )
+
+    ensure_schema("menu_choice.menus", _create)
 
 
 def _ensure_departments_schema(db) -> None:
     if not _is_sqlite(db):
         return
-    db.execute(
-        text(
-            """
-            CREATE TABLE IF NOT EXISTS departments (
-                id TEXT PRIMARY KEY,
-                site_id TEXT,
-                name TEXT
+
+    def _create() -> None:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS departments (
+                    id TEXT PRIMARY KEY,
+                    site_id TEXT,
+                    name TEXT
+                )
+                """
             )
-            """
         )
-    )
+
+    ensure_schema("menu_choice.departments", _create)
 
 
 def _ensure_menu_choice_completion_schema(db) -> None:
     if not _is_sqlite(db):
         return
-    db.execute(
-        text(
-            """
-            CREATE TABLE IF NOT EXISTS menu_choice_completion (
-                site_id TEXT NOT NULL,
-                department_id TEXT NOT NULL,
-                week_key TEXT NOT NULL,
-                completed_at TEXT,
-                UNIQUE (site_id, department_id, week_key)
+
+    def _create() -> None:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS menu_choice_completion (
+                    site_id TEXT NOT NULL,
+                    department_id TEXT NOT NULL,
+                    week_key TEXT NOT NULL,
+                    completed_at TEXT,
+                    UNIQUE (site_id, department_id, week_key)
+                )
+                """
             )
-            """
         )
-    )
+
+    ensure_schema("menu_choice_completion", _create)
 
 
 def _menus_has_column(db, column_name: str) -> bool:
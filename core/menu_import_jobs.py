@@ -0,0 +1,523 @@
+"""Background menu-import jobs behind POST /admin/menu-import and GET /admin/menu-import/<job_id>.
+
+The request thread only validates and decodes the upload, persists a MenuImportJob row (payload
+included) and hands the job id to a worker pool, so a large DOCX/XLSX no longer holds a gunicorn
+sync worker for the whole parse + persist. A worker claims the row (pending -> processing with a
+compare-and-set UPDATE, so a job never runs twice), parses it (CSV / JSON / DocxMenuImporter /
+ExcelMenuImporter), applies it through MenuImportService (one transaction per upload) and records
+progress, warnings and the per-week summary on the row. Status polls read the row, so any
+gunicorn worker can answer them.
+
+Idempotency: the job key is the Idempotency-Key header, else a sha256 of site, format and payload.
+(tenant_id, idempotency_key) is unique and submitting a known key returns the existing job. A
+failed job, or one left pending/processing for MENU_IMPORT_STALE_S, is run again.
+
+Stale jobs: a worker that dies mid-job leaves its row processing, and shutdown() at exit drops
+queued futures, leaving their rows pending. sweep_stale() requeues such rows (created_at is reset
+to the requeue time); it runs when the worker pool starts, and a status poll that finds its own
+job stale requeues that job. Requeueing is a compare-and-set, so concurrent pollers schedule it once.
+
+Env (read like core/audit_sink.py; _test_reset() re-reads):
+ - MENU_IMPORT_MODE: async (default) | inline. create_app() selects inline under TESTING unless set.
+ - MENU_IMPORT_WORKERS (2), MENU_IMPORT_STALE_S (900)
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
+
+from sqlalchemy import ColumnElement, Table, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import metrics_registry
+from .db import ensure_schema, get_new_session
+from .importers.base import ImportedMenuItem, MenuImportResult, WeekImport
+from .models import MenuImportJob
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("csv", "json", "docx", "xlsx")
+# Formats whose `data` is base64 in the JSON request body
+BINARY_FORMATS = ("docx", "xlsx")
+
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Progress checkpoints reported through the status endpoint
+_P_CLAIMED = 10
+_P_PARSED = 50
+_P_DONE = 100
+
+# Stale jobs requeued per sweep
+_SWEEP_BATCH = 100
+
+_JOBS = metrics_registry.counter(
+    "menu_import_jobs_total", "Menu import jobs by outcome", ("outcome",)
+)
+_JOB_SECONDS = metrics_registry.histogram(
+    "menu_import_job_seconds", "Menu import job run time (parse + apply)"
+)
+
+
+class MenuImportInputError(ValueError):
+    """The upload cannot be turned into an import (bad format, encoding or JSON shape)."""
+
+
+class _EnvConfig:
+    mode: str
+    workers: int
+    stale_s: int
+
+    def __init__(self) -> None:
+        self.reload()
+
+    def reload(self) -> None:
+        mode = (os.getenv("MENU_IMPORT_MODE") or "async").strip().lower()
+        self.mode = mode if mode in ("async", "inline") else "async"
+        try:
+            self.workers = max(1, int(os.getenv("MENU_IMPORT_WORKERS", "2")))
+        except ValueError:
+            self.workers = 2
+        try:
+            self.stale_s = max(1, int(os.getenv("MENU_IMPORT_STALE_S", "900")))
+        except ValueError:
+            self.stale_s = 900
+
+
+_cfg = _EnvConfig()
+_mode_override: str | None = None
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _now() -> datetime:
+    return datetime.now(UTC)
+
+
+def idempotency_key(site_id: str | None, data_format: str, payload: bytes) -> str:
+    h = hashlib.sha256()
+    h.update(f"{site_id or ''}|{data_format}|".encode())
+    h.update(payload)
+    return f"sha256:{h.hexdigest()}"
+
+
+def to_dict(job: MenuImportJob) -> dict[str, Any]:
+    def _ts(v: datetime | None) -> str | None:
+        return v.isoformat() if v is not None else None
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": int(job.progress or 0),
+        "data_format": job.data_format,
+        "filename": job.filename,
+        "site_id": job.site_id,
+        "created_at": _ts(job.created_at),
+        "started_at": _ts(job.started_at),
+        "completed_at": _ts(job.completed_at),
+        "error_message": job.error_message,
+        "warnings": list(job.warnings or []),
+        "summary": job.summary,
+    }
+
+
+def _ensure_table(db) -> None:
+    # Migration 0016 creates the table; SQLite dev databases get it on first use
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    ensure_schema(
+        "menu_import_jobs",
+        lambda: cast(Table, MenuImportJob.__table__).create(bind, checkfirst=True),
+    )
+
+
+def _read(tenant_id: int, job_id: str) -> MenuImportJob | None:
+    db = get_new_session()
+    try:
+        _ensure_table(db)
+        job = db.get(MenuImportJob, job_id)
+        if job is None or int(job.tenant_id) != int(tenant_id):
+            return None
+        db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+
+def get_job(tenant_id: int, job_id: str) -> dict[str, Any] | None:
+    """The job as a dict (None if unknown or another tenant's); a stale job is requeued."""
+    job = _read(tenant_id, job_id)
+    if job is None:
+        return None
+    if _is_stale(job) and _requeue(job_id):
+        job = _read(tenant_id, job_id) or job
+    return to_dict(job)
+
+
+def submit(
+    tenant_id: int,
+    site_id: str,
+    data_format: str,
+    payload: bytes,
+    *,
+    filename: str | None = None,
+    key: str | None = None,
+) -> tuple[dict[str, Any], bool]:
+    """Persist (or reuse) the job for this upload and schedule it; returns (job, created).
+
+    created is False when the key matched an existing job that is still valid (pending,
+    processing or completed); that job is returned untouched.
+    """
+    if data_format not in FORMATS:
+        raise MenuImportInputError(f"unsupported data_format: {data_format}")
+    key = key or idempotency_key(site_id, data_format, payload)
+    db = get_new_session()
+    try:
+        _ensure_table(db)
+        job = db.query(MenuImportJob).filter_by(tenant_id=tenant_id, idempotency_key=key).first()
+        if job is None:
+            job = MenuImportJob(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant_id,
+                site_id=site_id,
+                idempotency_key=key,
+                data_format=data_format,
+                filename=filename,
+                status=PENDING,
+                progress=0,
+                payload=payload,
+                created_at=_now(),
+            )
+            db.add(job)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Same key submitted concurrently: the other request owns the job
+                db.rollback()
+                job = (
+                    db.query(MenuImportJob)
+                    .filter_by(tenant_id=tenant_id, idempotency_key=key)
+                    .one()
+                )
+                _JOBS.labels(outcome="reused").inc()
+                return to_dict(job), False
+            _JOBS.labels(outcome="submitted").inc()
+            job_id = job.id
+        elif job.status == FAILED:
+            job_id = job.id
+            res = db.execute(
+                update(MenuImportJob)
+                .where(MenuImportJob.id == job_id, MenuImportJob.status == FAILED)
+                .values(
+                    site_id=site_id,
+                    data_format=data_format,
+                    filename=filename,
+                    status=PENDING,
+                    progress=0,
+                    payload=payload,
+                    warnings=None,
+                    summary=None,
+                    error_message=None,
+                    created_at=_now(),
+                    started_at=None,
+                    completed_at=None,
+                )
+            )
+            db.commit()
+            if not res.rowcount:
+                # A concurrent resubmit already reset it
+                _JOBS.labels(outcome="reused").inc()
+                return get_job(tenant_id, job_id) or to_dict(job), False
+            _JOBS.labels(outcome="resubmitted").inc()
+        elif _is_stale(job):
+            job_id = job.id
+            db.close()
+            requeued = _requeue(job_id)  # schedules the job when it wins
+            if not requeued:
+                _JOBS.labels(outcome="reused").inc()
+            return get_job(tenant_id, job_id) or to_dict(job), requeued
+        else:
+            _JOBS.labels(outcome="reused").inc()
+            return to_dict(job), False
+    finally:
+        db.close()
+    _schedule(job_id)
+    return get_job(tenant_id, job_id) or {"job_id": job_id, "status": PENDING}, True
+
+
+def _is_stale(job: MenuImportJob) -> bool:
+    if job.status not in (PENDING, PROCESSING):
+        return False
+    since = job.started_at if job.status == PROCESSING else job.created_at
+    if since is None:
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return _now() - since > timedelta(seconds=_cfg.stale_s)
+
+
+def _stale_clause() -> ColumnElement[bool]:
+    """SQL counterpart of _is_stale()."""
+    cutoff = _now() - timedelta(seconds=_cfg.stale_s)
+    return or_(
+        (MenuImportJob.status == PENDING) & (MenuImportJob.created_at < cutoff),
+        (MenuImportJob.status == PROCESSING) & (MenuImportJob.started_at < cutoff),
+    )
+
+
+def _requeue(job_id: str) -> bool:
+    """stale -> pending (compare-and-set) and schedule it; False when it is no longer stale."""
+    db = get_new_session()
+    try:
+        res = db.execute(
+            update(MenuImportJob)
+            .where(MenuImportJob.id == job_id, _stale_clause())
+            .values(status=PENDING, progress=0, created_at=_now(), started_at=None)
+        )
+        db.commit()
+        if not res.rowcount:
+            return False
+    finally:
+        db.close()
+    log.warning("menu import job %s was stale; requeued", job_id)
+    _JOBS.labels(outcome="requeued").inc()
+    _schedule(job_id)
+    return True
+
+
+def sweep_stale(limit: int = _SWEEP_BATCH) -> int:
+    """Requeue up to limit jobs left pending/processing past MENU_IMPORT_STALE_S; returns the count."""
+    db = get_new_session()
+    try:
+        _ensure_table(db)
+        ids = list(
+            db.scalars(
+                select(MenuImportJob.id)
+                .where(_stale_clause())
+                .order_by(MenuImportJob.created_at)
+                .limit(limit)
+            )
+        )
+    finally:
+        db.close()
+    return sum(1 for job_id in ids if _requeue(job_id))
+
+
+def _schedule(job_id: str) -> None:
+    if (_mode_override or _cfg.mode) == "inline":
+        run_job(job_id)
+        return
+    _executor().submit(run_job, job_id)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    started = False
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=_cfg.workers, thread_name_prefix="menu-import"
+                )
+                started = True
+    pool = _pool
+    if started:
+        # Pick up jobs stranded by a previous process (dead worker, futures cancelled at exit)
+        try:
+            sweep_stale()
+        except Exception:  # pragma: no cover - DB unavailable; status polls requeue later
+            log.exception("menu import stale sweep failed")
+    return pool
+
+
+def _claim(job_id: str) -> bool:
+    """pending (or stale) -> processing; False when another worker already owns the job."""
+    cutoff = _now() - timedelta(seconds=_cfg.stale_s)
+    db = get_new_session()
+    try:
+        res = db.execute(
+            update(MenuImportJob)
+            .where(
+                MenuImportJob.id == job_id,
+                or_(
+                    MenuImportJob.status == PENDING,
+                    (MenuImportJob.status == PROCESSING) & (MenuImportJob.started_at < cutoff),
+                ),
+            )
+            .values(status=PROCESSING, progress=_P_CLAIMED, started_at=_now())
+        )
+        db.commit()
+        return bool(res.rowcount)
+    finally:
+        db.close()
+
+
+def _set(job_id: str, **values: Any) -> None:
+    db = get_new_session()
+    try:
+        db.execute(update(MenuImportJob).where(MenuImportJob.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_job(job_id: str) -> None:
+    """Claim, parse and apply one job; never raises (the outcome is stored on the row)."""
+    try:
+        if not _claim(job_id):
+            return
+        db = get_new_session()
+        try:
+            job = db.get(MenuImportJob, job_id)
+            if job is None:  # pragma: no cover - deleted while queued
+                return
+            tenant_id, site_id = int(job.tenant_id), job.site_id
+            data_format, filename, payload = job.data_format, job.filename, job.payload or b""
+        finally:
+            db.close()
+    except Exception:  # pragma: no cover - DB unavailable; the stale sweep retries later
+        log.exception("menu import job %s could not be claimed", job_id)
+        return
+
+    t0 = time.perf_counter()
+    try:
+        result = parse_payload(data_format, payload, filename)
+        if result.errors and not result.weeks:
+            raise MenuImportInputError("; ".join(str(e) for e in result.errors))
+        _set(job_id, progress=_P_PARSED, warnings=list(result.warnings))
+
+        from .menu_import_service import MenuImportService
+        from .menu_service import MenuServiceDB
+
+        applied = MenuImportService(MenuServiceDB()).apply(tenant_id, site_id, result)
+        weeks = applied.get("weeks", [])
+        summary = {
+            "weeks": weeks,
+            "created": sum(int(w.get("created", 0)) for w in weeks),
+            "updated": sum(int(w.get("updated", 0)) for w in weeks),
+            "skipped": sum(int(w.get("skipped", 0)) for w in weeks),
+            "errors": list(applied.get("errors") or []),
+        }
+        _set(
+            job_id,
+            status=COMPLETED,
+            progress=_P_DONE,
+            summary=summary,
+            warnings=list(applied.get("warnings") or []),
+            payload=None,
+            completed_at=_now(),
+        )
+        _JOBS.labels(outcome=COMPLETED).inc()
+    except Exception as exc:
+        if not isinstance(exc, ValueError):
+            log.exception("menu import job %s failed", job_id)
+        try:
+            _set(
+                job_id,
+                status=FAILED,
+                error_message=str(exc) or exc.__class__.__name__,
+                payload=None,
+                completed_at=_now(),
+            )
+        except Exception:  # pragma: no cover - left processing; the stale sweep retries it
+            log.exception("menu import job %s: could not record failure", job_id)
+        _JOBS.labels(outcome=FAILED).inc()
+    finally:
+        _JOB_SECONDS.labels().observe(time.perf_counter() - t0)
+
+
+def parse_payload(data_format: str, payload: bytes, filename: str | None) -> MenuImportResult:
+    if data_format == "csv":
+        from .menu_csv_parser import csv_rows_to_import_result, parse_menu_csv
+
+        return csv_rows_to_import_result(parse_menu_csv(io.BytesIO(payload)))
+    if data_format == "json":
+        return _json_result(payload)
+    if data_format == "docx":
+        from .importers.docx_importer import DocxMenuImporter
+
+        return DocxMenuImporter().parse(payload, filename or "menu.docx")
+    if data_format == "xlsx":
+        from .importers.excel_importer import ExcelMenuImporter
+
+        return ExcelMenuImporter().parse(payload, filename or "menu.xlsx")
+    raise MenuImportInputError(f"unsupported data_format: {data_format}")
+
+
+def _json_result(payload: bytes) -> MenuImportResult:
+    """{"weeks": [{"year", "week", "items": [{day, meal, variant_type, dish_name, category?}]}]}"""
+    try:
+        doc = json.loads(payload.decode("utf-8-sig"))
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise MenuImportInputError(f"invalid JSON: {exc}") from exc
+    if not isinstance(doc, dict) or not isinstance(doc.get("weeks"), list):
+        raise MenuImportInputError("JSON must be an object with a 'weeks' list")
+    weeks: list[WeekImport] = []
+    for wi, w in enumerate(doc["weeks"]):
+        try:
+            items = [
+                ImportedMenuItem(
+                    day=str(i["day"]),
+                    meal=str(i["meal"]),
+                    variant_type=str(i.get("variant_type") or "main"),
+                    dish_name=str(i["dish_name"]),
+                    category=i.get("category"),
+                )
+                for i in w.get("items") or []
+            ]
+            weeks.append(WeekImport(year=int(w["year"]), week=int(w["week"]), items=items))
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            raise MenuImportInputError(f"weeks[{wi}]: invalid entry ({exc})") from exc
+    return MenuImportResult(weeks=weeks, warnings=[str(x) for x in doc.get("warnings") or []])
+
+
+def configure_menu_import_jobs(mode: str | None) -> None:
+    """Force inline/async (None = follow MENU_IMPORT_MODE)."""
+    global _mode_override
+    _mode_override = mode
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the worker pool; with wait=False queued jobs are cancelled and left pending for
+    sweep_stale() (next pool start) or a status poll to requeue."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _test_reset() -> None:  # pragma: no cover - invoked by tests explicitly
+    shutdown()
+    _cfg.reload()
+
+
+atexit.register(shutdown, False)
+
+__all__ = [
+    "BINARY_FORMATS",
+    "FORMATS",
+    "MenuImportInputError",
+    "configure_menu_import_jobs",
+    "get_job",
+    "idempotency_key",
+    "parse_payload",
+    "run_job",
+    "shutdown",
+    "submit",
+    "sweep_stale",
+]
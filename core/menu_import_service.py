@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+from datetime import UTC, datetime
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
 from .db import get_session
-from .importers.base import ImportedMenuItem, MenuImportResult
+from .importers.base import MenuImportResult
 from .menu_service import MenuServiceDB
-from .models import Dish
+from .models import Dish, Menu, MenuVariant
+
+# Names per IN (...) lookup and rows per multi-row VALUES; stays well under the bound-parameter
+# limits of SQLite (32766) and Postgres (65535)
+_IN_CHUNK = 500
+_VALUES_CHUNK = 1000
 
 
 class MenuImportService:
@@ -13,38 +23,50 @@ class MenuImportService:
     - Upsert Dishes (by name + tenant scope)
     - Set variants
     Returns stats per week.
+
+    An upload is applied set-based in one transaction: menus for all weeks are resolved with one
+    query (missing ones inserted together), dishes with chunked IN lookups plus one multi-row
+    INSERT for new names, and variant slots with one multi-row write (INSERT ... ON CONFLICT on
+    Postgres where uq_menu_variant_slot exists; elsewhere a multi-row INSERT for new slots and an
+    executemany UPDATE by primary key for changed ones). Counting is unchanged: each item is
+    compared with the slot's state before the upload.
     """
 
     def __init__(self, menu_service: MenuServiceDB):
         self.menu_service = menu_service
 
     def apply(self, tenant_id: int, site_id: str, result: MenuImportResult) -> dict:
+        if result.weeks and not site_id:
+            raise ValueError("site_id required")
         summary = []
         db = get_session()
         try:
+            menu_ids = self._resolve_menus(
+                db, tenant_id, site_id, [(w.year, w.week) for w in result.weeks]
+            )
+            dish_ids = self._resolve_dishes(
+                db, tenant_id, [(i.dish_name, i.category) for w in result.weeks for i in w.items]
+            )
+            existing = self._existing_variants(db, list(dict.fromkeys(menu_ids.values())))
+            pending: dict[tuple[int, str, str, str], int] = {}
             for week_block in result.weeks:
                 created = 0
                 updated = 0
                 skipped = 0
-                menu = self.menu_service.create_or_get_menu(
-                    tenant_id, site_id, week_block.week, week_block.year
-                )
-                # Preload existing variants map
-                existing_map = self._existing_variant_map(db, menu.id)
+                menu_id = menu_ids[(week_block.year, week_block.week)]
                 for item in week_block.items:
-                    dish_id = self._get_or_create_dish(db, tenant_id, item)
-                    key = (item.day, item.meal, item.variant_type)
-                    prev = existing_map.get(key)
-                    if prev == dish_id:
+                    dish_id = dish_ids[item.dish_name]
+                    slot = (menu_id, item.day.strip(), item.meal.strip(), item.variant_type.strip())
+                    prev = existing.get(slot)
+                    prev_dish = prev[1] if prev else None
+                    if prev_dish == dish_id:
                         skipped += 1
                         continue
                     if prev is None:
                         created += 1
                     else:
                         updated += 1
-                    self.menu_service.set_variant(
-                        tenant_id, menu.id, item.day, item.meal, item.variant_type, dish_id
-                    )
+                    pending[slot] = dish_id
                 summary.append(
                     {
                         "week": week_block.week,
@@ -55,27 +77,164 @@ class MenuImportService:
                         "total": len(week_block.items),
                     }
                 )
+            self._write_variants(db, pending, existing)
+            db.commit()
             return {"weeks": summary, "warnings": result.warnings, "errors": result.errors}
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
 
-    def _existing_variant_map(self, db, menu_id: int):
-        from .models import MenuVariant
-
-        rows = db.query(MenuVariant).filter_by(menu_id=menu_id).all()
-        return {(r.day, r.meal, r.variant_type): r.dish_id for r in rows}
-
-    def _get_or_create_dish(self, db, tenant_id: int, item: ImportedMenuItem):
-        # Simple exact-name lookup; future: normalization, fragments, fuzzy matching
-        existing = db.query(Dish).filter_by(tenant_id=tenant_id, name=item.dish_name).first()
-        if existing:
-            # Backfill category if missing and we imported one
-            if not existing.category and item.category:
-                existing.category = item.category
-                db.commit()
-            return existing.id
-        dish = Dish(tenant_id=tenant_id, name=item.dish_name, category=item.category)
-        db.add(dish)
-        db.commit()
-        db.refresh(dish)
-        return dish.id
+    def _resolve_menus(
+        self, db: Session, tenant_id: int, site_id: str, weeks: list[tuple[int, int]]
+    ) -> dict[tuple[int, int], int]:
+        """(year, week) -> menu id; claims legacy site-less menus and inserts missing ones."""
+        wanted = list(dict.fromkeys(weeks))
+        if not wanted:
+            return {}
+
+        def _load() -> dict[tuple[int, int], tuple[int, str | None]]:
+            rows = db.execute(
+                select(Menu.id, Menu.year, Menu.week, Menu.site_id)
+                .where(
+                    Menu.tenant_id == tenant_id,
+                    (Menu.site_id == site_id) | Menu.site_id.is_(None),
+                    tuple_(Menu.year, Menu.week).in_(wanted),
+                )
+                .order_by(Menu.id)
+            ).all()
+            found: dict[tuple[int, int], tuple[int, str | None]] = {}
+            for mid, year, week, sid in rows:
+                cur = found.get((year, week))
+                # Site-bound menu wins over a legacy one; otherwise the oldest
+                if cur is None or (cur[1] is None and sid is not None):
+                    found[(year, week)] = (mid, sid)
+            return found
+
+        found = _load()
+        legacy = [mid for mid, sid in found.values() if sid is None]
+        if legacy:
+            db.execute(update(Menu).where(Menu.id.in_(legacy)).values(site_id=site_id))
+        missing = [yw for yw in wanted if yw not in found]
+        if missing:
+            now = datetime.now(UTC)
+            db.execute(
+                insert(Menu),
+                [
+                    {
+                        "tenant_id": tenant_id,
+                        "site_id": site_id,
+                        "year": year,
+                        "week": week,
+                        "status": "draft",
+                        "updated_at": now,
+                    }
+                    for year, week in missing
+                ],
+            )
+            found = _load()
+        return {yw: found[yw][0] for yw in wanted}
+
+    def _resolve_dishes(
+        self, db: Session, tenant_id: int, items: list[tuple[str, str | None]]
+    ) -> dict[str, int]:
+        """dish name -> id (exact name, tenant scope); inserts missing names in one statement.
+
+        A dish gets the first non-empty category seen for its name, also when backfilling an
+        existing dish without one.
+        """
+        categories: dict[str, str | None] = {}
+        for name, category in items:
+            if not categories.get(name):
+                categories[name] = category
+        names = list(categories)
+        if not names:
+            return {}
+
+        def _load() -> dict[str, tuple[int, str | None]]:
+            found: dict[str, tuple[int, str | None]] = {}
+            for i in range(0, len(names), _IN_CHUNK):
+                rows = db.execute(
+                    select(Dish.id, Dish.name, Dish.category)
+                    .where(Dish.tenant_id == tenant_id, Dish.name.in_(names[i : i + _IN_CHUNK]))
+                    .order_by(Dish.id)
+                ).all()
+                for did, name, category in rows:
+                    found.setdefault(name, (did, category))
+            return found
+
+        found = _load()
+        backfill = [
+            {"id": did, "category": categories[name]}
+            for name, (did, category) in found.items()
+            if not category and categories.get(name)
+        ]
+        if backfill:
+            db.execute(update(Dish), backfill)
+        missing = [n for n in names if n not in found]
+        if missing:
+            db.execute(
+                insert(Dish),
+                [{"tenant_id": tenant_id, "name": n, "category": categories[n]} for n in missing],
+            )
+            found = _load()
+        return {name: found[name][0] for name in names}
+
+    def _existing_variants(
+        self, db: Session, menu_ids: list[int]
+    ) -> dict[tuple[int, str, str, str], tuple[int, int | None]]:
+        """(menu_id, day, meal, variant_type) -> (variant id, dish_id) before this upload."""
+        if not menu_ids:
+            return {}
+        rows = db.execute(
+            select(
+                MenuVariant.id,
+                MenuVariant.menu_id,
+                MenuVariant.day,
+                MenuVariant.meal,
+                MenuVariant.variant_type,
+                MenuVariant.dish_id,
+            )
+            .where(MenuVariant.menu_id.in_(menu_ids))
+            .order_by(MenuVariant.id)
+        ).all()
+        out: dict[tuple[int, str, str, str], tuple[int, int | None]] = {}
+        for vid, mid, day, meal, vtype, dish_id in rows:
+            out.setdefault((mid, day, meal, vtype), (vid, dish_id))
+        return out
+
+    def _write_variants(
+        self,
+        db: Session,
+        pending: dict[tuple[int, str, str, str], int],
+        existing: dict[tuple[int, str, str, str], tuple[int, int | None]],
+    ) -> None:
+        if not pending:
+            return
+        rows = [
+            {"menu_id": mid, "day": day, "meal": meal, "variant_type": vtype, "dish_id": dish_id}
+            for (mid, day, meal, vtype), dish_id in pending.items()
+        ]
+        if db.bind is not None and db.bind.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+            for i in range(0, len(rows), _VALUES_CHUNK):
+                stmt = pg_insert(MenuVariant).values(rows[i : i + _VALUES_CHUNK])
+                db.execute(
+                    stmt.on_conflict_do_update(
+                        constraint="uq_menu_variant_slot",
+                        set_={"dish_id": stmt.excluded.dish_id},
+                    )
+                )
+            return
+        new_rows = [r for slot, r in zip(pending, rows, strict=True) if slot not in existing]
+        changed = [
+            {"id": existing[slot][0], "dish_id": dish_id}
+            for slot, dish_id in pending.items()
+            if slot in existing
+        ]
+        for i in range(0, len(new_rows), _VALUES_CHUNK):
+            db.execute(insert(MenuVariant).values(new_rows[i : i + _VALUES_CHUNK]))
+        if changed:
+            db.execute(update(MenuVariant), changed)
@@ -0,0 +1,559 @@
+"""In-process metrics registry: counters, fixed-bucket histograms and gauges.
+
+Families are declared once at import time (counter()/histogram()/gauge() are get-or-create) and
+hand out label children that are cached per label-value tuple, so the hot path is a dict lookup
+plus one add under a striped lock (16 stripes, keyed by sample hash) - no global lock.
+
+Multiprocess mode (gunicorn): when METRICS_MULTIPROC_DIR is set, every worker writes its samples
+into its own mmap-backed file (counter_<pid>.db / gauge_<pid>.db) instead of process memory, and
+render() merges all files in the directory:
+ - counters and histograms are summed across files (including exited workers, so totals never
+   go backwards)
+ - gauges are summed (default), max'ed, or exposed per pid (multiprocess_mode="liveall");
+   mark_process_dead(pid) (gunicorn child_exit) removes the gauge file of an exited worker
+The directory must be emptied when the master starts (clear_multiprocess_dir(), on_starting).
+
+render() produces the Prometheus text exposition format (version 0.0.4) served by GET /metrics.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from typing import Any
+
+from .metrics import Metrics
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_STRIPES = 16
+_GAUGE_MODES = ("sum", "max", "liveall")
+
+SampleKey = tuple[str, str, tuple[tuple[str, str], ...]]  # (family, sample name, labels)
+
+
+# ---- Value backends ----------------------------------------------------------------
+
+
+class _LocalValues:
+    """Sample values in process memory."""
+
+    def __init__(self) -> None:
+        self._values: dict[SampleKey, float] = {}
+        self._locks = [threading.Lock() for _ in range(_STRIPES)]
+
+    def add(self, kind: str, key: SampleKey, amount: float) -> None:
+        with self._locks[hash(key) % _STRIPES]:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, kind: str, key: SampleKey, value: float) -> None:
+        with self._locks[hash(key) % _STRIPES]:
+            self._values[key] = value
+
+    def samples(self) -> Iterator[tuple[SampleKey, float, str | None]]:
+        for key, value in list(self._values.items()):
+            yield key, value, None
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class _MmapFile:
+    """Append-only key -> float64 file shared read-only with the scraping worker.
+
+    Layout: 8-byte header (uint32 used bytes, 4 pad), then entries of
+    uint32 key length, utf-8 key padded so the value is 8-byte aligned, float64 value.
+    A new entry is fully written before `used` is bumped, so readers never see a torn entry.
+    """
+
+    _INITIAL = 64 * 1024
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, "a+b")  # noqa: SIM115 - kept open for the life of the worker
+        if os.fstat(self._f.fileno()).st_size == 0:
+            self._f.truncate(self._INITIAL)
+        self._size = os.fstat(self._f.fileno()).st_size
+        self._m = mmap.mmap(self._f.fileno(), self._size)
+        self._used = struct.unpack_from("I", self._m, 0)[0] or 8
+        if self._used == 8:
+            struct.pack_into("I", self._m, 0, 8)
+        self._positions: dict[str, int] = {k: pos for k, _v, pos in self._read(self._m, self._used)}
+
+    @staticmethod
+    def _read(buf: Any, used: int) -> Iterator[tuple[str, float, int]]:
+        pos = 8
+        while pos < used:
+            klen = struct.unpack_from("I", buf, pos)[0]
+            raw_key = bytes(buf[pos + 4 : pos + 4 + klen])
+            pos += 4 + klen + (-(4 + klen) % 8)
+            value = struct.unpack_from("d", buf, pos)[0]
+            yield raw_key.decode("utf-8"), value, pos
+            pos += 8
+
+    @classmethod
+    def read_file(cls, path: str) -> list[tuple[str, float]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < 8:
+            return []
+        used = struct.unpack_from("I", data, 0)[0]
+        return [(k, v) for k, v, _pos in cls._read(data, min(used, len(data)))]
+
+    def _position(self, key: str) -> int:
+        pos = self._positions.get(key)
+        if pos is not None:
+            return pos
+        encoded = key.encode("utf-8")
+        entry = 4 + len(encoded) + (-(4 + len(encoded)) % 8) + 8
+        while self._used + entry > self._size:
+            self._m.close()
+            self._size *= 2
+            self._f.truncate(self._size)
+            self._m = mmap.mmap(self._f.fileno(), self._size)
+        start = self._used
+        struct.pack_into("I", self._m, start, len(encoded))
+        self._m[start + 4 : start + 4 + len(encoded)] = encoded
+        pos = start + entry - 8
+        struct.pack_into("d", self._m, pos, 0.0)
+        self._used += entry
+        struct.pack_into("I", self._m, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def add(self, key: str, amount: float) -> None:
+        pos = self._position(key)
+        struct.pack_into("d", self._m, pos, struct.unpack_from("d", self._m, pos)[0] + amount)
+
+    def set(self, key: str, value: float) -> None:
+        struct.pack_into("d", self._m, self._position(key), value)
+
+    def close(self) -> None:
+        self._m.close()
+        self._f.close()
+
+
+class _MultiprocessValues:
+    """Sample values in per-worker mmap files under `directory` (re-opened after fork)."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid = 0
+        self._files: dict[str, _MmapFile] = {}
+
+    def _file(self, kind: str) -> _MmapFile:
+        pid = os.getpid()
+        if pid != self._pid:
+            # Forked worker: never write into the parent's files
+            self._files = {}
+            self._pid = pid
+        # Counters and histograms share counter_<pid>.db: one mapping per file, or a second
+        # _MmapFile would append over the first one's entries
+        prefix = "gauge" if kind == "gauge" else "counter"
+        f = self._files.get(prefix)
+        if f is None:
+            f = _MmapFile(os.path.join(self.directory, f"{prefix}_{pid}.db"))
+            self._files[prefix] = f
+        return f
+
+    @staticmethod
+    def _encode(kind: str, key: SampleKey) -> str:
+        family, sample, labels = key
+        return json.dumps([kind, family, sample, labels], separators=(",", ":"))
+
+    def add(self, kind: str, key: SampleKey, amount: float) -> None:
+        with self._lock:
+            self._file(kind).add(self._encode(kind, key), amount)
+
+    def set(self, kind: str, key: SampleKey, value: float) -> None:
+        with self._lock:
+            self._file(kind).set(self._encode(kind, key), value)
+
+    def samples(self) -> Iterator[tuple[SampleKey, float, str | None]]:
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.db"))):
+            pid = os.path.basename(path).rsplit("_", 1)[-1][:-3]
+            try:
+                entries = _MmapFile.read_file(path)
+            except OSError:  # pragma: no cover - file removed between glob and open
+                continue
+            for raw, value in entries:
+                _kind, family, sample, labels = json.loads(raw)
+                yield (family, sample, tuple(tuple(p) for p in labels)), value, pid
+
+    def clear(self) -> None:
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+            self._pid = 0
+
+
+# ---- Families ----------------------------------------------------------------------
+
+
+def _label_key(labelnames: tuple[str, ...], values: Mapping[str, Any]) -> tuple[tuple[str, str], ...]:
+    if labelnames and set(values) != set(labelnames):
+        raise ValueError(f"expected labels {labelnames}, got {tuple(sorted(values))}")
+    return tuple((k, str(values[k])) for k in (labelnames or tuple(sorted(values))))
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Sequence[str]):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[tuple[str, str], ...], Any] = {}
+
+    def labels(self, **values: Any) -> Any:
+        key = _label_key(self.labelnames, values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._child(key))
+        return child
+
+    def _child(self, labels: tuple[tuple[str, str], ...]) -> Any:  # pragma: no cover - abstract
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("_values", "_key")
+
+    def __init__(self, values: Any, key: SampleKey) -> None:
+        self._values = values
+        self._key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        self._values.add("counter", self._key, amount)
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _child(self, labels: tuple[tuple[str, str], ...]) -> _CounterChild:
+        return _CounterChild(self._registry._values, (self.name, self.name, labels))
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("_values", "_key")
+
+    def __init__(self, values: Any, key: SampleKey) -> None:
+        self._values = values
+        self._key = key
+
+    def set(self, value: float) -> None:
+        self._values.set("gauge", self._key, float(value))
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._values.add("gauge", self._key, amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._values.add("gauge", self._key, -amount)
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        multiprocess_mode: str = "sum",
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.multiprocess_mode = multiprocess_mode if multiprocess_mode in _GAUGE_MODES else "sum"
+
+    def _child(self, labels: tuple[tuple[str, str], ...]) -> _GaugeChild:
+        return _GaugeChild(self._registry._values, (self.name, self.name, labels))
+
+    def set(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("_values", "_bounds", "_bucket_keys", "_sum_key", "_count_key")
+
+    def __init__(self, values: Any, name: str, bounds: tuple[float, ...], labels: tuple) -> None:
+        self._values = values
+        self._bounds = bounds
+        self._bucket_keys = [
+            (name, f"{name}_bucket", labels + (("le", _fmt(b)),)) for b in bounds
+        ]
+        self._sum_key = (name, f"{name}_sum", labels)
+        self._count_key = (name, f"{name}_count", labels)
+
+    def observe(self, value: float) -> None:
+        # Buckets are stored non-cumulative (one add per observation) and summed at render time
+        for i, bound in enumerate(self._bounds):
+            if value <= bound:
+                self._values.add("histogram", self._bucket_keys[i], 1.0)
+                break
+        self._values.add("histogram", self._sum_key, value)
+        self._values.add("histogram", self._count_key, 1.0)
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        bounds = sorted(float(b) for b in buckets if not math.isinf(b))
+        self.buckets = tuple(bounds) + (math.inf,)
+
+    def _child(self, labels: tuple[tuple[str, str], ...]) -> _HistogramChild:
+        return _HistogramChild(self._registry._values, self.name, self.buckets, labels)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).observe(value)
+
+
+# ---- Registry ----------------------------------------------------------------------
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if float(v).is_integer():
+        return f"{v:.1f}"
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels: Iterable[tuple[str, str]]) -> str:
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + inner + "}" if inner else ""
+
+
+class MetricsRegistry:
+    def __init__(self, multiprocess_dir: str | None = None) -> None:
+        self._lock = threading.Lock()
+        self._families: dict[str, _Family] = {}
+        self.multiprocess_dir: str | None = None
+        self._values: _LocalValues | _MultiprocessValues = _LocalValues()
+        self.configure(multiprocess_dir)
+
+    def configure(self, multiprocess_dir: str | None) -> None:
+        """Switch value storage (None = process memory); existing samples are discarded."""
+        self._values.clear()
+        self.multiprocess_dir = multiprocess_dir or None
+        if self.multiprocess_dir:
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            self._values = _MultiprocessValues(self.multiprocess_dir)
+        else:
+            self._values = _LocalValues()
+        with self._lock:
+            for fam in self._families.values():
+                fam._children.clear()
+
+    def _get_or_create(self, cls: type, name: str, *args: Any, **kwargs: Any) -> Any:
+        fam = self._families.get(name)
+        if fam is None:
+            with self._lock:
+                fam = self._families.get(name)
+                if fam is None:
+                    fam = cls(self, name, *args, **kwargs)
+                    self._families[name] = fam
+        if not isinstance(fam, cls):
+            raise ValueError(f"metric {name!r} already registered as {fam.kind}")
+        return fam
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(
+        self, name: str, help: str, labelnames: Sequence[str] = (), multiprocess_mode: str = "sum"
+    ) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames, multiprocess_mode)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def _merged(self) -> dict[str, dict[tuple, float]]:
+        """family -> {(sample name, labels): value}, merged across workers."""
+        out: dict[str, dict[tuple, float]] = {}
+        for (family, sample, labels), value, pid in self._values.samples():
+            fam = self._families.get(family)
+            bucket = out.setdefault(family, {})
+            if isinstance(fam, Gauge) and pid is not None:
+                if fam.multiprocess_mode == "liveall":
+                    labels = labels + (("pid", pid),)
+                elif fam.multiprocess_mode == "max":
+                    prev = bucket.get((sample, labels))
+                    bucket[(sample, labels)] = value if prev is None else max(prev, value)
+                    continue
+            bucket[(sample, labels)] = bucket.get((sample, labels), 0.0) + value
+        return out
+
+    def get_sample_value(self, sample: str, labels: Mapping[str, str] | None = None) -> float | None:
+        """Merged value of one sample (histogram buckets are cumulative), for tests/diagnostics."""
+        want = tuple(sorted((labels or {}).items()))
+        for line_name, line_labels, value in self._lines():
+            if line_name == sample and tuple(sorted(line_labels)) == want:
+                return value
+        return None
+
+    def _lines(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        merged = self._merged()
+        for family in sorted(merged):
+            fam = self._families.get(family)
+            samples = merged[family]
+            if not isinstance(fam, Histogram):
+                for (sample, labels), value in sorted(samples.items()):
+                    yield sample, labels, value
+                continue
+            series: dict[tuple, dict[str, float]] = {}
+            for (sample, labels), value in samples.items():
+                if sample.endswith("_bucket"):
+                    base = tuple(p for p in labels if p[0] != "le")
+                    le = dict(labels)["le"]
+                    series.setdefault(base, {})[le] = value
+                else:
+                    series.setdefault(labels, {})
+            for base in sorted(series):
+                acc = 0.0
+                for bound in fam.buckets:
+                    acc += series[base].get(_fmt(bound), 0.0)
+                    yield f"{family}_bucket", base + (("le", _fmt(bound)),), acc
+                yield f"{family}_sum", base, samples.get((f"{family}_sum", base), 0.0)
+                yield f"{family}_count", base, samples.get((f"{family}_count", base), 0.0)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        seen: set[str] = set()
+        for sample, labels, value in self._lines():
+            family = self._family_of(sample)
+            if family not in seen:
+                seen.add(family)
+                fam = self._families.get(family)
+                if fam is not None:
+                    lines.append(f"# HELP {family} {fam.help}")
+                    lines.append(f"# TYPE {family} {fam.kind}")
+            lines.append(f"{sample}{_labels_text(labels)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _family_of(self, sample: str) -> str:
+        if sample in self._families:
+            return sample
+        for suffix in ("_bucket", "_sum", "_count"):
+            if sample.endswith(suffix) and sample[: -len(suffix)] in self._families:
+                return sample[: -len(suffix)]
+        return sample
+
+    def reset(self) -> None:
+        """Drop all samples (tests)."""
+        self._values.clear()
+        with self._lock:
+            for fam in self._families.values():
+                fam._children.clear()
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v) or math.isnan(v):
+        return _fmt(v) if not math.isnan(v) else "NaN"
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+
+REGISTRY = MetricsRegistry(os.getenv("METRICS_MULTIPROC_DIR") or None)
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def gauge(
+    name: str, help: str, labelnames: Sequence[str] = (), multiprocess_mode: str = "sum"
+) -> Gauge:
+    return REGISTRY.gauge(name, help, labelnames, multiprocess_mode)
+
+
+def histogram(
+    name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return REGISTRY.histogram(name, help, labelnames, buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def mark_process_dead(pid: int, directory: str | None = None) -> None:
+    """Remove an exited worker's gauge file (gunicorn child_exit); its counters are kept."""
+    directory = directory or REGISTRY.multiprocess_dir
+    if not directory:
+        return
+    path = os.path.join(directory, f"gauge_{pid}.db")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def clear_multiprocess_dir(directory: str | None = None) -> None:
+    """Delete stale worker files (gunicorn on_starting, before any worker forks)."""
+    directory = directory or REGISTRY.multiprocess_dir
+    if not directory:
+        return
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+class RegistryMetrics(Metrics):
+    """METRICS_BACKEND=prometheus: core.metrics.increment() events become counters.
+
+    "rate_limit.hit" -> app_rate_limit_hit_total; tags become labels.
+    """
+
+    def increment(self, name: str, tags: Mapping[str, str] | None = None) -> None:
+        family = "app_" + "".join(c if c.isalnum() else "_" for c in name) + "_total"
+        REGISTRY.counter(family, f"core.metrics event {name}").labels(**(tags or {})).inc()
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "Counter",
+    "DEFAULT_BUCKETS",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "RegistryMetrics",
+    "clear_multiprocess_dir",
+    "counter",
+    "gauge",
+    "histogram",
+    "mark_process_dead",
+    "render",
+]
@@ -11,8 +11,10 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     String,
     Text,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from typing import Optional
@@ -173,6 +175,20 @@ class ShiftSlot(Base):
     status: Mapped[str] = mapped_column(String(20), default="planned")
     notes: Mapped[str] = mapped_column(Text, nullable=True)
 
+    # Natural key for imports; unit_id/role are nullable, so NULL is folded to a sentinel (unit ids
+    # start at 1, an empty role is stored as NULL). start_ts leads so it also serves range reads
+    __table_args__ = (
+        Index(
+            "uq_shift_slots_natural_key",
+            "tenant_id",
+            "start_ts",
+            "end_ts",
+            text("coalesce(unit_id, 0)"),
+            text("coalesce(role, '')"),
+            unique=True,
+        ),
+    )
+
 
 # --- Tasks (Prep / Freezer) ---
 class Task(Base):
@@ -244,6 +260,45 @@ class ServiceMetric(Base):
     leftover_qty_kg: Mapped[float] = mapped_column(Float, nullable=True)
     served_g_per_guest: Mapped[float] = mapped_column(Float, nullable=True)
 
+    # Natural key for ingest upserts; dish_id/category are nullable, so NULL is folded to a
+    # sentinel (dish ids start at 1, empty category is stored as NULL)
+    __table_args__ = (
+        Index(
+            "uq_service_metrics_natural_key",
+            "tenant_id",
+            "unit_id",
+            "date",
+            "meal",
+            text("coalesce(dish_id, 0)"),
+            text("coalesce(category, '')"),
+            unique=True,
+        ),
+    )
+
+
+class ServiceMetricStat(Base):
+    """Rolling served-g-per-guest history behind portion recommendations (see core.portion_stats).
+
+    One row per (tenant, unit, scope, key): unit_id 0 aggregates all units; scope is "dish"
+    (key = dish id), "category" (key = category) or "all" (key = ""). samples maps a metric's
+    natural key to [date, served_g_per_guest] for the most recent rows inside the history window.
+    """
+
+    __tablename__ = "service_metric_stats"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id"))
+    unit_id: Mapped[int] = mapped_column(Integer, default=0)
+    scope: Mapped[str] = mapped_column(String(10))
+    scope_key: Mapped[str] = mapped_column(String(50), default="")
+    sample_count: Mapped[int] = mapped_column(Integer, default=0)
+    sample_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    samples: Mapped[dict] = mapped_column(JSON, default=dict)
+    built_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        Index("uq_service_metric_stats_key", "tenant_id", "unit_id", "scope", "scope_key", unique=True),
+    )
+
 
 # --- Feature Flags (per tenant) ---
 class TenantFeatureFlag(Base):
@@ -295,4 +350,31 @@ class AuditEvent(Base):
     __table_args__ = (
         Index("ix_audit_events_tenant_ts", "tenant_id", "ts"),
         Index("ix_audit_events_event_ts", "event", "ts"),
+        Index("ix_audit_events_ts_id", "ts", "id"),
+    )
+
+
+# --- Menu import jobs ---
+class MenuImportJob(Base):
+    __tablename__ = "menu_import_jobs"
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id"))
+    site_id: Mapped[str] = mapped_column(String(36), nullable=True)
+    idempotency_key: Mapped[str] = mapped_column(String(128))
+    data_format: Mapped[str] = mapped_column(String(10))
+    filename: Mapped[str] = mapped_column(String(255), nullable=True)
+    # pending -> processing -> completed | failed; payload is dropped once the job finishes
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    progress: Mapped[int] = mapped_column(Integer, default=0)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    warnings: Mapped[list] = mapped_column(JSON, nullable=True)
+    summary: Mapped[dict] = mapped_column(JSON, nullable=True)
+    error_message: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("uq_menu_import_jobs_tenant_key", "tenant_id", "idempotency_key", unique=True),
+        Index("ix_menu_import_jobs_status_created", "status", "created_at"),
     )
@@ -0,0 +1,170 @@
+"""Precomputed /openapi.json artifact.
+
+The spec builder in app_factory produces a large nested dict and merges openapi/parts on top.
+The result only changes with a deploy, so it is serialized once per process (or at build time
+with scripts/build_openapi_artifact.py) and served as bytes with:
+
+ - a strong ETag (sha256 of the canonical JSON bytes) and If-None-Match -> 304
+ - optional pre-gzipped bytes when the client sends Accept-Encoding: gzip (OPENAPI_GZIP, default on),
+   under their own ETag ("-gzip" inside the quotes): the two bodies are different representations
+
+When OPENAPI_ARTIFACT_PATH points to a prebuilt file it is loaded at startup and, unless
+OPENAPI_VERIFY_ARTIFACT=0, compared against the live builder; on mismatch the live spec wins.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from flask import Request, Response
+
+log = logging.getLogger(__name__)
+
+_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def serialize_spec(spec: dict[str, Any]) -> bytes:
+    """Canonical JSON bytes (sorted keys, compact) so equal specs hash equally."""
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class OpenAPIArtifact:
+    body: bytes
+    etag: str
+    gzipped: bytes | None = None
+    etag_gzip: str | None = None
+
+    @classmethod
+    def from_bytes(cls, body: bytes, compress: bool = True) -> OpenAPIArtifact:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # mtime=0 keeps the gzip bytes deterministic across processes
+        gz = gzip.compress(body, compresslevel=9, mtime=0) if compress else None
+        etag_gz = etag[:-1] + '-gzip"' if gz is not None else None
+        return cls(body=body, etag=etag, gzipped=gz, etag_gzip=etag_gz)
+
+    @classmethod
+    def from_spec(cls, spec: dict[str, Any], compress: bool = True) -> OpenAPIArtifact:
+        return cls.from_bytes(serialize_spec(spec), compress=compress)
+
+
+def _none_match(header_val: str | None, etag: str) -> bool:
+    if not header_val:
+        return False
+    tokens = [t.strip() for t in header_val.split(",") if t.strip()]
+    # Weak comparison per RFC 9110 for If-None-Match
+    return "*" in tokens or etag in tokens or f"W/{etag}" in tokens
+
+
+def _accepts_gzip(header_val: str | None) -> bool:
+    for part in (header_val or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            q = params.strip().lower()
+            return not (q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"))
+    return False
+
+
+def artifact_response(artifact: OpenAPIArtifact, req: Request) -> Response:
+    """200 with cached bytes (gzip when accepted) or 304 when If-None-Match matches.
+
+    If-None-Match is compared against the ETag of the negotiated encoding.
+    """
+    use_gzip = artifact.gzipped is not None and _accepts_gzip(req.headers.get("Accept-Encoding"))
+    etag = artifact.etag_gzip if use_gzip and artifact.etag_gzip else artifact.etag
+    if _none_match(req.headers.get("If-None-Match"), etag):
+        resp = Response(status=304)
+    elif use_gzip:
+        resp = Response(artifact.gzipped, mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(artifact.body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = _CACHE_CONTROL
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
+def load_artifact(path: str | Path, compress: bool = True) -> OpenAPIArtifact | None:
+    try:
+        return OpenAPIArtifact.from_bytes(Path(path).read_bytes(), compress=compress)
+    except OSError:
+        log.warning("OpenAPI artifact not readable: %s", path)
+        return None
+
+
+def write_artifact(spec: dict[str, Any], path: str | Path) -> OpenAPIArtifact:
+    """Write canonical spec bytes to path (plus path.gz) and return the artifact."""
+    artifact = OpenAPIArtifact.from_spec(spec)
+    p = Path(path)
+    p.write_bytes(artifact.body)
+    if artifact.gzipped is not None:
+        p.with_name(p.name + ".gz").write_bytes(artifact.gzipped)
+    return artifact
+
+
+class OpenAPIArtifactHolder:
+    """Per-app holder: builds the artifact on first use (or adopts a prebuilt one) exactly once."""
+
+    def __init__(self, builder: Callable[[], dict[str, Any]], compress: bool = True) -> None:
+        self.builder = builder
+        self._compress = compress
+        self._lock = threading.Lock()
+        self._artifact: OpenAPIArtifact | None = None
+        self.builds = 0
+
+    def _build(self) -> OpenAPIArtifact:
+        self.builds += 1
+        return OpenAPIArtifact.from_spec(self.builder(), compress=self._compress)
+
+    def get(self) -> OpenAPIArtifact:
+        artifact = self._artifact
+        if artifact is None:
+            with self._lock:
+                if self._artifact is None:
+                    self._artifact = self._build()
+                artifact = self._artifact
+        return artifact
+
+    def adopt(self, path: str | Path, verify: bool = True) -> bool:
+        """Serve the prebuilt artifact at path; with verify, only if it matches the live builder.
+
+        Returns True when the file was adopted.
+        """
+        prebuilt = load_artifact(path, compress=self._compress)
+        if prebuilt is None:
+            return False
+        with self._lock:
+            if verify:
+                live = self._build()
+                if live.etag != prebuilt.etag:
+                    log.error(
+                        "OpenAPI artifact %s is stale (etag %s, live %s); serving live spec",
+                        path,
+                        prebuilt.etag,
+                        live.etag,
+                    )
+                    self._artifact = live
+                    return False
+            self._artifact = prebuilt
+        return True
+
+    def response(self, req: Request) -> Response:
+        return artifact_response(self.get(), req)
+
+
+__all__ = [
+    "OpenAPIArtifact",
+    "OpenAPIArtifactHolder",
+    "artifact_response",
+    "load_artifact",
+    "serialize_spec",
+    "write_artifact",
+]
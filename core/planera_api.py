@@ -2,14 +2,18 @@ from __future__ import annotations
 
 import uuid
 from datetime import date as _date
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from flask import Blueprint, jsonify, request, session, make_response, current_app, g
 
 from .auth import require_roles
 from .csrf import csrf_protect
+from .csv_stream import csv_etag, csv_response
 from .http_errors import bad_request, not_found
-from .db import get_session
+from .db import ensure_schema, get_session
+
+if TYPE_CHECKING:
+    from .planera_service import PlaneraService
 
 bp = Blueprint("planera_api", __name__, url_prefix="/api")
 _service: "PlaneraService | None" = None
@@ -51,6 +55,22 @@ def _build_etag(kind: str, payload: dict) -> str:
     return f'W/"planera:{kind}:{h}"'
 
 
+def _version_etag(kind: str, *parts: Any) -> str:
+    """ETag from the request scope and PlaneraService.inputs_version (no aggregation needed)."""
+    import json, hashlib
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    h = hashlib.sha1(canonical.encode()).hexdigest()[:16]
+    return f'W/"planera:{kind}:v:{h}"'
+
+
+def _get_service() -> "PlaneraService":
+    global _service
+    if _service is None:
+        from .planera_service import PlaneraService
+        _service = PlaneraService()
+    return _service
+
+
 def _conditional(etag: str) -> Any:
     inm = request.headers.get("If-None-Match")
     if inm and inm == etag:
@@ -110,24 +130,28 @@ def _ensure_normal_exclusions_schema() -> None:
         dialect = db.bind.dialect.name if db.bind is not None else ""
         if dialect != "sqlite":
             return
-        db.execute(
-            __import__("sqlalchemy").text(
-                """
-                CREATE TABLE IF NOT EXISTS normal_exclusions (
-                  tenant_id TEXT NOT NULL,
-                  site_id TEXT NOT NULL,
-                  year INTEGER NOT NULL,
-                  week INTEGER NOT NULL,
-                  day_index INTEGER NOT NULL,
-                  meal TEXT NOT NULL,
-                  alt TEXT NOT NULL,
-                  diet_type_id TEXT NOT NULL,
-                  UNIQUE (tenant_id, site_id, year, week, day_index, meal, alt, diet_type_id)
-                );
-                """
+
+        def _create() -> None:
+            db.execute(
+                __import__("sqlalchemy").text(
+                    """
+                    CREATE TABLE IF NOT EXISTS normal_exclusions (
+                      tenant_id TEXT NOT NULL,
+                      site_id TEXT NOT NULL,
+                      year INTEGER NOT NULL,
+                      week INTEGER NOT NULL,
+                      day_index INTEGER NOT NULL,
+                      meal TEXT NOT NULL,
+                      alt TEXT NOT NULL,
+                      diet_type_id TEXT NOT NULL,
+                      UNIQUE (tenant_id, site_id, year, week, day_index, meal, alt, diet_type_id)
+                    );
+                    """
+                )
             )
-        )
-        db.commit()
+            db.commit()
+
+        ensure_schema("normal_exclusions", _create)
     finally:
         try:
             db.close()
@@ -160,12 +184,17 @@ def get_planera_day():
     if not ok:
         return not_found("site_or_department_not_found")
     site_name, deps = ok
-    global _service
-    if _service is None:
-        from .planera_service import PlaneraService
-        _service = PlaneraService()
+    service = _get_service()
     meal_labels = _meal_labels(site_id)
-    agg = _service.compute_day(tid, site_id, date_str, [(d["department_id"], d["department_name"]) for d in deps])
+    iso_year, iso_week, _dow = _d.isocalendar()
+    version = service.inputs_version(tid, site_id, iso_year, iso_week, [d["department_id"] for d in deps])
+    etag = None
+    if version is not None:
+        etag = _version_etag("day", site_id, site_name, date_str, deps, meal_labels, version)
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
+    agg = service.compute_day(tid, site_id, date_str, [(d["department_id"], d["department_name"]) for d in deps])
     payload = {
         "site_id": site_id,
         "site_name": site_name,
@@ -174,10 +203,11 @@ def get_planera_day():
         "departments": agg["departments"],
         "totals": agg["totals"],
     }
-    etag = _build_etag("day", payload)
-    maybe = _conditional(etag)
-    if maybe is not None:
-        return maybe
+    if etag is None:
+        etag = _build_etag("day", payload)
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
     resp = jsonify(payload)
     resp.headers["ETag"] = etag
     resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
@@ -212,12 +242,16 @@ def get_planera_week():
     if not ok:
         return not_found("site_or_department_not_found")
     site_name, deps = ok
-    global _service
-    if _service is None:
-        from .planera_service import PlaneraService
-        _service = PlaneraService()
+    service = _get_service()
     meal_labels = _meal_labels(site_id)
-    agg = _service.compute_week(tid, site_id, year, week, [(d["department_id"], d["department_name"]) for d in deps])
+    version = service.inputs_version(tid, site_id, year, week, [d["department_id"] for d in deps])
+    etag = None
+    if version is not None:
+        etag = _version_etag("week", site_id, site_name, year, week, deps, meal_labels, version)
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
+    agg = service.compute_week(tid, site_id, year, week, [(d["department_id"], d["department_name"]) for d in deps])
     payload = {
         "site_id": site_id,
         "site_name": site_name,
@@ -227,10 +261,11 @@ def get_planera_week():
         "days": agg["days"],
         "weekly_totals": agg["weekly_totals"],
     }
-    etag = _build_etag("week", payload)
-    maybe = _conditional(etag)
-    if maybe is not None:
-        return maybe
+    if etag is None:
+        etag = _build_etag("week", payload)
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
     resp = jsonify(payload)
     resp.headers["ETag"] = etag
     resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
@@ -265,60 +300,50 @@ def get_planera_week_csv():  # CSV export for week aggregation
     if not ok:
         return not_found("site_or_department_not_found")
     site_name, deps = ok
-    global _service
-    if _service is None:
-        from .planera_service import PlaneraService
-        _service = PlaneraService()
-    agg = _service.compute_week(tid, site_id, year, week, [(d["department_id"], d["department_name"]) for d in deps])
-    payload_for_etag = {
-        "site_id": site_id,
-        "site_name": site_name,
-        "year": year,
-        "week": week,
-        "days": agg["days"],
-        "weekly_totals": agg["weekly_totals"],
-    }
-    etag = _build_etag("week", payload_for_etag)
-    inm = request.headers.get("If-None-Match")
-    if inm and inm == etag:
-        resp = make_response("")
-        resp.status_code = 304
-        resp.headers["ETag"] = etag
-        resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
-        return resp
-    # Build CSV rows
-    import csv, io
-    output = io.StringIO()
-    w = csv.writer(output)
-    w.writerow(["date", "weekday", "meal", "department", "residents_total", "normal", "special_diets"])
-    # For department resolution we iterate departments again and fetch per department days for precise per-dept counts
-    # However agg["days"] already aggregates across all departments. For CSV we output aggregated totals per day+meal per department separately.
-    # Simplification: output aggregated site totals only (department column = "__total__") plus per-day site totals.
-    # Future enhancement: expand per department rows.
-    weekday_map = {d["day_of_week"]: d["weekday_name"] for d in agg["days"]}
-    for d in agg["days"]:
-        dow = d.get("day_of_week")
-        date_str = d.get("date")
-        weekday_name = d.get("weekday_name")
-        for meal_key in ("lunch", "dinner"):
-            meal = (d.get("meals") or {}).get(meal_key, {})
-            specials = meal.get("special_diets") or []
-            specials_str = ";".join(f"{s.get('diet_name')}:{int(s.get('count') or 0)}" for s in specials) if specials else ""
-            w.writerow([
-                date_str,
-                weekday_name,
-                meal_key,
-                "__total__",
-                int(meal.get("residents_total") or 0),
-                int(meal.get("normal_diet_count") or 0),
-                specials_str,
-            ])
-    csv_text = output.getvalue()
-    resp = make_response(csv_text)
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-    resp.headers["ETag"] = etag
-    resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
-    return resp
+    service = _get_service()
+    version = service.inputs_version(tid, site_id, year, week, [d["department_id"] for d in deps])
+    etag = None
+    if version is not None:
+        etag = csv_etag(_version_etag("week", "csv", site_id, site_name, year, week, deps, version))
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
+    agg = service.compute_week(tid, site_id, year, week, [(d["department_id"], d["department_name"]) for d in deps])
+    if etag is None:
+        payload_for_etag = {
+            "site_id": site_id,
+            "site_name": site_name,
+            "year": year,
+            "week": week,
+            "days": agg["days"],
+            "weekly_totals": agg["weekly_totals"],
+        }
+        etag = csv_etag(_build_etag("week", payload_for_etag))
+        maybe = _conditional(etag)
+        if maybe is not None:
+            return maybe
+    # CSV rows: aggregated site totals per day + meal (department column = "__total__").
+    # agg["days"] already aggregates across all departments; per-department rows are a future enhancement.
+    def rows():
+        yield ["date", "weekday", "meal", "department", "residents_total", "normal", "special_diets"]
+        for d in agg["days"]:
+            for meal_key in ("lunch", "dinner"):
+                meal = (d.get("meals") or {}).get(meal_key, {})
+                specials = meal.get("special_diets") or []
+                specials_str = ";".join(f"{s.get('diet_name')}:{int(s.get('count') or 0)}" for s in specials)
+                yield [
+                    d.get("date"),
+                    d.get("weekday_name"),
+                    meal_key,
+                    "__total__",
+                    int(meal.get("residents_total") or 0),
+                    int(meal.get("normal_diet_count") or 0),
+                    specials_str,
+                ]
+
+    return csv_response(
+        rows(), headers={"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+    )
 
 
 @bp.post("/kitchen/planering/normal_exclusions/toggle")
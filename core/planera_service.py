@@ -106,6 +106,17 @@ class PlaneraService:
         for dep_id in department_ids:
             repo.upsert_registration(tenant_id=tenant_id, site_id=site_id, department_id=dep_id, date_str=date.isoformat(), meal_type=meal, registered=True)
 
+    def inputs_version(
+        self,
+        tenant_id: int | str,
+        site_id: str,
+        year: int,
+        week: int,
+        department_ids: Iterable[str],
+    ) -> str | None:
+        """Version key for everything compute_day/compute_week read (see WeekviewService.inputs_version)."""
+        return self._weekview.inputs_version(tenant_id, site_id, year, week, department_ids)
+
     def compute_day(
         self,
         tenant_id: int | str,
@@ -122,8 +133,10 @@ class PlaneraService:
         total_special_acc: Dict[str, Dict[str, int]] = {"lunch": {}, "dinner": {}}
         total_residents: Dict[str, int] = {"lunch": 0, "dinner": 0}
         diet_names_global: Dict[str, str] = {}
+        departments = list(departments)
+        fetched = self._weekview.fetch_weekview_many(tenant_id, year, week, [dep_id for dep_id, _ in departments])
         for dep_id, dep_name in departments:
-            day = self._extract_day(tenant_id, year, week, dep_id, iso_date)
+            day = self._find_day(self._days_of(fetched.get(dep_id, ({}, ""))[0]), iso_date)
             meals_payload: Dict[str, Any] = {}
             for meal in ("lunch", "dinner"):
                 residents_total = 0
@@ -224,15 +237,11 @@ class PlaneraService:
         week: int,
         departments: Iterable[Tuple[str, str]],
     ) -> Dict[str, Any]:
-        dept_days: Dict[str, List[Dict[str, Any]]] = {}
-        for dep_id, _dep_name in departments:
-            payload, _etag = self._weekview.fetch_weekview(tenant_id, year, week, dep_id)
-            try:
-                summaries = payload.get("department_summaries") or []
-                days = (summaries[0].get("days") if summaries else []) or []
-            except Exception:
-                days = []
-            dept_days[dep_id] = days
+        departments = list(departments)
+        fetched = self._weekview.fetch_weekview_many(tenant_id, year, week, [dep_id for dep_id, _ in departments])
+        dept_days: Dict[str, List[Dict[str, Any]]] = {
+            dep_id: self._days_of(fetched.get(dep_id, ({}, ""))[0]) for dep_id, _dep_name in departments
+        }
         weekday_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
         days_out: List[Dict[str, Any]] = []
         weekly_residents: Dict[str, int] = {"lunch": 0, "dinner": 0}
@@ -323,12 +332,18 @@ class PlaneraService:
 
     def _extract_day(self, tenant_id: int | str, year: int, week: int, dep_id: str, iso_date: str) -> Dict[str, Any] | None:
         payload, _etag = self._weekview.fetch_weekview(tenant_id, year, week, dep_id)
+        return self._find_day(self._days_of(payload), iso_date)
+
+    @staticmethod
+    def _days_of(payload: Dict[str, Any] | None) -> List[Dict[str, Any]]:
+        """Return days[] of the single department summary in a weekview payload."""
+        if not payload:
+            return []
         try:
             summaries = payload.get("department_summaries") or []
-            day_list = (summaries[0].get("days") if summaries else []) or []
+            return (summaries[0].get("days") if summaries else []) or []
         except Exception:
-            return None
-        return self._find_day(day_list, iso_date)
+            return []
 
     @staticmethod
     def _find_day(days: List[Dict[str, Any]], iso_date: str) -> Dict[str, Any] | None:
@@ -1,14 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, timedelta
 from typing import Any
 
+from . import portion_stats
 from .db import get_session
-from .models import PortionGuideline, ServiceMetric
+from .portion_stats import HISTORY_DAYS, Guideline  # noqa: F401 (HISTORY_DAYS re-exported)
 
 SAFETY_FACTOR = 1.05
-HISTORY_DAYS = 120
 # For tests we blend even with small history (>=1 point)
 MIN_HISTORY_POINTS = 1
 BASELINE_DEFAULT = 400  # grams per guest fallback (aligned with tests expecting 441 & 494 outcomes)
@@ -30,8 +29,40 @@ class PortionRecommendationService:
         """Return recommendation object with fields:
         g_per_guest_recommended, total_g, total_kg, protein_total_g (if known), meta
         """
-        baseline = self._baseline(inp)
-        history_mean, sample_size = self._history_mean(inp)
+        return self.recommend_many([inp])[0]
+
+    def recommend_many(self, inputs: list[RecommendationInput]) -> list[dict[str, Any]]:
+        """recommend() for many dishes/categories at once, e.g. a whole week's menu.
+
+        History comes from core.portion_stats with one read per tenant for all distinct
+        (unit, dish/category) keys; guidelines come from the per-tenant cache.
+        """
+        if not inputs:
+            return []
+        db = get_session()
+        try:
+            keys: dict[int, set[portion_stats.StatKey]] = {}
+            for inp in inputs:
+                keys.setdefault(inp.tenant_id, set()).add(self._stat_key(inp))
+            history: dict[tuple[int, portion_stats.StatKey], list[float]] = {}
+            guidelines: dict[int, tuple[Guideline, ...]] = {}
+            for tenant_id, tenant_keys in keys.items():
+                for key, values in portion_stats.history(db, tenant_id, tenant_keys).items():
+                    history[(tenant_id, key)] = values
+                guidelines[tenant_id] = portion_stats.guideline_rows(db, tenant_id)
+        finally:
+            db.close()
+        return [
+            self._recommend(inp, guidelines[inp.tenant_id], history[(inp.tenant_id, self._stat_key(inp))])
+            for inp in inputs
+        ]
+
+    def _recommend(
+        self, inp: RecommendationInput, guidelines: tuple[Guideline, ...], values: list[float]
+    ) -> dict[str, Any]:
+        baseline_val = self._guideline_value(inp, guidelines, "baseline_g_per_guest")
+        baseline = int(baseline_val) if baseline_val is not None else BASELINE_DEFAULT
+        history_mean, sample_size = self._history_mean(values)
         if history_mean is None:
             blended: float = float(baseline)
             source = "baseline"
@@ -48,10 +79,10 @@ class PortionRecommendationService:
         total_g = g_per_guest * max(inp.guest_count, 0)
         total_kg = total_g / 1000.0
         protein_total_g = None
-        protein_per_100g = self._protein_per_100g(inp)
+        protein_per_100g = self._guideline_value(inp, guidelines, "protein_per_100g")
         if protein_per_100g is not None:
             protein_total_g = (protein_per_100g / 100.0) * total_g
-        result = {
+        return {
             "ok": True,
             "g_per_guest": g_per_guest,
             "total_g": total_g,
@@ -69,7 +100,6 @@ class PortionRecommendationService:
                 },
             },
         }
-        return result
 
     # Adapter methods expected by legacy API route (tests reference fields)
     class _BlendedResult:
@@ -112,85 +142,47 @@ class PortionRecommendationService:
         )
         return self._protein_per_100g(inp)
 
-    def _baseline(self, inp: RecommendationInput) -> int:
+    def _protein_per_100g(self, inp: RecommendationInput) -> float | None:
         db = get_session()
         try:
-            q = db.query(PortionGuideline).filter(PortionGuideline.tenant_id == inp.tenant_id)
-            if inp.unit_id:
-                q = q.filter(
-                    (PortionGuideline.unit_id == inp.unit_id) | (PortionGuideline.unit_id.is_(None))
-                )
-            if inp.category:
-                q = q.filter(PortionGuideline.category == inp.category)
-            recs = q.all()
-            best: int | None = None
-            for r in recs:
-                val = r.baseline_g_per_guest
-                if val is None:
-                    continue
-                if r.unit_id == inp.unit_id:
-                    best = val
-                    break
-                if best is None:
-                    best = val
-            return int(best) if best is not None else BASELINE_DEFAULT
+            guidelines = portion_stats.guideline_rows(db, inp.tenant_id)
         finally:
             db.close()
+        return self._guideline_value(inp, guidelines, "protein_per_100g")
 
-    def _history_mean(self, inp: RecommendationInput) -> tuple[float | None, int]:
-        db = get_session()
-        try:
-            since = date.today() - timedelta(days=HISTORY_DAYS)
-            q = db.query(ServiceMetric).filter(
-                ServiceMetric.tenant_id == inp.tenant_id,
-                ServiceMetric.date >= since,
-                ServiceMetric.served_g_per_guest.isnot(None),
-            )
-            if inp.unit_id:
-                q = q.filter(ServiceMetric.unit_id == inp.unit_id)
-            if inp.dish_id is not None:
-                q = q.filter(ServiceMetric.dish_id == inp.dish_id)
-            elif inp.category is not None:
-                q = q.filter(ServiceMetric.category == inp.category)
-            # Collect non-null floats directly
-            rows_raw = q.all()
-            rows: list[float] = [
-                float(r.served_g_per_guest) for r in rows_raw if r.served_g_per_guest is not None
-            ]
-            sample_size = len(rows)
-            if sample_size < MIN_HISTORY_POINTS:
-                return None, sample_size
-            trimmed = rows
-            if sample_size >= 5:
-                k = max(1, int(0.1 * sample_size))
-                trimmed_sorted = sorted(rows)
-                trimmed = trimmed_sorted[k : sample_size - k] if sample_size - 2 * k > 0 else rows
-            mean_val: float | None = (sum(trimmed) / len(trimmed)) if trimmed else None
-            return mean_val, sample_size
-        finally:
-            db.close()
+    @staticmethod
+    def _stat_key(inp: RecommendationInput) -> portion_stats.StatKey:
+        return portion_stats.stat_key(inp.unit_id, inp.dish_id, inp.category)
 
-    def _protein_per_100g(self, inp: RecommendationInput) -> float | None:
-        db = get_session()
-        try:
-            q = db.query(PortionGuideline).filter(PortionGuideline.tenant_id == inp.tenant_id)
-            if inp.unit_id:
-                q = q.filter(
-                    (PortionGuideline.unit_id == inp.unit_id) | (PortionGuideline.unit_id.is_(None))
-                )
-            if inp.category:
-                q = q.filter(PortionGuideline.category == inp.category)
-            recs = q.all()
-            best: float | None = None
-            for r in recs:
-                val = r.protein_per_100g
-                if val is None:
-                    continue
-                if r.unit_id == inp.unit_id:
-                    best = val
-                    break
-                if best is None:
-                    best = val
-            return best
-        finally:
-            db.close()
+    @staticmethod
+    def _guideline_value(
+        inp: RecommendationInput, guidelines: tuple[Guideline, ...], field: str
+    ) -> Any:
+        """First non-null field of the matching guidelines; a unit-specific row wins over shared ones."""
+        best = None
+        for g in guidelines:
+            if inp.unit_id and g.unit_id is not None and g.unit_id != inp.unit_id:
+                continue
+            if inp.category and g.category != inp.category:
+                continue
+            val = getattr(g, field)
+            if val is None:
+                continue
+            if g.unit_id == inp.unit_id:
+                return val
+            if best is None:
+                best = val
+        return best
+
+    @staticmethod
+    def _history_mean(values: list[float]) -> tuple[float | None, int]:
+        """Trimmed mean (10% per tail from 5 points) of sorted history values, and the sample size."""
+        sample_size = len(values)
+        if sample_size < MIN_HISTORY_POINTS:
+            return None, sample_size
+        trimmed = values
+        if sample_size >= 5:
+            k = max(1, int(0.1 * sample_size))
+            trimmed = values[k : sample_size - k] if sample_size - 2 * k > 0 else values
+        mean_val: float | None = (sum(trimmed) / len(trimmed)) if trimmed else None
+        return mean_val, sample_size
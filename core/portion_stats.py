@@ -0,0 +1,442 @@
+"""Maintained statistics behind portion recommendations.
+
+PortionRecommendationService blends a guideline baseline with the served-g-per-guest history of
+the last HISTORY_DAYS days. Instead of reading every ServiceMetric row in that window (and the
+guideline rows twice) per call, it reads:
+
+ - ``service_metric_stats``: one row per (tenant, unit, scope, key) holding count, sum and the
+   most recent MAX_SAMPLES samples inside the window (a sliding reservoir the trimmed mean is
+   taken from). ServiceMetricsService.ingest merges its batch into the rows it touches in the
+   same transaction, building any row that does not exist yet. A missing row, or one whose
+   built_at is older than PORTION_STATS_MAX_AGE_S seconds (default 86400), is rebuilt from
+   service_metrics when first read, on its own session. A rebuild never replaces a row an
+   ingest wrote after the rebuild read it: missing rows are inserted only if still missing,
+   expired rows only replaced while built_at is unchanged (ingest bumps it).
+ - a safety net engine listener: any other write to service_metrics (ORM, raw SQL, the
+   migration 0018 dedupe) that changes rows drops the written tenants' stats rows inside that
+   same transaction (every tenant's when the statement does not say), so stats never outlive
+   the rows they were built from.
+ - a per-tenant cache of guideline rows (PORTION_GUIDELINE_CACHE_TTL seconds, default 60),
+   invalidated whenever SQL on the engine writes to portion_guidelines.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from collections.abc import Callable, Iterable
+from datetime import UTC, date, datetime, timedelta
+from typing import Any, NamedTuple, cast
+
+from sqlalchemy import Table, event, inspect, tuple_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import PortionGuideline, ServiceMetric, ServiceMetricStat
+from .site_cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+HISTORY_DAYS = 120
+# Samples kept per stats row; older ones inside the window are evicted first
+MAX_SAMPLES = 1024
+# Execution option ingest puts on its service_metrics writes: it maintains the stats itself
+MAINTAINED = {"service_metric_stats": "maintained"}
+_KEY_CHUNK = 300
+_WRITE_VERBS = ("insert", "update", "delete", "replace")
+_METRICS_TABLE = re.compile(r"\bservice_metrics\b")
+_GUIDELINES_TABLE = re.compile(r"\bportion_guidelines\b")
+# connection.info key: tenants of the ServiceMetric rows the ORM is flushing
+_FLUSH_TENANTS = "service_metrics_flush_tenants"
+
+# (unit_id or 0 for all units, scope, scope_key)
+StatKey = tuple[int, str, str]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+max_age_s = _env_float("PORTION_STATS_MAX_AGE_S", 86400.0)
+guidelines = TTLCache(maxsize=1024, ttl=_env_float("PORTION_GUIDELINE_CACHE_TTL", 60.0))
+
+
+def stat_key(unit_id: int | None, dish_id: int | None, category: str | None) -> StatKey:
+    """Stats row a recommendation reads: the dish when given, else the category, else everything."""
+    unit = int(unit_id) if unit_id else 0
+    if dish_id is not None:
+        return (unit, "dish", str(dish_id))
+    if category is not None:
+        return (unit, "category", category)
+    return (unit, "all", "")
+
+
+def _metric_keys(unit_id: int, dish_id: int | None, category: str | None) -> list[StatKey]:
+    keys: list[StatKey] = []
+    for unit in {int(unit_id), 0}:
+        keys.append((unit, "all", ""))
+        if dish_id is not None:
+            keys.append((unit, "dish", str(dish_id)))
+        if category is not None:
+            keys.append((unit, "category", category))
+    return keys
+
+
+def _sample_id(unit_id: int, day: str, meal: str, dish_id: int | None, category: str | None) -> str:
+    # Natural key of the metric row, so a re-ingested row replaces its sample
+    return f"{unit_id}|{day}|{meal}|{'' if dish_id is None else dish_id}|{category or ''}"
+
+
+def _since() -> str:
+    return (date.today() - timedelta(days=HISTORY_DAYS)).isoformat()
+
+
+def _merge(
+    samples: dict[str, list[Any]], updates: dict[str, tuple[str, float | None]], since: str
+) -> dict[str, list[Any]]:
+    out = {sid: s for sid, s in samples.items() if s[0] >= since}
+    for sid, (day, value) in updates.items():
+        if value is None or day < since:
+            out.pop(sid, None)
+        else:
+            out[sid] = [day, float(value)]
+    if len(out) > MAX_SAMPLES:
+        newest = sorted(out.items(), key=lambda kv: kv[1][0], reverse=True)[:MAX_SAMPLES]
+        out = dict(newest)
+    return out
+
+
+def _ensure_table(db) -> None:
+    # Migration 0019 creates the table; SQLite dev databases get it on first use
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    from .db import ensure_schema
+
+    ensure_schema(
+        "service_metric_stats",
+        lambda: cast(Table, ServiceMetricStat.__table__).create(bind, checkfirst=True),
+    )
+
+
+def _load_rows(db, tenant_id: int, keys: list[StatKey], for_update: bool = False) -> list[ServiceMetricStat]:
+    cols = tuple_(ServiceMetricStat.unit_id, ServiceMetricStat.scope, ServiceMetricStat.scope_key)
+    out: list[ServiceMetricStat] = []
+    for i in range(0, len(keys), _KEY_CHUNK):
+        q = db.query(ServiceMetricStat).filter(
+            ServiceMetricStat.tenant_id == tenant_id, cols.in_(keys[i : i + _KEY_CHUNK])
+        )
+        if for_update:
+            q = q.with_for_update()
+        out.extend(q.all())
+    return out
+
+
+def record(db, tenant_id: int, rows: Iterable[dict[str, Any]]) -> int:
+    """Merge normalized, just-upserted metric rows into the stats rows of their keys.
+
+    Runs in the caller's transaction (the caller commits). Keys without a stats row get one
+    built from service_metrics here, which already holds these rows; leaving them to history()
+    could let a rebuild that read service_metrics before this transaction committed save
+    samples without them. Returns the number of stats rows written.
+    """
+    updates: dict[StatKey, dict[str, tuple[str, float | None]]] = {}
+    for m in rows:
+        day = m["date"].isoformat()
+        sid = _sample_id(m["unit_id"], day, m["meal"], m["dish_id"], m["category"])
+        for key in _metric_keys(m["unit_id"], m["dish_id"], m["category"]):
+            updates.setdefault(key, {})[sid] = (day, m.get("served_g_per_guest"))
+    if not updates:
+        return 0
+    _ensure_table(db)
+    since = _since()
+    stats = _load_rows(db, tenant_id, list(updates), for_update=True)
+    now = datetime.now(UTC)
+    for st in stats:
+        _store(st, _merge(st.samples or {}, updates[(st.unit_id, st.scope, st.scope_key)], since))
+        st.built_at = now
+    have = {(st.unit_id, st.scope, st.scope_key) for st in stats}
+    missing = [k for k in updates if k not in have]
+    if missing:
+        _save(db, tenant_id, _build(db, tenant_id, missing, since), replace=True)
+    return len(stats) + len(missing)
+
+
+def _store(st: ServiceMetricStat, samples: dict[str, list[Any]]) -> None:
+    st.samples = samples
+    st.sample_count = len(samples)
+    st.sample_sum = sum(s[1] for s in samples.values())
+
+
+def _expired(st: ServiceMetricStat, now: datetime) -> bool:
+    built = st.built_at.replace(tzinfo=None) if st.built_at else None
+    return built is None or (now - built).total_seconds() > max_age_s
+
+
+def _build(db, tenant_id: int, keys: list[StatKey], since: str) -> dict[StatKey, dict[str, list[Any]]]:
+    """Samples for keys straight from service_metrics, in one query."""
+    q = db.query(
+        ServiceMetric.unit_id,
+        ServiceMetric.date,
+        ServiceMetric.meal,
+        ServiceMetric.dish_id,
+        ServiceMetric.category,
+        ServiceMetric.served_g_per_guest,
+    ).filter(
+        ServiceMetric.tenant_id == tenant_id,
+        ServiceMetric.date >= date.fromisoformat(since),
+        ServiceMetric.served_g_per_guest.isnot(None),
+    )
+    units = {k[0] for k in keys}
+    if 0 not in units:
+        q = q.filter(ServiceMetric.unit_id.in_(units))
+    built: dict[StatKey, dict[str, tuple[str, float | None]]] = {k: {} for k in keys}
+    for m in q:
+        day = m.date.isoformat()
+        sid = _sample_id(m.unit_id, day, m.meal, m.dish_id, m.category)
+        for key in _metric_keys(m.unit_id, m.dish_id, m.category):
+            if key in built:
+                built[key][sid] = (day, m.served_g_per_guest)
+    return {k: _merge({}, updates, since) for k, updates in built.items()}
+
+
+def _save(
+    db, tenant_id: int, built: dict[StatKey, dict[str, list[Any]]], replace: bool
+) -> None:
+    """Insert stats rows for built; an existing row is replaced only when replace is set."""
+    insert_fn: Callable[..., Any]
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        insert_fn = pg_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        insert_fn = sqlite_insert
+    now = datetime.now(UTC)
+    values = [
+        {
+            "tenant_id": tenant_id,
+            "unit_id": unit,
+            "scope": scope,
+            "scope_key": scope_key,
+            "sample_count": len(samples),
+            "sample_sum": sum(s[1] for s in samples.values()),
+            "samples": samples,
+            "built_at": now,
+        }
+        for (unit, scope, scope_key), samples in built.items()
+    ]
+    index = ["tenant_id", "unit_id", "scope", "scope_key"]
+    for i in range(0, len(values), _KEY_CHUNK):
+        stmt: Any = insert_fn(ServiceMetricStat).values(values[i : i + _KEY_CHUNK])
+        if replace:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index,
+                set_={
+                    f: getattr(stmt.excluded, f)
+                    for f in ("sample_count", "sample_sum", "samples", "built_at")
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index)
+        db.execute(stmt)
+
+
+def _rebuild(
+    tenant_id: int, keys: list[StatKey], expired: dict[StatKey, datetime], since: str
+) -> dict[StatKey, dict[str, list[Any]]]:
+    """Build keys from service_metrics and save them on an isolated session.
+
+    expired maps keys that have a stats row to the built_at read with it. Rows an ingest
+    created or merged into since then are kept: they already hold everything this build saw.
+    A failed save is logged; the built samples are still returned.
+    """
+    from .db import get_new_session
+
+    db = get_new_session()
+    try:
+        built = _build(db, tenant_id, keys, since)
+        try:
+            _save(db, tenant_id, {k: v for k, v in built.items() if k not in expired}, replace=False)
+            now = datetime.now(UTC)
+            for (unit, scope, scope_key), was in expired.items():
+                samples = built[(unit, scope, scope_key)]
+                db.execute(
+                    update(ServiceMetricStat)
+                    .where(
+                        ServiceMetricStat.tenant_id == tenant_id,
+                        ServiceMetricStat.unit_id == unit,
+                        ServiceMetricStat.scope == scope,
+                        ServiceMetricStat.scope_key == scope_key,
+                        ServiceMetricStat.built_at == was,
+                    )
+                    .values(
+                        sample_count=len(samples),
+                        sample_sum=sum(s[1] for s in samples.values()),
+                        samples=samples,
+                        built_at=now,
+                    )
+                )
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            log.warning("portion stats for tenant %s could not be saved", tenant_id, exc_info=True)
+        return built
+    finally:
+        db.close()
+
+
+def history(db, tenant_id: int, keys: Iterable[StatKey]) -> dict[StatKey, list[float]]:
+    """Sorted in-window served-g-per-guest samples for each key.
+
+    Reads all keys in one query on db. Missing or expired stats rows are rebuilt together from
+    service_metrics (one more query) and saved on a separate session, so db's transaction is
+    left alone.
+    """
+    wanted = list(dict.fromkeys(keys))
+    if not wanted:
+        return {}
+    _ensure_table(db)
+    since = _since()
+    now = datetime.now(UTC).replace(tzinfo=None)
+    found: dict[StatKey, dict[str, list[Any]]] = {}
+    expired: dict[StatKey, datetime] = {}
+    for st in _load_rows(db, tenant_id, wanted):
+        key = (st.unit_id, st.scope, st.scope_key)
+        if _expired(st, now):
+            expired[key] = st.built_at
+        else:
+            found[key] = st.samples or {}
+    missing = [k for k in wanted if k not in found]
+    if missing:
+        found.update(_rebuild(tenant_id, missing, expired, since))
+    return {k: sorted(s[1] for s in found[k].values() if s[0] >= since) for k in wanted}
+
+
+class Guideline(NamedTuple):
+    unit_id: int | None
+    category: str
+    baseline_g_per_guest: int | None
+    protein_per_100g: float | None
+
+
+def guideline_rows(db, tenant_id: int) -> tuple[Guideline, ...]:
+    """A tenant's guideline rows in id order, from the per-tenant cache."""
+
+    def _load() -> tuple[Guideline, ...]:
+        q = (
+            db.query(PortionGuideline)
+            .filter(PortionGuideline.tenant_id == tenant_id)
+            .order_by(PortionGuideline.id)
+        )
+        return tuple(
+            Guideline(g.unit_id, g.category, g.baseline_g_per_guest, g.protein_per_100g) for g in q
+        )
+
+    return guidelines.get_or_load(tenant_id, _load)
+
+
+def _touches(statement: str, table: re.Pattern[str]) -> bool:
+    head = statement.lstrip()[:7].lower()
+    return head.startswith(_WRITE_VERBS) and table.search(statement.lower()) is not None
+
+
+def _changed_rows(cursor, statement: str) -> bool:
+    # sqlite3 only reports rowcount for RETURNING statements once their rows are fetched
+    return cursor.rowcount != 0 or "returning" in statement.lower()
+
+
+def _written_tenants(conn, context) -> set[int] | None:
+    """Tenants a service_metrics write touched; None when the statement does not tell."""
+    flushing = conn.info.get(_FLUSH_TENANTS)
+    if flushing:
+        return set(flushing)
+    params = getattr(context, "compiled_parameters", None) if context is not None else None
+    if not params:
+        return None
+    tenants: set[int] = set()
+    for p in params:
+        # INSERT/SET column, or an ORM/Core WHERE service_metrics.tenant_id = :tenant_id_1
+        tid = p.get("tenant_id", p.get("tenant_id_1"))
+        if tid is None:
+            return None
+        tenants.add(int(tid))
+    return tenants
+
+
+def _drop_stats(conn, tenants: set[int] | None) -> None:
+    # Own DBAPI cursor: the triggering statement's cursor may still hold RETURNING rows
+    sql = "DELETE FROM service_metric_stats"
+    if tenants is not None:
+        sql += f" WHERE tenant_id IN ({', '.join(str(int(t)) for t in sorted(tenants))})"
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(sql)
+    except Exception:  # pragma: no cover - SQLite database that never created the table
+        pass
+    finally:
+        cursor.close()
+
+
+def _note_flush_tenant(_mapper, connection, target: ServiceMetric) -> None:
+    # before_insert/update/delete fire for the whole flush batch before its statements run
+    tenants = connection.info.setdefault(_FLUSH_TENANTS, set())
+    tenants.add(target.tenant_id)
+    tenants.update(inspect(target).attrs.tenant_id.history.deleted or ())
+
+
+def _end_flush(_mapper, connection, _target: ServiceMetric) -> None:
+    connection.info.pop(_FLUSH_TENANTS, None)
+
+
+for _name in ("before_insert", "before_update", "before_delete"):
+    event.listen(ServiceMetric, _name, _note_flush_tenant)
+for _name in ("after_insert", "after_update", "after_delete"):
+    event.listen(ServiceMetric, _name, _end_flush)
+
+
+def install_invalidation_listener(engine: Engine) -> None:
+    """Drop stats on out-of-band service_metrics writes and cached guidelines on guideline writes."""
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _on_execute(conn, cursor, statement, _params, context, _executemany) -> None:
+        statement = statement or ""
+        if _touches(statement, _GUIDELINES_TABLE):
+            conn.info["portion_guidelines_dirty"] = True
+            guidelines.invalidate()
+        if _touches(statement, _METRICS_TABLE) and _changed_rows(cursor, statement):
+            options = context.execution_options if context is not None else {}
+            if options.get("service_metric_stats") != MAINTAINED["service_metric_stats"]:
+                _drop_stats(conn, _written_tenants(conn, context))
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn) -> None:
+        conn.info.pop(_FLUSH_TENANTS, None)
+        if conn.info.pop("portion_guidelines_dirty", False):
+            guidelines.invalidate()
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn) -> None:
+        conn.info.pop(_FLUSH_TENANTS, None)
+        if conn.info.pop("portion_guidelines_dirty", False):
+            guidelines.invalidate()
+
+
+__all__ = [
+    "HISTORY_DAYS",
+    "MAX_SAMPLES",
+    "MAINTAINED",
+    "StatKey",
+    "Guideline",
+    "stat_key",
+    "record",
+    "history",
+    "guideline_rows",
+    "guidelines",
+    "install_invalidation_listener",
+]
@@ -6,10 +6,11 @@ from flask import request
 from werkzeug.wrappers.response import Response
 
 from .http_errors import too_many_requests
+from .rate_limit_store import BucketState, BucketStore
 
 # In-memory simple rate limiter (per-process). For production scale: replace with Redis.
-# Key: (tenant_id, user_id, bucket, minute_epoch)
-_store: dict[tuple[int | None, int | None, str, int], int] = {}
+# Key: (tenant_id, user_id, bucket); state a=minute_epoch, b=count (bounded, see rate_limit_store)
+_store = BucketStore()
 
 
 class RateLimitExceeded(Exception):
@@ -45,11 +46,16 @@ def allow(
             limit_per_minute = min(limit_per_minute, forced_limit)
         except Exception:
             limit_per_minute = min(limit_per_minute, 3)
-    now = int(time.time())
-    minute = now // 60
-    key = (tenant_id, user_id, bucket, minute)
-    cnt = _store.get(key, 0) + 1
-    _store[key] = cnt
+    minute = int(time.time()) // 60
+
+    def _hit(state: BucketState, _now: float) -> int:
+        if state.a != minute:
+            state.a = float(minute)
+            state.b = 0.0
+        state.b += 1.0
+        return int(state.b)
+
+    cnt = _store.mutate((tenant_id, user_id, bucket), 60, _hit)
     if cnt > limit_per_minute:
         raise RateLimitExceeded(bucket, limit_per_minute)
 
@@ -57,7 +63,9 @@ def allow(
 def remaining(
     tenant_id: int | None, user_id: int | None, bucket: str, limit_per_minute: int
 ) -> int:
-    now = int(time.time())
-    minute = now // 60
-    key = (tenant_id, user_id, bucket, minute)
-    return max(0, limit_per_minute - _store.get(key, 0))
+    minute = int(time.time()) // 60
+
+    def _count(state: BucketState | None, _now: float) -> int:
+        return int(state.b) if state is not None and state.a == minute else 0
+
+    return max(0, limit_per_minute - _store.peek((tenant_id, user_id, bucket), _count))
@@ -0,0 +1,152 @@
+"""Bounded in-process bucket store shared by the memory rate limiters.
+
+Used by core/rate_limit.py (per-minute counters), MemoryRateLimiter (fixed window) and
+MemoryTokenBucketRateLimiter. Previously each kept a plain dict keyed per tenant/user/bucket
+(and per minute for rate_limit.py) that was never pruned, so a long-lived worker grew without
+bound and concurrent gthread workers could race on read-modify-write.
+
+Design:
+ - keys are hashed onto N stripes (power of two); each stripe has its own lock and an
+   OrderedDict in touch order, so contention is per stripe rather than global
+ - bucket state is a small __slots__ record of floats (a, b, c) plus an expiry; the limiter
+   decides what they mean (window start + count, tokens + last refill, leased permits ...)
+ - each touch sets expires = now + ttl and moves the key to the back; inserts first drop
+   expired keys from the front, then evict least-recently-touched keys past the stripe cap
+   (RATE_LIMIT_MAX_KEYS / stripes), so memory stays flat under a flood of distinct keys
+
+An entry is only dropped once its window has passed (fixed window) or its bucket has refilled
+to capacity (token bucket), so expiry never changes a limiter decision; cap evictions can,
+and are counted in stats()["evictions"].
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+TimeFn = Callable[[], float]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class BucketState:
+    """Limiter-defined floats; fresh=True until the first mutation returns."""
+
+    __slots__ = ("a", "b", "c", "expires", "fresh")
+
+    def __init__(self) -> None:
+        self.a = 0.0
+        self.b = 0.0
+        self.c = 0.0
+        self.expires = 0.0
+        self.fresh = True
+
+
+class _Stripe:
+    __slots__ = ("lock", "entries", "evictions", "expired")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, BucketState] = OrderedDict()
+        self.evictions = 0
+        self.expired = 0
+
+
+class BucketStore:
+    def __init__(
+        self,
+        max_keys: int | None = None,
+        stripes: int | None = None,
+        now_func: TimeFn | None = None,
+    ) -> None:
+        max_keys = max_keys if max_keys is not None else _env_int("RATE_LIMIT_MAX_KEYS", 100_000)
+        stripes = stripes if stripes is not None else _env_int("RATE_LIMIT_STORE_STRIPES", 16)
+        n = 1
+        while n < max(1, stripes):
+            n <<= 1
+        self._mask = n - 1
+        self._stripes = tuple(_Stripe() for _ in range(n))
+        self.max_keys = max(1, max_keys)
+        self._cap = max(1, -(-self.max_keys // n))
+        # Late-bound so tests that monkeypatch time.time also steer expiry
+        self._now: TimeFn = now_func or (lambda: time.time())
+
+    def _stripe(self, key: Hashable) -> _Stripe:
+        return self._stripes[hash(key) & self._mask]
+
+    def _make_room(self, stripe: _Stripe, now: float) -> None:
+        entries = stripe.entries
+        while entries:
+            _k, oldest = next(iter(entries.items()))
+            if oldest.expires > now:
+                break
+            entries.popitem(last=False)
+            stripe.expired += 1
+        while len(entries) >= self._cap:
+            entries.popitem(last=False)
+            stripe.evictions += 1
+
+    def mutate(self, key: Hashable, ttl: float, fn: Callable[[BucketState, float], T]) -> T:
+        """Run fn(state, now) under the key's stripe lock and keep the state for ttl seconds.
+
+        A missing or expired key is handed to fn as a fresh BucketState (state.fresh is True).
+        """
+        stripe = self._stripe(key)
+        now = self._now()
+        with stripe.lock:
+            entries = stripe.entries
+            state = entries.get(key)
+            if state is not None and state.expires <= now:
+                del entries[key]
+                stripe.expired += 1
+                state = None
+            if state is None:
+                self._make_room(stripe, now)
+                state = BucketState()
+                entries[key] = state
+            else:
+                entries.move_to_end(key)
+            result = fn(state, now)
+            state.fresh = False
+            state.expires = now + ttl
+            return result
+
+    def peek(self, key: Hashable, fn: Callable[[BucketState | None, float], T]) -> T:
+        """Read-only view: fn receives the live state (None when missing/expired)."""
+        stripe = self._stripe(key)
+        now = self._now()
+        with stripe.lock:
+            state = stripe.entries.get(key)
+            if state is not None and state.expires <= now:
+                state = None
+            return fn(state, now)
+
+    def clear(self) -> None:
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+
+    def __len__(self) -> int:
+        return sum(len(s.entries) for s in self._stripes)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "keys": len(self),
+            "max_keys": self.max_keys,
+            "stripes": len(self._stripes),
+            "evictions": sum(s.evictions for s in self._stripes),
+            "expired": sum(s.expired for s in self._stripes),
+        }
+
+
+__all__ = ["BucketState", "BucketStore"]
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import os
 import time
-from typing import Literal, Protocol, runtime_checkable
+from typing import Literal, NamedTuple, Protocol, runtime_checkable
 
 
 class RateLimitError(Exception):
@@ -15,10 +15,37 @@ class RateLimitError(Exception):
         limit: Optional symbolic limit name.
     """
 
-    def __init__(self, message: str, retry_after: int, limit: str | None = None) -> None:
+    def __init__(
+        self,
+        message: str,
+        retry_after: int,
+        limit: str | None = None,
+        remaining: int | None = None,
+    ) -> None:
         super().__init__(message)
         self.retry_after = retry_after
         self.limit = limit
+        self.remaining = remaining
+
+
+class RateLimitDecision(NamedTuple):
+    """Outcome of a single limiter call: allowed, tokens/hits left, seconds until next permit."""
+
+    allowed: bool
+    remaining: int
+    retry_after: int
+
+
+class RateLimitGrant(NamedTuple):
+    """Batch acquisition result: permits granted (0..want) and how long they stay valid.
+
+    ttl_ms is the window remainder for fixed windows; 0 when the backend has no natural bound.
+    """
+
+    granted: int
+    remaining: int
+    retry_after: int
+    ttl_ms: int
 
 
 @runtime_checkable
@@ -34,6 +61,14 @@ class TokenBucketRateLimiter(RateLimiter, Protocol):  # pragma: no cover
     def retry_after_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> int: ...
 
 
+# Single-call interface: one backend round trip yields allow + remaining + retry_after (duck typed)
+@runtime_checkable
+class DecidingRateLimiter(RateLimiter, Protocol):  # pragma: no cover
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision: ...
+
+
 class _EnvConfig:
     backend: str
     redis_url: str | None
@@ -66,11 +101,14 @@ def _build_fixed() -> RateLimiter:
         return MemoryRateLimiter()
     if _cfg.backend == "redis":
         try:
+            from .rate_limiter_lease import wrap_with_lease
             from .rate_limiter_redis import (
                 RedisRateLimiter,  # local import to keep optional dependency boundary
             )
 
-            return RedisRateLimiter(_cfg.redis_url or "redis://localhost:6379/0", _cfg.prefix)
+            return wrap_with_lease(
+                RedisRateLimiter(_cfg.redis_url or "redis://localhost:6379/0", _cfg.prefix)
+            )
         except Exception:
             # Fallback to noop silently; production logging added in app_factory wiring.
             from .rate_limiter_noop import NoopRateLimiter
@@ -85,10 +123,12 @@ def _build_token_bucket() -> RateLimiter:
     # Choose memory or redis token bucket based on same backend env for consistency; fallback to memory if redis unsupported.
     if _cfg.backend == "redis":
         try:
+            from .rate_limiter_lease import wrap_with_lease
             from .rate_limiter_token_bucket_redis import RedisTokenBucketRateLimiter  # type: ignore
 
-            return RedisTokenBucketRateLimiter(
-                _cfg.redis_url or "redis://localhost:6379/0", _cfg.prefix
+            # Local lease tier (RATE_LIMIT_LEASE_*) keeps high-quota buckets off Redis per request
+            return wrap_with_lease(
+                RedisTokenBucketRateLimiter(_cfg.redis_url or "redis://localhost:6379/0", _cfg.prefix)
             )
         except Exception:
             pass
@@ -127,7 +167,10 @@ def window_start(epoch: float | None = None, size: int = 60) -> int:
 
 
 __all__ = [
+    "DecidingRateLimiter",
     "RateLimiter",
+    "RateLimitDecision",
+    "RateLimitGrant",
     "RateLimitError",
     "get_rate_limiter",
     "window_start",
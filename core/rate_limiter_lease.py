@@ -0,0 +1,165 @@
+"""Local lease tier in front of the Redis limiters.
+
+Each worker takes permits from Redis in batches (acquire(want=batch)) and spends them from an
+in-process BucketStore, so a caller far under quota costs one Redis call per batch instead of
+one per request. A worker goes back to Redis when its lease is used up or within
+_RENEW_MARGIN_MS of expiring:
+ - fixed window: the lease expires with the window it was taken from (the script's PTTL, and
+   never later than the end of the aligned window). A refill that straddles a window boundary
+   keeps no lease, so permits counted in window N are never spent in window N+1.
+ - token bucket: the lease is valid for RATE_LIMIT_LEASE_TTL_MS (default 1000)
+
+Accuracy bound: batch = min(RATE_LIMIT_LEASE_MAX, floor(quota * RATE_LIMIT_LEASE_ACCURACY)).
+Leased permits are already counted in Redis and die with their window, so a fixed window never
+admits more than quota; the error is early 429s while up to `batch` unused permits sit with
+each other worker. Concurrent refills of one key add up instead of overwriting each other. For the
+token bucket a lease can be spent after Redis has refilled, so the cluster may overshoot the
+bucket by at most workers * batch. Limits whose batch would be < 2 bypass the tier entirely,
+which keeps low-quota limits (login, admin writes) exact.
+
+Backend errors from Redis propagate exactly as without the tier.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .rate_limit_store import BucketState, BucketStore
+from .rate_limiter import RateLimitDecision, RateLimiter, window_start
+
+TimeFn = Callable[[], float]
+
+_RENEW_MARGIN_MS = 50
+
+
+class _LeaseConfig:
+    accuracy: float
+    max_batch: int
+    ttl_ms: int
+
+    def __init__(self) -> None:
+        self.reload()
+
+    def reload(self) -> None:
+        try:
+            self.accuracy = float(os.getenv("RATE_LIMIT_LEASE_ACCURACY", "0.05"))
+        except ValueError:
+            self.accuracy = 0.05
+        try:
+            self.max_batch = int(os.getenv("RATE_LIMIT_LEASE_MAX", "50"))
+        except ValueError:
+            self.max_batch = 50
+        try:
+            self.ttl_ms = int(os.getenv("RATE_LIMIT_LEASE_TTL_MS", "1000"))
+        except ValueError:
+            self.ttl_ms = 1000
+
+    @property
+    def enabled(self) -> bool:
+        return self.accuracy > 0 and self.max_batch > 1 and self.ttl_ms > _RENEW_MARGIN_MS
+
+
+class LeasedRateLimiter(RateLimiter):
+    """Wraps a limiter with acquire(); state a=permits left, b=lease expiry (epoch s), c=remaining."""
+
+    def __init__(
+        self,
+        inner: Any,
+        config: _LeaseConfig | None = None,
+        now_func: TimeFn | None = None,
+    ) -> None:
+        self._inner = inner
+        self._cfg = config or _LeaseConfig()
+        self._now: TimeFn = now_func or (lambda: time.time())
+        self._leases = BucketStore(now_func=self._now)
+        self.redis_calls = 0
+
+    @property
+    def inner(self) -> Any:
+        return self._inner
+
+    def batch_size(self, quota: int) -> int:
+        return max(1, min(self._cfg.max_batch, math.floor(quota * self._cfg.accuracy)))
+
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision:
+        batch = self.batch_size(quota)
+        if batch < 2:
+            self.redis_calls += 1
+            return self._inner.decide(key, quota, per_seconds, burst)
+        lkey = (key, quota, per_seconds, burst)
+        ttl_s = max(per_seconds, self._cfg.ttl_ms / 1000.0)
+
+        def _spend(st: BucketState, now: float) -> RateLimitDecision | None:
+            if not st.fresh and st.a >= 1.0 and now < st.b:
+                st.a -= 1.0
+                return RateLimitDecision(True, int(st.c + st.a), 0)
+            return None
+
+        local = self._leases.mutate(lkey, ttl_s, _spend)
+        if local is not None:
+            return local
+        # Lease exhausted or about to expire: one Redis call refills it (outside the stripe lock)
+        self.redis_calls += 1
+        window = window_start(self._now(), size=per_seconds)
+        grant = self._inner.acquire(key, quota, per_seconds, burst, want=batch)
+        if grant.granted <= 0:
+            return RateLimitDecision(False, 0, grant.retry_after)
+        left = grant.granted - 1
+        if grant.ttl_ms > 0:
+            # Fixed window: the permits belong to the window Redis counted them in
+            window_end = float(window + per_seconds)
+            if window_start(self._now(), size=per_seconds) != window:
+                left = 0  # the window may have turned during the call: keep nothing
+            valid_ms = grant.ttl_ms
+        else:
+            window_end = math.inf
+            valid_ms = self._cfg.ttl_ms
+        if left <= 0:
+            return RateLimitDecision(True, grant.remaining, 0)
+
+        def _store(st: BucketState, now: float) -> None:
+            expires = min(now + max(0, valid_ms - _RENEW_MARGIN_MS) / 1000.0, window_end - _RENEW_MARGIN_MS / 1000.0)
+            if not st.fresh and st.a >= 1.0 and now < st.b:
+                # Another thread refilled meanwhile: keep both leases, bounded by the earlier expiry
+                st.a += float(left)
+                st.b = min(st.b, expires)
+                st.c = min(st.c, float(grant.remaining))
+                return
+            st.a = float(left)
+            st.b = expires
+            st.c = float(grant.remaining)
+
+        self._leases.mutate(lkey, ttl_s, _store)
+        return RateLimitDecision(True, grant.remaining + left, 0)
+
+    def allow(self, key: str, quota: int, per_seconds: int) -> bool:
+        return self.decide(key, quota, per_seconds).allowed
+
+    def retry_after(self, key: str, per_seconds: int) -> int:
+        return self._inner.retry_after(key, per_seconds)
+
+    def allow_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> bool:
+        return self.decide(key, quota, per_seconds, burst).allowed
+
+    def retry_after_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> int:
+        fn = getattr(self._inner, "retry_after_bucket", None)
+        if fn is None:
+            return self._inner.retry_after(key, per_seconds)
+        return fn(key, quota, per_seconds, burst)
+
+
+def wrap_with_lease(inner: Any) -> Any:
+    """Return inner behind a lease tier when enabled via env and inner supports acquire()."""
+    cfg = _LeaseConfig()
+    if not cfg.enabled or not callable(getattr(inner, "acquire", None)):
+        return inner
+    return LeasedRateLimiter(inner, cfg)
+
+
+__all__ = ["LeasedRateLimiter", "wrap_with_lease"]
@@ -1,39 +1,50 @@
 """In-process memory fixed-window rate limiter for tests.
-Not for production (single-process only)."""
+Not for production (single-process only). State lives in a bounded BucketStore."""
 
 from __future__ import annotations
 
 import time
 
-from .rate_limiter import RateLimiter, window_start
+from .rate_limit_store import BucketState, BucketStore
+from .rate_limiter import RateLimitDecision, RateLimiter, window_start
 
 
 class MemoryRateLimiter(RateLimiter):  # type: ignore[misc]
-    def __init__(self) -> None:
-        # key -> (window_start, count)
-        self._buckets: dict[str, tuple[int, int]] = {}
+    def __init__(self, store: BucketStore | None = None) -> None:
+        # key -> state(a=window_start, b=count)
+        self._buckets = store if store is not None else BucketStore()
 
-    def allow(self, key: str, quota: int, per_seconds: int) -> bool:
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision:
         ws = window_start(size=per_seconds)
-        cur = self._buckets.get(key)
-        if cur is None or cur[0] != ws:
-            self._buckets[key] = (ws, 1)
-            return True
-        # same window
-        new_count = cur[1] + 1
-        self._buckets[key] = (ws, new_count)
-        return new_count <= quota
+
+        def _hit(state: BucketState, _now: float) -> RateLimitDecision:
+            if state.a != ws:
+                state.a = float(ws)
+                state.b = 0.0
+            state.b += 1.0
+            count = int(state.b)
+            if count <= quota:
+                return RateLimitDecision(True, quota - count, 0)
+            return RateLimitDecision(False, 0, max(1, ws + per_seconds - int(time.time())))
+
+        return self._buckets.mutate(key, per_seconds, _hit)
+
+    def allow(self, key: str, quota: int, per_seconds: int) -> bool:
+        return self.decide(key, quota, per_seconds).allowed
 
     def retry_after(self, key: str, per_seconds: int) -> int:
-        cur = self._buckets.get(key)
-        if not cur:
-            return 0
-        ws, _ = cur
-        now = int(time.time())
-        end = ws + per_seconds
-        if now >= end:
-            return 0
-        return end - now
+        def _remaining(state: BucketState | None, _now: float) -> int:
+            if state is None:
+                return 0
+            now = int(time.time())
+            end = int(state.a) + per_seconds
+            if now >= end:
+                return 0
+            return end - now
+
+        return self._buckets.peek(key, _remaining)
 
 
 __all__ = ["MemoryRateLimiter"]
@@ -1,48 +1,95 @@
-"""Implement fixed-window limiter using Redis INCR+EXPIRE (set EXPIRE when INCR==1). Provide retry_after via TTL. Handle connection errors by raising a specific BackendInitError."""
+"""Fixed-window limiter on Redis: one Lua call per decision (INCRBY, PEXPIRE on first hit, PTTL).
+
+Window keys expire at the end of their aligned window (window_start + per_seconds), so the
+PTTL in the reply is the window remainder: retry_after and lease lifetimes never reach into
+the next window.
+
+The script returns {count, pttl_ms}; decide() derives allowed/remaining/retry_after from that
+single reply, so a blocked request costs one round trip instead of MULTI + EXPIRE + TTL.
+acquire() takes several permits in the same call (used by the lease tier, rate_limiter_lease).
+Burst has no meaning for a fixed window and is ignored (capacity = quota).
+"""
 
 from __future__ import annotations
 
+import math
+import time
+from collections.abc import Callable
+from typing import Any
+
 try:
     import redis  # type: ignore
 except Exception:  # pragma: no cover
     redis = None  # type: ignore
 
-from .rate_limiter import RateLimiter, window_start
+from .rate_limiter import RateLimitDecision, RateLimiter, RateLimitGrant, window_start
+
+# KEYS[1] = window key, ARGV[1] = ms left in the window, ARGV[2] = permits requested
+FIXED_WINDOW_LUA = """
+local count = redis.call('INCRBY', KEYS[1], ARGV[2])
+local ttl = redis.call('PTTL', KEYS[1])
+if count == tonumber(ARGV[2]) or ttl < 0 then
+  redis.call('PEXPIRE', KEYS[1], ARGV[1])
+  ttl = tonumber(ARGV[1])
+end
+return {count, ttl}
+"""
 
 
 class RedisRateLimiter(RateLimiter):  # type: ignore[misc]
     _PREFIX: str
-    _client: redis.Redis  # type: ignore[name-defined]
+    _client: Any
 
-    def __init__(self, url: str, prefix: str) -> None:
-        if redis is None:
-            raise RuntimeError("redis library not available")
-        self._client = redis.Redis.from_url(url, decode_responses=False)
+    def __init__(
+        self,
+        url: str,
+        prefix: str,
+        client: Any | None = None,
+        now_func: Callable[[], float] | None = None,
+    ) -> None:
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis library not available")
+            client = redis.Redis.from_url(url, decode_responses=False)
+        self._client = client
         self._PREFIX = prefix
+        self._now: Callable[[], float] = now_func or time.time
+        # register_script -> EVALSHA with transparent EVAL/SCRIPT LOAD on NOSCRIPT
+        self._script = client.register_script(FIXED_WINDOW_LUA)
 
-    def _key(self, logical_key: str, per_seconds: int) -> str:
-        ws = window_start(size=per_seconds)
+    def _key(self, logical_key: str, per_seconds: int, ws: int | None = None) -> str:
+        if ws is None:
+            ws = window_start(self._now(), size=per_seconds)
         return f"{self._PREFIX}{logical_key}:{ws}:{per_seconds}"
 
+    def acquire(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None, want: int = 1
+    ) -> RateLimitGrant:
+        now = self._now()
+        ws = window_start(now, size=per_seconds)
+        rk = self._key(key, per_seconds, ws)
+        left_ms = max(1, math.ceil((ws + per_seconds - now) * 1000))
+        count, ttl_ms = self._script(keys=[rk], args=[left_ms, want])
+        count = int(count)
+        granted = max(0, min(want, quota - (count - want)))
+        retry_after = 0 if granted else max(1, math.ceil(int(ttl_ms) / 1000))
+        return RateLimitGrant(granted, max(0, quota - count), retry_after, int(ttl_ms))
+
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision:
+        g = self.acquire(key, quota, per_seconds)
+        return RateLimitDecision(g.granted == 1, g.remaining, g.retry_after)
+
     def allow(self, key: str, quota: int, per_seconds: int) -> bool:
-        rk = self._key(key, per_seconds)
-        pipe = self._client.pipeline(transaction=True)
-        pipe.incr(rk, 1)
-        pipe.ttl(rk)
-        results = pipe.execute()
-        count = int(results[0])
-        ttl = int(results[1])
-        if count == 1 or ttl < 0:
-            # first increment or no ttl yet -> set expire
-            self._client.expire(rk, per_seconds)
-        return count <= quota
+        return self.decide(key, quota, per_seconds).allowed
 
     def retry_after(self, key: str, per_seconds: int) -> int:
         rk = self._key(key, per_seconds)
-        ttl = self._client.ttl(rk)
+        ttl = self._client.pttl(rk)
         if ttl is None or ttl < 0:
             return per_seconds
-        return int(ttl)
+        return max(1, math.ceil(int(ttl) / 1000))
 
 
-__all__ = ["RedisRateLimiter"]
+__all__ = ["FIXED_WINDOW_LUA", "RedisRateLimiter"]
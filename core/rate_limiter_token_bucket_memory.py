@@ -11,66 +11,77 @@ Algorithm:
 - If tokens >= 1: consume 1, allow.
   Else: block, retry_after = ceil((1 - tokens)/refill_rate)
 
-Burst capacity defaults to quota if not explicitly provided to allow a full window burst.
+Burst capacity defaults to quota if not explicitly provided to allow a full window burst;
+decide()/allow_bucket() take the registry burst as capacity.
 
-Time function is injectable for deterministic tests.
+Time function is injectable for deterministic tests. State lives in a bounded BucketStore
+(a=tokens, b=last_refill); a key expires once it would have refilled to capacity, at which
+point it is indistinguishable from a new key.
 """
 
 from __future__ import annotations
 
+import math
 import time
 from collections.abc import Callable
-from dataclasses import dataclass
 
-from .rate_limiter import RateLimiter
+from .rate_limit_store import BucketState, BucketStore
+from .rate_limiter import RateLimitDecision, RateLimiter
 
 TimeFn = Callable[[], float]
 
 
-@dataclass
-class _Bucket:
-    tokens: float
-    last_refill: float
-
-
 class MemoryTokenBucketRateLimiter(RateLimiter):
-    def __init__(self, now_func: TimeFn | None = None) -> None:
-        self._buckets: dict[str, _Bucket] = {}
+    def __init__(self, now_func: TimeFn | None = None, store: BucketStore | None = None) -> None:
         self._now: TimeFn = now_func or time.time
+        self._buckets = store if store is not None else BucketStore(now_func=self._now)
 
-    # We extend the protocol conceptually with burst (capacity). Existing allow signature does not expose burst.
-    # To integrate minimally we allow callers to encode capacity inside key name when needed, but for HTTP integration
-    # we will adapt code to provide a token-bucket specific path. For initial scaffold we accept standard signature
-    # and treat quota as both steady rate and capacity; later integration layer will pass burst via a prefixed key.
-    def allow(
-        self, key: str, quota: int, per_seconds: int
-    ) -> bool:  # uses quota as both rate & capacity
-        capacity = quota
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision:
+        capacity = max(1, burst if burst is not None else quota)  # burst defaults to quota
         refill_rate = quota / per_seconds  # tokens per second
-        now = self._now()
-        b = self._buckets.get(key)
-        if b is None:
-            self._buckets[key] = _Bucket(tokens=float(capacity - 1), last_refill=now)
-            return True
-        # Refill
-        if now > b.last_refill:
-            elapsed = now - b.last_refill
-            new_tokens = min(capacity, b.tokens + elapsed * refill_rate)
-            b.tokens = new_tokens
-            b.last_refill = now
-        if b.tokens >= 1.0:
-            b.tokens -= 1.0
-            return True
-        # Not enough tokens
-        return False
+
+        def _take(b: BucketState, now: float) -> RateLimitDecision:
+            if b.fresh:
+                b.a = float(capacity)  # tokens
+                b.b = now  # last_refill
+            # Refill
+            elif now > b.b:
+                elapsed = now - b.b
+                b.a = min(capacity, b.a + elapsed * refill_rate)
+                b.b = now
+            if b.a >= 1.0:
+                b.a -= 1.0
+                return RateLimitDecision(True, int(b.a), 0)
+            # Not enough tokens
+            return RateLimitDecision(False, 0, max(1, math.ceil((1.0 - b.a) / refill_rate)))
+
+        # Empty -> full takes capacity / refill_rate; after that the key can go
+        return self._buckets.mutate(key, capacity / refill_rate, _take)
+
+    def allow(self, key: str, quota: int, per_seconds: int) -> bool:  # quota as rate & capacity
+        return self.decide(key, quota, per_seconds).allowed
+
+    def allow_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> bool:
+        return self.decide(key, quota, per_seconds, burst).allowed
+
+    def retry_after_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> int:
+        capacity = max(1, burst)
+        refill_rate = quota / per_seconds
+
+        def _wait(b: BucketState | None, now: float) -> int:
+            if b is None:
+                return 0
+            tokens = min(capacity, b.a + max(0.0, now - b.b) * refill_rate)
+            return 0 if tokens >= 1.0 else max(1, math.ceil((1.0 - tokens) / refill_rate))
+
+        return self._buckets.peek(key, _wait)
 
     def retry_after(self, key: str, per_seconds: int) -> int:
-        b = self._buckets.get(key)
-        if b is None:
+        if self._buckets.peek(key, lambda b, _now: b is None):
             return 0
-        # We do not know quota directly (steady rate) here; approximate using observed refill by storing rate in key not implemented yet.
-        # For memory backend tests we will embed rate info into key as key|quota|per, but keep simple fallback for now.
-        # Without rate info, fall back to 1 second.
+        # Rate unknown without quota; callers with limits use decide()/retry_after_bucket()
         return 1
 
 
@@ -1,102 +1,133 @@
 """Redis-backed token bucket implementation.
 
-Atomicity via Lua script to avoid race conditions.
+Atomicity via Lua script to avoid race conditions; every decision is one EVALSHA.
 Key layout: <prefix>tb:<logical_key>
-Value stored as: tokens|last_refill_ms (packed string) or two fields in a hash; we use a simple string for speed.
+Value stored as: tokens:last_refill_ms (packed string); we use a simple string for speed.
 
-Lua responsibilities:
-1. Read current value (if nil: initialize full bucket - 1 token on first consume).
-2. Refill based on elapsed ms.
-3. If tokens >= 1: decrement, store updated state, return {1, tokens_remaining, retry_after_ms=0}
-4. Else: store state (unchanged tokens), return {0, tokens, retry_after_ms_needed}
+Lua contract (KEYS[1] = bucket key):
+  ARGV[1] now_ms, ARGV[2] capacity (burst), ARGV[3] refill rate in tokens per ms,
+  ARGV[4] cost (permits wanted; 0 = peek without consuming or creating the key)
+  -> {granted, floor(tokens_remaining), retry_after_ms}
 
-Retry-after ms = ceil((1 - tokens)/refill_rate) * 1000.
+1. Read current value (if nil: full bucket).
+2. Refill based on elapsed ms, capped at capacity.
+3. granted = min(cost, floor(tokens)); subtract it (cost > 1 is a lease, see rate_limiter_lease).
+4. If nothing was granted and tokens < 1: retry_after_ms = ceil((1 - tokens) / rate).
+5. Persist with PX = time to refill from empty to capacity; an expired key equals a full bucket.
+
+Capacity is the registry `burst` (defaults to quota); steady rate is quota / per_seconds.
 """
 
 from __future__ import annotations
 
+import math
 import time
 from collections.abc import Callable
+from typing import Any
 
 try:  # pragma: no cover - optional dependency
     import redis  # type: ignore
 except Exception:  # pragma: no cover
     redis = None  # type: ignore
 
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimitDecision, RateLimiter, RateLimitGrant
 
-_LUA = """
+TOKEN_BUCKET_LUA = """
 local key = KEYS[1]
 local now_ms = tonumber(ARGV[1])
 local capacity = tonumber(ARGV[2])
-local refill_rate = tonumber(ARGV[3])  -- tokens per ms * 1000 scaled
-local per_ms = tonumber(ARGV[4])
--- fetch existing
+local rate = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
 local raw = redis.call('GET', key)
-local tokens
-local last_ms
-if not raw then
-  tokens = capacity
-  last_ms = now_ms
-else
+local tokens = capacity
+local last_ms = now_ms
+if raw then
   local sep = string.find(raw, ':')
-  tokens = tonumber(string.sub(raw, 1, sep-1))
-  last_ms = tonumber(string.sub(raw, sep+1))
-  if not tokens or not last_ms then
-    tokens = capacity
-    last_ms = now_ms
+  if sep then
+    tokens = tonumber(string.sub(raw, 1, sep-1)) or capacity
+    last_ms = tonumber(string.sub(raw, sep+1)) or now_ms
   end
 end
--- refill
 if now_ms > last_ms then
-  local elapsed = now_ms - last_ms
-  local add = elapsed * refill_rate / 1000.0  -- since refill_rate expressed in tokens/sec *1000 upstream
-  tokens = math.min(capacity, tokens + add)
+  tokens = math.min(capacity, tokens + (now_ms - last_ms) * rate)
   last_ms = now_ms
 end
-local allowed = 0
+local granted = 0
 local retry_after_ms = 0
-if tokens >= 1.0 then
-  tokens = tokens - 1.0
-  allowed = 1
-else
-  local deficit = 1.0 - tokens
-  local rate_per_ms = (refill_rate / 1000.0)
-  if rate_per_ms <= 0 then
-    retry_after_ms = per_ms
+if cost > 0 then
+  granted = math.min(cost, math.floor(tokens))
+  tokens = tokens - granted
+end
+if granted == 0 and tokens < 1.0 then
+  if rate > 0 then
+    retry_after_ms = math.ceil((1.0 - tokens) / rate)
   else
-    retry_after_ms = math.ceil(deficit / rate_per_ms)
+    retry_after_ms = 1000
+  end
+end
+if cost > 0 then
+  local ttl_ms = 1000
+  if rate > 0 then
+    ttl_ms = math.max(1, math.ceil(capacity / rate))
   end
+  redis.call('SET', key, string.format('%.6f:%d', tokens, last_ms), 'PX', ttl_ms)
 end
--- persist
-redis.call('SET', key, string.format('%f:%d', tokens, last_ms), 'PX', per_ms)
-return {allowed, string.format('%f', tokens), retry_after_ms}
+return {granted, math.floor(tokens), retry_after_ms}
 """
 
 
 class RedisTokenBucketRateLimiter(RateLimiter):  # type: ignore[misc]
-    def __init__(self, url: str, prefix: str, now_ms_fn: Callable[[], int] | None = None) -> None:
-        if redis is None:
-            raise RuntimeError("redis library not available")
-        self._client = redis.Redis.from_url(url, decode_responses=True)
+    def __init__(
+        self,
+        url: str,
+        prefix: str,
+        now_ms_fn: Callable[[], int] | None = None,
+        client: Any | None = None,
+    ) -> None:
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis library not available")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self._client = client
         self._prefix = f"{prefix}tb:"
-        self._script = self._client.register_script(_LUA)
+        self._script = client.register_script(TOKEN_BUCKET_LUA)
         self._now_ms = now_ms_fn or (lambda: int(time.time() * 1000))
 
     def _rk(self, logical_key: str) -> str:
         return f"{self._prefix}{logical_key}"
 
+    def _call(self, key: str, quota: int, per_seconds: int, burst: int | None, cost: int) -> RateLimitGrant:
+        capacity = max(1, burst if burst is not None else quota)
+        rate_per_ms = quota / (per_seconds * 1000.0)
+        granted, remaining, retry_ms = self._script(
+            keys=[self._rk(key)], args=[self._now_ms(), capacity, repr(rate_per_ms), cost]
+        )
+        retry_after = 0 if int(retry_ms) <= 0 else max(1, math.ceil(int(retry_ms) / 1000))
+        return RateLimitGrant(int(granted), max(0, int(remaining)), retry_after, 0)
+
+    def acquire(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None, want: int = 1
+    ) -> RateLimitGrant:
+        return self._call(key, quota, per_seconds, burst, cost=want)
+
+    def decide(
+        self, key: str, quota: int, per_seconds: int, burst: int | None = None
+    ) -> RateLimitDecision:
+        g = self._call(key, quota, per_seconds, burst, cost=1)
+        return RateLimitDecision(g.granted == 1, g.remaining, g.retry_after)
+
     def allow(self, key: str, quota: int, per_seconds: int) -> bool:
-        capacity = quota
-        now_ms = self._now_ms()
-        per_ms = per_seconds * 1000
-        refill_rate = quota  # tokens per second
-        result = self._script(keys=[self._rk(key)], args=[now_ms, capacity, refill_rate, per_ms])  # type: ignore[arg-type]
-        allowed = int(result[0]) == 1
-        return allowed
+        return self.decide(key, quota, per_seconds).allowed
+
+    def allow_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> bool:
+        return self.decide(key, quota, per_seconds, burst).allowed
+
+    def retry_after_bucket(self, key: str, quota: int, per_seconds: int, burst: int) -> int:
+        return self._call(key, quota, per_seconds, burst, cost=0).retry_after
 
     def retry_after(self, key: str, per_seconds: int) -> int:
+        # Rate unknown without quota; callers with limits use decide()/retry_after_bucket()
         return 1
 
 
-__all__ = ["RedisTokenBucketRateLimiter"]
+__all__ = ["TOKEN_BUCKET_LUA", "RedisTokenBucketRateLimiter"]
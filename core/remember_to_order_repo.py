@@ -6,7 +6,7 @@ from typing import Iterable
 
 from sqlalchemy import text
 
-from .db import get_session
+from .db import ensure_schema, get_session
 from .week_key import normalize_week_key
 
 
@@ -30,6 +30,9 @@ class RememberToOrderRepo:
                 return
         except Exception:
             return
+        ensure_schema("remember_to_order_items", lambda: self._create_table(db))
+
+    def _create_table(self, db) -> None:
         db.execute(
             text(
                 """
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import csv
 import io
 import json
+from collections.abc import Iterator
 from typing import Any
 
+from ..csv_stream import iter_csv_chunks
+
 try:
     from openpyxl import Workbook
 except Exception:  # pragma: no cover - tests run with openpyxl installed per requirements
@@ -15,39 +17,39 @@ def _specials_json(obj: dict[str, int]) -> str:
     return json.dumps({k: int(v) for k, v in sorted((obj or {}).items())}, separators=(",", ":"))
 
 
-def build_csv(report_payload: dict[str, Any]) -> bytes:
-    buf = io.StringIO(newline="")
-    w = csv.writer(buf)
-    # departments section
-    w.writerow(["departments"])  # section marker
-    w.writerow(["department_id", "department_name", "meal", "normal", "total", "specials_json"])
+def csv_rows(report_payload: dict[str, Any]) -> Iterator[list[Any]]:
+    """Rows of the CSV export: a departments section, a blank line, then a totals section."""
+    yield ["departments"]  # section marker
+    yield ["department_id", "department_name", "meal", "normal", "total", "specials_json"]
     for dep in report_payload.get("departments", []):
         dep_id = dep.get("department_id")
         dep_name = dep.get("department_name")
         for meal in ("lunch", "dinner"):
             m = dep.get(meal, {})
-            w.writerow([
+            yield [
                 dep_id,
                 dep_name if dep_name is not None else "",
                 meal,
                 int(m.get("normal", 0)),
                 int(m.get("total", 0)),
                 _specials_json(m.get("specials", {})),
-            ])
-    # totals section
-    w.writerow([])
-    w.writerow(["totals"])  # section marker
-    w.writerow(["meal", "normal", "total", "specials_json"])
+            ]
+    yield []
+    yield ["totals"]  # section marker
+    yield ["meal", "normal", "total", "specials_json"]
     totals = report_payload.get("totals", {})
     for meal in ("lunch", "dinner"):
         m = totals.get(meal, {})
-        w.writerow([
+        yield [
             meal,
             int(m.get("normal", 0)),
             int(m.get("total", 0)),
             _specials_json(m.get("specials", {})),
-        ])
-    return buf.getvalue().encode("utf-8")
+        ]
+
+
+def build_csv(report_payload: dict[str, Any]) -> bytes:
+    return b"".join(iter_csv_chunks(csv_rows(report_payload)))
 
 
 def build_xlsx(report_payload: dict[str, Any]) -> bytes:
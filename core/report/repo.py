@@ -4,17 +4,20 @@ from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy import text
 
-from ..db import get_session
+from ..db import ensure_schema, get_session
 
 
 class ReportRepo:
     """Read-only access for report aggregation from weekview tables."""
 
     def _ensure_schema(self) -> None:
-        """Ensure weekview tables exist in SQLite test env.
+        """Ensure weekview tables exist in SQLite test env (once per engine).
 
         Mirrors WeekviewRepo._ensure_schema for safety when report is used without touching weekview first.
         """
+        ensure_schema("report.weekview_tables", self._bootstrap_schema)
+
+    def _bootstrap_schema(self) -> None:
         db = get_session()
         try:
             dialect = db.bind.dialect.name if db.bind is not None else ""
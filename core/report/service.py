@@ -3,6 +3,8 @@ from __future__ import annotations
 from collections import defaultdict
 from typing import Iterable
 
+from ..response_cache import cached_payload
+from ..weekview.service import WeekviewService
 from .repo import ReportRepo
 
 
@@ -34,6 +36,23 @@ class ReportService:
             etag = self._build_etag_site(year, week, vmax, n)
         if if_none_match and if_none_match == etag:
             return True, {}, etag
+        # Department meta (names/notes) is covered by departments.version in inputs_version
+        dep_ids = list(versions_map.keys()) if department_id is None else [department_id]
+        inputs = WeekviewService().inputs_version(tenant_id, None, year, week, dep_ids)
+        key = None if inputs is None else (str(tenant_id), department_id, year, week, sorted(versions_map.items()), inputs)
+        payload = cached_payload(
+            "report", key, lambda: self._aggregate(tenant_id, year, week, department_id, versions_map)
+        )
+        return False, payload, etag
+
+    def _aggregate(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str | None,
+        versions_map: dict[str, int],
+    ) -> dict:
         # When department_id is specified but no data, treat as 404 at API layer; here we still aggregate empty
         residents = self.repo.get_residents(tenant_id, year, week, department_id)
         marks = self.repo.get_marks(tenant_id, year, week, department_id)
@@ -114,5 +133,4 @@ class ReportService:
                 "total": totals_meals["dinner"]["total"],
             },
         }
-        payload = {"year": year, "week": week, "departments": departments, "totals": totals}
-        return False, payload, etag
+        return {"year": year, "week": week, "departments": departments, "totals": totals}
@@ -9,7 +9,8 @@ from .auth import require_roles
 from .http_errors import bad_request, not_found
 from .report.service import ReportService
 from .report.repo import ReportRepo
-from .report.export import build_csv, build_xlsx
+from .csv_stream import csv_etag, csv_response
+from .report.export import build_xlsx, csv_rows
 
 
 bp = Blueprint("report_api", __name__, url_prefix="/api")
@@ -113,25 +114,24 @@ def export_report() -> Response:
     not_mod, payload, base_etag = _service.compute(tid, year, week, department_id, None)
     # Suffix ETag with format to differentiate export variants
     export_etag = base_etag[:-1] + f":fmt:{fmt}" + base_etag[-1:]
+    if fmt == "csv":
+        export_etag = csv_etag(export_etag)
     if inm and inm == export_etag:
         resp = make_response("")
         resp.status_code = 304
         resp.headers["ETag"] = export_etag
         resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
         return resp
-    # Build bytes
+    cache_headers = {"ETag": export_etag, "Cache-Control": "private, max-age=0, must-revalidate"}
     if fmt == "csv":
-        data = build_csv(payload)
-        mime = "text/csv"
-        ext = "csv"
-    else:
-        data = build_xlsx(payload)
-        mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        ext = "xlsx"
-    filename = f"report_y{year}_w{week}.{ext}"
+        return csv_response(
+            csv_rows(payload), filename=f"report_y{year}_w{week}.csv", headers=cache_headers
+        )
+    data = build_xlsx(payload)
+    mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    filename = f"report_y{year}_w{week}.xlsx"
     resp = make_response(data)
     resp.headers["Content-Type"] = mime
     resp.headers["Content-Disposition"] = f"attachment; filename=\"{filename}\""
-    resp.headers["ETag"] = export_etag
-    resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
+    resp.headers.update(cache_headers)
     return resp
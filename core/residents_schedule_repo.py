@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 from typing import Optional, Sequence
-from sqlalchemy import text
-from .db import get_session
+from sqlalchemy import bindparam, text
+from .db import ensure_schema, get_session
 
 
 class ResidentsScheduleRepo:
@@ -18,6 +18,9 @@ class ResidentsScheduleRepo:
     """
 
     def _ensure_table(self) -> None:
+        ensure_schema("department_residents_schedule", self._create_table)
+
+    def _create_table(self) -> None:
         db = get_session()
         try:
             db.execute(
@@ -66,6 +69,34 @@ class ResidentsScheduleRepo:
         finally:
             db.close()
 
+    def get_for_departments(self, department_ids: Sequence[str], week: int) -> dict[str, dict[str, list[dict]]]:
+        """Week and forever schedules for several departments in one query.
+
+        Returns {department_id: {"week": [...], "forever": [...]}} with items shaped like get_week/get_forever.
+        """
+        ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        out: dict[str, dict[str, list[dict]]] = {d: {"week": [], "forever": []} for d in ids}
+        if not ids:
+            return out
+        self._ensure_table()
+        db = get_session()
+        try:
+            rows = db.execute(
+                text(
+                    "SELECT department_id, week, weekday, meal, count FROM department_residents_schedule "
+                    "WHERE department_id IN :ids AND (week=:w OR week IS NULL) ORDER BY department_id, weekday, meal"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids, "w": int(week)},
+            ).fetchall()
+            for r in rows:
+                bucket = "forever" if r[1] is None else "week"
+                out.setdefault(str(r[0]), {"week": [], "forever": []})[bucket].append(
+                    {"weekday": int(r[2]), "meal": str(r[3]), "count": int(r[4])}
+                )
+            return out
+        finally:
+            db.close()
+
     def upsert_items(self, department_id: str, week: Optional[int], items: Sequence[dict]) -> None:
         self._ensure_table()
         db = get_session()
@@ -1,12 +1,101 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import date as _date
+from typing import Iterable
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 from .db import get_session
+from .residents_schedule_repo import ResidentsScheduleRepo
 from .residents_weekly_repo import ResidentsWeeklyRepo
 
+MEALS = ("lunch", "dinner")
+
+
+@dataclass
+class ResidentsWeek:
+    """Resolved residents inputs and effective per-day values for one department-week.
+
+    days[weekday] = {"lunch": int, "dinner": int, "source": str} for weekday 1..7 where source is
+    "schedule_week" | "schedule_forever" | "weekly_override" | "fixed" (first match wins).
+    """
+
+    department_id: str
+    fixed: int
+    override: dict | None
+    week_schedule: dict[tuple[int, str], int] = field(default_factory=dict)
+    forever_schedule: dict[tuple[int, str], int] = field(default_factory=dict)
+    days: dict[int, dict] = field(default_factory=dict)
+
+    @property
+    def has_override(self) -> bool:
+        ov = self.override or {}
+        return bool(ov.get("residents_lunch") or ov.get("residents_dinner"))
+
+    @property
+    def has_variation(self) -> bool:
+        return bool(self.week_schedule or self.forever_schedule or self.has_override)
+
+    def weekly(self, meal: str) -> int:
+        """Week-level value: weekly override when set (non-zero), else fixed."""
+        return int((self.override or {}).get(f"residents_{meal}") or self.fixed)
+
+
+def _schedule_index(items: Iterable[dict]) -> dict[tuple[int, str], int]:
+    return {(int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in items}
+
+
+def resolve_effective_residents(department_ids: Iterable[str], year: int, week: int) -> dict[str, ResidentsWeek]:
+    """Compute the 7 x {lunch, dinner} effective-residents matrix for many departments at once.
+
+    Reads schedules, weekly overrides and fixed counts with one query each, independent of how many
+    departments are requested. Unknown departments resolve to fixed=0.
+    """
+    ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+    if not ids:
+        return {}
+    try:
+        schedules = ResidentsScheduleRepo().get_for_departments(ids, week)
+    except Exception:
+        schedules = {}
+    try:
+        overrides = ResidentsWeeklyRepo().get_for_week_many(ids, year, week)
+    except Exception:
+        overrides = {}
+    db = get_session()
+    try:
+        rows = db.execute(
+            text("SELECT id, COALESCE(resident_count_fixed,0) FROM departments WHERE id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": ids},
+        ).fetchall()
+        fixed_by_dep = {str(r[0]): int(r[1] or 0) for r in rows}
+    finally:
+        db.close()
+    out: dict[str, ResidentsWeek] = {}
+    for dep_id in ids:
+        sched = schedules.get(dep_id) or {}
+        rw = ResidentsWeek(
+            department_id=dep_id,
+            fixed=fixed_by_dep.get(dep_id, 0),
+            override=overrides.get(dep_id),
+            week_schedule=_schedule_index(sched.get("week", [])),
+            forever_schedule=_schedule_index(sched.get("forever", [])),
+        )
+        fallback_source = "weekly_override" if rw.has_override else "fixed"
+        for dow in range(1, 8):
+            for source, idx in (("schedule_week", rw.week_schedule), ("schedule_forever", rw.forever_schedule)):
+                if any((dow, meal) in idx for meal in MEALS):
+                    rw.days[dow] = {meal: int(idx.get((dow, meal), 0)) for meal in MEALS}
+                    rw.days[dow]["source"] = source
+                    break
+            else:
+                rw.days[dow] = {"lunch": rw.weekly("lunch"), "dinner": rw.weekly("dinner"), "source": fallback_source}
+        out[dep_id] = rw
+    return out
+
 
 def get_effective_residents_for_week(department_id: str, year: int, week: int) -> dict:
     """
@@ -18,21 +107,9 @@ def get_effective_residents_for_week(department_id: str, year: int, week: int) -
         "has_override": bool
     }
     """
-    db = get_session()
-    try:
-        # Read fixed from departments
-        row = db.execute(
-            text(
-                "SELECT COALESCE(resident_count_fixed, 0) FROM departments WHERE id=:id"
-            ),
-            {"id": department_id},
-        ).fetchone()
-        fixed = int(row[0] or 0) if row else 0
-    finally:
-        db.close()
-
-    repo = ResidentsWeeklyRepo()
-    ov = repo.get_for_week(department_id, year, week)
+    rw = resolve_effective_residents([department_id], year, week)[str(department_id)]
+    fixed = rw.fixed
+    ov = rw.override
     if ov:
         lunch = ov["residents_lunch"] if ov["residents_lunch"] is not None else fixed
         dinner = ov["residents_dinner"] if ov["residents_dinner"] is not None else fixed
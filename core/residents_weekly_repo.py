@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
-from .db import get_session
+from .db import ensure_schema, get_session
 
 
 def _is_sqlite(db) -> bool:
@@ -28,29 +28,32 @@ class ResidentsWeeklyRepo:
 
     def _ensure_table(self, db):
         if _is_sqlite(db):
-            db.execute(
-                text(
-                    """
-                    CREATE TABLE IF NOT EXISTS department_residents_weekly (
-                        id TEXT PRIMARY KEY,
-                        department_id TEXT NOT NULL,
-                        year INTEGER NOT NULL,
-                        week INTEGER NOT NULL,
-                        residents_lunch INTEGER NULL,
-                        residents_dinner INTEGER NULL,
-                        updated_at TEXT
-                    )
-                    """
+            ensure_schema("department_residents_weekly", lambda: self._create_table(db))
+
+    def _create_table(self, db) -> None:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS department_residents_weekly (
+                    id TEXT PRIMARY KEY,
+                    department_id TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    week INTEGER NOT NULL,
+                    residents_lunch INTEGER NULL,
+                    residents_dinner INTEGER NULL,
+                    updated_at TEXT
                 )
+                """
             )
-            db.execute(
-                text(
-                    """
-                    CREATE UNIQUE INDEX IF NOT EXISTS
-                    ux_dept_res_week ON department_residents_weekly(department_id, year, week)
-                    """
-                )
+        )
+        db.execute(
+            text(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS
+                ux_dept_res_week ON department_residents_weekly(department_id, year, week)
+                """
             )
+        )
 
     def get_for_week(self, department_id: str, year: int, week: int) -> dict | None:
         db = get_session()
@@ -72,6 +75,28 @@ class ResidentsWeeklyRepo:
         finally:
             db.close()
 
+    def get_for_week_many(self, department_ids, year: int, week: int) -> dict[str, dict]:
+        """Set-based variant of get_for_week; departments without an override are omitted."""
+        ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        if not ids:
+            return {}
+        db = get_session()
+        try:
+            self._ensure_table(db)
+            rows = db.execute(
+                text(
+                    """
+                    SELECT department_id, residents_lunch, residents_dinner
+                    FROM department_residents_weekly
+                    WHERE department_id IN :ids AND year=:y AND week=:w
+                    """
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids, "y": int(year), "w": int(week)},
+            ).fetchall()
+            return {str(r[0]): {"residents_lunch": r[1], "residents_dinner": r[2]} for r in rows}
+        finally:
+            db.close()
+
     def upsert_for_week(
         self,
         department_id: str,
@@ -0,0 +1,197 @@
+"""Response cache for versioned read payloads (weekview, report, weekview report).
+
+Payloads are cached as JSON bytes under a key that includes every version the payload was
+built from (weekview_versions, WeekviewService.inputs_version, ...), so writes never need to
+invalidate anything: a new version simply produces a new key and old entries age out.
+
+Backend selection mirrors core/rate_limiter.py via env:
+ - RESPONSE_CACHE_BACKEND: memory (default, in-process LRU) | redis | none
+ - RESPONSE_CACHE_MAX_ENTRIES (memory, default 512), RESPONSE_CACHE_TTL seconds (default 300)
+ - REDIS_URL, RESPONSE_CACHE_PREFIX (default "yuplan:rc:")
+
+Hits/misses are counted per namespace (stats()) and emitted as response_cache.hit/miss metrics.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable, Sequence
+from typing import Any, Protocol, TypeVar, runtime_checkable
+
+from .metrics import increment as metrics_increment
+from .site_cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@runtime_checkable
+class ResponseCache(Protocol):
+    def get(self, key: str) -> bytes | None: ...  # pragma: no cover
+    def set(self, key: str, value: bytes, ttl: int) -> None: ...  # pragma: no cover
+
+
+class MemoryResponseCache:
+    """Per-process LRU; the TTL is fixed per instance (RESPONSE_CACHE_TTL)."""
+
+    def __init__(self, max_entries: int = 512, ttl: int = 300) -> None:
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def get(self, key: str) -> bytes | None:
+        return self._cache.get(key, None)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._cache.set(key, value)
+
+    def clear(self) -> None:
+        self._cache.invalidate()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class NoopResponseCache:
+    def get(self, key: str) -> bytes | None:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        return None
+
+
+class _EnvConfig:
+    backend: str
+    redis_url: str | None
+    prefix: str
+    max_entries: int
+    ttl: int
+
+    def __init__(self) -> None:
+        self.reload()
+
+    def reload(self) -> None:
+        self.backend = os.getenv("RESPONSE_CACHE_BACKEND", "memory").strip().lower() or "memory"
+        self.redis_url = os.getenv("REDIS_URL")
+        self.prefix = os.getenv("RESPONSE_CACHE_PREFIX", "yuplan:rc:")
+        try:
+            self.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+        except ValueError:
+            self.max_entries = 512
+        try:
+            self.ttl = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        except ValueError:
+            self.ttl = 300
+
+
+_cfg = _EnvConfig()
+_instance: ResponseCache | None = None
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _build() -> ResponseCache:
+    if _cfg.backend == "none":
+        return NoopResponseCache()
+    if _cfg.backend == "redis":
+        try:
+            from .response_cache_redis import RedisResponseCache  # optional dependency boundary
+
+            return RedisResponseCache(_cfg.redis_url or "redis://localhost:6379/0", _cfg.prefix)
+        except Exception:
+            log.warning("Redis response cache unavailable; using in-process LRU", exc_info=True)
+    return MemoryResponseCache(_cfg.max_entries, _cfg.ttl)
+
+
+def get_response_cache() -> ResponseCache:
+    global _instance
+    if _instance is None:
+        _instance = _build()
+    return _instance
+
+
+def _test_reset() -> None:  # pragma: no cover - invoked by tests explicitly
+    global _instance
+    _cfg.reload()
+    _instance = None
+    with _stats_lock:
+        _stats.clear()
+
+
+def clear_local() -> None:
+    """Drop in-process entries (engine replaced or schema dropped); shared backends expire by TTL."""
+    cache = _instance
+    if isinstance(cache, MemoryResponseCache):
+        cache.clear()
+
+
+def _count(namespace: str, hit: bool) -> None:
+    with _stats_lock:
+        ns = _stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        ns["hits" if hit else "misses"] += 1
+    try:
+        metrics_increment("response_cache.hit" if hit else "response_cache.miss", {"namespace": namespace})
+    except Exception:
+        pass
+
+
+def make_key(namespace: str, key_parts: Sequence[Any]) -> str:
+    raw = json.dumps(list(key_parts), sort_keys=True, separators=(",", ":"), default=str)
+    return f"{namespace}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def cached_payload(namespace: str, key_parts: Sequence[Any] | None, builder: Callable[[], T]) -> T:
+    """Return builder() through the cache; key_parts=None bypasses caching (unknown version).
+
+    key_parts must contain every version the payload depends on. Hits and misses both return the
+    decoded JSON (a private copy, lists for tuples); payloads that are not plain JSON are returned
+    uncached, as built. Backend errors degrade to a miss.
+    """
+    if key_parts is None:
+        return builder()
+    cache = get_response_cache()
+    key = make_key(namespace, key_parts)
+    try:
+        raw = cache.get(key)
+    except Exception:
+        raw = None
+    if raw is not None:
+        _count(namespace, True)
+        return json.loads(raw)
+    _count(namespace, False)
+    payload = builder()
+    try:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        return payload
+    try:
+        cache.set(key, body, _cfg.ttl)
+    except Exception:
+        log.debug("response cache set failed for %s", namespace, exc_info=True)
+    return json.loads(body)
+
+
+def stats() -> dict[str, Any]:
+    cache = get_response_cache()
+    with _stats_lock:
+        namespaces = {k: dict(v) for k, v in _stats.items()}
+    out: dict[str, Any] = {"backend": type(cache).__name__, "ttl_s": _cfg.ttl, "namespaces": namespaces}
+    if isinstance(cache, MemoryResponseCache):
+        out["entries"] = len(cache)
+        out["max_entries"] = _cfg.max_entries
+    return out
+
+
+__all__ = [
+    "ResponseCache",
+    "MemoryResponseCache",
+    "NoopResponseCache",
+    "cached_payload",
+    "clear_local",
+    "get_response_cache",
+    "make_key",
+    "stats",
+]
@@ -0,0 +1,35 @@
+"""Redis backend for core.response_cache (SET with EX; read errors degrade to a miss)."""
+
+from __future__ import annotations
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None
+
+
+class RedisResponseCache:
+    _prefix: str
+    _client: redis.Redis
+
+    def __init__(self, url: str, prefix: str) -> None:
+        if redis is None:
+            raise RuntimeError("redis library not available")
+        self._client = redis.Redis.from_url(url, decode_responses=False)
+        self._prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            raw = self._client.get(self._prefix + key)
+        except redis.RedisError:
+            return None
+        return bytes(raw) if raw is not None else None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            self._client.set(self._prefix + key, value, ex=max(1, int(ttl)))
+        except redis.RedisError:
+            pass
+
+
+__all__ = ["RedisResponseCache"]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from datetime import date
 from typing import Any, TypedDict, cast
 
-from sqlalchemy import and_, func
+from sqlalchemy import func, literal_column, select, text
 
-from .db import get_session
+from . import portion_stats
+from .db import ensure_schema, get_new_session, get_session
 from .models import ServiceMetric
 
 
@@ -54,47 +56,121 @@ class SummaryDayRow(TypedDict):
     served_g_per_guest: float | None
 
 
+# Natural key of a metric row; NULL dish/category fold to the sentinels of
+# uq_service_metrics_natural_key so ON CONFLICT matches rows without a dish or category
+_KEY_FIELDS = ("unit_id", "date", "meal", "dish_id", "category")
+_VALUE_FIELDS = (
+    "guest_count",
+    "produced_qty_kg",
+    "served_qty_kg",
+    "leftover_qty_kg",
+    "served_g_per_guest",
+)
+# Rows per INSERT ... VALUES statement (11 bound values each; SQLite allows 32766)
+_UPSERT_CHUNK = 1000
+
+
+def _conflict_target() -> list[Any]:
+    return [
+        ServiceMetric.tenant_id,
+        ServiceMetric.unit_id,
+        ServiceMetric.date,
+        ServiceMetric.meal,
+        func.coalesce(ServiceMetric.dish_id, literal_column("0")),
+        func.coalesce(ServiceMetric.category, literal_column("''")),
+    ]
+
+
+# Same index as migration 0018 (which also collapses duplicate keys first)
+_NATURAL_KEY_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_service_metrics_natural_key ON service_metrics
+      (tenant_id, unit_id, date, meal, coalesce(dish_id, 0), coalesce(category, ''))
+"""
+
+
+def _ensure_natural_key(db: Any) -> None:
+    """SQLite databases created before migration 0018 get the unique index on first ingest.
+
+    The index is created on its own session so the caller's transaction is never committed
+    here. Duplicate keys are not deleted at runtime: a database that still has them fails the
+    CREATE and needs migration 0018.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+
+    def _create() -> None:
+        ddl = get_new_session()
+        try:
+            ddl.execute(text(_NATURAL_KEY_SQL))
+            ddl.commit()
+        finally:
+            ddl.close()
+
+    ensure_schema("service_metrics_natural_key", _create)
+
+
 class ServiceMetricsService:
     def ingest(self, tenant_id: int, rows: list[IngestRow]) -> IngestResult:
+        """Validate rows and upsert them by natural key in one transaction.
+
+        Rows are normalized and de-duplicated in memory (the last row for a key wins), then
+        written with multi-row INSERT ... ON CONFLICT DO UPDATE statements. inserted/updated come
+        from the statements' RETURNING rows: Postgres reports (xmax = 0) for fresh tuples; SQLite
+        allocates new ids above the previous MAX(id), which is read once up front. The batch is
+        merged into the portion recommendation statistics (core.portion_stats) before commit.
+        """
+        errors: list[str] = []
+        batch: dict[tuple[Any, ...], dict[str, Any]] = {}
+        for r in rows:
+            try:
+                norm = self._normalize_row(r)
+            except ValueError as e:
+                errors.append(str(e))
+                continue
+            norm["tenant_id"] = tenant_id
+            batch[tuple(norm[f] for f in _KEY_FIELDS)] = norm
+        if not batch:
+            return {"ok": True, "inserted": 0, "updated": 0, "errors": errors}
         db = get_session()
         inserted = 0
         updated = 0
-        errors: list[str] = []
         try:
-            for r in rows:
-                try:
-                    norm = self._normalize_row(r)
-                except ValueError as e:
-                    errors.append(str(e))
-                    continue
-                norm["tenant_id"] = tenant_id
-                key_filter = and_(
-                    ServiceMetric.tenant_id == tenant_id,
-                    ServiceMetric.unit_id == norm["unit_id"],
-                    ServiceMetric.date == norm["date"],
-                    ServiceMetric.meal == norm["meal"],
-                    ServiceMetric.dish_id.is_(norm["dish_id"])
-                    if norm["dish_id"] is None
-                    else ServiceMetric.dish_id == norm["dish_id"],
-                    ServiceMetric.category == norm["category"],
+            _ensure_natural_key(db)
+            dialect = db.get_bind().dialect.name
+            insert_fn: Callable[..., Any]
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+                insert_fn = pg_insert
+                fresh: Any = literal_column("xmax = 0")
+                max_before = None
+            else:
+                from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+                insert_fn = sqlite_insert
+                fresh = None
+                max_before = db.execute(select(func.max(ServiceMetric.id))).scalar() or 0
+            values = list(batch.values())
+            for i in range(0, len(values), _UPSERT_CHUNK):
+                stmt: Any = insert_fn(ServiceMetric).values(values[i : i + _UPSERT_CHUNK])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=_conflict_target(),
+                    set_={f: getattr(stmt.excluded, f) for f in _VALUE_FIELDS},
                 )
-                existing = db.query(ServiceMetric).filter(key_filter).first()
-                if existing:
-                    updated += 1
-                    for f in [
-                        "guest_count",
-                        "produced_qty_kg",
-                        "served_qty_kg",
-                        "leftover_qty_kg",
-                        "served_g_per_guest",
-                    ]:
-                        setattr(existing, f, norm.get(f))
+                upsert = stmt.returning(fresh if fresh is not None else ServiceMetric.id)
+                returned = db.execute(upsert, execution_options=portion_stats.MAINTAINED).scalars().all()
+                if fresh is not None:
+                    n_new = sum(1 for f in returned if f)
                 else:
-                    sm = ServiceMetric(**norm)
-                    db.add(sm)
-                    inserted += 1
+                    n_new = sum(1 for pk in returned if pk > max_before)
+                inserted += n_new
+                updated += len(returned) - n_new
+            portion_stats.record(db, tenant_id, values)
             db.commit()
             return {"ok": True, "inserted": inserted, "updated": updated, "errors": errors}
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
 
@@ -176,7 +252,7 @@ class ServiceMetricsService:
         if meal not in {"lunch", "dinner", "evening"}:
             raise ValueError("invalid meal")
         dish_id = r.get("dish_id")
-        category = r.get("category")
+        category = r.get("category") or None
         if dish_id is None and not category:
             raise ValueError("dish_id or category required")
         guest_count = r.get("guest_count")
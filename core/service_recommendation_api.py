@@ -6,6 +6,7 @@ from flask import Blueprint, current_app, jsonify, request, session
 
 from .api_types import ErrorResponse, RecommendationResponse
 from .auth import require_roles
+from .portion_recommendation_service import RecommendationInput
 
 bp = Blueprint("service_recommendation", __name__, url_prefix="/service")
 
@@ -47,3 +48,47 @@ def get_recommendation() -> RecommendationResponse | ErrorResponse:
             "history_mean_used": blended.history_mean_used,
         },
     )
+
+
+# Enough for every dish/category of a week's menu across a few units
+MAX_BATCH_ITEMS = 500
+
+
+@bp.post("/recommendations")
+@require_roles("superuser", "admin", "cook", "unit_portal")
+def post_recommendations():
+    """Recommendations for a list of {category|dish_id, guest_count[, unit_id]} items in one call."""
+    tenant_id = session.get("tenant_id")
+    if not tenant_id:
+        return jsonify({"ok": False, "error": "no tenant"}), 400
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"ok": False, "error": "items required"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"ok": False, "error": f"at most {MAX_BATCH_ITEMS} items"}), 400
+    inputs = []
+    for item in items:
+        if not isinstance(item, dict) or item.get("guest_count") is None:
+            return jsonify({"ok": False, "error": "guest_count required"}), 400
+        if not item.get("category") and item.get("dish_id") is None:
+            return jsonify({"ok": False, "error": "category or dish_id required"}), 400
+        try:
+            guest_count_int = int(item["guest_count"])
+            dish_id = int(item["dish_id"]) if item.get("dish_id") is not None else None
+            unit_id = int(item.get("unit_id") or session.get("unit_id") or 0) or None
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "invalid item"}), 400
+        inputs.append(
+            RecommendationInput(
+                tenant_id=tenant_id,
+                unit_id=unit_id,  # type: ignore[arg-type]
+                category=item.get("category") or None,
+                dish_id=dish_id,
+                guest_count=guest_count_int,
+            )
+        )
+    svc = current_app.portion_service  # type: ignore[attr-defined]
+    results = svc.recommend_many(inputs)
+    out = [{**item, **{k: v for k, v in res.items() if k != "ok"}} for item, res in zip(items, results)]
+    return jsonify({"ok": True, "items": out})
@@ -0,0 +1,131 @@
+"""Process-local cache for site -> tenant resolution and sites-table capabilities.
+
+The global before_request hook resolves the tenant of the session/query site on every
+request. Both the mapping and the schema probe (does ``sites.tenant_id`` exist?) change
+rarely, so they are kept in a bounded TTL/LRU cache:
+
+ - explicit invalidation from site writers (SitesRepo.create_site, admin site endpoints)
+ - a safety net engine listener that invalidates when any INSERT/UPDATE/DELETE/DDL
+   statement touching ``sites`` executes and again when that transaction commits
+ - TTL (SITE_TENANT_CACHE_TTL seconds, default 60) bounds staleness across workers
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_MISSING = object()
+_WRITE_VERBS = ("insert", "update", "delete", "replace", "alter", "drop", "create")
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any, default: Any = _MISSING) -> Any:
+        """Return the cached value, or default (a private sentinel unless given) when absent/expired."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Any = _MISSING) -> None:
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _ttl_from_env() -> float:
+    try:
+        return float(os.getenv("SITE_TENANT_CACHE_TTL", "60"))
+    except ValueError:
+        return 60.0
+
+
+site_tenants = TTLCache(maxsize=4096, ttl=_ttl_from_env())
+capabilities = TTLCache(maxsize=64, ttl=_ttl_from_env())
+
+
+def invalidate_sites(site_id: str | None = None) -> None:
+    """Drop cached site->tenant entries (one site or all) and sites-table capabilities."""
+    if site_id is None:
+        site_tenants.invalidate()
+    else:
+        site_tenants.invalidate(str(site_id))
+    capabilities.invalidate()
+
+
+def _touches_sites(statement: str) -> bool:
+    head = statement.lstrip()[:7].lower()
+    return head.startswith(_WRITE_VERBS) and "sites" in statement.lower()
+
+
+def install_invalidation_listener(engine: Engine) -> None:
+    """Invalidate the cache whenever SQL executed on engine writes to the sites table."""
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _on_execute(conn, _cursor, statement, _params, _context, _executemany) -> None:
+        if _touches_sites(statement or ""):
+            conn.info["sites_dirty"] = True
+            invalidate_sites()
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn) -> None:
+        # Re-invalidate after commit so readers that refilled mid-transaction see the new rows
+        if conn.info.pop("sites_dirty", False):
+            invalidate_sites()
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn) -> None:
+        if conn.info.pop("sites_dirty", False):
+            invalidate_sites()
+
+
+def stats() -> dict[str, Any]:
+    return {
+        "site_tenants": {"size": len(site_tenants), "hits": site_tenants.hits, "misses": site_tenants.misses},
+        "capabilities": {"size": len(capabilities), "hits": capabilities.hits, "misses": capabilities.misses},
+    }
+
+
+__all__ = ["TTLCache", "site_tenants", "capabilities", "invalidate_sites", "install_invalidation_listener", "stats"]
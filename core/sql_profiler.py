@@ -0,0 +1,228 @@
+"""Opt-in, sampled per-request SQL profiler with N+1 detection.
+
+A global SQLAlchemy Engine listener (before/after_cursor_execute) times every statement issued
+while a profile is active on the current thread; with no active profile it is one attribute
+lookup. Statements are normalized (literals -> ?, IN lists collapsed, whitespace squeezed) so
+repeated shapes group together. A SELECT shape executed SQL_PROFILE_N1_THRESHOLD or more times
+in one request is flagged as a likely N+1.
+
+For a sampled request the result goes to:
+ - the Server-Timing header: db;dur=<ms>;desc="<n> queries" (+ n1;desc="<count>x <table>")
+ - the structured request log line (key "sql")
+ - a ring buffer shown on the support page (GET /admin/support/sql-profiles)
+
+Env (read like core/audit_sink.py; _test_reset() re-reads). App config keys of the same name
+override in create_app():
+ - SQL_PROFILE_SAMPLE_RATE (0 = off, 1 = every request)
+ - SQL_PROFILE_N1_THRESHOLD (5), SQL_PROFILE_TOP (5 shapes kept), SQL_PROFILE_BUFFER (200)
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics_registry
+
+_N_PLUS_ONE = metrics_registry.counter(
+    "sql_n_plus_one_total", "Requests flagged with repeated SELECT shapes", ("route",)
+)
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|:\w+|%s|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_TABLE = re.compile(r"\bFROM\s+\"?([\w.]+)", re.IGNORECASE)
+
+
+def normalize(statement: str) -> str:
+    s = _STRING.sub("?", statement)
+    s = _PARAM.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("IN (?)", s)
+    return _WS.sub(" ", s).strip()
+
+
+class RequestProfile:
+    __slots__ = ("queries", "db_s", "shapes", "_starts")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_s = 0.0
+        self.shapes: dict[str, list[float]] = {}  # normalized sql -> [count, seconds]
+        self._starts: list[float] = []
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.queries += 1
+        self.db_s += elapsed
+        shape = normalize(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def summary(self, top: int, n1_threshold: int) -> dict[str, Any]:
+        ranked = sorted(self.shapes.items(), key=lambda kv: kv[1][1], reverse=True)
+        n_plus_one = [
+            {"sql": sql, "count": int(c), "ms": round(t * 1000.0, 2)}
+            for sql, (c, t) in sorted(self.shapes.items(), key=lambda kv: kv[1][0], reverse=True)
+            if c >= n1_threshold and sql[:6].upper() == "SELECT"
+        ]
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.db_s * 1000.0, 2),
+            "top": [
+                {"sql": sql, "count": int(c), "ms": round(t * 1000.0, 2)}
+                for sql, (c, t) in ranked[:top]
+            ],
+            "n_plus_one": n_plus_one,
+        }
+
+
+class _EnvConfig:
+    sample_rate: float
+    n1_threshold: int
+    top: int
+    buffer: int
+
+    def __init__(self) -> None:
+        self.reload()
+
+    @staticmethod
+    def _num(name: str, default: float) -> float:
+        try:
+            return float(os.getenv(name, str(default)))
+        except ValueError:
+            return default
+
+    def reload(self) -> None:
+        self.sample_rate = min(1.0, max(0.0, self._num("SQL_PROFILE_SAMPLE_RATE", 0.0)))
+        self.n1_threshold = max(2, int(self._num("SQL_PROFILE_N1_THRESHOLD", 5)))
+        self.top = max(1, int(self._num("SQL_PROFILE_TOP", 5)))
+        self.buffer = max(1, int(self._num("SQL_PROFILE_BUFFER", 200)))
+
+
+_cfg = _EnvConfig()
+_local = threading.local()
+_recent: deque[dict[str, Any]] = deque(maxlen=_cfg.buffer)
+
+
+def configure(
+    sample_rate: float | None = None,
+    n1_threshold: int | None = None,
+    top: int | None = None,
+) -> None:
+    """Re-read env, then apply overrides (create_app passes its app config values)."""
+    _cfg.reload()
+    if sample_rate is not None:
+        _cfg.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+    if n1_threshold is not None:
+        _cfg.n1_threshold = max(2, int(n1_threshold))
+    if top is not None:
+        _cfg.top = max(1, int(top))
+
+
+def active() -> RequestProfile | None:
+    return getattr(_local, "profile", None)
+
+
+def start_request() -> bool:
+    """Begin profiling this thread's request if sampled; returns whether it is profiled."""
+    rate = _cfg.sample_rate
+    if rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+        _local.profile = None
+        return False
+    _local.profile = RequestProfile()
+    return True
+
+
+def finish_request(resp: Any, info: dict[str, Any]) -> dict[str, Any] | None:
+    """Stop profiling, add Server-Timing to resp and buffer the summary; None if not sampled.
+
+    `info` (request_id, method, path, route, status) is stored alongside the summary.
+    """
+    profile = active()
+    _local.profile = None
+    if profile is None:
+        return None
+    summary = profile.summary(_cfg.top, _cfg.n1_threshold)
+    timing = [f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries"']
+    if summary["n_plus_one"]:
+        worst = summary["n_plus_one"][0]
+        m = _TABLE.search(worst["sql"])
+        target = m.group(1) if m else "select"
+        timing.append(f'n1;desc="{worst["count"]}x {target}"')
+        try:
+            _N_PLUS_ONE.labels(route=info.get("route") or "unmatched").inc()
+        except Exception:  # pragma: no cover - metrics must never break a response
+            pass
+    existing = resp.headers.get("Server-Timing")
+    resp.headers["Server-Timing"] = ", ".join(([existing] if existing else []) + timing)
+    _recent.append({"ts": time.time(), **info, **summary})
+    return summary
+
+
+def discard() -> None:
+    """Drop any profile left on this thread (teardown; after_request may not have run)."""
+    _local.profile = None
+
+
+def recent(limit: int | None = None, n_plus_one_only: bool = False) -> list[dict[str, Any]]:
+    items = list(_recent)
+    if n_plus_one_only:
+        items = [i for i in items if i["n_plus_one"]]
+    items.reverse()  # newest first
+    return items[:limit] if limit else items
+
+
+def stats() -> dict[str, Any]:
+    return {
+        "sample_rate": _cfg.sample_rate,
+        "n1_threshold": _cfg.n1_threshold,
+        "top": _cfg.top,
+        "buffered": len(_recent),
+        "buffer_max": _recent.maxlen,
+    }
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile._starts.append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, "profile", None)
+    if profile is not None and profile._starts:
+        profile.record(statement, time.perf_counter() - profile._starts.pop())
+
+
+def _test_reset() -> None:  # pragma: no cover - invoked by tests explicitly
+    global _recent
+    _cfg.reload()
+    _recent = deque(maxlen=_cfg.buffer)
+    _local.profile = None
+
+
+__all__ = [
+    "RequestProfile",
+    "configure",
+    "finish_request",
+    "normalize",
+    "recent",
+    "start_request",
+    "stats",
+]
@@ -3,6 +3,10 @@
 Exposes:
  - GET /admin/support/ : Basic environment info, top events, recent warnings.
  - GET /admin/support/lookup?request_id=... : Filter ring buffer by request ID.
+ - GET /admin/support/db-pool : Connection pool occupancy and checkout wait statistics.
+ - GET /admin/support/response-cache : Response cache backend and per-namespace hit/miss counters.
+ - GET /admin/support/audit-sink : Audit writer mode, queue depth, batch sizes and flush latency.
+ - GET /admin/support/sql-profiles : Recent sampled per-request SQL profiles (?n_plus_one=1, ?limit=).
 """
 
 from __future__ import annotations
@@ -11,10 +15,14 @@ from datetime import UTC, datetime
 
 from flask import Blueprint, current_app, jsonify, request
 
+from . import sql_profiler
 from .app_authz import require_roles
 from .audit_events import record_audit_event
+from .audit_sink import get_audit_sink
+from .db import pool_stats
 from .http_errors import not_found, unprocessable_entity
 from .logging_setup import LOG_BUFFER
+from .response_cache import stats as response_cache_stats
 from .telemetry import LOCAL_EVENTS
 
 bp = Blueprint("support", __name__, url_prefix="/admin/support")
@@ -54,6 +62,44 @@ def support_lookup():
     return jsonify({"ok": True, "request_id": rid, "hits": hits}), 200
 
 
+@bp.get("/db-pool")
+@require_roles("superuser")
+def support_db_pool():
+    return jsonify({"ok": True, "pool": pool_stats()}), 200
+
+
+@bp.get("/response-cache")
+@require_roles("superuser")
+def support_response_cache():
+    return jsonify({"ok": True, "response_cache": response_cache_stats()}), 200
+
+
+@bp.get("/audit-sink")
+@require_roles("superuser")
+def support_audit_sink():
+    return jsonify({"ok": True, "audit_sink": get_audit_sink().stats()}), 200
+
+
+@bp.get("/sql-profiles")
+@require_roles("superuser")
+def support_sql_profiles():
+    try:
+        limit = int(request.args.get("limit", "50"))
+    except ValueError:
+        return unprocessable_entity([{"field": "limit", "msg": "must be an integer"}])
+    n1_only = request.args.get("n_plus_one", "").lower() in ("1", "true", "yes")
+    return (
+        jsonify(
+            {
+                "ok": True,
+                "profiler": sql_profiler.stats(),
+                "profiles": sql_profiler.recent(max(1, limit), n_plus_one_only=n1_only),
+            }
+        ),
+        200,
+    )
+
+
 @bp.get("/ticket/<string:rid>")
 @require_roles("superuser")
 def support_ticket(rid: str):
@@ -84,6 +130,8 @@ def support_ui():  # pragma: no cover - simple HTML shell
 <div id='meta'></div>
 <h2>Events (top 10)</h2>
 <table id='events'><thead><tr><th>Event</th><th>Antal</th></tr></thead><tbody></tbody></table>
+<h2>SQL-profiler (senaste 20 samplade requests)</h2>
+<table id='sql'><thead><tr><th>Tid</th><th>Route</th><th>Status</th><th>Queries</th><th>DB ms</th><th>N+1</th></tr></thead><tbody></tbody></table>
 <h2>Senaste varningar (50)</h2>
 <table id='logs'><thead><tr><th>Tid</th><th>Nivå</th><th>Path</th><th>Request-ID</th><th>Meddelande</th></tr></thead><tbody></tbody></table>
 <script>
@@ -92,6 +140,8 @@ async function load(){
     document.getElementById('meta').textContent = JSON.stringify({service_version:j.service_version,deploy_env:j.deploy_env,now:j.now}, null, 2);
     const et=document.querySelector('#events tbody'); et.innerHTML='';
     (j.events||[]).forEach(([k,v])=>{const tr=document.createElement('tr'); tr.innerHTML=`<td>${k}</td><td>${v}</td>`; et.appendChild(tr);});
+    try{const sr=await fetch('./sql-profiles?limit=20'); const sj=await sr.json(); const st=document.querySelector('#sql tbody'); st.innerHTML='';
+        (sj.profiles||[]).forEach(p=>{const tr=document.createElement('tr'); const n1=(p.n_plus_one||[]).map(x=>x.count+'x '+x.sql).join('<br>'); tr.innerHTML=`<td>${new Date(p.ts*1000).toISOString()}</td><td>${p.method} ${p.route}</td><td>${p.status}</td><td>${p.queries}</td><td>${p.db_ms}</td><td><code>${n1}</code></td>`; st.appendChild(tr);});}catch(e){}
     const lt=document.querySelector('#logs tbody'); lt.innerHTML='';
     (j.recent_warnings||[]).forEach(r=>{const ts=new Date((r.ts||0)*1000).toISOString(); const tr=document.createElement('tr'); tr.innerHTML=`<td>${ts}</td><td>${r.level}</td><td>${r.path}</td><td>${r.request_id||''}</td><td>${r.msg}</td>`; lt.appendChild(tr);});
 }
@@ -10,6 +10,8 @@ from __future__ import annotations
 from collections import Counter
 from typing import Any
 
+from . import metrics_registry
+
 try:  # pragma: no cover - optional dependency
     from opentelemetry.metrics import get_meter  # type: ignore
 
@@ -24,6 +26,10 @@ except Exception:  # pragma: no cover
 
 # Local in-process event counts (pilot visibility without backend)
 LOCAL_EVENTS: Counter[str] = Counter()
+# Same counts on GET /metrics (merged across workers in multiprocess mode)
+_DOMAIN_EVENTS = metrics_registry.counter(
+    "domain_events_total", "Domain events by action", ("action",)
+)
 
 
 def track_event(action: str, *, avdelning: str | None = None, maltid: str | None = None) -> None:
@@ -40,6 +46,7 @@ def track_event(action: str, *, avdelning: str | None = None, maltid: str | None
     """
     # Mirror to local counter irrespective of OTEL availability
     LOCAL_EVENTS[action] += 1
+    _DOMAIN_EVENTS.labels(action=action).inc()
     if _EVENTS:
         labels: dict[str, Any] = {"action": action}
         if avdelning:
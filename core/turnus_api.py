@@ -3,11 +3,18 @@ from datetime import datetime
 from flask import Blueprint, jsonify, request, session
 
 from .auth import require_roles
-from .turnus_service import TurnusService
+from .turnus_service import ShiftStreamError, TurnusService, iter_csv_shifts, iter_ndjson_shifts
 
 bp = Blueprint("turnus_api", __name__, url_prefix="/turnus")
 service = TurnusService()
 
+# Streaming import bodies (template_id in the query string); parsed row by row
+_STREAM_READERS = {
+    "text/csv": iter_csv_shifts,
+    "application/x-ndjson": iter_ndjson_shifts,
+    "application/ndjson": iter_ndjson_shifts,
+}
+
 
 def current_tenant_id():
     tid = session.get("tenant_id")
@@ -40,6 +47,15 @@ def create_template():
 @require_roles("admin", "superuser")
 def import_shifts():
     tid = current_tenant_id()
+    reader = _STREAM_READERS.get(request.mimetype)
+    if reader is not None:
+        template_id = request.args.get("template_id", type=int)
+        if not template_id:
+            return jsonify({"error": "template_id required"}), 400
+        try:
+            return jsonify(service.import_shifts(tid, template_id, reader(request.stream)))
+        except ShiftStreamError as exc:
+            return jsonify({"error": str(exc)}), 400
     data = request.get_json() or {}
     template_id = data.get("template_id")
     shifts = data.get("shifts") or []
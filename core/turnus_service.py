@@ -1,12 +1,66 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from datetime import date, datetime
-from typing import Any
+from itertools import islice
+from typing import IO, Any
 
-from .db import get_session
+from sqlalchemy import func, literal_column, text
+
+from .db import ensure_schema, get_new_session, get_session
 from .models import ShiftSlot, ShiftTemplate
 
 ISO_FMT = "%Y-%m-%dT%H:%M:%S"
+# Shifts parsed, checked against existing keys (one range query) and inserted (one statement)
+# per round; 2000 rows x 8 bound values stays below SQLite's 32766 parameter limit
+_IMPORT_BATCH = 2000
+
+# (unit_id, start_ts, end_ts, role)
+ShiftKey = tuple[int | None, datetime, datetime, str | None]
+
+
+def _conflict_target() -> list[Any]:
+    return [
+        ShiftSlot.tenant_id,
+        ShiftSlot.start_ts,
+        ShiftSlot.end_ts,
+        func.coalesce(ShiftSlot.unit_id, literal_column("0")),
+        func.coalesce(ShiftSlot.role, literal_column("''")),
+    ]
+
+
+# Same index as migration 0020 (which also collapses duplicate slots first)
+_NATURAL_KEY_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_shift_slots_natural_key ON shift_slots
+      (tenant_id, start_ts, end_ts, coalesce(unit_id, 0), coalesce(role, ''))
+"""
+
+
+class ShiftStreamError(ValueError):
+    """A streamed import body cannot be read (not UTF-8, malformed CSV)."""
+
+
+def _ensure_natural_key(db: Any) -> None:
+    """SQLite databases created before migration 0020 get the unique index on first import.
+
+    Created on its own session, so the import's transaction is not committed here. Duplicate
+    slots are left to migration 0020; a database that still has them fails the CREATE.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+
+    def _create() -> None:
+        ddl = get_new_session()
+        try:
+            ddl.execute(text(_NATURAL_KEY_SQL))
+            ddl.commit()
+        finally:
+            ddl.close()
+
+    ensure_schema("shift_slots_natural_key", _create)
 
 
 def parse_ts(val: str) -> datetime:
@@ -20,6 +74,54 @@ def parse_ts(val: str) -> datetime:
         raise ValueError("invalid datetime format") from None
 
 
+def _parse_shift(s: Any) -> ShiftKey | None:
+    """Natural key of one inbound shift, or None when it is invalid."""
+    if not isinstance(s, Mapping):
+        return None
+    try:
+        start_ts = parse_ts(s["start_ts"])
+        end_ts = parse_ts(s["end_ts"])
+        unit_raw = s.get("unit_id")
+        unit_id = int(unit_raw) if unit_raw is not None and unit_raw != "" else None
+    except Exception:
+        return None
+    if end_ts <= start_ts:
+        return None
+    role = (s.get("role") or "").strip() or None
+    return (unit_id, start_ts, end_ts, role)
+
+
+def iter_csv_shifts(stream: IO[bytes]) -> Iterator[dict[str, Any]]:
+    """Shifts from a CSV body with a unit_id,start_ts,end_ts,role header, read row by row.
+
+    Raises ShiftStreamError when the body is not UTF-8 or not CSV.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        for row in reader:
+            yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ShiftStreamError(f"invalid CSV body: {exc}") from exc
+
+
+def iter_ndjson_shifts(stream: IO[bytes]) -> Iterator[Any]:
+    """Shifts from a newline-delimited JSON body, one object per line; bad lines yield None.
+
+    Raises ShiftStreamError when the body is not UTF-8.
+    """
+    try:
+        for line in io.TextIOWrapper(stream, encoding="utf-8-sig"):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    except UnicodeDecodeError as exc:
+        raise ShiftStreamError(f"invalid NDJSON body: {exc}") from exc
+
+
 class TurnusService:
     def get_templates(self, tenant_id: int) -> list[dict[str, Any]]:
         db = get_session()
@@ -51,62 +153,85 @@ class TurnusService:
             db.close()
 
     def import_shifts(
-        self, tenant_id: int, template_id: int, shifts: list[dict[str, Any]]
+        self, tenant_id: int, template_id: int, shifts: Iterable[Any]
     ) -> dict[str, int]:
+        """Insert the shifts whose (unit_id, start_ts, end_ts, role) is not stored yet.
+
+        shifts may be any iterable, e.g. rows streamed from a CSV/NDJSON body. It is consumed in
+        rounds of _IMPORT_BATCH: each round is parsed and de-duplicated in memory, checked against
+        the stored keys with one start_ts range query and bulk-inserted with one INSERT ... ON
+        CONFLICT DO NOTHING (the unique index also catches a concurrent import). Invalid rows and
+        duplicates count as skipped. The whole import commits once.
+        """
         db = get_session()
         inserted = 0
         skipped = 0
+        seen: set[ShiftKey] = set()  # keys already handled by earlier rows of this import
+        it = iter(shifts)
         try:
-            seen = set()  # track duplicates inside same batch (unit_id,start_ts,end_ts,role)
-            for s in shifts:
-                try:
-                    start_ts = parse_ts(s["start_ts"])
-                    end_ts = parse_ts(s["end_ts"])
-                except Exception:
-                    skipped += 1
+            _ensure_natural_key(db)
+            while batch := list(islice(it, _IMPORT_BATCH)):
+                fresh: list[ShiftKey] = []
+                for s in batch:
+                    key = _parse_shift(s)
+                    if key is None or key in seen:
+                        skipped += 1
+                        continue
+                    seen.add(key)
+                    fresh.append(key)
+                if not fresh:
                     continue
-                if end_ts <= start_ts:
-                    skipped += 1
-                    continue
-                unit_id = s.get("unit_id")
-                role = (s.get("role") or "").strip() or None
-                key = (unit_id, start_ts, end_ts, role)
-                if key in seen:
-                    skipped += 1
-                    continue
-                # duplicate check
-                exists = (
-                    db.query(ShiftSlot)
-                    .filter_by(
-                        tenant_id=tenant_id,
-                        unit_id=unit_id,
-                        start_ts=start_ts,
-                        end_ts=end_ts,
-                        role=role,
-                    )
-                    .first()
-                )
-                if exists:
-                    skipped += 1
-                    continue
-                slot = ShiftSlot(
-                    tenant_id=tenant_id,
-                    unit_id=unit_id,
-                    template_id=template_id,
-                    start_ts=start_ts,
-                    end_ts=end_ts,
-                    role=role,
-                    status="planned",
-                    notes=None,
-                )
-                db.add(slot)
-                seen.add(key)
-                inserted += 1
+                existing = self._existing_keys(db, tenant_id, fresh)
+                new = [k for k in fresh if k not in existing]
+                n = self._insert_slots(db, tenant_id, template_id, new) if new else 0
+                inserted += n
+                skipped += len(fresh) - n
             db.commit()
             return {"inserted": inserted, "skipped": skipped}
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
 
+    def _existing_keys(self, db: Any, tenant_id: int, keys: list[ShiftKey]) -> set[ShiftKey]:
+        starts = [k[1] for k in keys]
+        cols = (ShiftSlot.unit_id, ShiftSlot.start_ts, ShiftSlot.end_ts, ShiftSlot.role)
+        q = db.query(*cols).filter(
+            ShiftSlot.tenant_id == tenant_id,
+            ShiftSlot.start_ts >= min(starts),
+            ShiftSlot.start_ts <= max(starts),
+        )
+        return {(r.unit_id, r.start_ts, r.end_ts, r.role) for r in q}
+
+    def _insert_slots(self, db: Any, tenant_id: int, template_id: int, keys: list[ShiftKey]) -> int:
+        insert_fn: Callable[..., Any]
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+            insert_fn = pg_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            insert_fn = sqlite_insert
+        stmt: Any = insert_fn(ShiftSlot).values(
+            [
+                {
+                    "tenant_id": tenant_id,
+                    "unit_id": unit_id,
+                    "template_id": template_id,
+                    "start_ts": start_ts,
+                    "end_ts": end_ts,
+                    "role": role,
+                    "status": "planned",
+                    "notes": None,
+                }
+                for unit_id, start_ts, end_ts, role in keys
+            ]
+        )
+        stmt = stmt.on_conflict_do_nothing(index_elements=_conflict_target())
+        return len(db.execute(stmt.returning(ShiftSlot.id)).scalars().all())
+
     def query_slots(
         self,
         tenant_id: int,
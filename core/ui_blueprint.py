@@ -7,6 +7,7 @@ from sqlalchemy import text
 
 from .auth import require_roles
 from .db import get_session
+from .site_cache import invalidate_sites
 from .models import Note, Task, User
 from .weekview.service import WeekviewService
 from .weekview_vm import build_weekview_vm
@@ -544,8 +545,10 @@ def admin_system_site_create():
     db = get_session()
     try:
         # Optional code column; insert minimal fields
-        db.execute(text("INSERT INTO sites(id,name) VALUES(:i,:n)"), {"i": str(uuid.uuid4()), "n": name})
+        new_site_id = str(uuid.uuid4())
+        db.execute(text("INSERT INTO sites(id,name) VALUES(:i,:n)"), {"i": new_site_id, "n": name})
         db.commit()
+        invalidate_sites(new_site_id)
         flash("Arbetsplats skapad.", "success")
     finally:
         db.close()
@@ -701,18 +704,17 @@ def admin_department_detail_get(department_id: str):
         week = current_week
     year = current_year
 
-    # Fetch weekly override and per-day schedules for selected week
-    from core.residents_weekly_repo import ResidentsWeeklyRepo
-    from core.residents_schedule_repo import ResidentsScheduleRepo
+    # Weekly override and per-day schedules for selected week, resolved in one pass
+    from core.residents_service import resolve_effective_residents
     try:
-        ov = ResidentsWeeklyRepo().get_for_week(department_id, year, week) or {}
-        sched_repo = ResidentsScheduleRepo()
-        week_sched = sched_repo.get_week(department_id, week)
-        forever_sched = sched_repo.get_forever(department_id)
+        rw = resolve_effective_residents([department_id], year, week)[department_id]
+        ov = rw.override or {}
+        counts_idx = rw.week_schedule
+        forever_idx = rw.forever_schedule
     except Exception:
         ov = {}
-        week_sched = []
-        forever_sched = []
+        counts_idx = {}
+        forever_idx = {}
     lunch_eff = int((ov.get("residents_lunch") if ov else None) or resident_count_fixed or 0)
     dinner_eff = int((ov.get("residents_dinner") if ov else None) or resident_count_fixed or 0)
 
@@ -739,13 +741,11 @@ def admin_department_detail_get(department_id: str):
         "has_override": bool(ov.get("residents_lunch") or ov.get("residents_dinner")),
     }
     # Variation flags and weekly_table
-    has_week_variation = bool(week_sched)
-    has_forever_variation = bool(forever_sched)
+    has_week_variation = bool(counts_idx)
+    has_forever_variation = bool(forever_idx)
     vm["has_variation"] = has_week_variation or has_forever_variation or bool(vm["has_override"]) 
     if vm["has_variation"]:
         day_names = ["Mån", "Tis", "Ons", "Tors", "Fre", "Lör", "Sön"]
-        counts_idx = {(int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in week_sched}
-        forever_idx = {(int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in forever_sched}
         table = []
         for dow in range(1, 8):
             rl = counts_idx.get((dow, "lunch"))
@@ -3683,29 +3683,23 @@ def reports_weekly_csv():
         return jsonify({"error": "bad_request", "message": "Missing tenant"}), 400
     dept_vms = compute_weekview_report(tid, year, week, departments)
 
-    # Build CSV
-    import io, csv
-    output = io.StringIO()
-    writer = csv.writer(output)
-    # Header row (stable)
-    writer.writerow(["site", "department", "year", "week", "meal", "residents_total", "debiterbar_specialkost", "normal_count"])
-    # Rows per department × meal (aggregated weekly totals)
-    for d in dept_vms:
-        dep_name = d.get("department_name")
-        meals = d.get("meals", {})
-        for meal_key in ("lunch", "dinner"):
-            meal = meals.get(meal_key) or {}
-            residents_total = int(meal.get("residents_total") or 0)
-            deb_count = int(meal.get("debiterbar_specialkost_count") or 0)
-            normal_count = int(meal.get("normal_diet_count") or max(0, residents_total - deb_count))
-            writer.writerow([site_name, dep_name, year, week, meal_key, residents_total, deb_count, normal_count])
-
-    csv_data = output.getvalue()
-    from flask import Response
-    resp = Response(csv_data)
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-    resp.headers["Content-Disposition"] = f"attachment; filename=veckorapport_v{week}_{year}.csv"
-    return resp
+    # Rows per department × meal (aggregated weekly totals); header row is stable
+    def rows():
+        yield ["site", "department", "year", "week", "meal", "residents_total", "debiterbar_specialkost", "normal_count"]
+        for d in dept_vms:
+            dep_name = d.get("department_name")
+            meals = d.get("meals", {})
+            for meal_key in ("lunch", "dinner"):
+                meal = meals.get(meal_key) or {}
+                residents_total = int(meal.get("residents_total") or 0)
+                deb_count = int(meal.get("debiterbar_specialkost_count") or 0)
+                normal_count = int(meal.get("normal_diet_count") or max(0, residents_total - deb_count))
+                yield [site_name, dep_name, year, week, meal_key, residents_total, deb_count, normal_count]
+
+    from .csv_stream import csv_response
+    return csv_response(
+        rows(), headers={"Content-Disposition": f"attachment; filename=veckorapport_v{week}_{year}.csv"}
+    )
 
 
 @ui_bp.get("/ui/api/remember-to-order")
@@ -4619,20 +4613,15 @@ def admin_departments_list():
     iso_cal = today.isocalendar()
     current_year, current_week = iso_cal[0], iso_cal[1]
     
-    # Variation indicators for current week
-    from core.residents_weekly_repo import ResidentsWeeklyRepo
-    from core.residents_schedule_repo import ResidentsScheduleRepo
-    repo = ResidentsWeeklyRepo()
-    sched = ResidentsScheduleRepo()
+    # Variation indicators for current week (all departments resolved in one pass)
+    from core.residents_service import resolve_effective_residents
+    try:
+        resolved = resolve_effective_residents([str(d["id"]) for d in departments], current_year, current_week)
+    except Exception:
+        resolved = {}
     for d in departments:
-        try:
-            ov = repo.get_for_week(str(d["id"]), current_year, current_week) or {}
-            has_weekly_override = bool(ov.get("residents_lunch") or ov.get("residents_dinner"))
-            week_sched = sched.get_week(str(d["id"]), current_week)
-            forever_sched = sched.get_forever(str(d["id"]))
-            d["has_variation"] = bool(week_sched or forever_sched or has_weekly_override)
-        except Exception:
-            d["has_variation"] = False
+        rw = resolved.get(str(d["id"]))
+        d["has_variation"] = bool(rw.has_variation) if rw is not None else False
 
     # Empty-state hint for tests/UI
     if not departments:
@@ -4783,14 +4772,12 @@ def admin_departments_edit_form(dept_id: str):
     selected_week = current_week
     weekly_table = None
     try:
-        from core.residents_schedule_repo import ResidentsScheduleRepo
-        sched_repo = ResidentsScheduleRepo()
-        week_sched = sched_repo.get_week(dept_id, selected_week)
-        forever_sched = sched_repo.get_forever(dept_id)
-        if week_sched or forever_sched:
+        from core.residents_service import resolve_effective_residents
+        rw = resolve_effective_residents([dept_id], current_year, selected_week)[str(dept_id)]
+        counts_idx = rw.week_schedule
+        forever_idx = rw.forever_schedule
+        if counts_idx or forever_idx:
             day_names = ["Mån", "Tis", "Ons", "Tors", "Fre", "Lör", "Sön"]
-            counts_idx = {(int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in week_sched}
-            forever_idx = {(int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in forever_sched}
             weekly_table = []
             fixed = int(department["resident_count_fixed"] or 0)
             for dow in range(1, 8):
@@ -5962,21 +5949,18 @@ def admin_residents_week_get(year: int, week: int):
     iso = today.isocalendar()
     current_year, current_week = iso[0], iso[1]
 
-    # Fetch overrides
-    from core.residents_weekly_repo import ResidentsWeeklyRepo
-    repo = ResidentsWeeklyRepo()
-    overrides = {}
-    for d in departments:
-        try:
-            ov = repo.get_for_week(d["id"], year, week) or {}
-        except Exception:
-            ov = {}
-        overrides[d["id"]] = ov
+    # Resolve overrides for all departments at once
+    from core.residents_service import resolve_effective_residents
+    try:
+        resolved = resolve_effective_residents([d["id"] for d in departments], year, week)
+    except Exception:
+        resolved = {}
 
     # Build rows with effective values
     rows = []
     for d in departments:
-        ov = overrides.get(d["id"]) or {}
+        rw = resolved.get(d["id"])
+        ov = (rw.override if rw is not None else None) or {}
         lunch = int((ov.get("residents_lunch") if ov else None) or d["resident_count_fixed"] or 0)
         dinner = int((ov.get("residents_dinner") if ov else None) or d["resident_count_fixed"] or 0)
         rows.append({
@@ -8,9 +8,16 @@ try:
 except Exception:  # pragma: no cover
     flask_current_app = None
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
-from ..db import allow_destructive_db, get_session
+from ..db import allow_destructive_db, ensure_schema, get_session
+
+# Rows per multi-row VALUES statement (8 bound values per row stays far below driver limits)
+_VALUES_CHUNK = 500
+
+
+class VersionConflictError(Exception):
+    """The week's stored version no longer matches the expected (If-Match) version."""
 
 
 class WeekviewRepo:
@@ -22,7 +29,10 @@ class WeekviewRepo:
     """
 
     def _ensure_schema(self) -> None:
-        """Create minimal tables if they don't exist (SQLite/testing safety)."""
+        """Create minimal tables if they don't exist (SQLite/testing safety); once per engine."""
+        ensure_schema("weekview", self._bootstrap_schema)
+
+    def _bootstrap_schema(self) -> None:
         db = get_session()
         try:
             dialect = db.bind.dialect.name if db.bind is not None else ""
@@ -269,93 +279,264 @@ class WeekviewRepo:
         finally:
             db.close()
 
-    def apply_operations(
-        self,
-        tenant_id: int | str,
-        year: int,
-        week: int,
-        department_id: str,
-        ops: Sequence[dict],
-    ) -> int:
-        """Apply batch toggle operations atomically and return new version.
+    def get_versions_many(
+        self, tenant_id: int | str, year: int, week: int, department_ids: Sequence[str]
+    ) -> dict[str, int]:
+        """Set-based variant of get_version for several departments.
 
-        On Postgres, version bump occurs via triggers. On SQLite, emulate bump.
+        Missing version rows are seeded with version 0 in one statement, mirroring get_version.
         """
+        dep_ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        if not dep_ids:
+            return {}
         self._ensure_schema()
         db = get_session()
         try:
-            dialect = db.bind.dialect.name if db.bind is not None else ""
-            # Ensure version row exists
-            db.execute(
+            rows = db.execute(
                 text(
                     """
-                    INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
-                    VALUES(:tid, :dep, :yy, :ww, 0)
-                    ON CONFLICT(tenant_id, department_id, year, week) DO NOTHING
+                    SELECT department_id, version FROM weekview_versions
+                    WHERE tenant_id=:tid AND year=:yy AND week=:ww AND department_id IN :deps
                     """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            )
-            # Upsert registrations
-            for op in ops:
-                params = {
-                    "tid": str(tenant_id),
-                    "dep": department_id,
-                    "yy": year,
-                    "ww": week,
-                    "dow": int(op["day_of_week"]),
-                    "meal": str(op["meal"]),
-                    "diet": str(op["diet_type"]),
-                    "marked": 1 if bool(op.get("marked", True)) else 0,
-                }
-                if dialect == "sqlite":
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_registrations(tenant_id, department_id, year, week, day_of_week, meal, diet_type, marked)
-                            VALUES(:tid, :dep, :yy, :ww, :dow, :meal, :diet, :marked)
-                            ON CONFLICT(tenant_id, department_id, year, week, day_of_week, meal, diet_type)
-                            DO UPDATE SET marked=excluded.marked
-                            """
-                        ),
-                        params,
-                    )
-                else:
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_registrations(tenant_id, department_id, year, week, day_of_week, meal, diet_type, marked)
-                            VALUES(:tid, :dep, :yy, :ww, :dow, :meal, :diet, :marked)
-                            ON CONFLICT (tenant_id, department_id, year, week, day_of_week, meal, diet_type)
-                            DO UPDATE SET marked=EXCLUDED.marked, updated_at=now()
-                            """
-                        ),
-                        params,
-                    )
-            # Emulate version bump on SQLite where triggers aren't present
-            if dialect == "sqlite":
+                ).bindparams(bindparam("deps", expanding=True)),
+                {"tid": str(tenant_id), "yy": year, "ww": week, "deps": dep_ids},
+            ).fetchall()
+            versions = {str(r[0]): int(r[1]) for r in rows}
+            missing = [d for d in dep_ids if d not in versions]
+            if missing:
                 db.execute(
                     text(
                         """
-                        UPDATE weekview_versions
-                        SET version = version + 1
-                        WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
+                        INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
+                        VALUES(:tid, :dep, :yy, :ww, 0)
+                        ON CONFLICT(tenant_id, department_id, year, week) DO NOTHING
                         """
                     ),
-                    {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
+                    [{"tid": str(tenant_id), "dep": d, "yy": year, "ww": week} for d in missing],
                 )
-            db.commit()
-            # Read new version
-            ver = db.execute(
+                db.commit()
+                for d in missing:
+                    versions[d] = 0
+            return versions
+        finally:
+            db.close()
+
+    def get_weekview_many(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_ids: Sequence[str],
+        site_id: str | None = None,
+    ) -> dict[str, dict]:
+        """Set-based variant of get_weekview.
+
+        Returns {department_id: payload} where each payload is shaped exactly like
+        get_weekview(tenant_id, year, week, department_id, site_id).
+        """
+        dep_ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        if not dep_ids:
+            return {}
+        self._ensure_schema()
+        params = {"tid": str(tenant_id), "yy": year, "ww": week, "deps": dep_ids}
+        marks: dict[str, list[dict]] = {d: [] for d in dep_ids}
+        counts: dict[str, list[dict]] = {d: [] for d in dep_ids}
+        alt2_days: dict[str, list[int]] = {d: [] for d in dep_ids}
+        db = get_session()
+        try:
+            rows = db.execute(
                 text(
                     """
-                    SELECT version FROM weekview_versions
-                    WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
+                    SELECT department_id, day_of_week, meal, diet_type, marked
+                    FROM weekview_registrations
+                    WHERE tenant_id=:tid AND year=:yy AND week=:ww AND department_id IN :deps
+                    ORDER BY department_id, day_of_week, meal, diet_type
                     """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            ).fetchone()
-            return int(ver[0]) if ver else 0
+                ).bindparams(bindparam("deps", expanding=True)),
+                params,
+            ).fetchall()
+            for r in rows:
+                marks[str(r[0])].append(
+                    {
+                        "day_of_week": int(r[1]),
+                        "meal": str(r[2]),
+                        "diet_type": str(r[3]),
+                        "marked": bool(r[4]),
+                    }
+                )
+            rows_c = db.execute(
+                text(
+                    """
+                    SELECT department_id, day_of_week, meal, count
+                    FROM weekview_residents_count
+                    WHERE tenant_id=:tid AND year=:yy AND week=:ww AND department_id IN :deps
+                    ORDER BY department_id, day_of_week, meal
+                    """
+                ).bindparams(bindparam("deps", expanding=True)),
+                params,
+            ).fetchall()
+            for r in rows_c:
+                counts[str(r[0])].append({"day_of_week": int(r[1]), "meal": str(r[2]), "count": int(r[3])})
+            # Alt2 days are site-scoped; without an explicit site each department uses its own site.
+            site_by_dep: dict[str, str | None] = {d: (str(site_id) if site_id else None) for d in dep_ids}
+            if not site_id:
+                rows_s = db.execute(
+                    text("SELECT id, site_id FROM departments WHERE id IN :deps").bindparams(
+                        bindparam("deps", expanding=True)
+                    ),
+                    {"deps": dep_ids},
+                ).fetchall()
+                for r in rows_s:
+                    site_by_dep[str(r[0])] = str(r[1]) if r[1] is not None else None
+            rows_a = db.execute(
+                text(
+                    """
+                    SELECT site_id, department_id, day_of_week
+                    FROM weekview_alt2_flags
+                    WHERE department_id IN :deps AND year=:yy AND week=:ww AND enabled=1
+                    ORDER BY department_id, day_of_week
+                    """
+                ).bindparams(bindparam("deps", expanding=True)),
+                {"deps": dep_ids, "yy": year, "ww": week},
+            ).fetchall()
+            for r in rows_a:
+                dep = str(r[1])
+                if dep in alt2_days and site_by_dep.get(dep) is not None and str(r[0]) == site_by_dep[dep]:
+                    alt2_days[dep].append(int(r[2]))
+        finally:
+            db.close()
+        out: dict[str, dict] = {}
+        for dep in dep_ids:
+            out[dep] = {
+                "year": year,
+                "week": week,
+                "week_start": None,
+                "week_end": None,
+                "department_summaries": [
+                    {
+                        "department_id": dep,
+                        "department_name": None,
+                        "department_notes": [],
+                        "days": [],
+                        "marks": marks[dep],
+                        "residents_counts": counts[dep],
+                        "alt2_days": alt2_days[dep],
+                    }
+                ],
+            }
+        return out
+
+    # --- Write path ---
+    # Every mutation is one transaction: a single-statement version bump (compare-and-swap on the
+    # If-Match version when given) followed by one multi-row upsert, returning the new version
+    # from RETURNING instead of re-reading it. The bump runs first so it takes the row/write lock
+    # and concurrent writers serialize on it. On Postgres the per-row bump triggers from
+    # migrations/sql/2025-11-06_weekview_init.sql stand down for these transactions (see
+    # migration 0017), so a mutation advances the version by exactly one on both dialects.
+
+    def _bump_version(self, db, dialect: str, key: dict, expected: int | None) -> int:
+        """version+1 for the week row in one statement; raises VersionConflictError on CAS miss."""
+        if dialect == "postgresql":
+            db.execute(text("SELECT set_config('yuplan.weekview_cas', 'on', true)"))
+        touch = ", updated_at=now()" if dialect == "postgresql" else ""
+        if expected is None or expected == 0:
+            guard = "" if expected is None else " WHERE weekview_versions.version = :expected"
+            sql = f"""
+                INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
+                VALUES(:tid, :dep, :yy, :ww, 1)
+                ON CONFLICT(tenant_id, department_id, year, week)
+                DO UPDATE SET version = weekview_versions.version + 1{touch}{guard}
+                RETURNING version
+                """
+        else:
+            sql = f"""
+                UPDATE weekview_versions SET version = version + 1{touch}
+                WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
+                  AND version = :expected
+                RETURNING version
+                """
+        row = db.execute(text(sql), {**key, "expected": expected}).fetchone()
+        if row is None:
+            raise VersionConflictError(expected)
+        return int(row[0])
+
+    def _upsert_many(
+        self,
+        db,
+        dialect: str,
+        table: str,
+        shared: dict,
+        rows: Sequence[dict],
+        conflict: Sequence[str],
+        update_cols: Sequence[str],
+    ) -> None:
+        """INSERT ... VALUES (...), (...) ON CONFLICT DO UPDATE in chunks of _VALUES_CHUNK rows.
+
+        `shared` maps columns common to every row to one bound value each; rows carry the rest.
+        Rows must be unique on `conflict` (Postgres rejects touching a row twice per statement).
+        """
+        if not rows:
+            return
+        row_cols = list(rows[0])
+        cols = list(shared) + row_cols
+        sets = ", ".join(f"{c}=excluded.{c}" for c in update_cols)
+        if dialect == "postgresql":
+            sets += ", updated_at=now()"
+        head = f"INSERT INTO {table}({', '.join(cols)}) VALUES "
+        tail = f" ON CONFLICT({', '.join(conflict)}) DO UPDATE SET {sets}"
+        shared_params = {f"s_{c}": v for c, v in shared.items()}
+        shared_sql = ", ".join(f":s_{c}" for c in shared)
+        for i in range(0, len(rows), _VALUES_CHUNK):
+            params = dict(shared_params)
+            values = []
+            for n, row in enumerate(rows[i : i + _VALUES_CHUNK]):
+                values.append(
+                    "(" + ", ".join([shared_sql] + [f":{c}_{n}" for c in row_cols]) + ")"
+                )
+                params.update({f"{c}_{n}": row[c] for c in row_cols})
+            db.execute(text(head + ", ".join(values) + tail), params)
+
+    def apply_operations(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str,
+        ops: Sequence[dict],
+        expected_version: int | None = None,
+    ) -> int:
+        """Apply batch toggle operations atomically and return the new version.
+
+        With expected_version (the If-Match version) the bump is a compare-and-swap and
+        VersionConflictError is raised when the stored version differs. The last op wins for
+        repeated (day_of_week, meal, diet_type) keys.
+        """
+        self._ensure_schema()
+        db = get_session()
+        try:
+            dialect = db.bind.dialect.name if db.bind is not None else ""
+            key = {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week}
+            version = self._bump_version(db, dialect, key, expected_version)
+            rows: dict[tuple, dict] = {}
+            for op in ops:
+                dow, meal, diet = int(op["day_of_week"]), str(op["meal"]), str(op["diet_type"])
+                rows[(dow, meal, diet)] = {
+                    "day_of_week": dow,
+                    "meal": meal,
+                    "diet_type": diet,
+                    "marked": bool(op.get("marked", True)),
+                }
+            self._upsert_many(
+                db,
+                dialect,
+                "weekview_registrations",
+                {"tenant_id": key["tid"], "department_id": department_id, "year": year, "week": week},
+                list(rows.values()),
+                ("tenant_id", "department_id", "year", "week", "day_of_week", "meal", "diet_type"),
+                ("marked",),
+            )
+            db.commit()
+            return version
         except Exception:
             db.rollback()
             raise
@@ -369,77 +550,30 @@ class WeekviewRepo:
         week: int,
         department_id: str,
         items: Sequence[dict],
+        expected_version: int | None = None,
     ) -> int:
+        """Upsert per-day residents counts; same transaction shape as apply_operations."""
         self._ensure_schema()
         db = get_session()
         try:
             dialect = db.bind.dialect.name if db.bind is not None else ""
-            # Ensure version row exists
-            db.execute(
-                text(
-                    """
-                    INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
-                    VALUES(:tid, :dep, :yy, :ww, 0)
-                    ON CONFLICT(tenant_id, department_id, year, week) DO NOTHING
-                    """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            )
+            key = {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week}
+            version = self._bump_version(db, dialect, key, expected_version)
+            rows: dict[tuple, dict] = {}
             for it in items:
-                params = {
-                    "tid": str(tenant_id),
-                    "dep": department_id,
-                    "yy": year,
-                    "ww": week,
-                    "dow": int(it["day_of_week"]),
-                    "meal": str(it["meal"]),
-                    "cnt": int(it["count"]),
-                }
-                if dialect == "sqlite":
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_residents_count(tenant_id, department_id, year, week, day_of_week, meal, count)
-                            VALUES(:tid, :dep, :yy, :ww, :dow, :meal, :cnt)
-                            ON CONFLICT(tenant_id, department_id, year, week, day_of_week, meal)
-                            DO UPDATE SET count=excluded.count
-                            """
-                        ),
-                        params,
-                    )
-                else:
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_residents_count(tenant_id, department_id, year, week, day_of_week, meal, count)
-                            VALUES(:tid, :dep, :yy, :ww, :dow, :meal, :cnt)
-                            ON CONFLICT (tenant_id, department_id, year, week, day_of_week, meal)
-                            DO UPDATE SET count=EXCLUDED.count, updated_at=now()
-                            """
-                        ),
-                        params,
-                    )
-            if dialect == "sqlite":
-                db.execute(
-                    text(
-                        """
-                        UPDATE weekview_versions SET version=version+1
-                        WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
-                        """
-                    ),
-                    {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-                )
+                dow, meal = int(it["day_of_week"]), str(it["meal"])
+                rows[(dow, meal)] = {"day_of_week": dow, "meal": meal, "count": int(it["count"])}
+            self._upsert_many(
+                db,
+                dialect,
+                "weekview_residents_count",
+                {"tenant_id": key["tid"], "department_id": department_id, "year": year, "week": week},
+                list(rows.values()),
+                ("tenant_id", "department_id", "year", "week", "day_of_week", "meal"),
+                ("count",),
+            )
             db.commit()
-            ver = db.execute(
-                text(
-                    """
-                    SELECT version FROM weekview_versions
-                    WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
-                    """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            ).fetchone()
-            return int(ver[0]) if ver else 0
+            return version
         except Exception:
             db.rollback()
             raise
@@ -454,23 +588,16 @@ class WeekviewRepo:
         department_id: str,
         days: Sequence[int],
         site_id: str | None = None,
+        expected_version: int | None = None,
     ) -> int:
+        """Replace the week's Alt2 days (site-scoped rows); same transaction shape as apply_operations."""
         self._ensure_schema()
         db = get_session()
         try:
             dialect = db.bind.dialect.name if db.bind is not None else ""
-            # Ensure version row exists
-            db.execute(
-                text(
-                    """
-                    INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
-                    VALUES(:tid, :dep, :yy, :ww, 0)
-                    ON CONFLICT(tenant_id, department_id, year, week) DO NOTHING
-                    """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            )
-            day_set = set(int(d) for d in days)
+            key = {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week}
+            version = self._bump_version(db, dialect, key, expected_version)
+            day_set = sorted(set(int(d) for d in days))
             # Resolve site_id for canonical writes
             # Prefer provided site_id; otherwise resolve from department (if present)
             site_id_val = str(site_id) if site_id else None
@@ -480,47 +607,20 @@ class WeekviewRepo:
                     {"dep": department_id},
                 ).fetchone()
                 site_id_val = str(row_site[0]) if row_site and row_site[0] is not None else None
-            # Upsert true for provided days
-            for d in day_set:
-                params = {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week, "dow": d}
-                if dialect == "sqlite":
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_alt2_flags(site_id, department_id, year, week, day_of_week, enabled)
-                            VALUES(:site_id, :dep, :yy, :ww, :dow, 1)
-                            ON CONFLICT(site_id, department_id, year, week, day_of_week)
-                            DO UPDATE SET enabled=1
-                            """
-                        ),
-                        {"site_id": site_id_val, **params},
-                    )
-                else:
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO weekview_alt2_flags(site_id, department_id, year, week, day_of_week, enabled)
-                            VALUES(:site_id, :dep, :yy, :ww, :dow, true)
-                            ON CONFLICT (site_id, department_id, year, week, day_of_week)
-                            DO UPDATE SET enabled=true, updated_at=now()
-                            """
-                        ),
-                        {"site_id": site_id_val, **params},
-                    )
-            # Remove others (set false by deletion)
+            scope = {"site_id": site_id_val, "dep": department_id, "yy": year, "ww": week}
+            # Remove days no longer flagged (all of them when no days are given)
             if day_set:
                 db.execute(
                     text(
                         """
                         DELETE FROM weekview_alt2_flags
                         WHERE site_id=:site_id AND department_id=:dep AND year=:yy AND week=:ww
-                          AND day_of_week NOT IN (%s)
-                        """ % ",".join(str(d) for d in sorted(day_set))
-                    ),
-                    {"site_id": site_id_val, "dep": department_id, "yy": year, "ww": week},
+                          AND day_of_week NOT IN :days
+                        """
+                    ).bindparams(bindparam("days", expanding=True)),
+                    {**scope, "days": day_set},
                 )
             else:
-                # If no days provided, clear all for week
                 db.execute(
                     text(
                         """
@@ -528,29 +628,19 @@ class WeekviewRepo:
                         WHERE site_id=:site_id AND department_id=:dep AND year=:yy AND week=:ww
                         """
                     ),
-                    {"site_id": site_id_val, "dep": department_id, "yy": year, "ww": week},
-                )
-            if dialect == "sqlite":
-                db.execute(
-                    text(
-                        """
-                        UPDATE weekview_versions SET version=version+1
-                        WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
-                        """
-                    ),
-                    {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
+                    scope,
                 )
+            self._upsert_many(
+                db,
+                dialect,
+                "weekview_alt2_flags",
+                {"site_id": site_id_val, "department_id": department_id, "year": year, "week": week},
+                [{"day_of_week": d, "enabled": True} for d in day_set],
+                ("site_id", "department_id", "year", "week", "day_of_week"),
+                ("enabled",),
+            )
             db.commit()
-            ver = db.execute(
-                text(
-                    """
-                    SELECT version FROM weekview_versions
-                    WHERE tenant_id=:tid AND department_id=:dep AND year=:yy AND week=:ww
-                    """
-                ),
-                {"tid": str(tenant_id), "dep": department_id, "yy": year, "ww": week},
-            ).fetchone()
-            return int(ver[0]) if ver else 0
+            return version
         except Exception:
             db.rollback()
             raise
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import hashlib
 import re
 from datetime import date
-from typing import Sequence, Any
+from typing import Iterable, Sequence, Any
 from flask import current_app
 from ..admin_repo import DietDefaultsRepo
-from sqlalchemy import text
-from ..residents_weekly_repo import ResidentsWeeklyRepo
-from ..residents_schedule_repo import ResidentsScheduleRepo
-from ..db import get_session
-from .repo import WeekviewRepo
+from ..residents_service import ResidentsWeek, resolve_effective_residents
+from ..response_cache import cached_payload
+from ..site_cache import TTLCache
+from .repo import VersionConflictError, WeekviewRepo
+
+# Which optional inputs_version sources exist, per engine (schema changes are rare)
+_input_capabilities = TTLCache(maxsize=8, ttl=300.0)
 
 
 class WeekviewService:
@@ -39,185 +42,223 @@ class WeekviewService:
         etag = self.build_etag(tenant_id, dep, year, week, version)
         return payload, etag
 
+    # Rows (not sums: swapped values must change the key) of everything the enriched payloads of
+    # one site-week read. Every column is cast to text so one UNION ALL works on both dialects;
+    # parts keyed by an optional table are only included where that table exists (see
+    # _input_parts). Reads leave all of these unchanged: weekview_versions rows that reads seed at 0
+    # are skipped like missing ones.
+    _INPUT_PARTS: dict[str, str] = {
+        "weekview_versions": """
+            SELECT 'wv', department_id, NULL, NULL, CAST(version AS TEXT), NULL FROM weekview_versions
+            WHERE tenant_id=:tid AND year=:yy AND week=:ww AND department_id IN :deps AND version <> 0""",
+        "departments": """
+            SELECT 'dep', id, NULL, NULL, CAST(version AS TEXT), CAST(resident_count_fixed AS TEXT)
+            FROM departments WHERE id IN :deps""",
+        "department_diet_defaults": """
+            SELECT 'dd', department_id, diet_type_id, NULL, CAST(default_count AS TEXT), {always_mark}
+            FROM department_diet_defaults WHERE department_id IN :deps""",
+        "department_residents_schedule": """
+            SELECT 'rs', department_id, CAST(week AS TEXT), CAST(weekday AS TEXT), meal, CAST(count AS TEXT)
+            FROM department_residents_schedule WHERE department_id IN :deps AND (week IS NULL OR week=:ww)""",
+        "department_residents_weekly": """
+            SELECT 'rw', department_id, NULL, NULL, CAST(residents_lunch AS TEXT), CAST(residents_dinner AS TEXT)
+            FROM department_residents_weekly WHERE department_id IN :deps AND year=:yy AND week=:ww""",
+        "alt2_flags": """
+            SELECT 'a2', department_id, CAST(weekday AS TEXT), NULL, CAST(version AS TEXT), CAST(enabled AS TEXT)
+            FROM alt2_flags WHERE site_id=:sid AND week=:ww""",
+        "menus": """
+            SELECT 'm', CAST(id AS TEXT), NULL, NULL, CAST(updated_at AS TEXT), NULL FROM menus
+            WHERE tenant_id=:tnum AND year=:yy AND week=:ww""",
+        "menu_variants": """
+            SELECT 'mv', mv.day, mv.meal, mv.variant_type, CAST(mv.dish_id AS TEXT), CAST(m.id AS TEXT)
+            FROM menu_variants mv JOIN menus m ON m.id = mv.menu_id
+            WHERE m.tenant_id=:tnum AND m.year=:yy AND m.week=:ww""",
+    }
+    # Created by SQLite bootstraps only; Postgres databases may not have them
+    _OPTIONAL_INPUTS = ("weekview_versions", "department_residents_schedule", "department_residents_weekly")
 
-class EtagMismatchError(Exception):
-    pass
-
-
-class WeekviewService(WeekviewService):  # type: ignore[misc]
-    _ETAG_RE = re.compile(r'^W/"weekview:dept:(?P<dep>[0-9a-fA-F\-]+):year:(?P<yy>\d{4}):week:(?P<ww>\d{1,2}):v(?P<v>\d+)"$')
-
-    def toggle_marks(
+    def inputs_version(
         self,
         tenant_id: int | str,
+        site_id: str | None,
         year: int,
         week: int,
-        department_id: str,
-        if_match: str,
-        ops: Sequence[dict],
-    ) -> str:
-        m = self._ETAG_RE.match(if_match or "")
-        if not m:
-            raise EtagMismatchError("invalid_if_match")
-        # Validate target tuple in ETag matches request
-        dep = m.group("dep")
-        yy = int(m.group("yy"))
-        ww = int(m.group("ww"))
-        v = int(m.group("v"))
-        if dep != department_id or yy != year or ww != week:
-            raise EtagMismatchError("etag_mismatch")
-        current = self.repo.get_version(tenant_id, year, week, department_id)
-        if current != v:
-            raise EtagMismatchError("etag_mismatch")
-        new_version = self.repo.apply_operations(tenant_id, year, week, department_id, ops)
-        return self.build_etag(tenant_id, department_id, year, week, new_version)
+        department_ids: Iterable[str],
+    ) -> str | None:
+        """Version key for everything the enriched payloads of (site, year, week, departments) read.
 
-    def fetch_weekview_conditional(
-        self,
-        tenant_id: int | str,
-        year: int,
-        week: int,
-        department_id: str | None,
-        if_none_match: str | None,
-        site_id: str | None = None,
-    ) -> tuple[bool, dict | None, str]:
+        Hashes, in order, weekview_versions (marks incl. produced specials, residents counts,
+        weekview alt2), department versions, diet defaults and residents schedules, the site's alt2
+        collection and the week's menus and variants, read in one query, so callers can answer
+        If-None-Match or key caches without aggregating. Returns None when a source table is
+        unavailable.
         """
-        Returns (not_modified, payload, etag). If not_modified is True, payload will be None.
-        """
-        dep = department_id or "__none__"
-        version = 0 if not department_id else self.repo.get_version(tenant_id, year, week, department_id)
-        etag = self.build_etag(tenant_id, dep, year, week, version)
-        if if_none_match and if_none_match == etag:
-            return True, None, etag
-        payload = self.repo.get_weekview(tenant_id, year, week, department_id, site_id)
-        if site_id and isinstance(payload, dict) and not payload.get("site_id"):
-            payload["site_id"] = site_id
+        from sqlalchemy import bindparam, text
+        from ..db import get_session
+
+        dep_ids = [str(d) for d in dict.fromkeys(department_ids) if d]
         try:
-            self._enrich_days(payload, tenant_id, year, week)
+            tnum = int(tenant_id)
         except Exception:
-            pass
-        return False, payload, etag
+            tnum = -1
+        db = get_session()
+        try:
+            self._ensure_input_tables(db)
+            sql = " UNION ALL ".join(self._input_parts(db)) + " ORDER BY 1, 2, 3, 4, 5, 6"
+            rows = db.execute(
+                text(sql).bindparams(bindparam("deps", expanding=True)),
+                {"tid": str(tenant_id), "tnum": tnum, "sid": str(site_id or ""), "yy": int(year), "ww": int(week), "deps": dep_ids or [""]},
+            ).fetchall()
+        except Exception:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            return None
+        finally:
+            db.close()
+        digest = hashlib.sha1()
+        for r in rows:
+            digest.update(repr(tuple(r)).encode("utf-8"))
+        return f"{len(rows)}:{digest.hexdigest()[:24]}"
 
-    def update_residents_counts(
-        self,
-        tenant_id: int | str,
-        year: int,
-        week: int,
-        department_id: str,
-        if_match: str,
-        items: Sequence[dict],
-    ) -> str:
-        m = self._ETAG_RE.match(if_match or "")
-        if not m:
-            raise EtagMismatchError("invalid_if_match")
-        dep = m.group("dep")
-        yy = int(m.group("yy"))
-        ww = int(m.group("ww"))
-        v = int(m.group("v"))
-        if dep != department_id or yy != year or ww != week:
-            raise EtagMismatchError("etag_mismatch")
-        current = self.repo.get_version(tenant_id, year, week, department_id)
-        if current != v:
-            raise EtagMismatchError("etag_mismatch")
-        new_v = self.repo.set_residents_counts(tenant_id, year, week, department_id, items)
-        return self.build_etag(tenant_id, department_id, year, week, new_v)
+    def _input_parts(self, db) -> list[str]:
+        bind = db.get_bind()
+        key = f"{bind.dialect.name}:{bind.url}"
+        present = _input_capabilities.get_or_load(key, lambda: self._probe_inputs(db))
+        parts = []
+        for table, sql in self._INPUT_PARTS.items():
+            if table in self._OPTIONAL_INPUTS and table not in present:
+                continue
+            always = "CAST(always_mark AS TEXT)" if "always_mark" in present else "NULL"
+            parts.append(sql.format(always_mark=always) if table == "department_diet_defaults" else sql)
+        return parts
 
-    def update_alt2_flags(
+    def _probe_inputs(self, db) -> frozenset[str]:
+        """Optional input tables (and the SQLite-only diet defaults always_mark column) present."""
+        from sqlalchemy import text
+
+        if db.get_bind().dialect.name == "sqlite":
+            cols = db.execute(text("PRAGMA table_info('department_diet_defaults')")).fetchall()
+            present = set(self._OPTIONAL_INPUTS)  # bootstrapped by _ensure_input_tables
+            if any(str(c[1]) == "always_mark" for c in cols):
+                present.add("always_mark")
+            return frozenset(present)
+        present = {
+            t for t in self._OPTIONAL_INPUTS
+            if db.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": t}).scalar()
+        }
+        always = db.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name='department_diet_defaults' AND column_name='always_mark'"
+            )
+        ).fetchone()
+        if always is not None:
+            present.add("always_mark")
+        return frozenset(present)
+
+    def _ensure_input_tables(self, db) -> None:
+        """SQLite/testing: make sure lazily bootstrapped input tables exist (no-op once done)."""
+        from ..admin_repo import _ensure_sqlite_table
+        from ..residents_schedule_repo import ResidentsScheduleRepo
+        from ..residents_weekly_repo import ResidentsWeeklyRepo
+
+        self.repo._ensure_schema()
+        ResidentsScheduleRepo()._ensure_table()
+        ResidentsWeeklyRepo()._ensure_table(db)
+        for table in ("departments", "department_diet_defaults", "alt2_flags"):
+            _ensure_sqlite_table(db, table)
+
+    def fetch_weekview_many(
         self,
         tenant_id: int | str,
         year: int,
         week: int,
-        department_id: str,
-        if_match: str,
-        days: Sequence[int],
+        department_ids: Sequence[str],
         site_id: str | None = None,
-    ) -> str:
-        m = self._ETAG_RE.match(if_match or "")
-        if not m:
-            raise EtagMismatchError("invalid_if_match")
-        dep = m.group("dep")
-        yy = int(m.group("yy"))
-        ww = int(m.group("ww"))
-        v = int(m.group("v"))
-        if dep != department_id or yy != year or ww != week:
-            raise EtagMismatchError("etag_mismatch")
-        current = self.repo.get_version(tenant_id, year, week, department_id)
-        if current != v:
-            raise EtagMismatchError("etag_mismatch")
-        new_v = self.repo.set_alt2_flags(tenant_id, year, week, department_id, days, site_id)
-        return self.build_etag(tenant_id, department_id, year, week, new_v)
+        source: str | None = None,
+    ) -> dict[str, tuple[dict, str]]:
+        """Batched fetch_weekview for site-level views.
 
-    # --- Residents helpers (v1) ---
-    def get_effective_residents_for_week(self, department_id: str, year: int, week: int) -> dict:
-        """Return effective residents for lunch/dinner for the given week.
-
-        Uses weekly override from ResidentsWeeklyRepo; falls back to department.resident_count_fixed.
+        Returns {department_id: (payload, etag)} in input order; each entry is identical to
+        fetch_weekview(tenant_id, year, week, department_id, site_id, source). Versions,
+        registrations, residents, alt2 flags, diet defaults and residents inputs are loaded
+        with a fixed number of set-based queries regardless of department count.
         """
-        # Fetch fixed from departments
-        fixed = 0
-        db = get_session()
+        dep_ids = [str(d) for d in dict.fromkeys(department_ids) if d]
+        if not dep_ids:
+            return {}
+        versions = self.repo.get_versions_many(tenant_id, year, week, dep_ids)
+        payloads = self.repo.get_weekview_many(tenant_id, year, week, dep_ids, site_id)
+        if site_id:
+            for payload in payloads.values():
+                payload["site_id"] = site_id
+        # Shared enrichment inputs: menu once per site, the rest set-based per department list
+        menu_days = self._load_menu_days(site_id, tenant_id, year, week, source)
         try:
-            row = db.execute(
-                text("SELECT COALESCE(resident_count_fixed,0) FROM departments WHERE id=:id"),
-                {"id": department_id},
-            ).fetchone()
-            fixed = int(row[0] or 0) if row else 0
-        finally:
-            db.close()
-        # Weekly override
-        ov = {}
+            diet_defaults = DietDefaultsRepo().list_for_departments(dep_ids)
+        except Exception:
+            diet_defaults = {}
         try:
-            ov = ResidentsWeeklyRepo().get_for_week(department_id, year, week) or {}
+            residents = resolve_effective_residents(dep_ids, year, week)
         except Exception:
-            ov = {}
-        lunch = int((ov.get("residents_lunch") if ov else None) or fixed)
-        dinner = int((ov.get("residents_dinner") if ov else None) or fixed)
-        return {
-            "lunch": lunch,
-            "dinner": dinner,
-            "has_override": bool(ov.get("residents_lunch") or ov.get("residents_dinner")),
-        }
+            residents = None
+        out: dict[str, tuple[dict, str]] = {}
+        for dep_id in dep_ids:
+            payload = payloads[dep_id]
+            if residents is not None:
+                try:
+                    self._enrich_days(
+                        payload,
+                        tenant_id,
+                        year,
+                        week,
+                        source,
+                        menu_days=menu_days,
+                        diet_defaults=diet_defaults,
+                        residents=residents,
+                    )
+                except Exception:
+                    pass
+            out[dep_id] = (payload, self.build_etag(tenant_id, dep_id, year, week, versions.get(dep_id, 0)))
+        return out
 
-    def get_effective_residents_for_day(self, department_id: str, year: int, week: int, weekday: int) -> dict:
-        """Precedence:
-        1) Weekly per-day schedule in department_residents_schedule
-        2) Forever per-day schedule
-        3) Weekly override (legacy same-for-week)
-        4) Fixed
 
-        Returns {"lunch": int, "dinner": int, "source": "schedule_week"|"schedule_forever"|"weekly_override"|"fixed"}.
-        """
-        # 1/2: per-day schedules
+    # --- Internal helpers ---
+    def _load_menu_days(
+        self, site_id: str | None, tenant_id: int | str, year: int, week: int, source: str | None = None
+    ) -> dict[str, Any]:
+        """Resolve menu texts for the week (optional service)."""
         try:
-            repo = ResidentsScheduleRepo()
-            week_items = { (int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in repo.get_week(department_id, week) }
-            forever_items = { (int(it["weekday"]), str(it["meal"])): int(it["count"]) for it in repo.get_forever(department_id) }
+            svc = getattr(current_app, "menu_service", None)
+            if svc is not None:
+                mv = svc.get_week_view(int(tenant_id), site_id, week, year, source=source)
+                return dict(mv.get("days", {}))
         except Exception:
-            week_items, forever_items = {}, {}
-        if (weekday, "lunch") in week_items or (weekday, "dinner") in week_items:
-            return {
-                "lunch": int(week_items.get((weekday, "lunch"), 0)),
-                "dinner": int(week_items.get((weekday, "dinner"), 0)),
-                "source": "schedule_week",
-            }
-        if (weekday, "lunch") in forever_items or (weekday, "dinner") in forever_items:
-            return {
-                "lunch": int(forever_items.get((weekday, "lunch"), 0)),
-                "dinner": int(forever_items.get((weekday, "dinner"), 0)),
-                "source": "schedule_forever",
-            }
-        # 3/4: legacy weekly override or fixed
-        wk = self.get_effective_residents_for_week(department_id, year, week)
-        src = "weekly_override" if wk.get("has_override") else "fixed"
-        return {"lunch": int(wk["lunch"]), "dinner": int(wk["dinner"]), "source": src}
+            pass
+        return {}
 
-    # --- Internal helpers ---
-    def _enrich_days(self, payload: dict, tenant_id: int | str, year: int, week: int, source: str | None = None) -> None:
+    def _enrich_days(
+        self,
+        payload: dict,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        source: str | None = None,
+        *,
+        menu_days: dict[str, Any] | None = None,
+        diet_defaults: dict[str, list[dict]] | None = None,
+        residents: dict[str, ResidentsWeek] | None = None,
+    ) -> None:
         """Populate department_summaries[*].days with Phase 1 fields.
 
         Keeps existing keys (marks, residents_counts, alt2_days) for backward compatibility.
         Adds per-day objects:
           { day_of_week, date, weekday_name, menu_texts, alt2_lunch, residents }
+
+        menu_days, diet_defaults and residents may be preloaded by fetch_weekview_many;
+        when omitted they are looked up for the payload's departments.
         """
         try:
             summaries: list[dict[str, Any]] = payload.get("department_summaries", [])  # type: ignore[assignment]
@@ -225,16 +266,14 @@ class WeekviewService(WeekviewService):  # type: ignore[misc]
             return
         if not summaries:
             return
-        # Resolve menu texts for the week (optional service)
-        menu_days: dict[str, Any] = {}
-        try:
-            svc = getattr(current_app, "menu_service", None)
-            if svc is not None:
-                site_id = payload.get("site_id") if isinstance(payload, dict) else None
-                mv = svc.get_week_view(int(tenant_id), site_id, week, year, source=source)
-                menu_days = dict(mv.get("days", {}))
-        except Exception:
-            menu_days = {}
+        if menu_days is None:
+            site_id = payload.get("site_id") if isinstance(payload, dict) else None
+            menu_days = self._load_menu_days(site_id, tenant_id, year, week, source)
+        if residents is None:
+            # Whole-week matrix for every summary in one pass instead of per-day lookups
+            residents = resolve_effective_residents(
+                [str(sm.get("department_id") or "").strip() for sm in summaries], year, week
+            )
 
         # Helper maps
         day_keys = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
@@ -254,14 +293,16 @@ class WeekviewService(WeekviewService):  # type: ignore[misc]
 
             # Resolve department id for diet defaults
             dept_id = str(summary.get("department_id") or "").strip()
-            diet_defaults: dict[str, int] = {}
+            dept_defaults: dict[str, int] = {}
             try:
                 if dept_id:
-                    repo = DietDefaultsRepo()
-                    items = repo.list_for_department(dept_id)
-                    diet_defaults = {str(it["diet_type_id"]): int(it.get("default_count", 0)) for it in items}
+                    if diet_defaults is not None:
+                        items = diet_defaults.get(dept_id, [])
+                    else:
+                        items = DietDefaultsRepo().list_for_department(dept_id)
+                    dept_defaults = {str(it["diet_type_id"]): int(it.get("default_count", 0)) for it in items}
             except Exception:
-                diet_defaults = {}
+                dept_defaults = {}
 
             # Build mark index from raw marks list if present
             marks = summary.get("marks", []) or []
@@ -322,7 +363,7 @@ class WeekviewService(WeekviewService):  # type: ignore[misc]
                 # Build diets list per meal using department defaults and marks
                 def _build_diets(meal_name: str) -> list[dict[str, Any]]:
                     out: list[dict[str, Any]] = []
-                    for dt_id, default_cnt in sorted(diet_defaults.items()):
+                    for dt_id, default_cnt in sorted(dept_defaults.items()):
                         out.append(
                             {
                                 "diet_type_id": dt_id,
@@ -334,7 +375,8 @@ class WeekviewService(WeekviewService):  # type: ignore[misc]
                     return out
 
                 # Residents v1: use effective values per day from admin data
-                eff = self.get_effective_residents_for_day(dept_id, year, week, dow)
+                rw = residents.get(dept_id)
+                eff = rw.days[dow] if rw is not None else {}
                 # Apply per-day overrides from residents_counts if present
                 rl = int(counts_idx.get((dow, "lunch"), eff.get("lunch", 0)) or 0)
                 rd = int(counts_idx.get((dow, "dinner"), eff.get("dinner", 0)) or 0)
@@ -356,3 +398,137 @@ class WeekviewService(WeekviewService):  # type: ignore[misc]
                     }
                 )
             summary["days"] = days_out
+
+class EtagMismatchError(Exception):
+    pass
+
+
+class WeekviewService(WeekviewService):  # type: ignore[misc]
+    _ETAG_RE = re.compile(r'^W/"weekview:dept:(?P<dep>[0-9a-fA-F\-]+):year:(?P<yy>\d{4}):week:(?P<ww>\d{1,2}):v(?P<v>\d+)"$')
+
+    def _expected_version(self, if_match: str, department_id: str, year: int, week: int) -> int:
+        """Version named by If-Match; the repo write compares-and-swaps it with the stored one."""
+        m = self._ETAG_RE.match(if_match or "")
+        if not m:
+            raise EtagMismatchError("invalid_if_match")
+        # Validate target tuple in ETag matches request
+        if m.group("dep") != department_id or int(m.group("yy")) != year or int(m.group("ww")) != week:
+            raise EtagMismatchError("etag_mismatch")
+        return int(m.group("v"))
+
+    def toggle_marks(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str,
+        if_match: str,
+        ops: Sequence[dict],
+    ) -> str:
+        v = self._expected_version(if_match, department_id, year, week)
+        try:
+            new_version = self.repo.apply_operations(
+                tenant_id, year, week, department_id, ops, expected_version=v
+            )
+        except VersionConflictError:
+            raise EtagMismatchError("etag_mismatch") from None
+        return self.build_etag(tenant_id, department_id, year, week, new_version)
+
+    def fetch_weekview_conditional(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str | None,
+        if_none_match: str | None,
+        site_id: str | None = None,
+    ) -> tuple[bool, dict | None, str]:
+        """
+        Returns (not_modified, payload, etag). If not_modified is True, payload will be None.
+        """
+        dep = department_id or "__none__"
+        version = 0 if not department_id else self.repo.get_version(tenant_id, year, week, department_id)
+        etag = self.build_etag(tenant_id, dep, year, week, version)
+        if if_none_match and if_none_match == etag:
+            return True, None, etag
+
+        def _build() -> dict:
+            payload = self.repo.get_weekview(tenant_id, year, week, department_id, site_id)
+            if site_id and isinstance(payload, dict) and not payload.get("site_id"):
+                payload["site_id"] = site_id
+            try:
+                self._enrich_days(payload, tenant_id, year, week)
+            except Exception:
+                pass
+            return payload
+
+        # Versions in the key make writes invalidate implicitly (see core/response_cache.py)
+        key = None
+        if department_id:
+            inputs = self.inputs_version(tenant_id, site_id, year, week, [department_id])
+            if inputs is not None:
+                key = (str(tenant_id), site_id, department_id, year, week, version, inputs)
+        return False, cached_payload("weekview", key, _build), etag
+
+    def update_residents_counts(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str,
+        if_match: str,
+        items: Sequence[dict],
+    ) -> str:
+        v = self._expected_version(if_match, department_id, year, week)
+        try:
+            new_v = self.repo.set_residents_counts(
+                tenant_id, year, week, department_id, items, expected_version=v
+            )
+        except VersionConflictError:
+            raise EtagMismatchError("etag_mismatch") from None
+        return self.build_etag(tenant_id, department_id, year, week, new_v)
+
+    def update_alt2_flags(
+        self,
+        tenant_id: int | str,
+        year: int,
+        week: int,
+        department_id: str,
+        if_match: str,
+        days: Sequence[int],
+        site_id: str | None = None,
+    ) -> str:
+        v = self._expected_version(if_match, department_id, year, week)
+        try:
+            new_v = self.repo.set_alt2_flags(
+                tenant_id, year, week, department_id, days, site_id, expected_version=v
+            )
+        except VersionConflictError:
+            raise EtagMismatchError("etag_mismatch") from None
+        return self.build_etag(tenant_id, department_id, year, week, new_v)
+
+    # --- Residents helpers (v1) ---
+    def get_effective_residents_for_week(self, department_id: str, year: int, week: int) -> dict:
+        """Return effective residents for lunch/dinner for the given week.
+
+        Uses weekly override from ResidentsWeeklyRepo; falls back to department.resident_count_fixed.
+        """
+        rw = resolve_effective_residents([department_id], year, week)[str(department_id)]
+        return {
+            "lunch": rw.weekly("lunch"),
+            "dinner": rw.weekly("dinner"),
+            "has_override": rw.has_override,
+        }
+
+    def get_effective_residents_for_day(self, department_id: str, year: int, week: int, weekday: int) -> dict:
+        """Precedence:
+        1) Weekly per-day schedule in department_residents_schedule
+        2) Forever per-day schedule
+        3) Weekly override (legacy same-for-week)
+        4) Fixed
+
+        Returns {"lunch": int, "dinner": int, "source": "schedule_week"|"schedule_forever"|"weekly_override"|"fixed"}.
+        Prefer resolve_effective_residents when more than one day or department is needed.
+        """
+        rw = resolve_effective_residents([department_id], year, week)[str(department_id)]
+        return dict(rw.days[int(weekday)])
@@ -4,6 +4,7 @@ from typing import Iterable, Tuple, List, Dict, Any
 
 from .weekview.service import WeekviewService
 from .admin_repo import DietDefaultsRepo
+from .response_cache import cached_payload
 
 
 def compute_weekview_report(
@@ -19,9 +20,28 @@ def compute_weekview_report(
     where each meal has residents_total, special_diets[], normal_diet_count.
     """
     svc = WeekviewService()
+    departments = list(departments)
+    dep_ids = [dep_id for dep_id, _ in departments]
+    inputs = svc.inputs_version(tenant_id, None, year, week, dep_ids)
+    key = None if inputs is None else (str(tenant_id), year, week, departments, inputs)
+    return cached_payload(
+        "weekview_report", key, lambda: _build_weekview_report(svc, tenant_id, year, week, departments, dep_ids)
+    )
+
+
+def _build_weekview_report(
+    svc: WeekviewService,
+    tenant_id: int | str,
+    year: int,
+    week: int,
+    departments: List[Tuple[str, str]],
+    dep_ids: List[str],
+) -> List[Dict[str, Any]]:
+    fetched = svc.fetch_weekview_many(tenant_id, year, week, dep_ids)
+    defaults_by_dep = DietDefaultsRepo().list_for_departments(dep_ids)
     out: List[Dict[str, Any]] = []
     for dep_id, dep_name in departments:
-        payload, _etag = svc.fetch_weekview(tenant_id, year, week, dep_id)
+        payload = fetched[dep_id][0] if dep_id in fetched else {}
         summaries = payload.get("department_summaries") or []
         days = (summaries[0].get("days") if summaries else []) or []
         marks_raw = (summaries[0].get("marks") if summaries else []) or []
@@ -34,7 +54,7 @@ def compute_weekview_report(
         except Exception:
             marked_idx = set()
         # Planned defaults and always_mark flags per department
-        defaults_items = DietDefaultsRepo().list_for_department(dep_id)
+        defaults_items = defaults_by_dep.get(str(dep_id), [])
         planned_map: Dict[str, int] = {str(it["diet_type_id"]): int(it.get("default_count", 0)) for it in defaults_items}
         always_map: Dict[str, bool] = {str(it["diet_type_id"]): bool(it.get("always_mark", False)) for it in defaults_items}
         # Accumulators
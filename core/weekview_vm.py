@@ -39,36 +39,32 @@ def build_weekview_vm(site_id: str, year: int, week: int, tenant_id: int | None
         db.close()
 
     svc = WeekviewService()
+    dep_ids = [str(dep["id"]) for dep in departments]
+    # Site-level loads: one batched weekview fetch plus set-based alt2/defaults/types lookups
+    fetched = svc.fetch_weekview_many(tid, year, week, dep_ids, site_id=site_id)
+    try:
+        alt2_rows_by_dep = Alt2Repo().list_for_departments_week(dep_ids, week)
+    except Exception:
+        alt2_rows_by_dep = {}
+    try:
+        defaults_by_dep = DietDefaultsRepo().list_for_departments(dep_ids)
+        types = DietTypesRepo().list_all(site_id=site_id)
+        name_by_id = {str(it["id"]): str(it["name"]) for it in types}
+        allowed_diet_ids = {str(it["id"]) for it in types}
+    except Exception:
+        defaults_by_dep = {}
+        name_by_id = {}
+        allowed_diet_ids = set()
     deps_out: list[dict[str, Any]] = []
     for dep in departments:
-        dep_id = dep["id"]
-        payload, _ = svc.fetch_weekview(tenant_id=tid, year=year, week=week, department_id=dep_id, site_id=site_id)
+        dep_id = str(dep["id"])
+        payload = fetched[dep_id][0] if dep_id in fetched else {}
         summaries = payload.get("department_summaries") or []
         s = summaries[0] if summaries else {}
         days = s.get("days") or []
+        # alt2_days from the weekview payload already covers the site-scoped weekview_alt2_flags rows
         alt2_days = set(s.get("alt2_days") or [])
-        try:
-            alt2_rows = Alt2Repo().list_for_department_week(dep_id, week)
-            alt2_days.update({int(r.get("weekday")) for r in alt2_rows if bool(r.get("enabled"))})
-        except Exception:
-            pass
-        try:
-            db_alt2 = get_session()
-            rows = db_alt2.execute(
-                text(
-                    "SELECT day_of_week FROM weekview_alt2_flags "
-                    "WHERE site_id=:s AND department_id=:d AND year=:y AND week=:w AND enabled=1"
-                ),
-                {"s": site_id, "d": dep_id, "y": year, "w": week},
-            ).fetchall()
-            alt2_days.update({int(r[0]) for r in rows})
-        except Exception:
-            pass
-        finally:
-            try:
-                db_alt2.close()
-            except Exception:
-                pass
+        alt2_days.update({int(r.get("weekday")) for r in alt2_rows_by_dep.get(dep_id, []) if bool(r.get("enabled"))})
         try:
             for d in days:
                 if not d.get("alt2_lunch"):
@@ -85,15 +81,7 @@ def build_weekview_vm(site_id: str, year: int, week: int, tenant_id: int | None
                     marked_idx.add((int(m.get("day_of_week")), str(m.get("meal")), str(m.get("diet_type"))))
         except Exception:
             marked_idx = set()
-        defaults = []
-        try:
-            defaults = DietDefaultsRepo().list_for_department(dep_id)
-            types = DietTypesRepo().list_all(site_id=site_id)
-            name_by_id = {str(it["id"]): str(it["name"]) for it in types}
-            allowed_diet_ids = {str(it["id"]) for it in types}
-        except Exception:
-            name_by_id = {}
-            allowed_diet_ids = set()
+        defaults = defaults_by_dep.get(dep_id, [])
         defaults_pos = [it for it in (defaults or []) if int(it.get("default_count", 0) or 0) > 0]
         default_count_by_id = {
             str(it.get("diet_type_id")): int(it.get("default_count") or 0)
@@ -154,7 +142,7 @@ def build_weekview_vm(site_id: str, year: int, week: int, tenant_id: int | None
                     )
                 diet_name = name_by_id.get(str(dtid), str(dtid))
                 diet_rows.append({"diet_type_id": str(dtid), "diet_type_name": diet_name, "cells": cells})
-        info_text = (dep.get("info_text") or "").strip()
+        info_text = str(dep.get("info_text") or "").strip()
         deps_out.append(
             {
                 "id": dep_id,
@@ -5,3 +5,27 @@ graceful_timeout = 30
 loglevel = "info"
 accesslog = "-"
 errorlog = "-"
+
+
+def worker_exit(server, worker):  # noqa: ARG001 - gunicorn hook signature
+    # Drain the batched audit writer before the worker goes away
+    from core.audit_sink import shutdown
+
+    shutdown(timeout=graceful_timeout / 2)
+    # Queued menu imports stay pending in the DB (re-run once stale); running ones finish
+    from core import menu_import_jobs
+
+    menu_import_jobs.shutdown(wait=False)
+
+
+def on_starting(server):  # noqa: ARG001 - gunicorn hook signature
+    # Multiprocess metrics: drop files left by a previous master before workers fork
+    from core.metrics_registry import clear_multiprocess_dir
+
+    clear_multiprocess_dir()
+
+
+def child_exit(server, worker):  # noqa: ARG001 - gunicorn hook signature
+    from core.metrics_registry import mark_process_dead
+
+    mark_process_dead(worker.pid)
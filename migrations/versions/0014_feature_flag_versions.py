@@ -0,0 +1,29 @@
+"""Add feature_flag_versions table (cross-worker feature-flag cache version)
+
+Revision ID: 0014_feature_flag_versions
+Revises: 0013_add_remember_to_order_items
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_feature_flag_versions"
+down_revision = "0013_add_remember_to_order_items"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "feature_flag_versions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute("INSERT INTO feature_flag_versions(id, version) VALUES (1, 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("feature_flag_versions")
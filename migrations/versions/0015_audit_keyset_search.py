@@ -0,0 +1,35 @@
+"""Audit keyset index and payload search projection
+
+(ts, id) index backs keyset pagination of GET /admin/audit. On Postgres a pg_trgm GIN index on
+CAST(payload AS VARCHAR) serves the case-insensitive payload search (q). SQLite keeps its FTS5
+side table in core/audit_repo.py (created on first use).
+
+Revision ID: 0015_audit_keyset_search
+Revises: 0014_feature_flag_versions
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0015_audit_keyset_search"
+down_revision = "0014_feature_flag_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_audit_events_ts_id", "audit_events", ["ts", "id"])
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_audit_events_payload_trgm ON audit_events "
+            "USING gin ((CAST(payload AS VARCHAR)) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_audit_events_payload_trgm")
+    op.drop_index("ix_audit_events_ts_id", table_name="audit_events")
@@ -0,0 +1,55 @@
+"""Menu import jobs
+
+Persisted rows for POST /admin/menu-import. (tenant_id, idempotency_key) is unique so a re-upload
+of the same file resolves to the existing job; (status, created_at) serves the stale-job sweep.
+
+Revision ID: 0016_menu_import_jobs
+Revises: 0015_audit_keyset_search
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0016_menu_import_jobs"
+down_revision = "0015_audit_keyset_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "menu_import_jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("site_id", sa.String(length=36), nullable=True),
+        sa.Column("idempotency_key", sa.String(length=128), nullable=False),
+        sa.Column("data_format", sa.String(length=10), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="pending"),
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("payload", sa.LargeBinary(), nullable=True),
+        sa.Column("warnings", sa.JSON(), nullable=True),
+        sa.Column("summary", sa.JSON(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "uq_menu_import_jobs_tenant_key",
+        "menu_import_jobs",
+        ["tenant_id", "idempotency_key"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_menu_import_jobs_status_created", "menu_import_jobs", ["status", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_menu_import_jobs_status_created", table_name="menu_import_jobs")
+    op.drop_index("uq_menu_import_jobs_tenant_key", table_name="menu_import_jobs")
+    op.drop_table("menu_import_jobs")
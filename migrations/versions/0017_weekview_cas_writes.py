@@ -0,0 +1,70 @@
+"""Weekview version bump: let the compare-and-swap write path own it
+
+WeekviewRepo writes now bump weekview_versions once per mutation (UPDATE ... WHERE
+version=:expected RETURNING version) and apply all rows with one multi-row upsert. The per-row
+bump triggers from migrations/sql/2025-11-06_weekview_init.sql would add one more bump per row, so
+bump_weekview_version() returns early when the transaction set yuplan.weekview_cas. Other writers
+to the weekview tables keep the trigger behaviour. Postgres only; SQLite has no triggers.
+
+Revision ID: 0017_weekview_cas_writes
+Revises: 0016_menu_import_jobs
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0017_weekview_cas_writes"
+down_revision = "0016_menu_import_jobs"
+branch_labels = None
+depends_on = None
+
+_BODY = """
+CREATE OR REPLACE FUNCTION bump_weekview_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  {guard}
+  UPDATE weekview_versions
+  SET version = version + 1, updated_at = now()
+  WHERE tenant_id = COALESCE(NEW.tenant_id, OLD.tenant_id)
+    AND department_id = COALESCE(NEW.department_id, OLD.department_id)
+    AND year = COALESCE(NEW.year, OLD.year)
+    AND week = COALESCE(NEW.week, OLD.week);
+  IF NOT FOUND THEN
+    INSERT INTO weekview_versions(tenant_id, department_id, year, week, version)
+    VALUES(COALESCE(NEW.tenant_id, OLD.tenant_id), COALESCE(NEW.department_id, OLD.department_id),
+           COALESCE(NEW.year, OLD.year), COALESCE(NEW.week, OLD.week), 1)
+    ON CONFLICT (tenant_id, department_id, year, week) DO UPDATE SET version = weekview_versions.version + 1, updated_at = now();
+  END IF;
+  IF TG_OP = 'DELETE' THEN
+    RETURN OLD;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+_GUARD = """IF current_setting('yuplan.weekview_cas', true) = 'on' THEN
+    IF TG_OP = 'DELETE' THEN
+      RETURN OLD;
+    END IF;
+    RETURN NEW;
+  END IF;"""
+
+
+def _has_weekview_versions() -> bool:
+    bind = op.get_bind()
+    return bool(bind.exec_driver_sql("SELECT to_regclass('weekview_versions') IS NOT NULL").scalar())
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql" or not _has_weekview_versions():
+        return
+    op.execute(_BODY.format(guard=_GUARD))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql" or not _has_weekview_versions():
+        return
+    op.execute(_BODY.format(guard=""))
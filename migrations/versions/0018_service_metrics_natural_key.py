@@ -0,0 +1,41 @@
+"""Unique natural key on service_metrics
+
+ServiceMetricsService.ingest upserts with ON CONFLICT on (tenant_id, unit_id, date, meal, dish,
+category). dish_id and category are nullable, so the index folds NULL to a sentinel
+(coalesce(dish_id, 0), coalesce(category, '')). Duplicates left by the old per-row ingest are
+collapsed first, keeping the oldest row per key (the one later ingests updated).
+
+Revision ID: 0018_service_metrics_natural_key
+Revises: 0017_weekview_cas_writes
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0018_service_metrics_natural_key"
+down_revision = "0017_weekview_cas_writes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM service_metrics WHERE id NOT IN (
+          SELECT MIN(id) FROM service_metrics
+          GROUP BY tenant_id, unit_id, date, meal, coalesce(dish_id, 0), coalesce(category, '')
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_service_metrics_natural_key ON service_metrics
+          (tenant_id, unit_id, date, meal, coalesce(dish_id, 0), coalesce(category, ''))
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_service_metrics_natural_key")
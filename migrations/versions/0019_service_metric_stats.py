@@ -0,0 +1,46 @@
+"""Rolling statistics for portion recommendations
+
+service_metric_stats holds, per (tenant, unit, dish/category), the recent served_g_per_guest
+samples that PortionRecommendationService blends with the guideline baseline. Rows are filled on
+first use and kept current by ServiceMetricsService.ingest, so no backfill is needed here.
+
+Revision ID: 0019_service_metric_stats
+Revises: 0018_service_metrics_natural_key
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0019_service_metric_stats"
+down_revision = "0018_service_metrics_natural_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "service_metric_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("unit_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("scope", sa.String(length=10), nullable=False),
+        sa.Column("scope_key", sa.String(length=50), nullable=False, server_default=""),
+        sa.Column("sample_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sample_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("samples", sa.JSON(), nullable=False),
+        sa.Column("built_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "uq_service_metric_stats_key",
+        "service_metric_stats",
+        ["tenant_id", "unit_id", "scope", "scope_key"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_service_metric_stats_key", table_name="service_metric_stats")
+    op.drop_table("service_metric_stats")
@@ -0,0 +1,42 @@
+"""Unique natural key on shift_slots
+
+TurnusService.import_shifts bulk-inserts with ON CONFLICT DO NOTHING on (tenant_id, start_ts,
+end_ts, unit, role). unit_id and role are nullable, so the index folds NULL to a sentinel
+(coalesce(unit_id, 0), coalesce(role, '')). Duplicates are collapsed first, keeping the oldest
+row per key.
+
+Revision ID: 0020_shift_slots_natural_key
+Revises: 0019_service_metric_stats
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0020_shift_slots_natural_key"
+down_revision = "0019_service_metric_stats"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE shift_slots SET role = NULL WHERE role = ''")
+    op.execute(
+        """
+        DELETE FROM shift_slots WHERE id NOT IN (
+          SELECT MIN(id) FROM shift_slots
+          GROUP BY tenant_id, start_ts, end_ts, coalesce(unit_id, 0), coalesce(role, '')
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_shift_slots_natural_key ON shift_slots
+          (tenant_id, start_ts, end_ts, coalesce(unit_id, 0), coalesce(role, ''))
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_shift_slots_natural_key")
@@ -20,6 +20,12 @@ def _parse_args() -> argparse.Namespace:
         action="store_true",
         help="Only count candidates, do not delete.",
     )
+    p.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Rows deleted per transaction (default 1000); keeps write locks short.",
+    )
     return p.parse_args()
 
 
@@ -49,19 +55,10 @@ def count_before(cutoff: datetime) -> int:
         db.close()
 
 
-def purge_before(cutoff: datetime) -> int:
-    from sqlalchemy import delete
+def purge_before(cutoff: datetime, batch_size: int = 1000) -> int:
+    from core.audit_repo import AuditRepo
 
-    from core.db import get_session
-    from core.models import AuditEvent
-
-    db = get_session()
-    try:
-        res = db.execute(delete(AuditEvent).where(AuditEvent.ts < cutoff))
-        db.commit()
-        return res.rowcount or 0
-    finally:
-        db.close()
+    return AuditRepo().purge_before(cutoff, batch_size=batch_size)
 
 
 def main() -> int:
@@ -69,6 +66,9 @@ def main() -> int:
     if args.days < 1:
         print("days must be >= 1", file=sys.stderr)
         return 2
+    if args.batch_size < 1:
+        print("batch-size must be >= 1", file=sys.stderr)
+        return 2
     _ensure_db()
     cutoff = datetime.now(UTC) - timedelta(days=args.days)
     try:
@@ -76,7 +76,7 @@ def main() -> int:
             n = count_before(cutoff)
             print(f"[DRY-RUN] would delete {n} audit events older than {cutoff.isoformat()}")
         else:
-            deleted = purge_before(cutoff)
+            deleted = purge_before(cutoff, batch_size=args.batch_size)
             print(f"deleted {deleted} audit events older than {cutoff.isoformat()}")
         return 0
     except Exception as e:  # pragma: no cover
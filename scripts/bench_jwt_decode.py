@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark jwt_utils.decode throughput with 1 vs 5 rotating secrets.
+
+Usage:
+    python scripts/bench_jwt_decode.py [--n N]
+
+Modes per secret count (token signed by the last secret, i.e. worst case for trial order):
+    legacy     : decode() with the previous verification (hmac.new(secret.encode()) per candidate
+                 in list order) swapped in and the cache disabled, as the baseline
+    keyed      : decode() with prepared kid-indexed HMAC keys, verification cache disabled
+    cached     : decode() with the verification cache warm (steady state for repeat Bearer calls)
+
+Exit codes:
+    0 = always (informational)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hmac
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core import jwt_utils  # noqa: E402
+from core.jwt_utils import _sign, decode, issue_token_pair  # noqa: E402
+
+
+class _LegacyRing:
+    """Previous verification: re-key hmac.new(secret.encode()) for each candidate, in list order."""
+
+    def __init__(self, candidates: tuple[str, ...]) -> None:
+        self.candidates = candidates
+
+    def verify(self, msg: bytes, sig: str, kid: object) -> bool:
+        return any(hmac.compare_digest(_sign(msg, s), sig) for s in self.candidates)
+
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - t0)
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description="JWT decode throughput")
+    p.add_argument("--n", type=int, default=50_000)
+    args = p.parse_args(argv)
+
+    print(f"{'secrets':>7} {'mode':>8} {'decodes/s':>12} {'vs legacy':>9}")
+    for count in (1, 5):
+        secrets = [f"bench-secret-{i}" for i in range(count)]
+        token, _, _ = issue_token_pair(user_id=1, role="admin", tenant_id=1, secret=secrets[-1])
+        primary = secrets[0]
+
+        jwt_utils.configure_verify_cache(0)
+        keyring = jwt_utils._keyring
+        jwt_utils._keyring = _LegacyRing  # type: ignore[assignment]
+        try:
+            legacy = _rate(lambda: decode(token, secret=primary, secrets_list=secrets), args.n)
+        finally:
+            jwt_utils._keyring = keyring  # type: ignore[assignment]
+        keyed = _rate(lambda: decode(token, secret=primary, secrets_list=secrets), args.n)
+        jwt_utils.configure_verify_cache(4096)
+        decode(token, secret=primary, secrets_list=secrets)
+        cached = _rate(lambda: decode(token, secret=primary, secrets_list=secrets), args.n)
+        for mode, rate in (("legacy", legacy), ("keyed", keyed), ("cached", cached)):
+            print(f"{count:>7} {mode:>8} {rate:>12,.0f} {rate / legacy:>8.1f}x")
+    jwt_utils.configure_verify_cache()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark MenuImportService.apply on a synthetic 52-week menu.
+
+Usage:
+    python scripts/bench_menu_import.py [--weeks N] [--dishes N] [--skip-legacy]
+
+Builds N weeks (default 52) x 7 days x (lunch alt1/alt2/dessert + dinner alt1) drawn from a pool of
+distinct dish names, imports it into a fresh SQLite file, then re-imports it with ~10% of the slots
+changed. Each run is timed and its COMMITs counted:
+
+    legacy : the previous per-item path (dish lookup + commit per new dish, set_variant with its own
+             session/commit per changed slot), as the baseline
+    bulk   : MenuImportService.apply (one transaction per upload)
+
+Exit codes:
+    0 = both paths produced the same summary
+    1 = summaries differ
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import event  # noqa: E402
+
+from core import db as core_db  # noqa: E402
+from core.importers.base import ImportedMenuItem, MenuImportResult, WeekImport  # noqa: E402
+from core.menu_import_service import MenuImportService  # noqa: E402
+from core.menu_service import MenuServiceDB  # noqa: E402
+from core.models import Base, Dish, MenuVariant  # noqa: E402
+
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+SLOTS = (("lunch", "alt1"), ("lunch", "alt2"), ("lunch", "dessert"), ("dinner", "alt1"))
+
+
+def _menu(weeks: int, pool: int, seed: int, change: float = 0.0) -> MenuImportResult:
+    rnd = random.Random(seed)
+    out = []
+    for w in range(1, weeks + 1):
+        items = []
+        for d_i, day in enumerate(DAYS):
+            for s_i, (meal, vtype) in enumerate(SLOTS):
+                n = (w * 31 + d_i * 7 + s_i) % pool
+                if change and rnd.random() < change:
+                    n = (n + 1) % pool
+                items.append(
+                    ImportedMenuItem(day=day, meal=meal, variant_type=vtype, dish_name=f"Rätt {n}")
+                )
+        out.append(WeekImport(year=2030, week=w, items=items))
+    return MenuImportResult(weeks=out)
+
+
+def _legacy_apply(tenant_id: int, site_id: str, result: MenuImportResult) -> dict:
+    """Previous MenuImportService.apply, kept here as the comparison baseline."""
+    menu_service = MenuServiceDB()
+    summary = []
+    db = core_db.get_session()
+    try:
+        for week_block in result.weeks:
+            created = updated = skipped = 0
+            menu = menu_service.create_or_get_menu(tenant_id, site_id, week_block.week, week_block.year)
+            rows = db.query(MenuVariant).filter_by(menu_id=menu.id).all()
+            existing_map = {(r.day, r.meal, r.variant_type): r.dish_id for r in rows}
+            for item in week_block.items:
+                dish = db.query(Dish).filter_by(tenant_id=tenant_id, name=item.dish_name).first()
+                if dish is None:
+                    dish = Dish(tenant_id=tenant_id, name=item.dish_name, category=item.category)
+                    db.add(dish)
+                    db.commit()
+                    db.refresh(dish)
+                prev = existing_map.get((item.day, item.meal, item.variant_type))
+                if prev == dish.id:
+                    skipped += 1
+                    continue
+                if prev is None:
+                    created += 1
+                else:
+                    updated += 1
+                menu_service.set_variant(
+                    tenant_id, menu.id, item.day, item.meal, item.variant_type, dish.id
+                )
+            summary.append(
+                {
+                    "week": week_block.week,
+                    "year": week_block.year,
+                    "created": created,
+                    "updated": updated,
+                    "skipped": skipped,
+                    "total": len(week_block.items),
+                }
+            )
+        return {"weeks": summary, "warnings": result.warnings, "errors": result.errors}
+    finally:
+        db.close()
+
+
+def _run(label: str, apply, first: MenuImportResult, second: MenuImportResult):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    try:
+        engine = core_db.init_engine(f"sqlite:///{tmp.name}", force=True)
+        Base.metadata.create_all(engine)
+        commits = {"n": 0}
+
+        def _on_commit(_conn):
+            commits["n"] += 1
+
+        event.listen(engine, "commit", _on_commit)
+        results = []
+        for phase, data in (("initial", first), ("reimport", second)):
+            commits["n"] = 0
+            t0 = time.perf_counter()
+            out = apply(1, "bench-site", data)
+            elapsed = time.perf_counter() - t0
+            totals = {k: sum(w[k] for w in out["weeks"]) for k in ("created", "updated", "skipped")}
+            print(
+                f"{label:>7} {phase:>9} {elapsed * 1000:>10.0f} {commits['n']:>8} "
+                f"{totals['created']:>8} {totals['updated']:>8} {totals['skipped']:>8}"
+            )
+            results.append(out["weeks"])
+        engine.dispose()
+        return results
+    finally:
+        os.unlink(tmp.name)
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description="Menu import benchmark")
+    p.add_argument("--weeks", type=int, default=52)
+    p.add_argument("--dishes", type=int, default=400)
+    p.add_argument("--skip-legacy", action="store_true")
+    args = p.parse_args(argv)
+
+    first = _menu(args.weeks, args.dishes, seed=1)
+    second = _menu(args.weeks, args.dishes, seed=2, change=0.1)
+    items = sum(len(w.items) for w in first.weeks)
+    print(f"weeks={args.weeks} items/upload={items} dish pool={args.dishes}")
+    print(f"{'path':>7} {'phase':>9} {'ms':>10} {'commits':>8} {'created':>8} {'updated':>8} {'skipped':>8}")
+    bulk = _run("bulk", MenuImportService(MenuServiceDB()).apply, first, second)
+    if args.skip_legacy:
+        return 0
+    legacy = _run("legacy", _legacy_apply, first, second)
+    return 0 if legacy == bulk else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
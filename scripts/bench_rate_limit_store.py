@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: memory rate limiters under a flood of distinct keys.
+
+Usage:
+    python scripts/bench_rate_limit_store.py [--keys N] [--max-keys CAP] [--strategy fixed|token_bucket]
+
+Drives N distinct keys (default 1,000,000) through MemoryRateLimiter / MemoryTokenBucketRateLimiter
+backed by a BucketStore capped at CAP keys (default RATE_LIMIT_MAX_KEYS or 100,000) and samples
+traced memory every N/10 calls. With the bounded store the samples flatten once the cap is
+reached; with the old plain dicts they grew linearly.
+
+Exit codes:
+    0 = store stayed within the cap and memory was flat over the second half of the run
+    1 = key count exceeded the cap or memory kept growing (>10% over the second half)
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.rate_limit_store import BucketStore  # noqa: E402
+from core.rate_limiter_memory import MemoryRateLimiter  # noqa: E402
+from core.rate_limiter_token_bucket_memory import MemoryTokenBucketRateLimiter  # noqa: E402
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--keys", type=int, default=1_000_000)
+    p.add_argument("--max-keys", type=int, default=None)
+    p.add_argument("--strategy", choices=("fixed", "token_bucket"), default="fixed")
+    args = p.parse_args(argv)
+
+    store = BucketStore(max_keys=args.max_keys)
+    limiter = (
+        MemoryTokenBucketRateLimiter(store=store)
+        if args.strategy == "token_bucket"
+        else MemoryRateLimiter(store=store)
+    )
+    step = max(1, args.keys // 10)
+    samples: list[tuple[int, int, int]] = []
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for i in range(args.keys):
+        limiter.allow(f"tenant:{i % 997}:user:{i}", quota=10, per_seconds=60)
+        if (i + 1) % step == 0:
+            samples.append((i + 1, len(store), tracemalloc.get_traced_memory()[0]))
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+
+    print(f"strategy={args.strategy} keys={args.keys} cap={store.max_keys} stripes={store.stats()['stripes']}")
+    print(f"{'calls':>10} {'live_keys':>10} {'traced_mib':>11}")
+    for calls, live, mem in samples:
+        print(f"{calls:>10} {live:>10} {mem / 2**20:>11.1f}")
+    print(f"{args.keys / elapsed:,.0f} allow()/s (under tracemalloc); stats={store.stats()}")
+
+    if any(live > store.max_keys for _c, live, _m in samples):
+        print("[FAIL] store exceeded its key cap", file=sys.stderr)
+        return 1
+    half = samples[len(samples) // 2 :]
+    if len(half) >= 2 and half[-1][2] > half[0][2] * 1.10:
+        print("[FAIL] memory kept growing over the second half of the flood", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark ServiceMetricsService.ingest on a synthetic day of kitchen metrics.
+
+Usage:
+    python scripts/bench_service_metrics_ingest.py [--rows N] [--skip-legacy]
+
+Builds N rows (default 50000) spread over units x meals x categories for one tenant, ingests them
+into a fresh SQLite file, then re-ingests the same keys with changed values (update path). Each
+run is timed and its statements counted:
+
+    legacy : the previous per-row path (query(...).first() per row, ORM insert/update), as the
+             baseline
+    bulk   : ServiceMetricsService.ingest (de-duplicated multi-row INSERT ... ON CONFLICT)
+
+Exit codes:
+    0 = both paths reported the same inserted/updated counts and stored the same rows
+    1 = results differ
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import and_, event  # noqa: E402
+
+from core import db as core_db  # noqa: E402
+from core.models import Base, ServiceMetric  # noqa: E402
+from core.service_metrics_service import ServiceMetricsService  # noqa: E402
+
+MEALS = ("lunch", "dinner", "evening")
+CATEGORIES = ("main", "side", "dessert", "soup", "salad", "bread", "drink", "extra")
+
+
+def _rows(n: int, bump: float = 0.0) -> list[dict]:
+    per_unit = len(MEALS) * len(CATEGORIES)
+    out = []
+    for i in range(n):
+        unit, rest = divmod(i, per_unit)
+        meal, cat = divmod(rest, len(CATEGORIES))
+        produced = 5.0 + (i % 7) + bump
+        out.append(
+            {
+                "unit_id": unit + 1,
+                "date": "2030-05-06",
+                "meal": MEALS[meal],
+                "category": CATEGORIES[cat],
+                "guest_count": 20 + (i % 30),
+                "produced_qty_kg": produced,
+                "served_qty_kg": produced - 1.0,
+                "leftover_qty_kg": 1.0,
+            }
+        )
+    return out
+
+
+def _legacy_ingest(tenant_id: int, rows: list[dict]) -> dict:
+    """Previous ServiceMetricsService.ingest, kept here as the comparison baseline."""
+    svc = ServiceMetricsService()
+    db = core_db.get_session()
+    inserted = updated = 0
+    errors: list[str] = []
+    try:
+        for r in rows:
+            try:
+                norm = svc._normalize_row(r)
+            except ValueError as e:
+                errors.append(str(e))
+                continue
+            norm["tenant_id"] = tenant_id
+            key_filter = and_(
+                ServiceMetric.tenant_id == tenant_id,
+                ServiceMetric.unit_id == norm["unit_id"],
+                ServiceMetric.date == norm["date"],
+                ServiceMetric.meal == norm["meal"],
+                ServiceMetric.dish_id.is_(norm["dish_id"])
+                if norm["dish_id"] is None
+                else ServiceMetric.dish_id == norm["dish_id"],
+                ServiceMetric.category == norm["category"],
+            )
+            existing = db.query(ServiceMetric).filter(key_filter).first()
+            if existing:
+                updated += 1
+                for f in (
+                    "guest_count",
+                    "produced_qty_kg",
+                    "served_qty_kg",
+                    "leftover_qty_kg",
+                    "served_g_per_guest",
+                ):
+                    setattr(existing, f, norm.get(f))
+            else:
+                db.add(ServiceMetric(**norm))
+                inserted += 1
+        db.commit()
+        return {"ok": True, "inserted": inserted, "updated": updated, "errors": errors}
+    finally:
+        db.close()
+
+
+def _snapshot() -> list[tuple]:
+    db = core_db.get_session()
+    try:
+        return sorted(
+            (m.unit_id, m.meal, m.category, m.guest_count, m.produced_qty_kg, m.served_g_per_guest)
+            for m in db.query(ServiceMetric).filter(ServiceMetric.date == date(2030, 5, 6))
+        )
+    finally:
+        db.close()
+
+
+def _run(label: str, ingest, first: list[dict], second: list[dict]):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    try:
+        engine = core_db.init_engine(f"sqlite:///{tmp.name}", force=True)
+        Base.metadata.create_all(engine)
+        stmts = {"n": 0}
+
+        def _on_exec(*_args):
+            stmts["n"] += 1
+
+        event.listen(engine, "before_cursor_execute", _on_exec)
+        results = []
+        for phase, data in (("initial", first), ("update", second)):
+            stmts["n"] = 0
+            t0 = time.perf_counter()
+            out = ingest(1, data)
+            elapsed = time.perf_counter() - t0
+            print(
+                f"{label:>7} {phase:>8} {elapsed * 1000:>10.0f} {stmts['n']:>10} "
+                f"{out['inserted']:>9} {out['updated']:>8} {len(data) / elapsed:>10.0f}"
+            )
+            results.append((out["inserted"], out["updated"]))
+        results.append(_snapshot())
+        engine.dispose()
+        return results
+    finally:
+        os.unlink(tmp.name)
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description="Service metrics ingest benchmark")
+    p.add_argument("--rows", type=int, default=50_000)
+    p.add_argument("--skip-legacy", action="store_true")
+    args = p.parse_args(argv)
+
+    first = _rows(args.rows)
+    second = _rows(args.rows, bump=0.5)
+    print(f"rows/ingest={args.rows}")
+    print(f"{'path':>7} {'phase':>8} {'ms':>10} {'statements':>10} {'inserted':>9} {'updated':>8} {'rows/s':>10}")
+    bulk = _run("bulk", ServiceMetricsService().ingest, first, second)
+    if args.skip_legacy:
+        return 0
+    legacy = _run("legacy", _legacy_ingest, first, second)
+    return 0 if legacy == bulk else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
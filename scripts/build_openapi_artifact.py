@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Build the /openapi.json artifact from the live spec builder.
+
+Usage:
+    python scripts/build_openapi_artifact.py [OUT] [--check]
+
+Writes canonical JSON bytes to OUT (default: openapi.json) plus OUT.gz. Point
+OPENAPI_ARTIFACT_PATH at OUT to serve it; the app verifies it against the live
+builder at startup unless OPENAPI_VERIFY_ARTIFACT=0.
+
+Exit codes:
+    0 = OK (written, or --check and up to date)
+    1 = --check and OUT is missing or stale
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.app_factory import create_app  # noqa: E402
+from core.openapi_artifact import OpenAPIArtifact, load_artifact, write_artifact  # noqa: E402
+
+
+def main(argv: list[str]) -> int:
+    check = "--check" in argv
+    args = [a for a in argv if not a.startswith("--")]
+    out = Path(args[0] if args else "openapi.json")
+    app = create_app({"TESTING": True, "SECRET_KEY": "build", "database_url": "sqlite:///:memory:"})
+    builder = app.extensions["openapi_artifact"].builder
+    spec = builder()
+    if check:
+        current = load_artifact(out)
+        live = OpenAPIArtifact.from_spec(spec)
+        if current is None or current.etag != live.etag:
+            print(f"[STALE] {out} does not match the live spec (live etag {live.etag})", file=sys.stderr)
+            return 1
+        print(f"[OK] {out} up to date ({live.etag})")
+        return 0
+    artifact = write_artifact(spec, out)
+    print(f"[OK] wrote {out} ({len(artifact.body)} bytes, etag {artifact.etag})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -311,11 +311,11 @@ class TestAdminWriteEndpoints:
         
         # Admin can access
         response = client.get("/admin/menu-import/uuid-123", headers={"X-User-Role": "admin", "X-Tenant-Id": "1"})
-        assert response.status_code == 501  # Not implemented but authorized
+        assert response.status_code == 404  # Authorized; no such job
         
         # Editor can access  
         response = client.get("/admin/menu-import/uuid-123", headers={"X-User-Role": "editor", "X-Tenant-Id": "1"})
-        assert response.status_code == 501  # Not implemented but authorized
+        assert response.status_code == 404  # Authorized; no such job
         
         # Viewer cannot access
         response = client.get("/admin/menu-import/uuid-123", headers={"X-User-Role": "viewer", "X-Tenant-Id": "1"})
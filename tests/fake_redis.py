@@ -0,0 +1,143 @@
+"""Minimal fakeredis-style stand-in for the rate limiter Lua scripts.
+
+Registered scripts run as real Lua 5.1 (Redis' dialect) through lupa when it is installed, with
+redis.call served from this fake's storage and clock (advance()). Without lupa they fall back to
+Python mirrors of the same KEYS/ARGV -> reply contract; tests/test_rate_limiter_lua_scripts.py
+checks that both agree. Every script call or command counts as one round trip (``calls``) so
+tests can assert one call per decision.
+"""
+
+from __future__ import annotations
+
+import math
+
+from core.rate_limiter_redis import FIXED_WINDOW_LUA
+from core.rate_limiter_token_bucket_redis import TOKEN_BUCKET_LUA
+
+try:  # optional: pip install lupa
+    from lupa.lua51 import LuaRuntime
+except ImportError:  # pragma: no cover - depends on the environment
+    LuaRuntime = None
+
+
+class FakeRedis:
+    def __init__(self, now_ms=None, lua=None):
+        self._data: dict[str, tuple[object, float | None]] = {}
+        self._t_ms = 1_000_000.0
+        self._now_ms = now_ms or (lambda: self._t_ms)
+        self.calls = 0
+        # lua=None: run scripts as Lua when lupa is installed; False forces the Python mirrors
+        if lua and LuaRuntime is None:
+            raise RuntimeError("lupa is not installed")
+        self.lua = LuaRuntime is not None if lua is None else bool(lua)
+
+    def advance(self, seconds: float) -> None:
+        self._t_ms += seconds * 1000
+
+    # --- storage with PX expiry ---
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, exp = item
+        if exp is not None and exp <= self._now_ms():
+            del self._data[key]
+            return None
+        return value
+
+    def _set(self, key, value, px=None):
+        self._data[key] = (value, None if px is None else self._now_ms() + float(px))
+
+    def _pttl(self, key) -> int:
+        if self._get(key) is None:
+            return -2
+        exp = self._data[key][1]
+        return -1 if exp is None else int(exp - self._now_ms())
+
+    def pttl(self, key) -> int:
+        self.calls += 1
+        return self._pttl(key)
+
+    def register_script(self, source: str):
+        if self.lua:
+            impl = self._lua_script(source)
+        else:
+            impl = {FIXED_WINDOW_LUA: self._fixed_window, TOKEN_BUCKET_LUA: self._token_bucket}[source]
+
+        def _run(keys, args):
+            self.calls += 1
+            return impl(keys, args)
+
+        return _run
+
+    # --- real Lua: the script body as a function of KEYS, ARGV and a redis.call shim ---
+    def _lua_script(self, source: str):
+        rt = LuaRuntime(unpack_returned_tuples=True)
+        fn = rt.execute(f"return function(KEYS, ARGV, redis)\n{source}\nend")
+        shim = rt.table_from({"call": self._lua_call})
+
+        def _impl(keys, args):
+            # Redis hands scripts string arguments and truncates Lua numbers in replies
+            reply = fn(rt.table_from(list(keys)), rt.table_from([str(a) for a in args]), shim)
+            return [int(reply[i]) for i in range(1, len(reply) + 1)]
+
+        return _impl
+
+    def _lua_call(self, command, *args):
+        cmd = str(command).upper()
+        if cmd == "INCRBY":
+            key, by = args
+            value = int(self._get(key) or 0) + int(by)
+            exp = self._data[key][1] if key in self._data else None
+            self._data[key] = (value, exp)
+            return value
+        if cmd == "PTTL":
+            return self._pttl(args[0])
+        if cmd == "PEXPIRE":
+            if self._get(args[0]) is None:
+                return 0
+            self._data[args[0]] = (self._data[args[0]][0], self._now_ms() + float(args[1]))
+            return 1
+        if cmd == "GET":
+            value = self._get(args[0])
+            return False if value is None else str(value)
+        if cmd == "SET":
+            key, value, opt, px = args
+            assert str(opt).upper() == "PX"
+            self._set(key, value, px=px)
+            return "OK"
+        raise NotImplementedError(cmd)
+
+    # --- Python mirrors of the Lua scripts ---
+    def _fixed_window(self, keys, args):
+        key, window_ms, want = keys[0], int(args[0]), int(args[1])
+        count = int(self._get(key) or 0) + want
+        ttl = self._pttl(key)
+        if count == want or ttl < 0:
+            self._set(key, count, px=window_ms)
+            ttl = window_ms
+        else:
+            self._data[key] = (count, self._data[key][1])
+        return [count, ttl]
+
+    def _token_bucket(self, keys, args):
+        key = keys[0]
+        now_ms, capacity, rate, cost = float(args[0]), float(args[1]), float(args[2]), float(args[3])
+        raw = self._get(key)
+        tokens, last_ms = capacity, now_ms
+        if raw is not None:
+            t, _, l = str(raw).partition(":")
+            tokens, last_ms = float(t), float(l)
+        if now_ms > last_ms:
+            tokens = min(capacity, tokens + (now_ms - last_ms) * rate)
+            last_ms = now_ms
+        granted, retry_ms = 0, 0
+        if cost > 0:
+            granted = min(int(cost), math.floor(tokens))
+            tokens -= granted
+        if granted == 0 and tokens < 1.0:
+            retry_ms = math.ceil((1.0 - tokens) / rate) if rate > 0 else 1000
+        if cost > 0:
+            ttl_ms = max(1, math.ceil(capacity / rate)) if rate > 0 else 1000
+            self._set(key, f"{tokens:.6f}:{int(last_ms)}", px=ttl_ms)
+        return [granted, math.floor(tokens), retry_ms]
@@ -0,0 +1,63 @@
+import gzip
+import json
+
+from core.app_factory import create_app
+from core.openapi_artifact import write_artifact
+
+
+def _app(tmp_path, **cfg):
+    return create_app(
+        {"TESTING": True, "SECRET_KEY": "test", "database_url": f"sqlite:///{tmp_path / 'db.sqlite'}", **cfg}
+    )
+
+
+def test_spec_built_once_with_strong_etag_and_304(tmp_path):
+    app = _app(tmp_path)
+    holder = app.extensions["openapi_artifact"]
+    c = app.test_client()
+    r1 = c.get("/openapi.json")
+    assert r1.status_code == 200
+    etag = r1.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert r1.get_json()["openapi"].startswith("3.")
+    r2 = c.get("/openapi.json", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.headers["ETag"] == etag
+    assert not r2.data
+    assert holder.builds == 1
+
+
+def test_gzip_bytes_when_accepted(tmp_path):
+    c = _app(tmp_path).test_client()
+    plain = c.get("/openapi.json")
+    r = c.get("/openapi.json", headers={"Accept-Encoding": "gzip, deflate"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["ETag"] != plain.headers["ETag"]
+    assert r.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert "Accept-Encoding" in r.headers["Vary"]
+    assert gzip.decompress(r.data) == plain.data
+
+    # Each tag only revalidates its own encoding
+    gz = {"Accept-Encoding": "gzip"}
+    again = c.get("/openapi.json", headers={**gz, "If-None-Match": r.headers["ETag"]})
+    assert again.status_code == 304 and again.headers["ETag"] == r.headers["ETag"]
+    assert c.get("/openapi.json", headers={**gz, "If-None-Match": plain.headers["ETag"]}).status_code == 200
+    assert c.get("/openapi.json", headers={"If-None-Match": r.headers["ETag"]}).status_code == 200
+
+
+def test_prebuilt_artifact_verified_at_startup(tmp_path):
+    app = _app(tmp_path)
+    path = tmp_path / "openapi.json"
+    good = write_artifact(app.extensions["openapi_artifact"].builder(), path)
+
+    app2 = _app(tmp_path, OPENAPI_ARTIFACT_PATH=str(path))
+    assert app2.test_client().get("/openapi.json").headers["ETag"] == good.etag
+
+    spec = json.loads(path.read_bytes())
+    spec["info"]["title"] = "stale"
+    write_artifact(spec, path)
+    app3 = _app(tmp_path, OPENAPI_ARTIFACT_PATH=str(path))
+    r = app3.test_client().get("/openapi.json")
+    # Stale artifact is rejected in favour of the live spec
+    assert r.headers["ETag"] == good.etag
+    assert r.get_json()["info"]["title"] != "stale"
@@ -54,3 +54,12 @@ def test_planera_week_csv_export_and_304(client_admin):
     assert r2.status_code == 304
     assert r2.get_data(as_text=True) == ""
 
+
+    # The gzip body gets its own ETag; each tag only revalidates its own encoding
+    url = f"/api/planera/week/csv?site_id={site_id}&year={year}&week={week}"
+    gz = {**_h("admin"), "Accept-Encoding": "gzip"}
+    r3 = client_admin.get(url, headers=gz)
+    assert r3.headers["Content-Encoding"] == "gzip"
+    assert r3.headers["ETag"] == etag[:-1] + '-gzip"'
+    assert client_admin.get(url, headers={**gz, "If-None-Match": r3.headers["ETag"]}).status_code == 304
+    assert client_admin.get(url, headers={**gz, "If-None-Match": etag}).status_code == 200
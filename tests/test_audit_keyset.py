@@ -0,0 +1,112 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from core.audit_repo import AuditCursorError, AuditQueryFilters, AuditRepo
+from core.db import get_session
+from core.models import AuditEvent
+
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1", "X-Tenant-Id": "1"}
+
+
+def _clear():
+    db = get_session()
+    try:
+        db.query(AuditEvent).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def _cleanup(app_session):
+    yield
+    _clear()
+
+
+def _seed(n, ts=None, tenant_id=1):
+    ts = ts or datetime.now(UTC) - timedelta(minutes=1)
+    AuditRepo().insert_many(
+        [
+            {
+                "ts": ts,
+                "event": f"evt{i}",
+                "tenant_id": tenant_id,
+                "actor_user_id": None,
+                "actor_role": "admin",
+                "payload": {"i": i},
+                "request_id": None,
+            }
+            for i in range(n)
+        ]
+    )
+
+
+def test_keyset_walks_every_row_once_with_ts_ties(app_session):
+    _clear()
+    _seed(25)  # identical ts: ordering falls back to id DESC
+    repo = AuditRepo()
+    seen, cursor = [], None
+    while True:
+        rows, cursor = repo.query_keyset(AuditQueryFilters(), size=10, cursor=cursor)
+        seen.extend(r.id for r in rows)
+        if cursor is None:
+            break
+    assert len(seen) == 25 and seen == sorted(seen, reverse=True)
+
+
+def test_bad_cursor_rejected(app_session):
+    with pytest.raises(AuditCursorError):
+        AuditRepo().query_keyset(AuditQueryFilters(), size=5, cursor="not-a-cursor")
+
+
+def test_text_search_uses_projection_for_rows_written_before_bootstrap(app_session):
+    _clear()
+    db = get_session()
+    try:
+        db.add(AuditEvent(ts=datetime.now(UTC), event="direct", payload={"note": "Zebra_Stripes"}))
+        db.commit()
+    finally:
+        db.close()
+    _seed(3)
+    rows, total = AuditRepo().query(AuditQueryFilters(text="zebra_str"), page=1, size=10)
+    assert total == 1 and rows[0].event == "direct"
+    _clear()
+    assert AuditRepo().query(AuditQueryFilters(text="zebra"), page=1, size=10)[1] == 0
+
+
+def test_purge_deletes_in_batches(app_session):
+    _clear()
+    _seed(23, ts=datetime.now(UTC) - timedelta(days=30))
+    _seed(2)
+    assert AuditRepo().purge_older_than(7, batch_size=5) == 23
+    assert AuditRepo().count(AuditQueryFilters()) == (2, True)
+
+
+def test_api_cursor_mode_with_total(client_admin):
+    _clear()
+    _seed(7)
+    r1 = client_admin.get("/admin/audit?cursor=&size=5&total=exact", headers=ADMIN)
+    assert r1.status_code == 200
+    body = r1.get_json()
+    assert len(body["items"]) == 5
+    assert body["meta"]["total"] == 7 and body["meta"]["total_exact"] is True
+    nxt = body["meta"]["next_cursor"]
+    r2 = client_admin.get(f"/admin/audit?cursor={nxt}&size=5&total=approx", headers=ADMIN)
+    body2 = r2.get_json()
+    assert len(body2["items"]) == 2 and body2["meta"]["next_cursor"] is None
+    assert body2["meta"]["total"] == 7
+    assert client_admin.get("/admin/audit?cursor=%%%", headers=ADMIN).status_code == 400
+
+
+def test_openapi_documents_cursor_mode(client_admin):
+    spec = client_admin.get("/openapi.json").get_json()
+    op = spec["paths"]["/admin/audit"]["get"]
+    params = {p["name"]: p for p in op["parameters"]}
+    assert "cursor" in params
+    assert params["total"]["schema"]["enum"] == ["exact", "approx"]
+    schema = op["responses"]["200"]["content"]["application/json"]["schema"]
+    refs = {s["$ref"].rsplit("/", 1)[-1] for s in schema["oneOf"]}
+    assert refs == {"PageResponse_AuditView", "KeysetResponse_AuditView"}
+    meta = spec["components"]["schemas"]["KeysetMeta"]["properties"]
+    assert {"next_cursor", "total", "total_exact"} <= set(meta)
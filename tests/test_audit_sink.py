@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from core import audit_sink
+from core.app_factory import create_app
+from core.audit import log_event
+from core.audit_sink import AsyncAuditSink, SyncAuditSink
+from core.db import get_session
+from core.models import AuditEvent, Base
+
+
+def _rows(event):
+    db = get_session()
+    try:
+        return db.query(AuditEvent).filter(AuditEvent.event == event).count()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    # The flusher runs on its own thread/connection, so it needs a DB file rather than :memory:
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'audit_sink.db'}")
+    app = create_app({"TESTING": True, "SECRET_KEY": "test"})
+    from core import db as core_db
+
+    Base.metadata.create_all(core_db._engine)
+    return app
+
+
+@pytest.fixture
+def use_sink(file_db, monkeypatch):
+    sinks = []
+
+    def _install(sink):
+        monkeypatch.setattr(audit_sink, "_instance", sink)
+        sinks.append(sink)
+        return sink
+
+    yield _install
+    for s in sinks:
+        s.close()
+
+
+def test_testing_app_defaults_to_sync_sink(app_session):
+    assert isinstance(audit_sink.get_audit_sink(), SyncAuditSink)
+
+
+def test_async_sink_writes_size_batches_and_flushes(use_sink):
+    sink = use_sink(AsyncAuditSink(batch_size=50, flush_interval_ms=10_000))
+    for i in range(120):
+        log_event("bulk_update", tenant_id=1, n=i)
+    assert sink.flush(timeout=5)
+    assert _rows("bulk_update") == 120
+    st = sink.stats()
+    assert st["batches"] == 3 and st["max_batch"] == 50
+    assert st["queue_depth"] == 0 and st["flush_ms_max"] is not None
+
+
+def test_async_sink_flushes_on_interval(use_sink):
+    use_sink(AsyncAuditSink(batch_size=1000, flush_interval_ms=30))
+    for _ in range(3):
+        log_event("interval_evt", tenant_id=1)
+    deadline = time.monotonic() + 3
+    while _rows("interval_evt") < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _rows("interval_evt") == 3
+
+
+@pytest.mark.parametrize("policy, expected_rows", [("drop", 0), ("sync", 1)])
+def test_full_queue_policy(use_sink, monkeypatch, policy, expected_rows):
+    sink = use_sink(AsyncAuditSink(max_queue=1, full_policy=policy))
+    # Keep the flusher from draining so the queue stays full
+    monkeypatch.setattr(sink, "_ensure_thread", lambda: None)
+    log_event("queued_evt", tenant_id=1)
+    log_event(f"overflow_{policy}", tenant_id=1)
+    assert _rows(f"overflow_{policy}") == expected_rows
+    assert sink.stats()["dropped"] == (1 if policy == "drop" else 0)
+
+
+def test_close_drains_then_writes_inline(use_sink):
+    sink = use_sink(AsyncAuditSink(batch_size=1000, flush_interval_ms=10_000))
+    log_event("before_close", tenant_id=1)
+    sink.close(timeout=5)
+    assert _rows("before_close") == 1
+    log_event("after_close", tenant_id=1)
+    assert _rows("after_close") == 1
+
+
+def test_failed_batch_is_retried_row_by_row(use_sink, caplog):
+    sink = use_sink(AsyncAuditSink(batch_size=1000, flush_interval_ms=10_000))
+    for i in range(5):
+        log_event("batch_ok", tenant_id=1, n=i)
+    log_event("batch_poison", tenant_id=1, blob=object())  # payload cannot be serialized
+    log_event("batch_ok", tenant_id=1, n=5)
+    with caplog.at_level("ERROR", logger="core.audit_sink"):
+        assert sink.flush(timeout=5)
+    assert _rows("batch_ok") == 6
+    assert _rows("batch_poison") == 0
+    st = sink.stats()
+    assert (st["flush_errors"], st["row_errors"], st["flushed"]) == (1, 1, 6)
+    assert any("batch_poison" in r.getMessage() for r in caplog.records)
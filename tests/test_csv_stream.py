@@ -0,0 +1,85 @@
+import csv
+import gzip
+import io
+import uuid
+
+from core import db as core_db
+from core import export_api
+from core.csv_stream import CHUNK_BYTES, csv_etag, csv_response, iter_csv_chunks
+from core.db import get_session
+from core.models import Base, Note, User
+
+EDITOR = {"X-User-Role": "editor", "X-Tenant-Id": "1"}
+
+
+def test_rows_are_coalesced_into_chunks():
+    rows = [["id", "text"]] + [[i, f"rad {i}, med komma"] for i in range(20000)]
+    chunks = list(iter_csv_chunks(rows, bom=True))
+    assert len(chunks) > 1
+    assert all(len(c) >= CHUNK_BYTES for c in chunks[:-1])
+    assert all(len(c) < CHUNK_BYTES + 100 for c in chunks)
+
+    expected = io.StringIO(newline="")
+    csv.writer(expected).writerows(rows)
+    assert b"".join(chunks) == ("\ufeff" + expected.getvalue()).encode("utf-8")
+    assert list(iter_csv_chunks([])) == []
+
+
+def test_gzip_body_gets_its_own_etag():
+    rows = [["id"], [1]]
+    plain = csv_response(rows, compress=False, headers={"ETag": '"v1"'})
+    gz = csv_response(rows, compress=True, headers={"ETag": '"v1"'})
+    weak = csv_response(rows, compress=True, headers={"ETag": 'W/"v1"'})
+    assert plain.headers["ETag"] == '"v1"'
+    assert gz.headers["ETag"] == '"v1-gzip"' and weak.headers["ETag"] == 'W/"v1-gzip"'
+    # Callers that already answered If-None-Match with csv_etag() are not suffixed twice
+    assert csv_etag(csv_etag('"v1"', True), True) == '"v1-gzip"'
+    assert csv_etag('"v1"', False) == '"v1"'
+
+
+def test_notes_export_streams_on_its_own_session(client_admin, monkeypatch):
+    with client_admin.application.app_context():
+        # Earlier tests may have swapped the global engine for a fresh in-memory one
+        Base.metadata.create_all(core_db._engine)
+        db = get_session()
+        try:
+            email = f"csv_{uuid.uuid4().hex[:8]}@ex.com"
+            user = User(tenant_id=1, email=email, password_hash="x", role="editor")
+            db.add(user)
+            db.flush()
+            marker = uuid.uuid4().hex[:8]
+            db.add_all(
+                Note(tenant_id=1, user_id=user.id, content=f"{marker} note {i}") for i in range(1200)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    closed = []
+    real = export_api.export_session
+
+    def _tracked():
+        s = real()
+        orig = s.close
+        s.close = lambda: (closed.append(True), orig())
+        return s
+
+    monkeypatch.setattr(export_api, "export_session", _tracked)
+    r = client_admin.get(
+        "/export/notes.csv", headers={**EDITOR, "Accept-Encoding": "gzip"}, buffered=False
+    )
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in r.headers["Vary"]
+    # The view has returned, but the rows are read while the body is iterated
+    assert closed == []
+    body = gzip.decompress(b"".join(r.response)).decode("utf-8")
+    r.close()
+    assert closed == [True]
+
+    lines = list(csv.reader(io.StringIO(body)))
+    assert lines[0][0] == "id"
+    assert sum(1 for ln in lines if ln[-1].startswith(marker)) == 1200
+
+    plain = client_admin.get("/export/notes.csv?sep=;", headers=EDITOR)
+    assert "Content-Encoding" not in plain.headers
+    assert plain.get_data(as_text=True).startswith("id;created_at;")
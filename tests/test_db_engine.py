@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+
+def test_engine_settings_precedence_and_validation():
+    from core.db_engine import EngineSettings
+
+    s = EngineSettings.from_mapping({"DB_POOL_SIZE": 7}, env={"DB_POOL_SIZE": "2", "DB_PREPARE_THRESHOLD": "none"})
+    assert s.pool_size == 7
+    assert s.prepare_threshold is None
+    assert EngineSettings.from_mapping(env={"DB_POOL_PRE_PING": "0"}).pool_pre_ping is False
+    with pytest.raises(ValueError):
+        EngineSettings.from_mapping({"SQLITE_JOURNAL_MODE": "bogus"})
+
+
+def test_postgres_engine_kwargs():
+    from core.db_engine import EngineSettings, engine_kwargs
+
+    settings = EngineSettings(pool_size=3, max_overflow=1, statement_timeout_ms=2500, prepare_threshold=None)
+    kw = engine_kwargs(make_url("postgresql+psycopg://u:p@db/app"), settings)
+    assert kw["pool_size"] == 3 and kw["max_overflow"] == 1 and kw["pool_pre_ping"] is True
+    assert kw["connect_args"] == {"options": "-c statement_timeout=2500", "prepare_threshold": None}
+
+
+def test_sqlite_file_pragmas_and_pool_stats(tmp_path):
+    from core.db_engine import EngineSettings, engine_kwargs, install_sqlite_pragmas, pool_stats
+
+    url = make_url(f"sqlite:///{tmp_path / 'tune.db'}")
+    settings = EngineSettings(sqlite_busy_timeout_ms=1234, sqlite_synchronous="FULL")
+    engine = create_engine(url, **engine_kwargs(url, settings))
+    install_sqlite_pragmas(engine, settings)
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL
+            stats = pool_stats(engine)
+            assert stats["checked_out"] == 1
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0 and stats["checkouts"] == 1
+        assert stats["wait_max_ms"] >= 0
+    finally:
+        engine.dispose()
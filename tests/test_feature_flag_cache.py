@@ -0,0 +1,70 @@
+from sqlalchemy import event, text
+
+from core.db import get_session
+from core.feature_service import FeatureService
+
+
+def _request_flags(app) -> dict:
+    from flask import g, session
+
+    with app.test_request_context("/healthz"):
+        session["user_id"] = 1
+        session["role"] = "admin"
+        session["tenant_id"] = 1
+        app.preprocess_request()
+        return dict(g.tenant_feature_flags)
+
+
+def test_snapshot_reused_and_invalidated_by_feature_service(app_session):
+    from core import feature_flag_cache
+
+    seen: list[str] = []
+    assert "ff.cache.probe" not in _request_flags(app_session)  # warm
+    engine = get_session().get_bind()
+
+    def _on_exec(conn, cursor, statement, params, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _on_exec)
+    try:
+        _request_flags(app_session)
+        assert not [s for s in seen if "tenant_feature_flags" in s]
+        FeatureService().enable(1, "ff.cache.probe")
+        assert _request_flags(app_session).get("ff.cache.probe") is True
+        FeatureService().disable(1, "ff.cache.probe")
+        assert _request_flags(app_session).get("ff.cache.probe") is False
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_exec)
+    with app_session.app_context():
+        assert feature_flag_cache.read_shared_version(get_session()) >= 2
+
+
+def test_shared_version_bump_from_other_worker_reloads(monkeypatch):
+    from core import feature_flag_cache
+
+    clock = [1000.0]
+    monkeypatch.setattr(feature_flag_cache.time, "monotonic", lambda: clock[0])
+    snaps = feature_flag_cache.FeatureFlagSnapshots(check_interval=2)
+    loads: list[int] = []
+
+    def _loader():
+        loads.append(1)
+        return {"x": True}
+
+    db = get_session()
+    try:
+        feature_flag_cache.bump_version(db)
+        db.commit()
+        snaps.get(db, "tenant", 7, _loader)
+        snaps.get(db, "tenant", 7, _loader)
+        assert len(loads) == 1
+        # Another worker commits a flag change: only the shared counter moves here
+        db.execute(text("UPDATE feature_flag_versions SET version = version + 1 WHERE id=1"))
+        db.commit()
+        snaps.get(db, "tenant", 7, _loader)
+        assert len(loads) == 1  # within the check interval
+        clock[0] += 3
+        snaps.get(db, "tenant", 7, _loader)
+        assert len(loads) == 2
+    finally:
+        db.close()
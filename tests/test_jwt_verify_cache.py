@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from core import jwt_utils
+from core.jwt_utils import JWTError, decode, encode, issue_token_pair
+
+SECRETS = [f"rot-secret-{i}" for i in range(5)]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    jwt_utils.configure_verify_cache(64)
+    yield
+    jwt_utils.configure_verify_cache()
+
+
+def test_repeat_decode_hits_cache_and_returns_claims():
+    at, _, _ = issue_token_pair(user_id=7, role="admin", tenant_id=3, secret=SECRETS[4])
+    first = decode(at, secret=SECRETS[0], secrets_list=SECRETS)
+    second = decode(at, secret=SECRETS[0], secrets_list=SECRETS)
+    assert first == second and second["sub"] == 7
+    assert jwt_utils._verify_cache.hits == 1
+
+
+def test_cached_token_still_checks_revocation():
+    at, _, _ = issue_token_pair(user_id=1, role="admin", tenant_id=1, secret=SECRETS[0])
+    decode(at, secret=SECRETS[0])
+    with pytest.raises(JWTError, match="revoked"):
+        decode(at, secret=SECRETS[0], is_revoked=lambda jti: True)
+
+
+def test_rotated_out_secret_is_not_served_from_cache():
+    at, _, _ = issue_token_pair(user_id=1, role="admin", tenant_id=1, secret=SECRETS[1])
+    decode(at, secret=SECRETS[0], secrets_list=SECRETS[:2])
+    with pytest.raises(JWTError, match="bad signature"):
+        decode(at, secret=SECRETS[0], secrets_list=[SECRETS[2]])
+
+
+def test_tampered_payload_with_cached_signature_rejected():
+    at, _, _ = issue_token_pair(user_id=1, role="viewer", tenant_id=1, secret=SECRETS[0])
+    decode(at, secret=SECRETS[0])
+    header_b, _payload_b, sig = at.split(".")
+    forged_payload = jwt_utils._b64url(
+        b'{"sub":1,"role":"superuser","tenant_id":1,"jti":"x","type":"access","iat":1,"exp":9999999999}'
+    )
+    with pytest.raises(JWTError, match="bad signature"):
+        decode(f"{header_b}.{forged_payload}.{sig}", secret=SECRETS[0])
+
+
+def test_kid_selects_key_and_unknown_kid_falls_back():
+    now = int(time.time())
+    claims = {"sub": 2, "role": "admin", "tenant_id": 1, "jti": "j", "type": "access", "iat": now}
+    with_kid = encode(claims, secret=SECRETS[3], ttl=60, kid=jwt_utils._kid_for_secret(SECRETS[3]))
+    bogus_kid = encode(claims, secret=SECRETS[3], ttl=60, kid="deadbeef")
+    assert decode(with_kid, secrets_list=SECRETS)["sub"] == 2
+    assert decode(bogus_kid, secrets_list=SECRETS)["sub"] == 2
+
+
+def test_expired_token_rejected_even_if_cached(monkeypatch):
+    now = int(time.time())
+    claims = {"sub": 2, "role": "admin", "tenant_id": 1, "jti": "j", "type": "access", "iat": now}
+    token = encode(claims, secret=SECRETS[0], ttl=60)
+    decode(token, secret=SECRETS[0])
+    monkeypatch.setattr(jwt_utils.time, "time", lambda: now + 3600)
+    with pytest.raises(JWTError, match="expired"):
+        decode(token, secret=SECRETS[0])
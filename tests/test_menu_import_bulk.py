@@ -0,0 +1,88 @@
+from sqlalchemy import event
+
+from core import db as core_db
+from core.db import get_session
+from core.importers.base import ImportedMenuItem, MenuImportResult, WeekImport
+from core.menu_import_service import MenuImportService
+from core.menu_service import MenuServiceDB
+from core.models import Dish, Menu
+
+SITE = "bulk-import-site"
+TENANT = 1
+
+
+def _week(week, dishes, year=2031):
+    days = ["monday", "tuesday", "wednesday"]
+    return WeekImport(
+        year=year,
+        week=week,
+        items=[
+            ImportedMenuItem(day=d, meal="lunch", variant_type="alt1", dish_name=name, category=cat)
+            for d, (name, cat) in zip(days, dishes, strict=False)
+        ],
+    )
+
+
+def _commits(fn):
+    n = {"commits": 0}
+
+    def _on_commit(_conn):
+        n["commits"] += 1
+
+    event.listen(core_db._engine, "commit", _on_commit)
+    try:
+        out = fn()
+    finally:
+        event.remove(core_db._engine, "commit", _on_commit)
+    return out, n["commits"]
+
+
+def test_apply_is_one_transaction_and_keeps_summary(app_session):
+    svc = MenuImportService(MenuServiceDB())
+    first = MenuImportResult(
+        weeks=[
+            _week(10, [("Bulk Soup", None), ("Bulk Fish", "fish"), ("Bulk Soup", "soup")]),
+            _week(11, [("Bulk Pasta", None)]),
+        ],
+        warnings=["w1"],
+    )
+    out, commits = _commits(lambda: svc.apply(TENANT, SITE, first))
+    assert commits == 1
+    assert [(w["week"], w["created"], w["updated"], w["skipped"], w["total"]) for w in out["weeks"]] == [
+        (10, 3, 0, 0, 3),
+        (11, 1, 0, 0, 1),
+    ]
+    assert out["warnings"] == ["w1"]
+
+    second = MenuImportResult(
+        weeks=[_week(10, [("Bulk Soup", None), ("Bulk Stew", None), ("Bulk Soup", None)])]
+    )
+    out2 = svc.apply(TENANT, SITE, second)
+    assert out2["weeks"][0] == {
+        "week": 10, "year": 2031, "created": 0, "updated": 1, "skipped": 2, "total": 3,
+    }
+    view = MenuServiceDB().get_week_view(TENANT, SITE, 10, 2031)
+    assert view["days"]["tuesday"]["lunch"]["alt1"]["dish_name"] == "Bulk Stew"
+    db = get_session()
+    try:
+        soup = db.query(Dish).filter_by(tenant_id=TENANT, name="Bulk Soup").all()
+        assert len(soup) == 1 and soup[0].category == "soup"
+        assert db.query(Menu).filter_by(tenant_id=TENANT, site_id=SITE, year=2031).count() == 2
+    finally:
+        db.close()
+
+
+def test_apply_claims_legacy_site_less_menu(app_session):
+    db = get_session()
+    try:
+        legacy = Menu(tenant_id=TENANT, site_id=None, week=20, year=2031)
+        db.add(legacy)
+        db.commit()
+        legacy_id = legacy.id
+    finally:
+        db.close()
+    MenuImportService(MenuServiceDB()).apply(
+        TENANT, SITE, MenuImportResult(weeks=[_week(20, [("Bulk Legacy", None)])])
+    )
+    view = MenuServiceDB().get_week_view(TENANT, SITE, 20, 2031)
+    assert view["menu_id"] == legacy_id
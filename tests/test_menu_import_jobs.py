@@ -0,0 +1,196 @@
+import base64
+import json
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from core import menu_import_jobs
+from core.app_factory import create_app
+from core.db import get_new_session
+from core.models import Base, MenuImportJob
+
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1", "X-Tenant-Id": "1"}
+EDITOR = {"X-User-Role": "editor", "X-User-Id": "2", "X-Tenant-Id": "1"}
+SITE = "menu-job-site"
+
+CSV = (
+    "Year,Week,Weekday,Meal,Alt,Text\n"
+    "2032,5,Måndag,Lunch,Alt1,Jobb Köttbullar\n"
+    "2032,5,Måndag,Lunch,Alt2,Jobb Fiskgratäng\n"
+    "2032,6,Tisdag,Lunch,Alt1,Jobb Soppa\n"
+)
+
+
+def _json_body(week, dish):
+    doc = {
+        "weeks": [
+            {
+                "year": 2032,
+                "week": week,
+                "items": [{"day": "monday", "meal": "lunch", "variant_type": "alt1", "dish_name": dish}],
+            }
+        ],
+        "warnings": ["note from parser"],
+    }
+    return {"data_format": "json", "data": json.dumps(doc), "site_id": SITE}
+
+
+def test_csv_import_runs_and_reports_summary(client_admin):
+    r = client_admin.post(
+        "/admin/menu-import", json={"data_format": "csv", "data": CSV, "site_id": SITE}, headers=ADMIN
+    )
+    assert r.status_code == 202
+    job = r.get_json()
+    assert r.headers["Location"] == f"/admin/menu-import/{job['job_id']}"
+
+    s = client_admin.get(f"/admin/menu-import/{job['job_id']}", headers=EDITOR)
+    assert s.status_code == 200
+    body = s.get_json()
+    assert body["status"] == "completed" and body["progress"] == 100
+    assert body["summary"]["created"] == 3
+    assert [(w["week"], w["created"]) for w in body["summary"]["weeks"]] == [(5, 2), (6, 1)]
+    assert body["completed_at"] and body["error_message"] is None
+
+
+def test_same_upload_reuses_job(client_admin):
+    body = _json_body(7, "Jobb Gryta")
+    first = client_admin.post("/admin/menu-import", json=body, headers=ADMIN)
+    again = client_admin.post("/admin/menu-import", json=body, headers=ADMIN)
+    assert first.status_code == 202 and again.status_code == 200
+    assert again.get_json()["job_id"] == first.get_json()["job_id"]
+    assert first.get_json()["warnings"] == ["note from parser"]
+
+    keyed = {**_json_body(8, "Jobb Lasagne"), "filename": "v8.json"}
+    a = client_admin.post("/admin/menu-import", json=keyed, headers={**ADMIN, "Idempotency-Key": "v8"})
+    b = client_admin.post(
+        "/admin/menu-import",
+        json=_json_body(8, "Jobb Pizza"),
+        headers={**ADMIN, "Idempotency-Key": "v8"},
+    )
+    assert b.status_code == 200 and b.get_json()["job_id"] == a.get_json()["job_id"]
+    assert b.get_json()["filename"] == "v8.json"
+
+
+def test_failed_job_reports_error_and_reruns_on_resubmit(client_admin):
+    bad = {"data_format": "json", "data": '{"weeks": [{"week": 3}]}', "site_id": SITE}
+    r = client_admin.post("/admin/menu-import", json=bad, headers={**ADMIN, "Idempotency-Key": "retry-me"})
+    failed = r.get_json()
+    assert failed["status"] == "failed" and "weeks[0]" in failed["error_message"]
+
+    good = _json_body(9, "Jobb Pannkaka")
+    r2 = client_admin.post("/admin/menu-import", json=good, headers={**ADMIN, "Idempotency-Key": "retry-me"})
+    assert r2.status_code == 202
+    assert r2.get_json()["job_id"] == failed["job_id"]
+    assert r2.get_json()["status"] == "completed" and r2.get_json()["error_message"] is None
+
+
+@pytest.mark.parametrize(
+    "body, detail",
+    [
+        ({"data_format": "pdf", "data": "x", "site_id": SITE}, "data_format"),
+        ({"data_format": "docx", "data": "not base64!", "site_id": SITE}, "base64"),
+    ],
+)
+def test_invalid_uploads_are_rejected_up_front(client_admin, body, detail):
+    r = client_admin.post("/admin/menu-import", json=body, headers=ADMIN)
+    assert r.status_code == 400
+    assert detail in r.get_json()["detail"]
+
+
+def test_job_status_is_tenant_scoped(client_admin):
+    job = client_admin.post("/admin/menu-import", json=_json_body(10, "Jobb Wok"), headers=ADMIN).get_json()
+    other = client_admin.get(
+        f"/admin/menu-import/{job['job_id']}",
+        headers={"X-User-Role": "admin", "X-User-Id": "9", "X-Tenant-Id": "2"},
+    )
+    assert other.status_code == 404
+
+    no_tenant = client_admin.application.test_client()
+    r = no_tenant.get(f"/admin/menu-import/{job['job_id']}", headers={"X-User-Role": "admin", "X-User-Id": "1"})
+    assert r.status_code == 401  # never falls back to tenant 0
+
+
+def _stranded(status, week, dish):
+    """A job row as a dead worker (processing) or a cancelled future (pending) leaves it."""
+    old = datetime.now(UTC) - timedelta(seconds=menu_import_jobs._cfg.stale_s + 60)
+    payload = _json_body(week, dish)["data"]
+    db = get_new_session()
+    try:
+        job = MenuImportJob(
+            id=str(uuid.uuid4()),
+            tenant_id=1,
+            site_id=SITE,
+            idempotency_key=f"stranded-{uuid.uuid4().hex}",
+            data_format="json",
+            status=status,
+            progress=10 if status == "processing" else 0,
+            payload=payload.encode(),
+            created_at=old,
+            started_at=old if status == "processing" else None,
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def test_stranded_jobs_are_requeued(client_admin):
+    with client_admin.application.app_context():
+        polled = _stranded("pending", 11, "Jobb Kassler")
+        swept = _stranded("processing", 12, "Jobb Kyckling")
+
+    s = client_admin.get(f"/admin/menu-import/{polled}", headers=ADMIN).get_json()
+    assert s["status"] == "completed" and s["summary"]["created"] == 1
+
+    with client_admin.application.app_context():
+        assert menu_import_jobs.sweep_stale() == 1
+        assert menu_import_jobs.sweep_stale() == 0
+    s = client_admin.get(f"/admin/menu-import/{swept}", headers=ADMIN).get_json()
+    assert s["status"] == "completed" and s["summary"]["created"] == 1
+
+
+@pytest.fixture
+def async_jobs(tmp_path, monkeypatch):
+    # Workers use their own threads/connections, so this needs a DB file rather than :memory:
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'menu_jobs.db'}")
+    monkeypatch.setenv("MENU_IMPORT_MODE", "async")
+    app = create_app({"TESTING": True, "SECRET_KEY": "test"})
+    from core import db as core_db
+
+    Base.metadata.create_all(core_db._engine)
+    yield app
+    menu_import_jobs.shutdown()
+    menu_import_jobs.configure_menu_import_jobs(None)
+    menu_import_jobs._test_reset()
+
+
+def test_async_job_runs_on_worker_pool(async_jobs):
+    client = async_jobs.test_client()
+    data = base64.b64encode(b"not a docx archive").decode()
+    r = client.post(
+        "/admin/menu-import",
+        json={"data_format": "docx", "data": data, "site_id": SITE, "filename": "v1.docx"},
+        headers=ADMIN,
+    )
+    assert r.status_code == 202
+    job_id = r.get_json()["job_id"]
+    deadline = time.monotonic() + 5
+    while True:
+        s = client.get(f"/admin/menu-import/{job_id}", headers=ADMIN)
+        status = s.get_json()["status"]
+        if status in ("completed", "failed") or time.monotonic() > deadline:
+            break
+        assert s.headers["Retry-After"] == "2"
+        time.sleep(0.02)
+    assert status in ("completed", "failed")
+    assert s.get_json()["completed_at"] is not None
+
+    csv = client.post(
+        "/admin/menu-import", json={"data_format": "csv", "data": CSV, "site_id": SITE}, headers=ADMIN
+    ).get_json()
+    menu_import_jobs.shutdown()  # waits for queued jobs
+    done = client.get(f"/admin/menu-import/{csv['job_id']}", headers=ADMIN).get_json()
+    assert done["status"] == "completed" and done["summary"]["created"] == 3
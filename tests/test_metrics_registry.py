@@ -0,0 +1,108 @@
+import multiprocessing
+
+import pytest
+
+from core import metrics_registry
+from core.jwt_utils import JWTError, decode
+from core.metrics_registry import MetricsRegistry
+
+
+def test_counter_gauge_histogram_render():
+    reg = MetricsRegistry()
+    c = reg.counter("jobs_total", "Jobs", ("kind",))
+    c.labels(kind="a").inc()
+    c.labels(kind="a").inc(2)
+    reg.gauge("depth", "Depth").labels().set(7)
+    h = reg.histogram("lat_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 3.0):
+        h.labels(route="/x").observe(v)
+    text = reg.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert "depth 7" in text
+    assert 'lat_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{route="/x",le="1.0"} 2' in text
+    assert 'lat_seconds_bucket{route="/x",le="+Inf"} 3' in text
+    assert 'lat_seconds_count{route="/x"} 3' in text
+    with pytest.raises(ValueError):
+        c.labels(other="x")
+    with pytest.raises(ValueError):
+        reg.gauge("jobs_total", "clash")
+
+
+def _worker(directory, n):
+    reg = MetricsRegistry(directory)
+    reg.counter("hits_total", "Hits").labels().inc(n)
+    reg.gauge("workers_up", "Up").labels().set(1)
+
+
+def test_multiprocess_mode_merges_worker_files(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker, args=(str(tmp_path), n)) for n in (3, 4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    reg = MetricsRegistry(str(tmp_path))
+    reg.counter("hits_total", "Hits")
+    reg.gauge("workers_up", "Up")
+    assert reg.get_sample_value("hits_total") == 7
+    assert reg.get_sample_value("workers_up") == 2
+    metrics_registry.mark_process_dead(procs[0].pid, str(tmp_path))
+    assert reg.get_sample_value("workers_up") == 1
+    assert reg.get_sample_value("hits_total") == 7  # exited workers keep their counts
+
+
+def test_multiprocess_counter_and_histogram_share_worker_file(tmp_path):
+    reg = MetricsRegistry(str(tmp_path))
+    c = reg.counter("hits_total", "Hits", ("route",))
+    h = reg.histogram("lat_seconds", "Latency", buckets=(0.3, 1.0))
+    # interleave new keys of both kinds: they append to the same counter_<pid>.db
+    c.labels(route="a").inc(5)
+    h.observe(0.5)
+    c.labels(route="b").inc(1)
+    h.observe(0.25)
+    text = reg.render()
+    assert 'hits_total{route="a"} 5' in text
+    assert 'hits_total{route="b"} 1' in text
+    assert 'lat_seconds_bucket{le="0.3"} 1' in text
+    assert 'lat_seconds_bucket{le="+Inf"} 2' in text
+    assert "lat_seconds_sum 0.75" in text
+    assert "lat_seconds_count 2" in text
+
+
+def test_metrics_endpoint_exposes_request_latency_and_jwt_rejections(client_admin, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    before = metrics_registry.REGISTRY.get_sample_value(
+        "jwt_rejected_total", {"reason": "malformed"}
+    ) or 0
+    with pytest.raises(JWTError):
+        decode("not-a-token", secret="s")
+    client_admin.get("/healthz")
+    with client_admin.session_transaction() as sess:
+        sess.update({"user_id": 1, "role": "superuser", "tenant_id": 1})
+    resp = client_admin.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = resp.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/healthz",method="GET",status_class="2xx"' in body
+    after = metrics_registry.REGISTRY.get_sample_value("jwt_rejected_total", {"reason": "malformed"})
+    assert after == before + 1
+
+
+def test_metrics_endpoint_token(client_admin, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "scrape-me")
+    assert client_admin.get("/metrics").status_code == 401
+    ok = client_admin.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert ok.status_code == 200
+
+
+def test_metrics_endpoint_is_not_public_without_token(client_admin, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client_admin.get("/metrics").status_code == 401
+    with client_admin.session_transaction() as sess:
+        sess.update({"user_id": 1, "role": "admin", "tenant_id": 1})
+    assert client_admin.get("/metrics").status_code == 403
+    with client_admin.session_transaction() as sess:
+        sess["role"] = "superuser"
+    assert client_admin.get("/metrics").status_code == 200
@@ -0,0 +1,224 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from core import db as core_db
+from core import portion_stats
+from core.db import get_new_session, get_session
+from core.models import PortionGuideline, ServiceMetric, ServiceMetricStat, Tenant
+from core.portion_recommendation_service import PortionRecommendationService, RecommendationInput
+from core.service_metrics_service import ServiceMetricsService
+
+TENANT = 1
+
+
+def _day(n):
+    return (date.today() - timedelta(days=n)).isoformat()
+
+
+def _metric(unit, n, g, **kw):
+    row = {"unit_id": unit, "date": _day(n), "meal": "lunch", "guest_count": 100, "served_g_per_guest": g}
+    row.update(kw)
+    return row
+
+
+def _selects(fn, table):
+    seen = []
+
+    def _on_exec(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+            seen.append(statement)
+
+    event.listen(core_db._engine, "before_cursor_execute", _on_exec)
+    try:
+        out = fn()
+    finally:
+        event.remove(core_db._engine, "before_cursor_execute", _on_exec)
+    return out, len(seen)
+
+
+def _inp(category=None, dish_id=None, unit_id=71, guests=10):
+    return RecommendationInput(
+        tenant_id=TENANT, unit_id=unit_id, category=category, dish_id=dish_id, guest_count=guests
+    )
+
+
+def test_history_served_from_stats_and_kept_current_by_ingest(app_session):
+    ingest = ServiceMetricsService().ingest
+    svc = PortionRecommendationService()
+    values = [300, 600, 500, 505, 495, 510, 490, 500, 500, 500]
+    with app_session.app_context():
+        ingest(TENANT, [_metric(71, i, v, category="stats-main") for i, v in enumerate(values)])
+        ingest(TENANT, [_metric(71, 1, 450, category="stats-soup", meal="dinner")])
+        ingest(TENANT, [_metric(72, 1, 999, category="stats-main")])  # other unit
+        ingest(TENANT, [_metric(71, 200, 999, category="stats-main", meal="dinner")])  # outside window
+
+        inputs = [_inp("stats-main"), _inp("stats-soup"), _inp("stats-none")]
+        first = svc.recommend_many(inputs)
+        assert [r["meta"]["sample_size"] for r in first] == [10, 1, 0]
+        assert first[0]["meta"]["history_mean"] == 500.0  # 10% trimmed per tail
+        assert first[0]["g_per_guest"] == 494
+        assert first[2]["meta"]["source"] == "baseline"
+
+        # Stats rows now exist: no service_metrics read, and ingest keeps them current
+        again, metric_reads = _selects(lambda: svc.recommend_many(inputs), "service_metrics")
+        assert metric_reads == 0 and again == first
+        ingest(TENANT, [_metric(71, 0, 800, category="stats-main")])  # replaces the 300 sample
+        ingest(TENANT, [_metric(71, 2, 200, category="stats-soup", meal="dinner")])
+        (main, soup), metric_reads = _selects(
+            lambda: svc.recommend_many(inputs[:2]), "service_metrics"
+        )
+        assert metric_reads == 0
+        assert (main["meta"]["sample_size"], main["meta"]["history_mean"]) == (10, 513.75)
+        assert (soup["meta"]["sample_size"], soup["meta"]["history_mean"]) == (2, 325.0)
+
+        # All-units lookups and dish lookups share the same maintained table
+        assert svc.recommend(_inp("stats-main", unit_id=None))["meta"]["sample_size"] == 11
+
+
+def test_out_of_band_metric_writes_drop_stats(app_session):
+    svc = PortionRecommendationService()
+    with app_session.app_context():
+        ServiceMetricsService().ingest(TENANT, [_metric(73, 1, 400, category="stats-orm")])
+        assert svc.recommend(_inp("stats-orm", unit_id=73))["meta"]["sample_size"] == 1
+
+        db = get_session()
+        try:
+            db.add(
+                ServiceMetric(
+                    tenant_id=TENANT,
+                    unit_id=73,
+                    date=date.today(),
+                    meal="dinner",
+                    category="stats-orm",
+                    served_g_per_guest=600,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        rec = svc.recommend(_inp("stats-orm", unit_id=73))
+        assert (rec["meta"]["sample_size"], rec["meta"]["history_mean"]) == (2, 500.0)
+
+
+def _stats_tenants(unit_id):
+    db = get_session()
+    try:
+        q = db.query(ServiceMetricStat.tenant_id).filter(ServiceMetricStat.unit_id == unit_id)
+        return {t for (t,) in q}
+    finally:
+        db.close()
+
+
+def test_out_of_band_writes_only_drop_the_written_tenants_stats(app_session):
+    ingest = ServiceMetricsService().ingest
+    with app_session.app_context():
+        db = get_session()
+        try:
+            other = Tenant(name="stats-other")
+            db.add(other)
+            db.commit()
+            other_id = other.id
+        finally:
+            db.close()
+        ingest(TENANT, [_metric(75, 1, 400, category="stats-scope")])
+        ingest(other_id, [_metric(75, 1, 400, category="stats-scope")])
+        assert _stats_tenants(75) == {TENANT, other_id}
+
+        db = get_session()
+        try:
+            db.add(ServiceMetric(tenant_id=TENANT, unit_id=75, date=date.today(), meal="dinner", category="stats-scope"))
+            db.commit()
+            assert _stats_tenants(75) == {other_id}
+
+            # ORM updates go by primary key only; the flushed objects name the tenant
+            ingest(TENANT, [_metric(75, 2, 300, category="stats-scope")])
+            row = db.query(ServiceMetric).filter_by(tenant_id=TENANT, unit_id=75, meal="dinner").one()
+            row.served_g_per_guest = 500
+            db.commit()
+            assert _stats_tenants(75) == {other_id}
+        finally:
+            db.close()
+
+
+def test_history_rebuilds_on_its_own_session(app_session):
+    with app_session.app_context():
+        ServiceMetricsService().ingest(TENANT, [_metric(76, 1, 410, category="stats-own")])
+        key = portion_stats.stat_key(76, 901, None)  # no ingest created this key
+        db = get_new_session()
+        commits = []
+        event.listen(db, "after_commit", lambda s: commits.append(s))
+        try:
+            assert portion_stats.history(db, TENANT, [key]) == {key: []}
+            assert commits == []
+        finally:
+            db.close()
+        assert portion_stats.history(get_session(), TENANT, [key]) == {key: []}
+
+
+def test_ingest_during_a_rebuild_is_not_lost(app_session, monkeypatch):
+    ingest = ServiceMetricsService().ingest
+    svc = PortionRecommendationService()
+    real_build = portion_stats._build
+    raced = []
+
+    def _build_then_ingest(db, tenant_id, keys, since):
+        built = real_build(db, tenant_id, keys, since)
+        if not raced:
+            # Commits after the rebuild's snapshot but before its save
+            raced.append(True)
+            ingest(TENANT, [_metric(77, 2, 700, category="stats-race")])
+        return built
+
+    with app_session.app_context():
+        ingest(TENANT, [_metric(77, 1, 300, category="stats-race-seed")])
+        monkeypatch.setattr(portion_stats, "_build", _build_then_ingest)
+        first = svc.recommend(_inp("stats-race", unit_id=77))
+        assert raced and first["meta"]["sample_size"] == 0  # served from the snapshot
+        monkeypatch.setattr(portion_stats, "_build", real_build)
+        again = svc.recommend(_inp("stats-race", unit_id=77))
+        assert (again["meta"]["sample_size"], again["meta"]["history_mean"]) == (1, 700.0)
+
+
+def test_guidelines_are_cached_until_written(app_session):
+    svc = PortionRecommendationService()
+    with app_session.app_context():
+        db = get_session()
+        try:
+            db.add(PortionGuideline(tenant_id=TENANT, unit_id=None, category="stats-fish", baseline_g_per_guest=200))
+            db.commit()
+        finally:
+            db.close()
+        assert svc.recommend(_inp("stats-fish"))["meta"]["baseline_used"] == 200
+        _, reads = _selects(lambda: svc.recommend(_inp("stats-fish")), "portion_guidelines")
+        assert reads == 0 and svc.protein_per_100g(TENANT, "stats-fish") is None
+
+        db = get_session()
+        try:
+            db.add(
+                PortionGuideline(
+                    tenant_id=TENANT, unit_id=71, category="stats-fish", baseline_g_per_guest=250, protein_per_100g=20.0
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        rec = svc.recommend(_inp("stats-fish", guests=10))
+        # The unit's own guideline wins over the shared one
+        assert rec["meta"]["baseline_used"] == 250
+        assert rec["protein_total_g"] == rec["total_g"] * 0.2
+
+
+def test_batch_endpoint_serves_a_week_in_one_call(client_admin):
+    with client_admin.session_transaction() as sess:
+        sess.update({"user_id": 1, "role": "admin", "tenant_id": TENANT})
+    items = [{"category": "stats-week", "guest_count": 10 + d, "unit_id": 74} for d in range(7)]
+    r = client_admin.post("/service/recommendations", json={"items": items})
+    assert r.status_code == 200
+    out = r.get_json()["items"]
+    assert [o["guest_count"] for o in out] == [10 + d for d in range(7)]
+    assert all(o["g_per_guest"] == 420 and o["meta"]["source"] == "baseline" for o in out)
+    assert out[3]["total_g"] == 420 * 13
+
+    bad = client_admin.post("/service/recommendations", json={"items": [{"category": "x"}]})
+    assert bad.status_code == 400
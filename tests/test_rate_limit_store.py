@@ -0,0 +1,80 @@
+import threading
+
+from core.rate_limit_store import BucketStore
+from core.rate_limiter_memory import MemoryRateLimiter
+from core.rate_limiter_token_bucket_memory import MemoryTokenBucketRateLimiter
+
+
+class FakeClock:
+    def __init__(self, start: float = 1000.0):
+        self._t = start
+
+    def time(self) -> float:
+        return self._t
+
+    def advance(self, sec: float) -> None:
+        self._t += sec
+
+
+def _incr(state, _now):
+    state.b += 1
+    return int(state.b)
+
+
+def test_store_caps_keys_and_evicts_lru():
+    store = BucketStore(max_keys=8, stripes=1, now_func=FakeClock().time)
+    for i in range(100):
+        store.mutate(f"k{i}", 60, _incr)
+    assert len(store) == 8
+    assert store.stats()["evictions"] == 92
+    # Most recent keys survive, oldest are gone
+    assert store.peek("k99", lambda s, _n: s is not None)
+    assert store.peek("k0", lambda s, _n: s is None)
+
+
+def test_store_expires_dead_windows_before_evicting():
+    clock = FakeClock()
+    store = BucketStore(max_keys=4, stripes=1, now_func=clock.time)
+    for i in range(4):
+        store.mutate(("old", i), 10, _incr)
+    clock.advance(11)
+    store.mutate("fresh", 10, _incr)
+    st = store.stats()
+    assert st["keys"] == 1
+    assert st["expired"] == 4 and st["evictions"] == 0
+
+
+def test_store_mutations_are_atomic_across_threads():
+    store = BucketStore(max_keys=1000, stripes=4)
+
+    def worker():
+        for _ in range(2000):
+            store.mutate("shared", 60, _incr)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.mutate("shared", 60, _incr) == 8 * 2000 + 1
+
+
+def test_memory_limiters_stay_bounded_under_distinct_keys():
+    fixed = MemoryRateLimiter(store=BucketStore(max_keys=64))
+    clock = FakeClock()
+    tb = MemoryTokenBucketRateLimiter(now_func=clock.time, store=BucketStore(max_keys=64, now_func=clock.time))
+    for i in range(5000):
+        assert fixed.allow(f"flood:{i}", quota=1, per_seconds=60)
+        assert tb.allow(f"flood:{i}", quota=1, per_seconds=60)
+    assert len(fixed._buckets) <= 64
+    assert len(tb._buckets) <= 64
+
+
+def test_token_bucket_expiry_matches_full_refill():
+    clock = FakeClock()
+    tb = MemoryTokenBucketRateLimiter(now_func=clock.time)
+    assert tb.allow("k", 2, 10) and tb.allow("k", 2, 10)
+    assert not tb.allow("k", 2, 10)
+    clock.advance(10)
+    # Key expired (would have been full again) -> behaves like a new bucket
+    assert len([1 for _ in range(3) if tb.allow("k", 2, 10)]) == 2
@@ -0,0 +1,103 @@
+import pytest
+
+from core.rate_limiter_lease import LeasedRateLimiter, _LeaseConfig, wrap_with_lease
+from core.rate_limiter_redis import RedisRateLimiter
+from core.rate_limiter_token_bucket_redis import RedisTokenBucketRateLimiter
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake():
+    return FakeRedis()
+
+
+def _leased(inner, fake, **env):
+    cfg = _LeaseConfig()
+    for k, v in env.items():
+        setattr(cfg, k, v)
+    return LeasedRateLimiter(inner, cfg, now_func=lambda: fake._now_ms() / 1000.0)
+
+
+def _fixed(fake):
+    return RedisRateLimiter("redis://unused", "t:", client=fake, now_func=lambda: fake._now_ms() / 1000.0)
+
+
+def test_high_quota_bucket_uses_one_redis_call_per_batch(fake):
+    lim = _leased(_fixed(fake), fake, accuracy=0.05, max_batch=50)
+    assert lim.batch_size(1000) == 50
+    decisions = [lim.decide("exp", quota=1000, per_seconds=60) for _ in range(500)]
+    assert all(d.allowed for d in decisions)
+    assert fake.calls == 10
+    assert decisions[-1].remaining == 500
+
+
+def test_fixed_window_never_exceeds_quota_across_workers(fake):
+    workers = [_leased(_fixed(fake), fake, accuracy=0.05, max_batch=50) for _ in range(3)]
+    allowed = sum(workers[i % 3].allow("shared", 100, 60) for i in range(300))
+    batch = workers[0].batch_size(100)
+    assert 100 - 2 * batch <= allowed <= 100
+
+
+def test_leftover_permits_do_not_cross_into_the_next_window(fake):
+    workers = [_leased(_fixed(fake), fake, accuracy=0.05, max_batch=50) for _ in range(4)]
+    # Fake clock starts at t=1000s: the 60s window [960, 1020) has 20s left
+    for i in range(600):
+        assert workers[i % 4].allow("edge", 1000, 60)
+    fake.advance(20)
+    allowed = sum(workers[i % 4].allow("edge", 1000, 60) for i in range(2000))
+    assert allowed <= 1000
+
+
+def test_concurrent_refills_keep_both_leases(fake):
+    class _Reentrant:
+        """Inner whose first acquire lets another caller refill the same key meanwhile."""
+
+        def __init__(self, inner):
+            self.inner, self.lim, self.nested = inner, None, False
+
+        def acquire(self, *args, **kwargs):
+            if not self.nested:
+                self.nested = True
+                assert self.lim.allow("race", 1000, 60)
+            return self.inner.acquire(*args, **kwargs)
+
+    inner = _Reentrant(_fixed(fake))
+    lim = _leased(inner, fake, accuracy=0.05, max_batch=50)
+    inner.lim = lim
+    assert lim.allow("race", 1000, 60)
+    assert fake.calls == 2
+    # Both batches of 50 are spendable locally: 2 * 49 leased permits
+    assert all(lim.allow("race", 1000, 60) for _ in range(98))
+    assert fake.calls == 2
+    lim.allow("race", 1000, 60)
+    assert fake.calls == 3
+
+
+def test_low_quota_limits_bypass_the_lease(fake):
+    lim = _leased(_fixed(fake), fake, accuracy=0.05, max_batch=50)
+    results = [lim.allow("login", 10, 60) for _ in range(11)]
+    assert results == [True] * 10 + [False]
+    assert fake.calls == 11
+
+
+def test_token_bucket_lease_renews_after_ttl(fake):
+    inner = RedisTokenBucketRateLimiter(
+        "redis://unused", "t:", now_ms_fn=lambda: int(fake._now_ms()), client=fake
+    )
+    lim = _leased(inner, fake, accuracy=0.1, max_batch=50, ttl_ms=1000)
+    assert lim.allow_bucket("tb", quota=600, per_seconds=60, burst=600)
+    assert fake.calls == 1
+    for _ in range(20):
+        lim.allow_bucket("tb", quota=600, per_seconds=60, burst=600)
+    assert fake.calls == 1
+    fake.advance(1)
+    assert lim.allow_bucket("tb", quota=600, per_seconds=60, burst=600)
+    assert fake.calls == 2
+
+
+def test_wrap_with_lease_respects_env(fake, monkeypatch):
+    inner = _fixed(fake)
+    monkeypatch.setenv("RATE_LIMIT_LEASE_ACCURACY", "0")
+    assert wrap_with_lease(inner) is inner
+    monkeypatch.setenv("RATE_LIMIT_LEASE_ACCURACY", "0.05")
+    assert isinstance(wrap_with_lease(inner), LeasedRateLimiter)
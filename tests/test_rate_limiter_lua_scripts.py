@@ -0,0 +1,120 @@
+"""Run the real rate limiter Lua scripts.
+
+The lupa-backed FakeRedis executes FIXED_WINDOW_LUA / TOKEN_BUCKET_LUA as Lua 5.1 and must
+reply exactly like the Python fallback mirrors. The redis-marked tests run the same scripts on
+a live server (REDIS_URL) and are skipped when none is reachable.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from core.rate_limiter_redis import FIXED_WINDOW_LUA, RedisRateLimiter
+from core.rate_limiter_token_bucket_redis import TOKEN_BUCKET_LUA, RedisTokenBucketRateLimiter
+from tests.fake_redis import FakeRedis
+
+
+def _pair():
+    pytest.importorskip("lupa", reason="lupa not installed")
+    return FakeRedis(lua=True), FakeRedis(lua=False)
+
+
+def _both(pair, source, steps):
+    """Replay (keys, args, advance_seconds) steps on both fakes and return the Lua replies."""
+    lua, py = pair
+    run_lua, run_py = lua.register_script(source), py.register_script(source)
+    replies = []
+    for keys, args, adv in steps:
+        got, want = run_lua(keys, args), run_py(keys, args)
+        assert got == want, (keys, args)
+        replies.append(got)
+        lua.advance(adv)
+        py.advance(adv)
+    assert lua.calls == py.calls == len(steps)
+    return replies
+
+
+def test_fixed_window_lua_matches_mirror():
+    replies = _both(
+        _pair(),
+        FIXED_WINDOW_LUA,
+        [
+            (["fw:a"], [1000, 1], 0.2),
+            (["fw:a"], [800, 2], 0.3),
+            (["fw:b"], [5000, 3], 0),
+            (["fw:a"], [500, 1], 0.6),  # window expired: count restarts
+            (["fw:a"], [1000, 1], 0),
+        ],
+    )
+    assert replies[0] == [1, 1000]
+    assert replies[1] == [3, 800]
+    assert replies[3] == [4, 500]
+    assert replies[4] == [1, 1000]
+
+
+def test_fixed_window_lua_repairs_missing_ttl():
+    lua, py = _pair()
+    for fake in (lua, py):
+        fake._set("fw:k", 2)  # counter left without an expiry
+    replies = _both((lua, py), FIXED_WINDOW_LUA, [(["fw:k"], [1500, 1], 0)])
+    assert replies == [[3, 1500]]
+    assert lua._pttl("fw:k") == 1500
+
+
+def test_token_bucket_lua_matches_mirror():
+    rate = repr(2 / 1000.0)  # 2 tokens per second
+    replies = _both(
+        _pair(),
+        TOKEN_BUCKET_LUA,
+        [
+            (["tb:a"], [1_000_000, 3, rate, 1], 0),
+            (["tb:a"], [1_000_000, 3, rate, 2], 0),
+            (["tb:a"], [1_000_000, 3, rate, 1], 0),  # empty: retry hint
+            (["tb:a"], [1_000_250, 3, rate, 0], 0),  # peek, no write
+            (["tb:a"], [1_000_600, 3, rate, 1], 0),
+            (["tb:a"], [1_010_000, 3, rate, 5], 0),  # refill capped at capacity
+        ],
+    )
+    assert replies[0] == [1, 2, 0]
+    assert replies[1] == [2, 0, 0]
+    assert replies[2] == [0, 0, 500]
+    assert replies[3] == [0, 0, 250]
+    assert replies[4] == [1, 0, 0]
+    assert replies[5] == [3, 0, 0]
+
+
+@pytest.fixture(scope="module")
+def redis_client():
+    redis = pytest.importorskip("redis", reason="redis-py not installed")
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    client = redis.Redis.from_url(url, socket_connect_timeout=0.2, socket_timeout=0.2)
+    try:
+        client.ping()
+    except Exception:
+        pytest.skip("Redis not available")
+    yield client
+
+
+@pytest.mark.redis
+def test_fixed_window_script_on_redis(redis_client):
+    prefix = f"test:{uuid.uuid4().hex}:"
+    lim = RedisRateLimiter("redis://unused", prefix, client=redis_client)
+    results = [lim.decide("k", quota=2, per_seconds=60) for _ in range(3)]
+    assert [d.allowed for d in results] == [True, True, False]
+    assert [d.remaining for d in results] == [1, 0, 0]
+    assert 1 <= results[-1].retry_after <= 60
+
+
+@pytest.mark.redis
+def test_token_bucket_script_on_redis(redis_client):
+    prefix = f"test:{uuid.uuid4().hex}:"
+    now = {"ms": 1_000_000}
+    lim = RedisTokenBucketRateLimiter(
+        "redis://unused", prefix, now_ms_fn=lambda: now["ms"], client=redis_client
+    )
+    assert lim.acquire("k", quota=2, per_seconds=1, burst=3, want=5).granted == 3
+    denied = lim.decide("k", quota=2, per_seconds=1, burst=3)
+    assert not denied.allowed and denied.retry_after == 1
+    now["ms"] += 500
+    assert lim.decide("k", quota=2, per_seconds=1, burst=3).allowed
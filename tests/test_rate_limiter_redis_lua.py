@@ -0,0 +1,71 @@
+import pytest
+from flask import Flask
+
+import core.rate_limiter as rl
+from core import limit_registry
+from core.app_factory import create_app
+from core.rate_limiter_redis import RedisRateLimiter
+from core.rate_limiter_token_bucket_redis import RedisTokenBucketRateLimiter
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake():
+    return FakeRedis()
+
+
+def _tb(fake):
+    return RedisTokenBucketRateLimiter(
+        "redis://unused", "t:", now_ms_fn=lambda: int(fake._now_ms()), client=fake
+    )
+
+
+def test_fixed_window_single_round_trip_per_decision(fake):
+    lim = RedisRateLimiter("redis://unused", "t:", client=fake)
+    results = [lim.decide("k", quota=3, per_seconds=60) for _ in range(4)]
+    assert [d.allowed for d in results] == [True, True, True, False]
+    assert [d.remaining for d in results] == [2, 1, 0, 0]
+    assert 1 <= results[-1].retry_after <= 60
+    assert fake.calls == 4
+
+
+def test_token_bucket_honors_burst_and_reports_retry_after(fake):
+    lim = _tb(fake)
+    # 1 token / 10s steady rate, capacity 3
+    results = [lim.decide("b", quota=1, per_seconds=10, burst=3) for _ in range(4)]
+    assert [d.allowed for d in results] == [True, True, True, False]
+    assert [d.remaining for d in results[:3]] == [2, 1, 0]
+    assert results[-1].retry_after == 10
+    assert fake.calls == 4
+    fake.advance(10)
+    assert lim.allow_bucket("b", quota=1, per_seconds=10, burst=3)
+
+
+def test_retry_after_bucket_peeks_without_consuming(fake):
+    lim = _tb(fake)
+    assert lim.retry_after_bucket("p", 2, 10, 2) == 0
+    assert lim.allow_bucket("p", 2, 10, 2) and lim.allow_bucket("p", 2, 10, 2)
+    assert lim.retry_after_bucket("p", 2, 10, 2) == 5
+    fake.advance(5)
+    # Peek did not consume the refilled token
+    assert lim.allow_bucket("p", 2, 10, 2)
+
+
+def test_http_limit_headers_come_from_single_decision(fake, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "redis")
+    rl._test_reset()
+    monkeypatch.setattr(rl, "_instance_tb", _tb(fake))
+    defaults = '{"test_endpoint": {"quota":3, "per_seconds":60, "burst":5, "strategy":"token_bucket"}}'
+    app: Flask = create_app({"TESTING": True, "FEATURE_LIMITS_DEFAULTS_JSON": defaults})
+    c = app.test_client()
+    try:
+        remaining = [c.get("/_limit/test").headers.get("RateLimit-Remaining") for _ in range(5)]
+        assert remaining == ["4", "3", "2", "1", "0"]
+        r = c.get("/_limit/test")
+        assert r.status_code == 429
+        assert r.headers["Retry-After"] == "20"
+        assert r.headers["RateLimit-Remaining"] == "0"
+        assert fake.calls == 6
+    finally:
+        limit_registry.refresh(None, None)
+        rl._test_reset()
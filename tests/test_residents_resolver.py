@@ -0,0 +1,63 @@
+import uuid
+
+from sqlalchemy import text
+
+
+def _dept(db, site_id, fixed):
+    dep = str(uuid.uuid4())
+    db.execute(
+        text(
+            "INSERT INTO departments(id, site_id, name, resident_count_mode, resident_count_fixed, version) "
+            "VALUES(:i,:s,:n,'fixed',:f,0)"
+        ),
+        {"i": dep, "s": site_id, "n": f"Avd {dep[:6]}", "f": fixed},
+    )
+    return dep
+
+
+def test_resolver_precedence_and_batch(app_session):
+    from core.db import get_session
+    from core.residents_schedule_repo import ResidentsScheduleRepo
+    from core.residents_service import get_effective_residents_for_week, resolve_effective_residents
+    from core.residents_weekly_repo import ResidentsWeeklyRepo
+    from core.weekview.service import WeekviewService
+
+    year, week = 2025, 10
+    with app_session.app_context():
+        db = get_session()
+        try:
+            site_id = str(uuid.uuid4())
+            db.execute(text("INSERT INTO sites(id, name, version) VALUES(:i,:n,0)"), {"i": site_id, "n": f"R {site_id[:6]}"})
+            fixed_only = _dept(db, site_id, 8)
+            mixed = _dept(db, site_id, 5)
+            db.commit()
+        finally:
+            db.close()
+        sched = ResidentsScheduleRepo()
+        sched.upsert_items(mixed, week, [{"weekday": 1, "meal": "lunch", "count": 11}])
+        sched.upsert_items(mixed, None, [{"weekday": 1, "meal": "dinner", "count": 2}, {"weekday": 2, "meal": "dinner", "count": 3}])
+        ResidentsWeeklyRepo().upsert_for_week(mixed, year, week, 9, None)
+
+        resolved = resolve_effective_residents([fixed_only, mixed, "missing"], year, week)
+        assert set(resolved) == {fixed_only, mixed, "missing"}
+        assert resolved[fixed_only].days[3] == {"lunch": 8, "dinner": 8, "source": "fixed"}
+        assert resolved[fixed_only].has_variation is False
+        m = resolved[mixed]
+        # Week schedule wins for the whole day; missing meal in that tier is 0
+        assert m.days[1] == {"lunch": 11, "dinner": 0, "source": "schedule_week"}
+        assert m.days[2] == {"lunch": 0, "dinner": 3, "source": "schedule_forever"}
+        # Weekly override falls back to fixed for the unset meal
+        assert m.days[4] == {"lunch": 9, "dinner": 5, "source": "weekly_override"}
+        assert m.has_variation is True
+        assert resolved["missing"].days[1]["source"] == "fixed" and resolved["missing"].fixed == 0
+
+        svc = WeekviewService()
+        for dow in range(1, 8):
+            assert svc.get_effective_residents_for_day(mixed, year, week, dow) == m.days[dow]
+        assert svc.get_effective_residents_for_week(mixed, year, week) == {"lunch": 9, "dinner": 5, "has_override": True}
+        assert get_effective_residents_for_week(mixed, year, week) == {
+            "resident_count_fixed": 5,
+            "residents_lunch": 9,
+            "residents_dinner": 5,
+            "has_override": True,
+        }
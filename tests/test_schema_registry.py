@@ -0,0 +1,45 @@
+from sqlalchemy import event
+
+
+def test_weekview_schema_bootstrap_runs_once(app_session, monkeypatch):
+    import core.db as db_mod
+    from core.db import get_session, reset_schema_registry
+    from core.weekview.repo import WeekviewRepo
+
+    # The suite may run on in-memory SQLite, which is never cached; treat it as a file DB here
+    monkeypatch.setattr(db_mod, "_is_sqlite_memory", lambda _engine: False)
+    with app_session.app_context():
+        engine = get_session().get_bind()
+        repo = WeekviewRepo()
+        repo.get_version(1, 2025, 12, "dep-registry")
+        seen: list[str] = []
+
+        def _on_exec(conn, cursor, statement, params, context, executemany):
+            seen.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _on_exec)
+        try:
+            repo.get_version(1, 2025, 12, "dep-registry")
+            assert not [s for s in seen if "CREATE" in s.upper()]
+            reset_schema_registry()
+            repo.get_version(1, 2025, 12, "dep-registry")
+            assert [s for s in seen if "CREATE" in s.upper()]
+        finally:
+            event.remove(engine, "before_cursor_execute", _on_exec)
+
+
+def test_ensure_schema_reruns_after_drop_all(monkeypatch):
+    from sqlalchemy import create_engine
+
+    import core.db as db_mod
+    from core.models import Base
+
+    monkeypatch.setattr(db_mod, "_engine", None)
+    calls = []
+    db_mod.ensure_schema("test.registry", lambda: calls.append(1))
+    db_mod.ensure_schema("test.registry", lambda: calls.append(1))
+    assert calls == [1]
+    Base.metadata.drop_all(create_engine("sqlite:///:memory:"))
+    db_mod.ensure_schema("test.registry", lambda: calls.append(1))
+    assert calls == [1, 1]
+    db_mod.reset_schema_registry()
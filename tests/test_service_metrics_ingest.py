@@ -0,0 +1,96 @@
+from sqlalchemy import event
+
+from core import db as core_db
+from core.db import get_session
+from core.models import ServiceMetric
+from core.service_metrics_service import ServiceMetricsService
+
+TENANT = 1
+
+
+def _row(unit, day, **kw):
+    base = {"unit_id": unit, "date": day, "meal": "lunch", "category": "main", "guest_count": 10}
+    base.update(kw)
+    return base
+
+
+def _writes(fn):
+    n = {"writes": 0}
+
+    def _on_exec(conn, cursor, statement, parameters, context, executemany):
+        # Stats rows (service_metric_stats) are written alongside; count the metric upserts
+        if statement.lstrip().upper().startswith("INSERT INTO SERVICE_METRICS "):
+            n["writes"] += 1
+
+    event.listen(core_db._engine, "before_cursor_execute", _on_exec)
+    try:
+        out = fn()
+    finally:
+        event.remove(core_db._engine, "before_cursor_execute", _on_exec)
+    return out, n["writes"]
+
+
+def _stored(day):
+    db = get_session()
+    try:
+        rows = db.query(ServiceMetric).filter(ServiceMetric.tenant_id == TENANT).all()
+        return sorted(
+            ((r.unit_id, r.dish_id, r.category, r.guest_count) for r in rows if r.date.isoformat() == day),
+            key=lambda t: (t[0], t[1] or 0, t[2] or ""),
+        )
+    finally:
+        db.close()
+
+
+def test_ingest_upserts_by_natural_key_in_one_statement(app_session):
+    svc = ServiceMetricsService()
+    day = "2031-03-03"
+    rows = [_row(u, day, category=c) for u in range(1, 51) for c in ("main", "dessert")]
+    with app_session.app_context():
+        res, writes = _writes(lambda: svc.ingest(TENANT, rows))
+        assert res == {"ok": True, "inserted": 100, "updated": 0, "errors": []}
+        assert writes == 1
+
+        again = [_row(1, day, guest_count=12), _row(51, day)]
+        assert svc.ingest(TENANT, again) == {"ok": True, "inserted": 1, "updated": 1, "errors": []}
+        assert len(_stored(day)) == 101
+
+
+def test_ingest_dedupes_and_matches_null_dish_or_category(app_session):
+    svc = ServiceMetricsService()
+    day = "2031-03-04"
+    rows = [
+        _row(1, day, guest_count=5),
+        _row(1, day, guest_count=7),  # same key: last one wins
+        _row(1, day, category=None, dish_id=9, guest_count=3),
+        _row(1, day, category="", dish_id=9, guest_count=4),  # "" is stored as NULL -> same key
+        {"unit_id": 1, "date": day, "meal": "brunch", "category": "main"},
+        {"unit_id": 1, "date": "not-a-date", "meal": "lunch", "category": "main"},
+    ]
+    with app_session.app_context():
+        res = svc.ingest(TENANT, rows)
+        assert (res["inserted"], res["updated"]) == (2, 0)
+        assert res["errors"] == ["invalid meal", "invalid date"]
+        assert _stored(day) == [(1, None, "main", 7), (1, 9, None, 4)]
+
+        # Rows without a dish (or without a category) still hit the existing row on re-ingest
+        res = svc.ingest(TENANT, [_row(1, day, guest_count=8), _row(1, day, category=None, dish_id=9, guest_count=2)])
+        assert (res["inserted"], res["updated"]) == (0, 2)
+        assert _stored(day) == [(1, None, "main", 8), (1, 9, None, 2)]
+
+
+def test_ingest_leaves_deduplication_to_the_migration(app_session):
+    seen = []
+
+    def _on_exec(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("DELETE"):
+            seen.append(statement)
+
+    with app_session.app_context():
+        event.listen(core_db._engine, "before_cursor_execute", _on_exec)
+        try:
+            res = ServiceMetricsService().ingest(TENANT, [_row(1, "2031-03-05")])
+        finally:
+            event.remove(core_db._engine, "before_cursor_execute", _on_exec)
+    assert res["inserted"] == 1
+    assert not [s for s in seen if "service_metrics" in s]
@@ -0,0 +1,67 @@
+from sqlalchemy import event, text
+
+from core.app_factory import create_app
+from core.db import get_session
+
+
+def test_ttl_cache_expiry_and_lru_bound(monkeypatch):
+    from core import site_cache
+
+    clock = [100.0]
+    monkeypatch.setattr(site_cache.time, "monotonic", lambda: clock[0])
+    cache = site_cache.TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", None)
+    assert cache.get_or_load("b", lambda: 99) is None  # cached None is a hit
+    cache.get("a")  # refresh recency of "a"
+    cache.set("c", 3)  # evicts least-recently used "b"
+    assert cache.get_or_load("b", lambda: 2) == 2
+    clock[0] += 11
+    assert cache.get_or_load("a", lambda: "fresh") == "fresh"
+
+
+def test_before_request_site_tenant_lookup_is_cached():
+    from core import site_cache
+
+    app = create_app({"TESTING": True, "SECRET_KEY": "x"})
+    client = app.test_client()
+    db = get_session()
+    try:
+        db.execute(text("CREATE TABLE IF NOT EXISTS sites(id TEXT PRIMARY KEY, name TEXT)"))
+        cols = {r[1] for r in db.execute(text("PRAGMA table_info('sites')")).fetchall()}
+        if "tenant_id" not in cols:
+            db.execute(text("ALTER TABLE sites ADD COLUMN tenant_id INTEGER"))
+        db.execute(text("INSERT OR REPLACE INTO sites(id,name,tenant_id) VALUES('cache-site','Cache',1)"))
+        db.commit()
+    finally:
+        db.close()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 1
+        sess["role"] = "admin"
+        sess["tenant_id"] = 1
+        sess["site_id"] = "cache-site"
+
+    client.get("/healthz")  # warm the cache
+    engine = get_session().get_bind()
+    seen: list[str] = []
+
+    def _on_exec(conn, cursor, statement, params, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _on_exec)
+    try:
+        client.get("/healthz")
+        assert not [s for s in seen if "sites" in s]
+        # A raw write to sites invalidates: tenant change is picked up on the next request
+        db = get_session()
+        try:
+            db.execute(text("UPDATE sites SET tenant_id=2 WHERE id='cache-site'"))
+            db.commit()
+        finally:
+            db.close()
+        assert len(site_cache.site_tenants) == 0
+        client.get("/healthz")
+        with client.session_transaction() as sess:
+            assert "site_id" not in sess  # cleared: site now belongs to another tenant
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_exec)
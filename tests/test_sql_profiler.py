@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from core import sql_profiler
+from core.db import get_session
+
+SU = {"X-User-Role": "superuser", "X-User-Id": "1", "X-Tenant-Id": "1"}
+ADMIN = {"X-User-Role": "admin", "X-User-Id": "1", "X-Tenant-Id": "1"}
+
+
+@pytest.fixture
+def profile_all():
+    sql_profiler._test_reset()
+    sql_profiler.configure(sample_rate=1.0, n1_threshold=3)
+    yield
+    sql_profiler._test_reset()
+
+
+def test_normalize_groups_statement_shapes():
+    a = sql_profiler.normalize("SELECT * FROM menus WHERE id = 12 AND name = 'x'")
+    b = sql_profiler.normalize("SELECT *  FROM menus\n WHERE id = 7 AND name = 'it''s'")
+    assert a == b == "SELECT * FROM menus WHERE id = ? AND name = ?"
+    assert sql_profiler.normalize("SELECT 1 FROM t2 WHERE id IN (?, ?, ?)") == (
+        "SELECT ? FROM t2 WHERE id IN (?)"
+    )
+
+
+def test_repeated_select_shape_flagged_as_n_plus_one(app_session, profile_all):
+    assert sql_profiler.start_request()
+    db = get_session()
+    try:
+        for i in range(4):
+            db.execute(text("SELECT id FROM tenants WHERE id = :i"), {"i": i}).fetchall()
+        db.execute(text("SELECT count(*) FROM users")).scalar()
+    finally:
+        db.close()
+    resp = SimpleNamespace(headers={})
+    summary = sql_profiler.finish_request(resp, {"route": "/x"})
+    assert summary["queries"] == 5
+    assert summary["n_plus_one"][0]["count"] == 4
+    assert resp.headers["Server-Timing"].startswith("db;dur=")
+    assert 'n1;desc="4x tenants"' in resp.headers["Server-Timing"]
+    assert sql_profiler.active() is None
+
+
+def test_unsampled_requests_are_not_profiled(app_session):
+    sql_profiler._test_reset()
+    assert sql_profiler.start_request() is False
+    assert sql_profiler.finish_request(SimpleNamespace(headers={}), {}) is None
+
+
+def test_request_gets_server_timing_and_support_ring_buffer(client_superuser, profile_all):
+    r = client_superuser.get("/admin/audit", headers=ADMIN)
+    assert r.status_code == 200
+    assert "db;dur=" in r.headers.get("Server-Timing", "")
+    listing = client_superuser.get("/admin/support/sql-profiles", headers=SU).get_json()
+    assert listing["ok"] is True and listing["profiler"]["sample_rate"] == 1.0
+    mine = [p for p in listing["profiles"] if p["route"] == "/admin/audit"]
+    assert mine and mine[0]["queries"] >= 1 and mine[0]["status"] == 200
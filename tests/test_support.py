@@ -43,3 +43,13 @@ def test_support_lookup_superuser(client_superuser, ensure_warning):
         assert payload["request_id"] == rid
     else:
         pytest.skip("No warnings captured; skipping lookup validation")
+
+
+def test_support_db_pool_stats(client_superuser):
+    r = client_superuser.get(
+        "/admin/support/db-pool", headers={"X-User-Role": "superuser", "X-Tenant-Id": "1"}
+    )
+    assert r.status_code == 200
+    pool = r.get_json()["pool"]
+    assert pool["initialized"] is True
+    assert "pool_class" in pool and "status" in pool
@@ -0,0 +1,123 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from core import db as core_db
+from core.db import get_session
+from core.models import ShiftSlot, Tenant, Unit
+from core.turnus_service import TurnusService
+
+
+@pytest.fixture
+def crew(app_session):
+    with app_session.app_context():
+        db = get_session()
+        try:
+            t = Tenant(name="TurnusImport_" + uuid.uuid4().hex[:6])
+            db.add(t)
+            db.flush()
+            unit = Unit(tenant_id=t.id, name="Rig")
+            db.add(unit)
+            db.commit()
+            ids = (t.id, unit.id)
+        finally:
+            db.close()
+        tpl = TurnusService().create_template(ids[0], "6 weeks", "simple6")
+    return {"tenant_id": ids[0], "unit_id": ids[1], "template_id": tpl}
+
+
+def _rotation(unit_id, weeks=6, crew_size=6):
+    """Day and night shifts for every cook, as legacy/offshore/rotation.py lays them out."""
+    start = datetime(2031, 1, 6, 7, 0)
+    out = []
+    for day in range(weeks * 7):
+        for cook in range(crew_size):
+            for half in (0, 12):
+                s = start + timedelta(days=day, hours=half)
+                out.append(
+                    {
+                        "unit_id": unit_id,
+                        "start_ts": s.isoformat(timespec="minutes"),
+                        "end_ts": (s + timedelta(hours=12)).isoformat(timespec="minutes"),
+                        "role": f"kokk {cook + 1}",
+                    }
+                )
+    return out
+
+
+def _statements(fn):
+    seen = []
+
+    def _on_exec(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        # In-memory SQLite re-runs the index bootstrap (CREATE INDEX) on every import
+        if "shift_slots" in statement and verb in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            seen.append(verb)
+
+    event.listen(core_db._engine, "before_cursor_execute", _on_exec)
+    try:
+        out = fn()
+    finally:
+        event.remove(core_db._engine, "before_cursor_execute", _on_exec)
+    return out, seen
+
+
+def test_import_is_set_based_and_idempotent(app_session, crew):
+    svc = TurnusService()
+    shifts = _rotation(crew["unit_id"])
+    tid, tpl = crew["tenant_id"], crew["template_id"]
+    with app_session.app_context():
+        res, stmts = _statements(lambda: svc.import_shifts(tid, tpl, shifts))
+        assert res == {"inserted": 504, "skipped": 0}
+        assert stmts == ["SELECT", "INSERT"]
+
+        # Re-import plus in-batch duplicates, invalid rows and role/unit spelled differently
+        extra = [
+            dict(shifts[0], role=" kokk 1 "),
+            dict(shifts[1], unit_id=str(crew["unit_id"])),
+            {"unit_id": crew["unit_id"], "start_ts": "2031-03-01T10:00", "end_ts": "2031-03-01T08:00"},
+            {"start_ts": "not a date", "end_ts": "2031-03-01T08:00"},
+            "not a shift",
+            {"unit_id": None, "start_ts": "2031-03-01T08:00", "end_ts": "2031-03-01T16:00", "role": ""},
+            {"unit_id": None, "start_ts": "2031-03-01T08:00", "end_ts": "2031-03-01T16:00"},
+        ]
+        res, stmts = _statements(lambda: svc.import_shifts(tid, tpl, shifts + extra))
+        assert res == {"inserted": 1, "skipped": 510}
+        assert stmts == ["SELECT", "INSERT"]
+
+        db = get_session()
+        try:
+            assert db.query(ShiftSlot).filter(ShiftSlot.tenant_id == tid).count() == 505
+        finally:
+            db.close()
+
+
+def test_streaming_csv_and_ndjson_bodies(app_session, crew, client_admin):
+    with client_admin.session_transaction() as sess:
+        sess.update({"user_id": 1, "role": "admin", "tenant_id": crew["tenant_id"]})
+    shifts = _rotation(crew["unit_id"], weeks=1, crew_size=2)
+    url = f"/turnus/import?template_id={crew['template_id']}"
+
+    header = "unit_id,start_ts,end_ts,role\n"
+    body = header + "".join(f"{s['unit_id']},{s['start_ts']},{s['end_ts']},{s['role']}\n" for s in shifts[:20])
+    r = client_admin.post(url, data=body.encode(), content_type="text/csv")
+    assert r.status_code == 200
+    assert r.get_json() == {"inserted": 20, "skipped": 0}
+
+    lines = [json.dumps(s) for s in shifts] + ["{broken", ""]
+    r = client_admin.post(url, data="\n".join(lines).encode(), content_type="application/x-ndjson")
+    assert r.get_json() == {"inserted": len(shifts) - 20, "skipped": 21}
+
+    slots = client_admin.get("/turnus/slots", query_string={"from": "2031-01-06", "to": "2031-01-13"})
+    assert len(slots.get_json()) == len(shifts)
+
+    missing = client_admin.post("/turnus/import", data=header.encode(), content_type="text/csv")
+    assert missing.status_code == 400
+
+    latin1 = (header + f"{crew['unit_id']},2031-02-01T07:00,2031-02-01T19:00,kokk ø\n").encode("latin-1")
+    for ctype in ("text/csv", "application/x-ndjson"):
+        bad = client_admin.post(url, data=latin1, content_type=ctype)
+        assert bad.status_code == 400 and "invalid" in bad.get_json()["error"]
@@ -0,0 +1,64 @@
+import pytest
+
+from tests.weekview.test_weekview_fetch_many import _seed_site
+
+
+@pytest.fixture()
+def fresh_cache(monkeypatch):
+    from core import response_cache
+
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "memory")
+    response_cache._test_reset()
+    yield response_cache
+    response_cache._test_reset()
+
+
+def test_cached_payload_hits_misses_and_bypass(fresh_cache):
+    built = []
+
+    def _builder():
+        built.append(1)
+        return {"n": len(built)}
+
+    assert fresh_cache.cached_payload("t", ("a", 1), _builder) == {"n": 1}
+    assert fresh_cache.cached_payload("t", ("a", 1), _builder) == {"n": 1}
+    assert fresh_cache.cached_payload("t", ("a", 2), _builder) == {"n": 2}  # new version -> new key
+    assert fresh_cache.cached_payload("t", None, _builder) == {"n": 3}  # unknown version: uncached
+    assert fresh_cache.stats()["namespaces"]["t"] == {"hits": 1, "misses": 2}
+
+
+def test_cached_payload_returns_the_same_shape_on_miss_and_hit(fresh_cache):
+    built = {"days": (1, 2), "when": "2025-11-10"}
+    miss = fresh_cache.cached_payload("shape", ("k",), lambda: built)
+    hit = fresh_cache.cached_payload("shape", ("k",), lambda: built)
+    assert miss == hit == {"days": [1, 2], "when": "2025-11-10"}
+    assert miss is not built and miss is not hit
+
+
+def test_weekview_and_report_cached_until_version_changes(app_session, fresh_cache):
+    from core.report.service import ReportService
+    from core.residents_schedule_repo import ResidentsScheduleRepo
+    from core.weekview.service import WeekviewService
+
+    year, week = 2025, 45
+    site_id, dep_ids = _seed_site(app_session, 1)
+    dep = dep_ids[0]
+    with app_session.test_request_context("/"):
+        svc = WeekviewService()
+        _nm, first, etag = svc.fetch_weekview_conditional(1, year, week, dep, None, site_id)
+        _nm, second, _etag = svc.fetch_weekview_conditional(1, year, week, dep, None, site_id)
+        assert second == first
+        assert fresh_cache.stats()["namespaces"]["weekview"] == {"hits": 1, "misses": 1}
+
+        svc.toggle_marks(1, year, week, dep, etag, [{"day_of_week": 1, "meal": "lunch", "diet_type": "gluten", "marked": True}])
+        _nm, third, _etag = svc.fetch_weekview_conditional(1, year, week, dep, None, site_id)
+        assert third["department_summaries"][0]["marks"][0]["diet_type"] == "gluten"
+        # Enrichment inputs outside weekview_versions also change the key
+        ResidentsScheduleRepo().upsert_items(dep, week, [{"weekday": 1, "meal": "lunch", "count": 9}])
+        _nm, fourth, _etag = svc.fetch_weekview_conditional(1, year, week, dep, None, site_id)
+        assert fourth["department_summaries"][0]["days"][0]["residents"]["lunch"] == 9
+        assert fresh_cache.stats()["namespaces"]["weekview"]["misses"] == 3
+
+        rs = ReportService()
+        assert rs.compute(1, year, week, dep)[1] == rs.compute(1, year, week, dep)[1]
+        assert fresh_cache.stats()["namespaces"]["report"] == {"hits": 1, "misses": 1}
@@ -0,0 +1,94 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from core import db as core_db
+
+
+def _statements(fn):
+    seen = []
+
+    def _on_exec(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(core_db._engine, "before_cursor_execute", _on_exec)
+    try:
+        out = fn()
+    finally:
+        event.remove(core_db._engine, "before_cursor_execute", _on_exec)
+    return out, seen
+
+
+def _etag(dep, v, year=2031, week=12):
+    return f'W/"weekview:dept:{dep}:year:{year}:week:{week}:v{v}"'
+
+
+def test_mutation_is_cas_bump_plus_one_upsert(app_session):
+    from core.weekview.service import WeekviewService
+
+    dep = str(uuid.uuid4())
+    with app_session.test_request_context("/"):
+        svc = WeekviewService()
+        svc.repo._ensure_schema()
+        ops = [
+            {"day_of_week": d, "meal": meal, "diet_type": diet, "marked": True}
+            for d in range(1, 8)
+            for meal in ("lunch", "dinner")
+            for diet in ("gluten", "laktos")
+        ]
+        etag, stmts = _statements(lambda: svc.toggle_marks(1, 2031, 12, dep, _etag(dep, 0), ops))
+        assert etag == _etag(dep, 1)
+        # No version read, no per-op loop: bump (RETURNING) + one multi-row upsert
+        assert len([s for s in stmts if s.lstrip().upper().startswith(("INSERT", "UPDATE", "SELECT"))]) == 2
+        assert all("version = :" not in s for s in stmts[1:])
+
+        etag = svc.update_residents_counts(
+            1, 2031, 12, dep, etag,
+            [{"day_of_week": 1, "meal": "lunch", "count": 3}, {"day_of_week": 1, "meal": "lunch", "count": 5}],
+        )
+        assert etag == _etag(dep, 2)
+        payload, _ = svc.fetch_weekview(1, 2031, 12, dep)
+        summary = payload["department_summaries"][0]
+        assert len(summary["marks"]) == 28 and all(m["marked"] for m in summary["marks"])
+        # Repeated keys in one request: the last one wins
+        assert summary["residents_counts"] == [{"day_of_week": 1, "meal": "lunch", "count": 5}]
+
+
+def test_stale_if_match_is_rejected_without_writing(app_session):
+    from core.weekview.service import EtagMismatchError, WeekviewService
+
+    dep = str(uuid.uuid4())
+    site = str(uuid.uuid4())
+    with app_session.test_request_context("/"):
+        svc = WeekviewService()
+        etag = svc.update_alt2_flags(1, 2031, 12, dep, _etag(dep, 0), [2, 4], site_id=site)
+        assert etag == _etag(dep, 1)
+        # A second writer still holding v0 (or naming a version that never existed) loses
+        for stale in (_etag(dep, 0), _etag(dep, 7)):
+            with pytest.raises(EtagMismatchError):
+                svc.update_alt2_flags(1, 2031, 12, dep, stale, [5], site_id=site)
+        assert svc.repo.get_version(1, 2031, 12, dep) == 1
+        assert svc.fetch_weekview(1, 2031, 12, dep, site_id=site)[0]["department_summaries"][0]["alt2_days"] == [2, 4]
+
+        # Replacing the set deletes days no longer flagged
+        etag = svc.update_alt2_flags(1, 2031, 12, dep, etag, [4, 6], site_id=site)
+        assert etag == _etag(dep, 2)
+        assert svc.fetch_weekview(1, 2031, 12, dep, site_id=site)[0]["department_summaries"][0]["alt2_days"] == [4, 6]
+
+        # A week without a version row only accepts v0
+        other = str(uuid.uuid4())
+        with pytest.raises(EtagMismatchError):
+            svc.toggle_marks(1, 2031, 12, other, _etag(other, 3), [])
+        assert svc.repo.get_version(1, 2031, 12, other) == 0
+
+
+def test_unconditional_repo_writes_still_bump_once(app_session):
+    from core.weekview.repo import WeekviewRepo
+
+    dep = str(uuid.uuid4())
+    with app_session.app_context():
+        repo = WeekviewRepo()
+        assert repo.apply_operations(1, 2031, 13, dep, [{"day_of_week": 1, "meal": "lunch", "diet_type": "x"}]) == 1
+        assert repo.set_residents_counts(1, 2031, 13, dep, [{"day_of_week": 1, "meal": "lunch", "count": 1}]) == 2
+        assert repo.get_version(1, 2031, 13, dep) == 2
@@ -0,0 +1,89 @@
+import uuid
+
+from sqlalchemy import event, text
+
+
+def _seed_site(app, n_deps: int):
+    from core.db import create_all, get_session
+
+    site_id = str(uuid.uuid4())
+    dep_ids = [str(uuid.uuid4()) for _ in range(n_deps)]
+    with app.app_context():
+        create_all()
+        db = get_session()
+        try:
+            db.execute(text("INSERT INTO sites(id, name, version) VALUES(:i,:n,0)"), {"i": site_id, "n": f"S {site_id[:6]}"})
+            for i, dep in enumerate(dep_ids):
+                db.execute(
+                    text(
+                        "INSERT INTO departments(id, site_id, name, resident_count_mode, resident_count_fixed, version) "
+                        "VALUES(:i,:s,:n,'fixed',:f,0)"
+                    ),
+                    {"i": dep, "s": site_id, "n": f"Avd {i}", "f": 10 + i},
+                )
+            db.commit()
+        finally:
+            db.close()
+    return site_id, dep_ids
+
+
+def test_fetch_weekview_many_matches_single_fetch(app_session):
+    from core.admin_repo import DepartmentsRepo
+    from core.residents_schedule_repo import ResidentsScheduleRepo
+    from core.residents_weekly_repo import ResidentsWeeklyRepo
+    from core.weekview.service import WeekviewService
+
+    app = app_session
+    year, week = 2025, 47
+    site_id, dep_ids = _seed_site(app, 3)
+    with app.test_request_context("/"):
+        svc = WeekviewService()
+        # Registrations, residents counts and alt2 on the first department
+        etag = svc.fetch_weekview(1, year, week, dep_ids[0], site_id=site_id)[1]
+        etag = svc.toggle_marks(1, year, week, dep_ids[0], etag, [{"day_of_week": 1, "meal": "lunch", "diet_type": "gluten", "marked": True}])
+        etag = svc.update_residents_counts(1, year, week, dep_ids[0], etag, [{"day_of_week": 2, "meal": "dinner", "count": 4}])
+        svc.update_alt2_flags(1, year, week, dep_ids[0], etag, [3], site_id=site_id)
+        # Diet defaults and residents inputs spread across departments
+        DepartmentsRepo().upsert_department_diet_defaults(dep_ids[1], 0, [{"diet_type_id": "laktos", "default_count": 2}])
+        ResidentsScheduleRepo().upsert_items(dep_ids[1], week, [{"weekday": 1, "meal": "lunch", "count": 7}])
+        ResidentsScheduleRepo().upsert_items(dep_ids[2], None, [{"weekday": 5, "meal": "dinner", "count": 3}])
+        ResidentsWeeklyRepo().upsert_for_week(dep_ids[2], year, week, 12, None)
+
+        batched = svc.fetch_weekview_many(1, year, week, dep_ids, site_id=site_id)
+        assert list(batched.keys()) == dep_ids
+        for dep in dep_ids:
+            assert batched[dep] == svc.fetch_weekview(1, year, week, dep, site_id=site_id)
+        # Without explicit site_id alt2 falls back to each department's own site
+        for dep in dep_ids:
+            assert svc.fetch_weekview_many(1, year, week, [dep])[dep] == svc.fetch_weekview(1, year, week, dep)
+        days0 = batched[dep_ids[0]][0]["department_summaries"][0]["days"]
+        assert days0[2]["alt2_lunch"] is True
+
+
+def test_fetch_weekview_many_query_count_is_constant(app_session):
+    from core.db import get_session
+    from core.weekview.service import WeekviewService
+
+    app = app_session
+    year, week = 2025, 46
+    _site_small, small = _seed_site(app, 2)
+    _site_large, large = _seed_site(app, 12)
+
+    def _count(deps):
+        with app.test_request_context("/"):
+            engine = get_session().get_bind()
+            svc = WeekviewService()
+            svc.fetch_weekview_many(1, year, week, deps)  # seed version rows
+            seen = []
+
+            def _on_exec(conn, cursor, statement, params, context, executemany):
+                seen.append(statement)
+
+            event.listen(engine, "before_cursor_execute", _on_exec)
+            try:
+                svc.fetch_weekview_many(1, year, week, deps)
+            finally:
+                event.remove(engine, "before_cursor_execute", _on_exec)
+            return len(seen)
+
+    assert _count(small) == _count(large)